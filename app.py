@@ -19,8 +19,19 @@ class Base(DeclarativeBase):
 db = SQLAlchemy(model_class=Base)
 login_manager = LoginManager()
 
-def create_app():
-    """Factory para criar a aplicação Flask"""
+def create_app(inicializar_banco=None):
+    """
+    Factory para criar a aplicação Flask
+    
+    Args:
+        inicializar_banco: Criar tabelas, admin e configurações padrão na
+            inicialização. Se omitido, segue a variável INICIALIZAR_BANCO
+            (padrão: sim); scripts de linha de comando usam INICIALIZAR_BANCO=0
+            para apenas ler o banco, sem efeitos colaterais.
+    """
+    if inicializar_banco is None:
+        inicializar_banco = os.environ.get('INICIALIZAR_BANCO', '1') != '0'
+    
     app = Flask(__name__)
     
     # Configurações da aplicação
@@ -305,8 +316,12 @@ def create_app():
     # Criar tabelas do banco
     with app.app_context():
         # Importar todos os modelos
-        from models import usuario, dominio, pergunta, resposta, logo, tipo_assessment, cliente, respondente, configuracao, projeto, assessment_version, parametro_sistema, assessment_publico, lead
+        from models import usuario, dominio, pergunta, resposta, logo, tipo_assessment, cliente, respondente, configuracao, projeto, assessment_version, parametro_sistema, assessment_publico, lead, cache_versao, progresso_tarefa, tarefa_background, cache_openai, estatistica_grupo, auditoria
+        if not inicializar_banco:
+            return app
+        
         db.create_all()
+        lead.preparar_busca_leads()
         
         # Criar usuário admin padrão se não existir
         from models.usuario import Usuario
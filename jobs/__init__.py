@@ -0,0 +1,3 @@
+"""
+Fila de tarefas em background e worker (python -m jobs.worker)
+"""
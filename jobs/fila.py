@@ -0,0 +1,299 @@
+"""
+Fila durável de tarefas em background (tabela tarefas_background)
+
+As rotas enfileiram tarefas; o worker (python -m jobs.worker) as reserva com
+um lease que é renovado enquanto a tarefa executa. Se o worker morrer, o
+lease expira e a tarefa volta para a fila. Falhas são repetidas com backoff
+exponencial até max_tentativas.
+"""
+
+import os
+import time
+import json
+import uuid
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models.tarefa_background import TarefaBackground
+from utils.progress_store import get_progress_store
+
+# Duração do lease; o worker renova a cada LEASE_SEGUNDOS / 3
+LEASE_SEGUNDOS = int(os.environ.get('JOBS_LEASE_SEGUNDOS', '120'))
+
+# Espera antes da primeira repetição (dobra a cada tentativa)
+BACKOFF_SEGUNDOS = int(os.environ.get('JOBS_BACKOFF_SEGUNDOS', '30'))
+
+MAX_TENTATIVAS = int(os.environ.get('JOBS_MAX_TENTATIVAS', '3'))
+
+
+class ErroPermanente(Exception):
+    """Falha que não deve ser repetida (ex: projeto não finalizado)"""
+    pass
+
+
+# Funções executoras registradas por tipo (ver jobs/tarefas.py)
+_executores = {}
+
+
+def tarefa(tipo):
+    """Registra a função que executa as tarefas de um tipo"""
+    def decorator(f):
+        _executores[tipo] = f
+        return f
+    return decorator
+
+
+def get_executor(tipo):
+    if not _executores:
+        import jobs.tarefas  # noqa: F401 - registra os executores
+    return _executores.get(tipo)
+
+
+def _chave(tipo, projeto_id):
+    return f'{tipo}:{projeto_id}' if projeto_id is not None else tipo
+
+
+def enfileirar(tipo, projeto_id=None, parametros=None, solicitado_por=None, max_tentativas=None, chave=None):
+    """
+    Enfileira uma tarefa.
+
+    Se já existir uma tarefa ativa com a mesma chave (por padrão, o tipo e o
+    projeto) ela é reaproveitada. Retorna (tarefa, criada).
+    """
+    chave = chave or _chave(tipo, projeto_id)
+
+    # Tarefas de workers que morreram não devem bloquear a deduplicação
+    recuperar_expiradas()
+
+    existente = TarefaBackground.query.filter(
+        TarefaBackground.chave_deduplicacao == chave,
+        TarefaBackground.status.in_(TarefaBackground.STATUS_ATIVOS)
+    ).first()
+    if existente:
+        logging.info(f"Tarefa {tipo} já está na fila para a chave {chave} (id {existente.id})")
+        if existente.status == 'pendente' and _modo_inline():
+            _executar_inline(existente.id)
+        return existente, False
+
+    nova = TarefaBackground(
+        tipo=tipo,
+        projeto_id=projeto_id,
+        chave_deduplicacao=chave,
+        parametros=json.dumps(parametros or {}, ensure_ascii=False),
+        session_id=uuid.uuid4().hex,
+        status='pendente',
+        max_tentativas=max_tentativas or MAX_TENTATIVAS,
+        disponivel_em=datetime.utcnow(),
+        solicitado_por=solicitado_por
+    )
+    db.session.add(nova)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Outra requisição enfileirou a mesma tarefa ao mesmo tempo
+        db.session.rollback()
+        existente = TarefaBackground.query.filter(
+            TarefaBackground.chave_deduplicacao == chave,
+            TarefaBackground.status.in_(TarefaBackground.STATUS_ATIVOS)
+        ).first()
+        if existente:
+            return existente, False
+        raise
+
+    get_progress_store().publicar(nova.session_id, {
+        'status': 'processing',
+        'current_domain': 'Aguardando na fila de processamento...',
+        'processed': 0,
+        'total': 0,
+        'percentage': 0
+    })
+    logging.info(f"Tarefa {tipo} enfileirada (id {nova.id}, chave {chave})")
+
+    if _modo_inline():
+        _executar_inline(nova.id)
+
+    return nova, True
+
+
+def _modo_inline():
+    """JOBS_INLINE=1 executa as tarefas no próprio processo web (ambientes sem worker)"""
+    return os.environ.get('JOBS_INLINE', '').lower() in ('1', 'true', 'sim')
+
+
+def _executar_inline(tarefa_id):
+    """Executa a tarefa em uma thread do processo web, incluindo as novas tentativas"""
+    from flask import current_app
+    from jobs.worker import processar_proxima
+
+    app = current_app._get_current_object()
+
+    def executar():
+        worker_id = f'inline-{os.getpid()}-{threading.get_ident()}'
+        with app.app_context():
+            while True:
+                processar_proxima(worker_id, tarefa_id=tarefa_id)
+                tarefa_atual = db.session.get(TarefaBackground, tarefa_id)
+                if not tarefa_atual or tarefa_atual.status != 'pendente':
+                    break
+                espera = (tarefa_atual.disponivel_em - datetime.utcnow()).total_seconds()
+                db.session.remove()
+                time.sleep(max(espera, 0))
+
+    thread = threading.Thread(target=executar)
+    thread.daemon = True
+    thread.start()
+
+
+def recuperar_expiradas():
+    """Devolve à fila tarefas cujo worker parou de renovar o lease"""
+    agora = datetime.utcnow()
+    expiradas = TarefaBackground.query.filter(
+        TarefaBackground.status == 'executando',
+        TarefaBackground.lease_ate < agora
+    ).all()
+
+    sessoes_com_erro = []
+    for tarefa_expirada in expiradas:
+        logging.warning(f"Lease expirado para tarefa {tarefa_expirada.id} (worker {tarefa_expirada.worker_id})")
+        if tarefa_expirada.tentativas >= tarefa_expirada.max_tentativas:
+            tarefa_expirada.status = 'erro'
+            tarefa_expirada.erro = 'Worker interrompido durante a execução'
+            tarefa_expirada.data_conclusao = agora
+            sessoes_com_erro.append(tarefa_expirada.session_id)
+        else:
+            tarefa_expirada.status = 'pendente'
+            tarefa_expirada.disponivel_em = agora
+        tarefa_expirada.lease_ate = None
+        tarefa_expirada.worker_id = None
+
+    if expiradas:
+        db.session.commit()
+    for session_id in sessoes_com_erro:
+        _publicar_erro(session_id, 'Worker interrompido durante a execução')
+    return len(expiradas)
+
+
+def reservar(worker_id, tarefa_id=None):
+    """
+    Reserva a próxima tarefa disponível para o worker.
+
+    A reserva é um UPDATE condicional: se outro worker pegou a mesma tarefa
+    primeiro, nenhuma linha é afetada e a próxima candidata é tentada.
+    """
+    agora = datetime.utcnow()
+    consulta = TarefaBackground.query.filter(
+        TarefaBackground.status == 'pendente',
+        TarefaBackground.disponivel_em <= agora
+    )
+    if tarefa_id is not None:
+        consulta = consulta.filter(TarefaBackground.id == tarefa_id)
+
+    candidatas = [
+        linha.id for linha in consulta.with_entities(TarefaBackground.id)
+        .order_by(TarefaBackground.disponivel_em, TarefaBackground.id)
+        .limit(10).all()
+    ]
+    db.session.rollback()
+
+    tabela = TarefaBackground.__table__
+    for candidata_id in candidatas:
+        resultado = db.session.execute(
+            update(tabela)
+            .where(tabela.c.id == candidata_id, tabela.c.status == 'pendente')
+            .values(
+                status='executando',
+                worker_id=worker_id,
+                lease_ate=agora + timedelta(seconds=LEASE_SEGUNDOS),
+                tentativas=tabela.c.tentativas + 1,
+                data_inicio=agora,
+                erro=None
+            )
+        )
+        db.session.commit()
+        if resultado.rowcount == 1:
+            return db.session.get(TarefaBackground, candidata_id, populate_existing=True)
+
+    return None
+
+
+def renovar_lease(tarefa_id, worker_id):
+    """Renova o lease da tarefa; retorna False se o worker perdeu a reserva"""
+    tabela = TarefaBackground.__table__
+    with db.engine.begin() as conn:
+        resultado = conn.execute(
+            update(tabela)
+            .where(tabela.c.id == tarefa_id,
+                   tabela.c.worker_id == worker_id,
+                   tabela.c.status == 'executando')
+            .values(lease_ate=datetime.utcnow() + timedelta(seconds=LEASE_SEGUNDOS))
+        )
+    return resultado.rowcount == 1
+
+
+def _finalizar(tarefa_atual, dono, **valores):
+    """Grava o resultado apenas se a tarefa ainda pertence a este worker"""
+    tabela = TarefaBackground.__table__
+    db.session.rollback()
+    resultado = db.session.execute(
+        update(tabela)
+        .where(tabela.c.id == tarefa_atual.id,
+               tabela.c.worker_id == dono,
+               tabela.c.status == 'executando')
+        .values(**valores)
+    )
+    db.session.commit()
+    if resultado.rowcount != 1:
+        logging.warning(f"Tarefa {tarefa_atual.id} não pertence mais ao worker {dono}; resultado descartado")
+        return False
+    return True
+
+
+def concluir(tarefa_atual, worker_id, resultado=None):
+    """Marca a tarefa como concluída"""
+    return _finalizar(
+        tarefa_atual, worker_id,
+        status='concluida',
+        resultado=json.dumps(resultado or {}, ensure_ascii=False, default=str),
+        lease_ate=None,
+        data_conclusao=datetime.utcnow()
+    )
+
+
+def falhar(tarefa_atual, worker_id, erro, permanente=False):
+    """
+    Registra a falha da tarefa.
+
+    Retorna True se a tarefa voltou para a fila (nova tentativa agendada) ou
+    False se a falha é definitiva.
+    """
+    agora = datetime.utcnow()
+    mensagem = str(erro)
+
+    if permanente or tarefa_atual.tentativas >= tarefa_atual.max_tentativas:
+        if _finalizar(tarefa_atual, worker_id,
+                      status='erro', erro=mensagem, lease_ate=None, data_conclusao=agora):
+            _publicar_erro(tarefa_atual.session_id, mensagem)
+        return False
+
+    espera = BACKOFF_SEGUNDOS * (2 ** (tarefa_atual.tentativas - 1))
+    if _finalizar(tarefa_atual, worker_id,
+                  status='pendente', erro=mensagem, lease_ate=None, worker_id=None,
+                  disponivel_em=agora + timedelta(seconds=espera)):
+        get_progress_store().publicar(tarefa_atual.session_id, {
+            'status': 'processing',
+            'current_domain': f'Falha na tentativa {tarefa_atual.tentativas}; nova tentativa em {espera}s',
+            'processed': 0,
+            'total': 0,
+            'percentage': 0
+        })
+    return True
+
+
+def _publicar_erro(session_id, mensagem):
+    get_progress_store().publicar(session_id, {
+        'status': 'error',
+        'message': mensagem or 'Erro durante processamento'
+    })
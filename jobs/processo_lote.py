@@ -0,0 +1,22 @@
+"""
+Inicialização dos processos do pool de relatórios em lote
+
+Fica fora de utils (e não importa app no nível do módulo) porque o processo
+filho precisa importar app antes de qualquer módulo de utils, senão ocorre
+importação circular. Ver utils.relatorios_lote._executar.
+"""
+
+import os
+import importlib
+
+
+def inicializar_processo_lote():
+    """
+    Importa a aplicação no processo filho sem repetir a inicialização do banco
+
+    O processo principal (worker ou script) já criou as tabelas e os dados
+    padrão; os filhos apenas geram relatórios e não devem executar
+    create_all, a preparação da busca de leads ou os seeds ao mesmo tempo.
+    """
+    os.environ['INICIALIZAR_BANCO'] = '0'
+    importlib.import_module('app')
@@ -0,0 +1,257 @@
+"""
+Executores das tarefas em background (IA de projetos e assessments públicos
+e geração de relatórios PDF, individuais ou em lote)
+
+Cada executor recebe a tarefa e uma função publicar(dados) que envia o
+progresso para o endpoint SSE. Deve retornar um dict de resultado, lançar
+ErroPermanente para falhas que não adianta repetir ou qualquer outra exceção
+para que a tarefa seja repetida.
+"""
+
+import json
+import logging
+from app import db
+from models.projeto import Projeto
+from utils.openai_utils import OpenAIAssistant
+from jobs.fila import tarefa, ErroPermanente
+
+
+def _carregar_projeto(tarefa_atual):
+    """Carrega o projeto da tarefa e valida as pré-condições comuns"""
+    projeto = Projeto.query.get(tarefa_atual.projeto_id)
+    if not projeto:
+        raise ErroPermanente('Projeto não encontrado')
+
+    if not projeto.is_totalmente_finalizado():
+        raise ErroPermanente('Projeto deve estar totalmente finalizado')
+
+    if not OpenAIAssistant().is_configured():
+        raise ErroPermanente('Integração com ChatGPT não configurada')
+
+    return projeto
+
+
+@tarefa('introducao_ia')
+def executar_introducao_ia(tarefa_atual, publicar):
+    """Gera a introdução do relatório"""
+    from utils.openai_utils import gerar_introducao_ia
+
+    projeto = _carregar_projeto(tarefa_atual)
+
+    publicar({
+        'status': 'processing',
+        'current_domain': 'Gerando introdução do relatório...',
+        'processed': 0,
+        'total': 1,
+        'percentage': 0
+    })
+
+    resultado = gerar_introducao_ia(projeto)
+    if resultado.get('erro'):
+        raise RuntimeError(resultado['erro'])
+
+    projeto.introducao_ia = resultado['introducao']
+    db.session.commit()
+
+    publicar({
+        'status': 'completed',
+        'current_domain': 'Processamento concluído!',
+        'processed': 1,
+        'total': 1,
+        'percentage': 100,
+        'success_message': 'Introdução inteligente gerada com sucesso!'
+    })
+    return {'assistant_name': resultado.get('assistant_name')}
+
+
+@tarefa('analise_dominios')
+def executar_analise_dominios(tarefa_atual, publicar):
+    """Gera a análise dos domínios com salvamento incremental"""
+    from utils.ia_batch_processor import gerar_analise_incremental
+
+    projeto = _carregar_projeto(tarefa_atual)
+
+    resultado = gerar_analise_incremental(projeto, publicar_progresso=publicar)
+    if resultado.get('erro'):
+        raise RuntimeError(resultado['erro'])
+
+    processados = resultado['dominios_processados']
+    total = resultado['total_dominios']
+    if processados == 0:
+        raise RuntimeError('Nenhum domínio foi processado')
+
+    if processados == total:
+        mensagem = f'Análise de {processados} domínios gerada com sucesso!'
+    else:
+        mensagem = f'Análise parcial: {processados} de {total} domínios processados.'
+
+    publicar({
+        'status': 'completed',
+        'current_domain': 'Processamento concluído!',
+        'processed': processados,
+        'total': total,
+        'percentage': 100,
+        'success_message': mensagem
+    })
+    return {'dominios_processados': processados, 'total_dominios': total}
+
+
+@tarefa('consideracoes_finais')
+def executar_consideracoes_finais(tarefa_atual, publicar):
+    """Gera as considerações finais do projeto"""
+    from utils.openai_utils import gerar_consideracoes_finais_projeto
+
+    projeto = _carregar_projeto(tarefa_atual)
+
+    publicar({
+        'status': 'processing',
+        'current_domain': 'Gerando considerações finais...',
+        'processed': 0,
+        'total': 1,
+        'percentage': 0
+    })
+
+    resultado = gerar_consideracoes_finais_projeto(projeto)
+    if resultado.get('erro'):
+        raise RuntimeError(resultado['erro'])
+
+    consideracoes_data = {
+        'consideracoes': resultado['consideracoes'],
+        'assistant_name': resultado['assistant_name'],
+        'gerado_em': resultado['gerado_em'],
+        'dados_utilizados': resultado['dados_utilizados']
+    }
+    projeto.consideracoes_finais_ia = json.dumps(consideracoes_data, ensure_ascii=False)
+    db.session.commit()
+    logging.info(f"Considerações finais salvas para projeto {projeto.id}")
+
+    publicar({
+        'status': 'completed',
+        'current_domain': 'Processamento concluído!',
+        'processed': 1,
+        'total': 1,
+        'percentage': 100,
+        'success_message': 'Considerações finais geradas com sucesso!'
+    })
+    return {'assistant_name': resultado['assistant_name']}
+
+
+@tarefa('recomendacoes_publicas')
+def executar_recomendacoes_publicas(tarefa_atual, publicar):
+    """Gera e armazena as recomendações de um assessment público concluído"""
+    from models.assessment_publico import AssessmentPublico
+    from utils.publico_utils import gerar_e_salvar_recomendacoes
+
+    assessment_publico_id = tarefa_atual.parametros_json.get('assessment_publico_id')
+    assessment_publico = AssessmentPublico.query.get(assessment_publico_id) if assessment_publico_id else None
+    if not assessment_publico:
+        raise ErroPermanente('Assessment público não encontrado')
+
+    recomendacoes = assessment_publico.get_recomendacoes()
+    if recomendacoes is not None:
+        return {'dominios': len(recomendacoes)}
+
+    assessment_publico.status_recomendacoes = 'gerando'
+    db.session.commit()
+
+    try:
+        recomendacoes = gerar_e_salvar_recomendacoes(assessment_publico)
+    except Exception:
+        # A página de resultado deixa de aguardar e gera as recomendações na hora
+        db.session.rollback()
+        assessment_publico.status_recomendacoes = 'erro'
+        db.session.commit()
+        raise
+
+    publicar({
+        'status': 'completed',
+        'current_domain': 'Processamento concluído!',
+        'processed': len(recomendacoes),
+        'total': len(recomendacoes),
+        'percentage': 100,
+        'success_message': 'Recomendações geradas com sucesso!'
+    })
+    return {'dominios': len(recomendacoes)}
+
+
+@tarefa('relatorio_pdf')
+def executar_relatorio_pdf(tarefa_atual, publicar):
+    """Gera o relatório PDF completo do projeto e o armazena para download"""
+    from utils.relatorio_artefatos import calcular_fingerprint, obter_relatorio
+
+    projeto = Projeto.query.get(tarefa_atual.projeto_id)
+    if not projeto:
+        raise ErroPermanente('Projeto não encontrado')
+
+    publicar({
+        'status': 'processing',
+        'current_domain': 'Gerando o relatório...',
+        'processed': 0,
+        'total': 1,
+        'percentage': 0
+    })
+
+    fingerprint = calcular_fingerprint(projeto)
+    obter_relatorio(projeto, fingerprint)
+
+    publicar({
+        'status': 'completed',
+        'current_domain': 'Processamento concluído!',
+        'processed': 1,
+        'total': 1,
+        'percentage': 100,
+        'success_message': 'Relatório gerado com sucesso!'
+    })
+    return {'fingerprint': fingerprint}
+
+
+@tarefa('relatorios_lote')
+def executar_relatorios_lote(tarefa_atual, publicar):
+    """Gera os relatórios dos projetos filtrados e os reúne em um ZIP para download"""
+    from datetime import date
+    from utils.relatorios_lote import selecionar_projetos, gerar_relatorios_lote, caminho_lote, remover_lotes_antigos
+
+    parametros = tarefa_atual.parametros_json
+    try:
+        projetos = selecionar_projetos(
+            cliente_id=parametros.get('cliente_id'),
+            status=parametros.get('status', 'finalizados'),
+            data_inicio=date.fromisoformat(parametros['data_inicio']) if parametros.get('data_inicio') else None,
+            data_fim=date.fromisoformat(parametros['data_fim']) if parametros.get('data_fim') else None
+        )
+    except ValueError as e:
+        raise ErroPermanente(str(e))
+
+    if not projetos:
+        raise ErroPermanente('Nenhum projeto encontrado com os filtros informados')
+
+    total = len(projetos)
+    publicar({
+        'status': 'processing',
+        'current_domain': f'Gerando {total} relatórios...',
+        'processed': 0,
+        'total': total,
+        'percentage': 0
+    })
+
+    def progresso(processados, total, projeto):
+        publicar({
+            'status': 'processing',
+            'current_domain': f'Relatório {processados} de {total}: {projeto.nome}',
+            'processed': processados,
+            'total': total,
+            'percentage': int(processados * 100 / total)
+        })
+
+    resumo = gerar_relatorios_lote(projetos, caminho_lote(tarefa_atual.id), progresso=progresso)
+    remover_lotes_antigos()
+
+    publicar({
+        'status': 'completed',
+        'current_domain': 'Processamento concluído!',
+        'processed': total,
+        'total': total,
+        'percentage': 100,
+        'success_message': f"{resumo['gerados']} de {total} relatórios gerados"
+    })
+    return resumo
@@ -0,0 +1,143 @@
+"""
+Worker da fila de tarefas em background
+
+Uso: python -m jobs.worker [--once] [--intervalo SEGUNDOS]
+
+Processa as tarefas de tarefas_background uma por vez. Vários workers podem
+rodar em paralelo (em um ou mais servidores); cada tarefa é reservada por um
+único worker. SIGTERM/SIGINT encerram o worker após a tarefa atual.
+"""
+
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+import threading
+from app import db
+from jobs.fila import (LEASE_SEGUNDOS, ErroPermanente, get_executor, recuperar_expiradas,
+                       reservar, renovar_lease, concluir, falhar)
+from utils.progress_store import get_progress_store
+
+
+class _RenovadorLease(threading.Thread):
+    """Renova o lease da tarefa enquanto ela executa"""
+
+    def __init__(self, app, tarefa_id, worker_id):
+        super().__init__(daemon=True)
+        self.app = app
+        self.tarefa_id = tarefa_id
+        self.worker_id = worker_id
+        self._parar = threading.Event()
+
+    def run(self):
+        intervalo = max(LEASE_SEGUNDOS / 3, 1)
+        with self.app.app_context():
+            while not self._parar.wait(intervalo):
+                try:
+                    if not renovar_lease(self.tarefa_id, self.worker_id):
+                        logging.warning(f"Worker {self.worker_id} perdeu o lease da tarefa {self.tarefa_id}")
+                        return
+                except Exception as e:
+                    logging.error(f"Erro ao renovar lease da tarefa {self.tarefa_id}: {e}")
+
+    def parar(self):
+        self._parar.set()
+
+
+def processar_proxima(worker_id, tarefa_id=None):
+    """
+    Reserva e executa uma tarefa (deve ser chamada dentro do app context).
+
+    Retorna True se alguma tarefa foi processada.
+    """
+    from flask import current_app
+
+    tarefa_atual = reservar(worker_id, tarefa_id=tarefa_id)
+    if not tarefa_atual:
+        return False
+
+    logging.info(f"Worker {worker_id} executando tarefa {tarefa_atual.id} "
+                 f"({tarefa_atual.tipo}, tentativa {tarefa_atual.tentativas}/{tarefa_atual.max_tentativas})")
+
+    store = get_progress_store()
+    session_id = tarefa_atual.session_id
+
+    def publicar(dados):
+        store.publicar(session_id, dados)
+
+    renovador = _RenovadorLease(current_app._get_current_object(), tarefa_atual.id, worker_id)
+    renovador.start()
+    try:
+        executor = get_executor(tarefa_atual.tipo)
+        if not executor:
+            raise ErroPermanente(f'Tipo de tarefa desconhecido: {tarefa_atual.tipo}')
+
+        resultado = executor(tarefa_atual, publicar)
+        concluir(tarefa_atual, worker_id, resultado)
+        logging.info(f"Tarefa {tarefa_atual.id} concluída")
+
+    except ErroPermanente as e:
+        logging.warning(f"Tarefa {tarefa_atual.id} falhou definitivamente: {e}")
+        falhar(tarefa_atual, worker_id, e, permanente=True)
+
+    except Exception as e:
+        logging.error(f"Erro na tarefa {tarefa_atual.id}: {e}", exc_info=True)
+        db.session.rollback()
+        if falhar(tarefa_atual, worker_id, e):
+            logging.info(f"Tarefa {tarefa_atual.id} reagendada")
+
+    finally:
+        renovador.parar()
+        db.session.remove()
+
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Worker da fila de tarefas em background')
+    parser.add_argument('--once', action='store_true', help='Processa as tarefas disponíveis e encerra')
+    parser.add_argument('--intervalo', type=float,
+                        default=float(os.environ.get('JOBS_INTERVALO_SEGUNDOS', '2')),
+                        help='Espera entre consultas quando a fila está vazia')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    from app import app
+
+    worker_id = f'{socket.gethostname()}-{os.getpid()}'
+    encerrar = threading.Event()
+
+    def sinal_encerrar(signum, frame):
+        logging.info(f"Worker {worker_id} encerrando após a tarefa atual")
+        encerrar.set()
+
+    signal.signal(signal.SIGTERM, sinal_encerrar)
+    signal.signal(signal.SIGINT, sinal_encerrar)
+
+    logging.info(f"Worker {worker_id} iniciado")
+
+    while not encerrar.is_set():
+        with app.app_context():
+            try:
+                recuperar_expiradas()
+                processou = processar_proxima(worker_id)
+            except Exception as e:
+                logging.error(f"Erro no loop do worker: {e}", exc_info=True)
+                db.session.rollback()
+                processou = False
+
+        if not processou:
+            if args.once:
+                break
+            encerrar.wait(args.intervalo)
+
+    logging.info(f"Worker {worker_id} encerrado")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,6 +7,7 @@ import sys
 from app import app, db
 from models.assessment_publico import AssessmentPublico, RespostaPublica
 from models.lead import Lead, LeadHistorico
+from models.estatistica_grupo import EstatisticaGrupoPublico
 
 def main():
     if '--confirmar' not in sys.argv:
@@ -61,6 +62,7 @@ def main():
         # Excluir assessments públicos
         if total_assessments > 0:
             AssessmentPublico.query.delete()
+            EstatisticaGrupoPublico.query.delete()
             print(f"   ✓ {total_assessments} assessments públicos excluídos")
         
         # Commit
@@ -7,6 +7,7 @@ Execute com: python3 limpar_dados_publicos.py
 from app import app, db
 from models.assessment_publico import AssessmentPublico, RespostaPublica
 from models.lead import Lead, LeadHistorico
+from models.estatistica_grupo import EstatisticaGrupoPublico
 
 def limpar_dados():
     """Limpa todos os dados de assessments públicos e leads"""
@@ -78,6 +79,7 @@ def limpar_dados():
             if total_assessments > 0:
                 print(f"\n[4/4] Deletando {total_assessments} assessments públicos...")
                 AssessmentPublico.query.delete()
+                EstatisticaGrupoPublico.query.delete()
                 db.session.commit()
                 print("✓ Assessments públicos deletados")
             
@@ -0,0 +1,68 @@
+-- Migração: Arquivo e contadores diários da auditoria
+-- Data: 2026-10-18
+-- Descrição: Índice por data na auditoria, tabela de arquivo usada pela retenção
+-- (scripts/arquivar_auditoria.py) e contadores diários lidos pelo dashboard.
+-- Os contadores são preenchidos a partir dos registros já existentes; se a aplicação
+-- já tiver criado as tabelas, use scripts/arquivar_auditoria.py --reconstruir-resumo.
+-- Sintaxe PostgreSQL (SERIAL, COMMENT ON); no SQLite as tabelas são criadas pela
+-- aplicação (db.create_all) e os contadores com --reconstruir-resumo.
+
+CREATE INDEX IF NOT EXISTS ix_auditoria_data_hora ON auditoria(data_hora);
+
+CREATE TABLE IF NOT EXISTS auditoria_arquivo (
+    id SERIAL PRIMARY KEY,
+    auditoria_id INTEGER NOT NULL,
+    usuario_tipo VARCHAR(20) NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    usuario_nome VARCHAR(100) NOT NULL,
+    usuario_email VARCHAR(100),
+    acao VARCHAR(50) NOT NULL,
+    entidade VARCHAR(50) NOT NULL,
+    entidade_id INTEGER,
+    entidade_nome VARCHAR(200),
+    descricao TEXT NOT NULL,
+    detalhes TEXT,
+    ip_address VARCHAR(45),
+    user_agent TEXT,
+    data_hora TIMESTAMP NOT NULL,
+    data_arquivamento TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_auditoria_arquivo_auditoria_id ON auditoria_arquivo(auditoria_id);
+CREATE INDEX IF NOT EXISTS ix_auditoria_arquivo_data_hora ON auditoria_arquivo(data_hora);
+
+COMMENT ON TABLE auditoria_arquivo IS 'Registros de auditoria com mais de AUDITORIA_RETENCAO_DIAS dias, movidos da tabela auditoria';
+COMMENT ON COLUMN auditoria_arquivo.auditoria_id IS 'Id do registro original na tabela auditoria';
+
+CREATE TABLE IF NOT EXISTS auditoria_resumo_diario (
+    id SERIAL PRIMARY KEY,
+    data DATE NOT NULL,
+    acao VARCHAR(50) NOT NULL,
+    entidade VARCHAR(50) NOT NULL,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    CONSTRAINT uq_auditoria_resumo_diario UNIQUE (data, acao, entidade)
+);
+
+COMMENT ON TABLE auditoria_resumo_diario IS 'Eventos de auditoria por dia (UTC), ação e entidade; atualizado junto com a gravação dos eventos';
+
+CREATE TABLE IF NOT EXISTS auditoria_usuarios_diarios (
+    id SERIAL PRIMARY KEY,
+    data DATE NOT NULL,
+    usuario_tipo VARCHAR(20) NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    CONSTRAINT uq_auditoria_usuarios_diarios UNIQUE (data, usuario_tipo, usuario_id)
+);
+
+COMMENT ON TABLE auditoria_usuarios_diarios IS 'Usuários com alguma ação registrada em cada dia (UTC)';
+
+-- Preencher os contadores com o histórico existente (somente na primeira execução)
+INSERT INTO auditoria_resumo_diario (data, acao, entidade, quantidade)
+SELECT DATE(data_hora), acao, entidade, COUNT(*)
+FROM auditoria
+WHERE NOT EXISTS (SELECT 1 FROM auditoria_resumo_diario)
+GROUP BY DATE(data_hora), acao, entidade;
+
+INSERT INTO auditoria_usuarios_diarios (data, usuario_tipo, usuario_id)
+SELECT DISTINCT DATE(data_hora), usuario_tipo, usuario_id
+FROM auditoria
+WHERE NOT EXISTS (SELECT 1 FROM auditoria_usuarios_diarios);
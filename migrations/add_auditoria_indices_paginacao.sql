@@ -0,0 +1,12 @@
+-- Migração: Índices de paginação da auditoria
+-- Data: 2026-10-18
+-- Descrição: Índices compostos terminando em (data_hora, id) para o explorador de auditoria
+-- (/admin/auditoria), que pagina por chave do mais recente para o mais antigo com
+-- filtros por usuário, entidade e ação. O índice simples em data_hora fica redundante.
+
+CREATE INDEX IF NOT EXISTS ix_auditoria_data_hora_id ON auditoria(data_hora, id);
+CREATE INDEX IF NOT EXISTS ix_auditoria_usuario_data_hora ON auditoria(usuario_tipo, usuario_id, data_hora, id);
+CREATE INDEX IF NOT EXISTS ix_auditoria_entidade_data_hora ON auditoria(entidade, entidade_id, data_hora, id);
+CREATE INDEX IF NOT EXISTS ix_auditoria_acao_data_hora ON auditoria(acao, data_hora, id);
+
+DROP INDEX IF EXISTS ix_auditoria_data_hora;
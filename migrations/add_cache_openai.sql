@@ -0,0 +1,24 @@
+-- Migration: Cache de respostas da OpenAI
+-- Data: 2026-10-18
+-- Descrição: Respostas indexadas pelo SHA-256 da requisição (operação, modelo,
+-- prompts, temperatura) para evitar regerar textos idênticos
+
+CREATE TABLE IF NOT EXISTS cache_openai (
+    id SERIAL PRIMARY KEY,
+    chave VARCHAR(64) UNIQUE NOT NULL,
+    operacao VARCHAR(50) NOT NULL,
+    modelo VARCHAR(50) NOT NULL,
+    resposta TEXT NOT NULL,
+    tamanho INTEGER NOT NULL DEFAULT 0,
+    tokens_prompt INTEGER,
+    tokens_resposta INTEGER,
+    acessos INTEGER NOT NULL DEFAULT 0,
+    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    ultimo_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_cache_openai_operacao ON cache_openai(operacao);
+CREATE INDEX IF NOT EXISTS ix_cache_openai_ultimo_acesso ON cache_openai(ultimo_acesso);
+
+COMMENT ON TABLE cache_openai IS 'Cache persistente de respostas da OpenAI (limites: OPENAI_CACHE_MAX_DIAS e OPENAI_CACHE_MAX_MB)';
+COMMENT ON COLUMN cache_openai.chave IS 'SHA-256 de (operação, modelo, prompt de sistema, prompt do usuário, temperatura, max_tokens)';
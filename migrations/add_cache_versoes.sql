@@ -0,0 +1,14 @@
+-- Migration: Tabela de versões de cache
+-- Data: 2026-10-18
+-- Descrição: Contador usado para invalidar, em todos os workers do gunicorn,
+-- o cache em memória de configuracoes e parametros_sistema
+
+CREATE TABLE IF NOT EXISTS cache_versoes (
+    id SERIAL PRIMARY KEY,
+    chave VARCHAR(100) UNIQUE NOT NULL,
+    versao INTEGER NOT NULL DEFAULT 0,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE cache_versoes IS 'Versão de cada cache de configurações; incrementada a cada alteração';
+COMMENT ON COLUMN cache_versoes.chave IS 'Nome do cache (configuracoes, parametros_sistema)';
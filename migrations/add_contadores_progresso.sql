@@ -0,0 +1,42 @@
+-- Migração: Contadores de progresso desnormalizados
+-- Data: 2026-10-18
+-- Descrição: Total de perguntas e perguntas respondidas por projeto e por
+-- respondente, mantidos a cada resposta salva. NULL indica que o contador
+-- será recalculado na próxima leitura (ou por scripts/recalcular_progresso.py)
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 
+        FROM information_schema.columns 
+        WHERE table_name = 'projetos' 
+        AND column_name = 'total_perguntas'
+    ) THEN
+        ALTER TABLE projetos 
+        ADD COLUMN total_perguntas INTEGER,
+        ADD COLUMN perguntas_respondidas INTEGER;
+        
+        COMMENT ON COLUMN projetos.total_perguntas IS 'Perguntas ativas das versões do projeto (NULL = recalcular)';
+        COMMENT ON COLUMN projetos.perguntas_respondidas IS 'Perguntas respondidas no projeto, colaborativo (NULL = recalcular)';
+        
+        RAISE NOTICE 'Contadores de progresso adicionados à tabela projetos';
+    ELSE
+        RAISE NOTICE 'Contadores de progresso já existem na tabela projetos';
+    END IF;
+    
+    IF NOT EXISTS (
+        SELECT 1 
+        FROM information_schema.columns 
+        WHERE table_name = 'projeto_respondentes' 
+        AND column_name = 'perguntas_respondidas'
+    ) THEN
+        ALTER TABLE projeto_respondentes 
+        ADD COLUMN perguntas_respondidas INTEGER;
+        
+        COMMENT ON COLUMN projeto_respondentes.perguntas_respondidas IS 'Respostas do respondente no projeto (NULL = recalcular)';
+        
+        RAISE NOTICE 'Contador de progresso adicionado à tabela projeto_respondentes';
+    ELSE
+        RAISE NOTICE 'Contador de progresso já existe na tabela projeto_respondentes';
+    END IF;
+END $$;
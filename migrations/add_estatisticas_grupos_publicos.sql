@@ -0,0 +1,32 @@
+-- Migração: Estatísticas agregadas dos grupos públicos
+-- Data: 2026-10-18
+-- Descrição: Agregados das pontuações dos assessments públicos concluídos por
+-- (grupo, tipo de assessment, domínio), mantidos a cada conclusão e lidos
+-- pelas páginas de grupos. Após aplicar, execute
+-- scripts/sincronizar_estatisticas_grupos.py para incluir os assessments já
+-- concluídos.
+
+CREATE TABLE IF NOT EXISTS estatisticas_grupos_publicos (
+    id SERIAL PRIMARY KEY,
+    grupo VARCHAR(100) NOT NULL DEFAULT '',
+    tipo_assessment_id INTEGER NOT NULL,
+    dominio_id INTEGER NOT NULL DEFAULT 0,
+    soma DOUBLE PRECISION NOT NULL DEFAULT 0,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    minima DOUBLE PRECISION,
+    maxima DOUBLE PRECISION,
+    histograma TEXT,
+    primeira_conclusao TIMESTAMP,
+    ultima_conclusao TIMESTAMP,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_estatisticas_grupos_publicos UNIQUE (grupo, tipo_assessment_id, dominio_id)
+);
+
+-- Tabelas criadas antes da coluna de detecção de divergência
+ALTER TABLE estatisticas_grupos_publicos ADD COLUMN IF NOT EXISTS soma_ids BIGINT NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS ix_estatisticas_grupos_publicos_tipo ON estatisticas_grupos_publicos(tipo_assessment_id, dominio_id);
+
+COMMENT ON COLUMN estatisticas_grupos_publicos.grupo IS 'Grupo/Campanha ('''' = sem grupo)';
+COMMENT ON COLUMN estatisticas_grupos_publicos.dominio_id IS 'Domínio versionado (0 = pontuação geral)';
+COMMENT ON COLUMN estatisticas_grupos_publicos.soma_ids IS 'Soma dos ids dos assessments (detecção de divergência)';
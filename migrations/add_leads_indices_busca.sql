@@ -0,0 +1,17 @@
+-- Migração: Índices de paginação e busca de leads
+-- Data: 2026-10-18
+-- Descrição: Índices compostos terminando em (data_criacao, id) para o dashboard de leads
+-- (/admin/leads), que pagina por chave do mais recente para o mais antigo com filtros
+-- por status e prioridade, e índices GIN de trigramas (pg_trgm) para a busca por
+-- trecho (ILIKE '%termo%') em nome, email e empresa. No SQLite a busca usa a tabela
+-- FTS5 leads_busca, criada na inicialização da aplicação.
+
+CREATE INDEX IF NOT EXISTS ix_leads_data_criacao_id ON leads(data_criacao, id);
+CREATE INDEX IF NOT EXISTS ix_leads_status_data_criacao ON leads(status, data_criacao, id);
+CREATE INDEX IF NOT EXISTS ix_leads_prioridade_data_criacao ON leads(prioridade, data_criacao, id);
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_leads_nome_trgm ON leads USING gin (nome gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_leads_email_trgm ON leads USING gin (email gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_leads_empresa_trgm ON leads USING gin (empresa gin_trgm_ops);
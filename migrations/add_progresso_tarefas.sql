@@ -0,0 +1,18 @@
+-- Migration: Tabela de progresso de tarefas em background
+-- Data: 2026-10-18
+-- Descrição: Estado de progresso compartilhado entre workers do gunicorn,
+-- lido pelo endpoint SSE /sse/progress/<session_id>
+
+CREATE TABLE IF NOT EXISTS progresso_tarefas (
+    id SERIAL PRIMARY KEY,
+    session_id VARCHAR(64) UNIQUE NOT NULL,
+    versao INTEGER NOT NULL DEFAULT 0,
+    dados TEXT,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expira_em TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_progresso_tarefas_expira_em ON progresso_tarefas(expira_em);
+
+COMMENT ON TABLE progresso_tarefas IS 'Progresso de tarefas em background (análise IA etc.) publicado para os streams SSE';
+COMMENT ON COLUMN progresso_tarefas.versao IS 'Incrementada a cada publicação; usada pelos assinantes para detectar mudanças';
@@ -0,0 +1,27 @@
+-- Migração: Recomendações IA armazenadas no assessment público
+-- Data: 2026-10-18
+-- Descrição: As recomendações por domínio passam a ser geradas uma única vez
+-- (em background, após a conclusão) e lidas pela página de resultado e pelo e-mail
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 
+        FROM information_schema.columns 
+        WHERE table_name = 'assessments_publicos' 
+        AND column_name = 'recomendacoes_ia'
+    ) THEN
+        ALTER TABLE assessments_publicos 
+        ADD COLUMN recomendacoes_ia TEXT,
+        ADD COLUMN status_recomendacoes VARCHAR(20),
+        ADD COLUMN data_recomendacoes TIMESTAMP;
+        
+        COMMENT ON COLUMN assessments_publicos.recomendacoes_ia IS 'Recomendações por domínio (JSON: {dominio_id: texto})';
+        COMMENT ON COLUMN assessments_publicos.status_recomendacoes IS 'pendente, gerando, concluido ou erro';
+        COMMENT ON COLUMN assessments_publicos.data_recomendacoes IS 'Data de geração das recomendações';
+        
+        RAISE NOTICE 'Colunas de recomendações adicionadas à tabela assessments_publicos';
+    ELSE
+        RAISE NOTICE 'Colunas de recomendações já existem na tabela assessments_publicos';
+    END IF;
+END $$;
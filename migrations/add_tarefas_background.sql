@@ -0,0 +1,37 @@
+-- Migration: Fila durável de tarefas em background
+-- Data: 2026-10-18
+-- Descrição: Tarefas de IA (introdução, análise de domínios, considerações finais)
+-- enfileiradas pelas rotas e executadas pelo worker (python -m jobs.worker)
+
+CREATE TABLE IF NOT EXISTS tarefas_background (
+    id SERIAL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,
+    projeto_id INTEGER REFERENCES projetos(id) ON DELETE CASCADE,
+    chave_deduplicacao VARCHAR(200) NOT NULL,
+    parametros TEXT,
+    session_id VARCHAR(64) NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL DEFAULT 3,
+    disponivel_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    lease_ate TIMESTAMP,
+    worker_id VARCHAR(100),
+    resultado TEXT,
+    erro TEXT,
+    solicitado_por INTEGER REFERENCES usuarios(id),
+    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_inicio TIMESTAMP,
+    data_conclusao TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS ix_tarefas_background_status ON tarefas_background(status);
+CREATE INDEX IF NOT EXISTS ix_tarefas_background_fila ON tarefas_background(status, disponivel_em);
+
+-- Apenas uma tarefa ativa por chave (ex: uma análise de domínios por projeto)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_tarefas_background_ativa
+    ON tarefas_background(chave_deduplicacao)
+    WHERE status IN ('pendente', 'executando');
+
+COMMENT ON TABLE tarefas_background IS 'Fila de tarefas em background executadas pelo worker (python -m jobs.worker)';
+COMMENT ON COLUMN tarefas_background.lease_ate IS 'Reserva do worker; se expirar sem renovação a tarefa volta para a fila';
+COMMENT ON COLUMN tarefas_background.disponivel_em IS 'Não executar antes desta data (backoff entre tentativas)';
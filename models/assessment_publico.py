@@ -1,6 +1,7 @@
 from datetime import datetime
 from app import db
 import secrets
+import json
 
 class AssessmentPublico(db.Model):
     """Modelo para armazenar respostas de assessments públicos"""
@@ -24,6 +25,11 @@ class AssessmentPublico(db.Model):
     ip_address = db.Column(db.String(50), comment='IP do respondente')
     grupo = db.Column(db.String(100), comment='Grupo/Campanha do assessment (parâmetro ?group=xyz)')
     
+    # Recomendações IA (geradas uma única vez após a conclusão)
+    recomendacoes_ia = db.Column(db.Text, comment='Recomendações por domínio (JSON: {dominio_id: texto})')
+    status_recomendacoes = db.Column(db.String(20), comment='pendente, gerando, concluido ou erro')
+    data_recomendacoes = db.Column(db.DateTime, comment='Data de geração das recomendações')
+    
     # Relacionamentos
     respostas = db.relationship('RespostaPublica', backref='assessment_publico', lazy=True, cascade='all, delete-orphan')
     tipo_assessment = db.relationship('TipoAssessment', backref='assessments_publicos', lazy=True)
@@ -72,6 +78,21 @@ class AssessmentPublico(db.Model):
         from models.assessment_version import AssessmentDominio
         return AssessmentDominio.query.filter(AssessmentDominio.id.in_(dominios_ids)).all()
     
+    def get_recomendacoes(self):
+        """Retorna as recomendações armazenadas ({dominio_id: texto}) ou None se ainda não foram geradas"""
+        if not self.recomendacoes_ia:
+            return None
+        try:
+            recomendacoes = {int(dominio_id): texto for dominio_id, texto in json.loads(self.recomendacoes_ia).items()}
+        except (ValueError, TypeError, AttributeError):
+            return None
+        # Um dicionário vazio não é resultado da IA: tratar como não gerado
+        return recomendacoes or None
+    
+    def recomendacoes_prontas(self):
+        """Indica se a página de resultado já pode ser exibida sem esperar pela IA"""
+        return self.status_recomendacoes not in ('pendente', 'gerando')
+    
     def to_dict(self):
         """Converte o assessment público para dicionário"""
         return {
@@ -84,7 +84,14 @@ class AssessmentVersao(db.Model):
         # Publicar esta versão
         self.status = 'publicada'
         self.data_publicacao = datetime.utcnow()
+        
+        # Perguntas da versão podem ter mudado desde que os projetos foram associados
+        from models.projeto import invalidar_progresso_projetos
+        from models.questionario import registrar_alteracao_questionario, limpar_questionario
+        invalidar_progresso_projetos(versao_id=self.id)
+        registrar_alteracao_questionario(self.id)
         db.session.commit()
+        limpar_questionario(self.id)
     
     def arquivar(self):
         """Arquiva esta versão"""
@@ -92,6 +99,18 @@ class AssessmentVersao(db.Model):
         self.data_arquivamento = datetime.utcnow()
         db.session.commit()
     
+    def get_questionario(self):
+        """Domínios e perguntas ativos compilados (em cache por processo)"""
+        from models.questionario import obter_questionario
+        return obter_questionario(self.id)
+    
+    def get_total_dominios(self):
+        """Retorna o total de domínios ativos nesta versão"""
+        return AssessmentDominio.query.filter_by(
+            versao_id=self.id,
+            ativo=True
+        ).count()
+    
     def get_total_perguntas(self):
         """Retorna o total de perguntas ativas nesta versão"""
         from models.pergunta import Pergunta
@@ -2,7 +2,14 @@ from app import db
 from datetime import datetime
 import pytz
 from flask_login import current_user
+import base64
 import json
+import logging
+
+# Colunas da auditoria na exportação CSV, na ordem do arquivo
+COLUNAS_EXPORTACAO = ('id', 'data_hora', 'usuario_tipo', 'usuario_id', 'usuario_nome', 'usuario_email',
+                      'acao', 'entidade', 'entidade_id', 'entidade_nome', 'descricao', 'detalhes',
+                      'ip_address', 'user_agent')
 
 class Auditoria(db.Model):
     """Modelo para registrar todas as ações do sistema"""
@@ -33,6 +40,14 @@ class Auditoria(db.Model):
     # Timestamp
     data_hora = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
+    # Paginação por chave (data_hora, id): um índice para a listagem geral e um por filtro principal
+    __table_args__ = (
+        db.Index('ix_auditoria_data_hora_id', 'data_hora', 'id'),
+        db.Index('ix_auditoria_usuario_data_hora', 'usuario_tipo', 'usuario_id', 'data_hora', 'id'),
+        db.Index('ix_auditoria_entidade_data_hora', 'entidade', 'entidade_id', 'data_hora', 'id'),
+        db.Index('ix_auditoria_acao_data_hora', 'acao', 'data_hora', 'id'),
+    )
+    
     def __repr__(self):
         return f'<Auditoria {self.id}: {self.usuario_nome} - {self.acao} {self.entidade}>'
     
@@ -62,6 +77,24 @@ class Auditoria(db.Model):
                 return {}
         return {}
     
+    def to_dict(self):
+        """Converte o registro para dicionário"""
+        return {
+            'id': self.id,
+            'data_hora': self.data_hora.isoformat() if self.data_hora else None,
+            'usuario_tipo': self.usuario_tipo,
+            'usuario_id': self.usuario_id,
+            'usuario_nome': self.usuario_nome,
+            'usuario_email': self.usuario_email,
+            'acao': self.acao,
+            'entidade': self.entidade,
+            'entidade_id': self.entidade_id,
+            'entidade_nome': self.entidade_nome,
+            'descricao': self.descricao,
+            'detalhes': self.detalhes_json,
+            'ip_address': self.ip_address
+        }
+    
     @classmethod
     def registrar(cls, acao, entidade, descricao, entidade_id=None, entidade_nome=None, 
                   detalhes=None, usuario_tipo=None, usuario_id=None, usuario_nome=None, 
@@ -69,6 +102,9 @@ class Auditoria(db.Model):
         """
         Método para registrar uma ação de auditoria
         
+        O registro não usa a sessão de quem chama (não faz commit nem rollback):
+        é enfileirado e gravado em lote por utils.auditoria_escritor.
+        
         Args:
             acao: Tipo da ação (create, update, delete, login, response, etc.)
             entidade: Tipo da entidade (cliente, projeto, resposta, assessment, etc.)
@@ -84,8 +120,11 @@ class Auditoria(db.Model):
             user_agent: User agent do navegador
         """
         try:
+            from flask import has_request_context
+            from utils.auditoria_escritor import get_escritor_auditoria
+            
             # Se não fornecido, tentar obter do usuário atual
-            if not usuario_tipo and hasattr(current_user, 'is_authenticated') and current_user.is_authenticated:
+            if not usuario_tipo and has_request_context() and hasattr(current_user, 'is_authenticated') and current_user.is_authenticated:
                 if hasattr(current_user, 'tipo'):
                     usuario_tipo = current_user.tipo
                 elif hasattr(current_user, 'email'):
@@ -103,80 +142,393 @@ class Auditoria(db.Model):
             if detalhes:
                 detalhes_json = json.dumps(detalhes, ensure_ascii=False)
             
-            # Criar registro de auditoria
-            auditoria = cls(
-                usuario_tipo=usuario_tipo or 'sistema',
-                usuario_id=usuario_id or 0,
-                usuario_nome=usuario_nome or 'Sistema',
-                usuario_email=usuario_email,
-                acao=acao,
-                entidade=entidade,
-                entidade_id=entidade_id,
-                entidade_nome=entidade_nome,
-                descricao=descricao,
-                detalhes=detalhes_json,
-                ip_address=ip_address,
-                user_agent=user_agent,
-                data_hora=datetime.utcnow()
-            )
+            # Evento com as colunas da tabela; a data/hora é a da ação, não a da gravação
+            evento = {
+                'usuario_tipo': usuario_tipo or 'sistema',
+                'usuario_id': usuario_id or 0,
+                'usuario_nome': usuario_nome or 'Sistema',
+                'usuario_email': usuario_email,
+                'acao': acao,
+                'entidade': entidade,
+                'entidade_id': entidade_id,
+                'entidade_nome': entidade_nome,
+                'descricao': descricao,
+                'detalhes': detalhes_json,
+                'ip_address': ip_address,
+                'user_agent': user_agent,
+                'data_hora': datetime.utcnow()
+            }
             
-            db.session.add(auditoria)
-            db.session.commit()
+            # Gravado em lote pelo escritor de auditoria, fora da transação de quem chama
+            get_escritor_auditoria().registrar(evento)
             
-            return auditoria
+            return evento
             
         except Exception as e:
-            db.session.rollback()
-            print(f"Erro ao registrar auditoria: {e}")
+            logging.error(f"Erro ao registrar auditoria: {e}")
             return None
     
     @classmethod
     def obter_atividades_recentes(cls, limite=50):
         """Obtém as atividades mais recentes para o dashboard"""
-        return cls.query.order_by(cls.data_hora.desc()).limit(limite).all()
+        return cls.paginar(limite=limite)[0]
     
     @classmethod
     def obter_atividades_por_usuario(cls, usuario_tipo, usuario_id, limite=50):
         """Obtém atividades de um usuário específico"""
-        return cls.query.filter_by(
-            usuario_tipo=usuario_tipo,
-            usuario_id=usuario_id
-        ).order_by(cls.data_hora.desc()).limit(limite).all()
+        return cls.paginar(limite=limite, usuario_tipo=usuario_tipo, usuario_id=usuario_id)[0]
     
     @classmethod
     def obter_atividades_por_entidade(cls, entidade, entidade_id, limite=50):
         """Obtém atividades relacionadas a uma entidade específica"""
-        return cls.query.filter_by(
-            entidade=entidade,
-            entidade_id=entidade_id
-        ).order_by(cls.data_hora.desc()).limit(limite).all()
+        return cls.paginar(limite=limite, entidade=entidade, entidade_id=entidade_id)[0]
+    
+    @classmethod
+    def _condicoes(cls, usuario_tipo=None, usuario_id=None, entidade=None, entidade_id=None,
+                   acao=None, desde=None, ate=None):
+        """Condições SQL dos filtros informados (desde inclusivo, ate exclusivo, em UTC)"""
+        condicoes = []
+        if usuario_tipo:
+            condicoes.append(cls.usuario_tipo == usuario_tipo)
+        if usuario_id is not None:
+            condicoes.append(cls.usuario_id == usuario_id)
+        if entidade:
+            condicoes.append(cls.entidade == entidade)
+        if entidade_id is not None:
+            condicoes.append(cls.entidade_id == entidade_id)
+        if acao:
+            condicoes.append(cls.acao == acao)
+        if desde:
+            condicoes.append(cls.data_hora >= desde)
+        if ate:
+            condicoes.append(cls.data_hora < ate)
+        return condicoes
+    
+    @classmethod
+    def paginar(cls, cursor=None, limite=50, **filtros):
+        """
+        Página de registros do mais recente para o mais antigo, por chave (data_hora, id)
+        
+        Em vez de OFFSET, cada página continua a partir do último registro da
+        anterior, usando os índices compostos: o custo é o mesmo na primeira
+        página e na milésima.
+        
+        Args:
+            cursor: Valor de `proximo_cursor` da página anterior (None para a primeira)
+            limite: Registros por página
+            **filtros: usuario_tipo, usuario_id, entidade, entidade_id, acao, desde, ate
+            
+        Returns:
+            (registros, proximo_cursor) - proximo_cursor é None na última página
+            
+        Raises:
+            ValueError: cursor inválido
+        """
+        consulta = cls.query.filter(*cls._condicoes(**filtros))
+        if cursor:
+            consulta = consulta.filter(db.tuple_(cls.data_hora, cls.id) < decodificar_cursor(cursor))
+        
+        # Um registro a mais indica se existe próxima página
+        registros = consulta.order_by(cls.data_hora.desc(), cls.id.desc()).limit(limite + 1).all()
+        proximo_cursor = None
+        if len(registros) > limite:
+            registros = registros[:limite]
+            proximo_cursor = codificar_cursor(registros[-1].data_hora, registros[-1].id)
+        return registros, proximo_cursor
+    
+    @classmethod
+    def iterar_linhas(cls, lote=2000, **filtros):
+        """
+        Percorre todos os registros filtrados, do mais recente para o mais antigo,
+        como tuplas com as colunas de COLUNAS_EXPORTACAO
+        
+        Lê em páginas por chave de `lote` linhas, sem carregar objetos na
+        sessão, para exportar qualquer volume com memória constante.
+        """
+        tabela = cls.__table__
+        colunas = [tabela.c[coluna] for coluna in COLUNAS_EXPORTACAO]
+        condicoes = cls._condicoes(**filtros)
+        posicao_data_hora = COLUNAS_EXPORTACAO.index('data_hora')
+        
+        ultima = None
+        while True:
+            consulta = db.select(*colunas).where(*condicoes)
+            if ultima:
+                consulta = consulta.where(db.tuple_(tabela.c.data_hora, tabela.c.id) < ultima)
+            linhas = db.session.execute(
+                consulta.order_by(tabela.c.data_hora.desc(), tabela.c.id.desc()).limit(lote)
+            ).all()
+            if not linhas:
+                return
+            yield from linhas
+            if len(linhas) < lote:
+                return
+            ultima = (linhas[-1][posicao_data_hora], linhas[-1][0])
+    
+    @classmethod
+    def arquivar(cls, antes_de, lote=5000):
+        """
+        Move para auditoria_arquivo os registros anteriores a `antes_de`
+        
+        Trabalha em lotes de `lote` registros, cada um em sua transação, para
+        não manter bloqueios longos na tabela. Os contadores diários não
+        mudam (continuam contando os eventos arquivados).
+        
+        Returns:
+            Quantidade de registros arquivados
+        """
+        colunas = [coluna.name for coluna in cls.__table__.columns if coluna.name != 'id']
+        arquivados = 0
+        while True:
+            ids = [linha[0] for linha in db.session.query(cls.id).filter(
+                cls.data_hora < antes_de
+            ).order_by(cls.id).limit(lote)]
+            if not ids:
+                break
+            
+            db.session.execute(
+                db.insert(AuditoriaArquivo.__table__).from_select(
+                    ['auditoria_id'] + colunas + ['data_arquivamento'],
+                    db.select(cls.__table__.c.id, *[cls.__table__.c[coluna] for coluna in colunas],
+                              db.literal(datetime.utcnow(), db.DateTime)).where(cls.id.in_(ids))
+                )
+            )
+            db.session.execute(db.delete(cls.__table__).where(cls.id.in_(ids)))
+            db.session.commit()
+            arquivados += len(ids)
+        
+        return arquivados
+    
+    @staticmethod
+    def expurgar_arquivo(antes_de):
+        """Exclui definitivamente do arquivo os registros anteriores a `antes_de`"""
+        excluidos = AuditoriaArquivo.query.filter(AuditoriaArquivo.data_hora < antes_de).delete(synchronize_session=False)
+        db.session.commit()
+        return excluidos
     
     @classmethod
     def estatisticas_dashboard(cls):
-        """Retorna estatísticas para o dashboard"""
+        """
+        Retorna estatísticas para o dashboard
+        
+        As contagens vêm dos contadores diários (auditoria_resumo_diario e
+        auditoria_usuarios_diarios), mantidos junto com a gravação dos
+        eventos, sem varrer a tabela auditoria.
+        """
         from datetime import datetime, timedelta
         
         hoje = datetime.utcnow().date()
         semana_passada = hoje - timedelta(days=7)
         mes_passado = hoje - timedelta(days=30)
         
+        quantidade = db.func.coalesce(db.func.sum(AuditoriaResumoDiario.quantidade), 0)
+        totais = db.session.query(
+            quantidade,
+            db.func.coalesce(db.func.sum(db.case((AuditoriaResumoDiario.data == hoje, AuditoriaResumoDiario.quantidade), else_=0)), 0),
+            db.func.coalesce(db.func.sum(db.case((AuditoriaResumoDiario.data >= semana_passada, AuditoriaResumoDiario.quantidade), else_=0)), 0),
+            db.func.coalesce(db.func.sum(db.case((AuditoriaResumoDiario.data >= mes_passado, AuditoriaResumoDiario.quantidade), else_=0)), 0)
+        ).one()
+        
         return {
-            'total_acoes': cls.query.count(),
-            'acoes_hoje': cls.query.filter(
-                db.func.date(cls.data_hora) == hoje
-            ).count(),
-            'acoes_semana': cls.query.filter(
-                cls.data_hora >= semana_passada
-            ).count(),
-            'acoes_mes': cls.query.filter(
-                cls.data_hora >= mes_passado
-            ).count(),
-            'usuarios_ativos_hoje': db.session.query(cls.usuario_id).filter(
-                db.func.date(cls.data_hora) == hoje
-            ).distinct().count(),
-            'ultimas_acoes': cls.query.order_by(cls.data_hora.desc()).limit(10).all()
+            'total_acoes': int(totais[0]),
+            'acoes_hoje': int(totais[1]),
+            'acoes_semana': int(totais[2]),
+            'acoes_mes': int(totais[3]),
+            'usuarios_ativos_hoje': AuditoriaUsuarioDiario.query.filter_by(data=hoje).count(),
+            'ultimas_acoes': cls.obter_atividades_recentes(limite=10)
         }
 
+
+class AuditoriaArquivo(db.Model):
+    """Registros de auditoria antigos, movidos pela retenção (scripts/arquivar_auditoria.py)"""
+    __tablename__ = 'auditoria_arquivo'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # Id do registro original em auditoria (no SQLite os ids de auditoria podem ser reutilizados)
+    auditoria_id = db.Column(db.Integer, nullable=False, index=True)
+    usuario_tipo = db.Column(db.String(20), nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    usuario_nome = db.Column(db.String(100), nullable=False)
+    usuario_email = db.Column(db.String(100), nullable=True)
+    acao = db.Column(db.String(50), nullable=False)
+    entidade = db.Column(db.String(50), nullable=False)
+    entidade_id = db.Column(db.Integer, nullable=True)
+    entidade_nome = db.Column(db.String(200), nullable=True)
+    descricao = db.Column(db.Text, nullable=False)
+    detalhes = db.Column(db.Text, nullable=True)
+    ip_address = db.Column(db.String(45), nullable=True)
+    user_agent = db.Column(db.Text, nullable=True)
+    data_hora = db.Column(db.DateTime, nullable=False, index=True)
+    data_arquivamento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<AuditoriaArquivo {self.auditoria_id}: {self.usuario_nome} - {self.acao} {self.entidade}>'
+
+
+def _upsert(conn, tabela, linhas, chave, somar=None):
+    """
+    Insere as linhas ou, se a chave já existir, soma as colunas em `somar`
+    (ou ignora a linha, se `somar` for omitido)
+    """
+    if not linhas:
+        return
+    
+    dialeto = conn.dialect.name
+    if dialeto in ('postgresql', 'sqlite'):
+        if dialeto == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        comando = insert(tabela)
+        if somar:
+            comando = comando.on_conflict_do_update(
+                index_elements=chave,
+                set_={coluna: tabela.c[coluna] + comando.excluded[coluna] for coluna in somar}
+            )
+        else:
+            comando = comando.on_conflict_do_nothing(index_elements=chave)
+        conn.execute(comando, linhas)
+        return
+    
+    # Outros bancos: atualizar e inserir o que não existia
+    for linha in linhas:
+        filtro = [tabela.c[coluna] == linha[coluna] for coluna in chave]
+        if somar:
+            atualizadas = conn.execute(
+                tabela.update().where(*filtro).values({coluna: tabela.c[coluna] + linha[coluna] for coluna in somar})
+            ).rowcount
+        else:
+            atualizadas = conn.execute(db.select(db.func.count()).select_from(tabela).where(*filtro)).scalar()
+        if not atualizadas:
+            conn.execute(tabela.insert().values(**linha))
+
+
+class AuditoriaResumoDiario(db.Model):
+    """Contador de eventos de auditoria por dia (UTC), ação e entidade"""
+    __tablename__ = 'auditoria_resumo_diario'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False)
+    acao = db.Column(db.String(50), nullable=False)
+    entidade = db.Column(db.String(50), nullable=False)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('data', 'acao', 'entidade', name='uq_auditoria_resumo_diario'),
+    )
+    
+    @staticmethod
+    def acumular(conn, eventos):
+        """
+        Soma os eventos aos contadores diários, na mesma conexão (transação)
+        em que os eventos são gravados
+        """
+        from collections import Counter
+        
+        contagem = Counter()
+        usuarios = set()
+        for evento in eventos:
+            data = evento['data_hora'].date()
+            contagem[(data, evento['acao'], evento['entidade'])] += 1
+            usuarios.add((data, evento['usuario_tipo'], evento['usuario_id']))
+        
+        _upsert(conn, AuditoriaResumoDiario.__table__, [
+            {'data': data, 'acao': acao, 'entidade': entidade, 'quantidade': quantidade}
+            for (data, acao, entidade), quantidade in sorted(contagem.items())
+        ], ['data', 'acao', 'entidade'], somar=['quantidade'])
+        _upsert(conn, AuditoriaUsuarioDiario.__table__, [
+            {'data': data, 'usuario_tipo': usuario_tipo, 'usuario_id': usuario_id}
+            for data, usuario_tipo, usuario_id in sorted(usuarios)
+        ], ['data', 'usuario_tipo', 'usuario_id'])
+    
+    @staticmethod
+    def reconstruir():
+        """
+        Recalcula todos os contadores a partir de auditoria e auditoria_arquivo
+        
+        Tudo ocorre em uma transação que impede gravações concorrentes do
+        escritor de auditoria (que grava os eventos e soma os contadores na
+        mesma transação): no PostgreSQL, um LOCK em modo SHARE na tabela
+        auditoria espera as gravações em andamento e segura as novas até o
+        commit; no SQLite, a exclusão inicial já reserva o banco para escrita.
+        Eventos gravados depois entram pelos contadores normalmente, então
+        nenhum é perdido ou contado duas vezes. Em outros bancos, execute com
+        a aplicação parada.
+        
+        Retorna a quantidade de eventos contabilizados.
+        """
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.execute(db.text('LOCK TABLE auditoria IN SHARE MODE'))
+        
+        # Excluir antes de contar, para contar já com as gravações bloqueadas
+        AuditoriaResumoDiario.query.delete()
+        AuditoriaUsuarioDiario.query.delete()
+        
+        contagem = {}
+        usuarios = set()
+        for modelo in (Auditoria, AuditoriaArquivo):
+            dia = db.func.date(modelo.data_hora)
+            for data, acao, entidade, quantidade in db.session.query(
+                dia, modelo.acao, modelo.entidade, db.func.count(modelo.id)
+            ).group_by(dia, modelo.acao, modelo.entidade):
+                chave = (_como_data(data), acao, entidade)
+                contagem[chave] = contagem.get(chave, 0) + quantidade
+            for data, usuario_tipo, usuario_id in db.session.query(
+                dia, modelo.usuario_tipo, modelo.usuario_id
+            ).distinct():
+                usuarios.add((_como_data(data), usuario_tipo, usuario_id))
+        
+        if contagem:
+            db.session.execute(db.insert(AuditoriaResumoDiario.__table__), [
+                {'data': data, 'acao': acao, 'entidade': entidade, 'quantidade': quantidade}
+                for (data, acao, entidade), quantidade in contagem.items()
+            ])
+        if usuarios:
+            db.session.execute(db.insert(AuditoriaUsuarioDiario.__table__), [
+                {'data': data, 'usuario_tipo': usuario_tipo, 'usuario_id': usuario_id}
+                for data, usuario_tipo, usuario_id in usuarios
+            ])
+        db.session.commit()
+        
+        return sum(contagem.values())
+
+
+class AuditoriaUsuarioDiario(db.Model):
+    """Usuários que registraram alguma ação em cada dia (UTC)"""
+    __tablename__ = 'auditoria_usuarios_diarios'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, nullable=False)
+    usuario_tipo = db.Column(db.String(20), nullable=False)
+    usuario_id = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('data', 'usuario_tipo', 'usuario_id', name='uq_auditoria_usuarios_diarios'),
+    )
+
+
+def codificar_cursor(data_hora, registro_id):
+    """Cursor opaco de paginação para a posição (data_hora, id)"""
+    return base64.urlsafe_b64encode(f'{data_hora.isoformat()}|{registro_id}'.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna (data_hora, id) do cursor ou ValueError se for inválido"""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data_hora, registro_id = texto.split('|')
+        return datetime.fromisoformat(data_hora), int(registro_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Cursor de paginação inválido') from e
+
+
+def _como_data(valor):
+    """func.date retorna date no PostgreSQL e texto no SQLite"""
+    if isinstance(valor, str):
+        return datetime.strptime(valor[:10], '%Y-%m-%d').date()
+    return valor
+
+
 # Funções auxiliares para registrar ações específicas
 
 def registrar_login(usuario_tipo, usuario_id, usuario_nome, usuario_email=None, ip_address=None):
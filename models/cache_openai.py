@@ -0,0 +1,23 @@
+from app import db
+from datetime import datetime
+
+
+class CacheOpenAI(db.Model):
+    """Respostas da OpenAI indexadas pelo hash da requisição (operação, modelo, prompts, temperatura)"""
+
+    __tablename__ = 'cache_openai'
+
+    id = db.Column(db.Integer, primary_key=True)
+    chave = db.Column(db.String(64), unique=True, nullable=False, comment='SHA-256 da requisição')
+    operacao = db.Column(db.String(50), nullable=False, index=True, comment='Operação que gerou a resposta (ex: gerar_analise_dominio)')
+    modelo = db.Column(db.String(50), nullable=False)
+    resposta = db.Column(db.Text, nullable=False, comment='Texto retornado pela OpenAI')
+    tamanho = db.Column(db.Integer, nullable=False, default=0, comment='Tamanho da resposta em bytes (para o limite do cache)')
+    tokens_prompt = db.Column(db.Integer, comment='Tokens de entrada cobrados na geração original')
+    tokens_resposta = db.Column(db.Integer, comment='Tokens de saída cobrados na geração original')
+    acessos = db.Column(db.Integer, nullable=False, default=0, comment='Quantidade de vezes que a resposta foi reaproveitada')
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    ultimo_acesso = db.Column(db.DateTime, default=datetime.utcnow, index=True, comment='Usado na remoção por idade e por tamanho (LRU)')
+
+    def __repr__(self):
+        return f'<CacheOpenAI {self.operacao} {self.chave[:12]}>'
@@ -0,0 +1,87 @@
+"""
+Cache de configurações por processo com invalidação entre workers
+"""
+
+import os
+import threading
+import time
+import logging
+from datetime import datetime
+from app import db
+
+
+class CacheVersao(db.Model):
+    """Contador de versão usado para invalidar caches locais em todos os workers"""
+
+    __tablename__ = 'cache_versoes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    chave = db.Column(db.String(100), unique=True, nullable=False, comment='Nome do cache (ex: configuracoes)')
+    versao = db.Column(db.Integer, nullable=False, default=0, comment='Incrementado a cada alteração')
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, comment='Data da última alteração')
+
+    def __repr__(self):
+        return f'<CacheVersao {self.chave}={self.versao}>'
+
+    @staticmethod
+    def obter(chave):
+        """Retorna a versão atual de um cache (0 se ainda não foi alterado)"""
+        versao = db.session.query(CacheVersao.versao).filter_by(chave=chave).scalar()
+        return versao or 0
+
+    @staticmethod
+    def incrementar(chave):
+        """Incrementa a versão na sessão atual (o commit fica a cargo de quem chama)"""
+        registro = CacheVersao.query.filter_by(chave=chave).first()
+        if registro:
+            registro.versao = CacheVersao.versao + 1
+            registro.data_atualizacao = datetime.utcnow()
+        else:
+            db.session.add(CacheVersao(chave=chave, versao=1))
+
+
+class CacheProcesso:
+    """
+    Cache em memória (por worker) de uma tabela de configurações inteira.
+
+    Todas as linhas são carregadas em uma única consulta. Enquanto o TTL não
+    expira nenhuma consulta é feita; depois disso apenas o contador em
+    cache_versoes é lido e a tabela só é recarregada se outro worker a alterou.
+    """
+
+    def __init__(self, chave, carregar, ttl=None):
+        self.chave = chave
+        self._carregar = carregar
+        self.ttl = ttl if ttl is not None else float(os.environ.get('CONFIG_CACHE_TTL', '10'))
+        self._valores = None
+        self._versao = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+    def obter(self):
+        """Retorna o dicionário de valores, recarregando se necessário"""
+        valores = self._valores
+        if valores is not None and time.monotonic() - self._verificado_em < self.ttl:
+            return valores
+
+        with self._lock:
+            if self._valores is not None and time.monotonic() - self._verificado_em < self.ttl:
+                return self._valores
+
+            versao = CacheVersao.obter(self.chave)
+            if self._valores is None or versao != self._versao:
+                self._valores = self._carregar()
+                self._versao = versao
+                logging.debug(f"Cache '{self.chave}' recarregado (versão {versao}, {len(self._valores)} itens)")
+            self._verificado_em = time.monotonic()
+            return self._valores
+
+    def registrar_alteracao(self):
+        """Marca o cache como alterado; deve ser chamado antes do commit da alteração"""
+        CacheVersao.incrementar(self.chave)
+
+    def limpar(self):
+        """Descarta os valores locais, forçando recarga no próximo acesso"""
+        with self._lock:
+            self._valores = None
+            self._versao = None
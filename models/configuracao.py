@@ -1,5 +1,6 @@
 from datetime import datetime
 from app import db
+from models.cache_versao import CacheProcesso
 
 class Configuracao(db.Model):
     """Modelo para configurações simplificadas do sistema"""
@@ -17,11 +18,16 @@ class Configuracao(db.Model):
     def __repr__(self):
         return f'<Configuracao {self.chave}={self.valor}>'
     
+    @staticmethod
+    def _carregar_todas():
+        """Carrega todas as configurações em uma única consulta"""
+        return dict(db.session.query(Configuracao.chave, Configuracao.valor).all())
+    
     @staticmethod
     def get_valor(chave, default=None):
-        """Obter valor de uma configuração"""
-        config = Configuracao.query.filter_by(chave=chave).first()
-        return config.valor if config else default
+        """Obter valor de uma configuração (via cache do processo)"""
+        valores = _cache_configuracoes.obter()
+        return valores[chave] if chave in valores else default
     
     @staticmethod
     def set_valor(chave, valor, descricao=None, tipo='string'):
@@ -41,7 +47,9 @@ class Configuracao(db.Model):
                 )
                 db.session.add(config)
             
+            _cache_configuracoes.registrar_alteracao()
             db.session.commit()
+            _cache_configuracoes.limpar()
             return config
         except Exception as e:
             db.session.rollback()
@@ -141,7 +149,9 @@ class Configuracao(db.Model):
                 )
                 db.session.add(config)
             
+            _cache_configuracoes.registrar_alteracao()
             db.session.commit()
+            _cache_configuracoes.limpar()
             logging.info("Configurações padrão inicializadas")
             
         except Exception as e:
@@ -192,4 +202,7 @@ class Configuracao(db.Model):
     @staticmethod
     def get_logo_sistema():
         """Retorna o logo do sistema configurado"""
-        return Configuracao.get_valor('logo_sistema', None)
\ No newline at end of file
+        return Configuracao.get_valor('logo_sistema', None)
+
+
+_cache_configuracoes = CacheProcesso('configuracoes', Configuracao._carregar_todas)
@@ -0,0 +1,350 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+import json
+import logging
+
+# Número de faixas do histograma de pontuações (0-10%, 10-20%, ..., 90-100%)
+FAIXAS_HISTOGRAMA = 10
+
+# dominio_id usado para a pontuação geral do assessment
+DOMINIO_GERAL = 0
+
+
+class EstatisticaGrupoPublico(db.Model):
+    """
+    Agregados das pontuações dos assessments públicos concluídos por
+    (grupo, tipo de assessment, domínio), mantidos a cada conclusão.
+
+    O grupo "GERAL" de um tipo é a soma dos agregados de todos os seus grupos.
+    A leitura não corrige divergências (ex.: assessments excluídos fora da
+    exclusão de grupo, ou concluídos antes da criação da tabela): use
+    scripts/sincronizar_estatisticas_grupos.py.
+    """
+
+    __tablename__ = 'estatisticas_grupos_publicos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    grupo = db.Column(db.String(100), nullable=False, default='', comment="Grupo/Campanha ('' = sem grupo)")
+    tipo_assessment_id = db.Column(db.Integer, nullable=False, comment='Tipo de assessment')
+    dominio_id = db.Column(db.Integer, nullable=False, default=DOMINIO_GERAL, comment='Domínio versionado (0 = pontuação geral)')
+
+    soma = db.Column(db.Float, nullable=False, default=0, comment='Soma das pontuações (0-100)')
+    quantidade = db.Column(db.Integer, nullable=False, default=0, comment='Quantidade de assessments')
+    soma_ids = db.Column(db.BigInteger, nullable=False, default=0, comment='Soma dos ids dos assessments (detecção de divergência)')
+    minima = db.Column(db.Float, comment='Menor pontuação')
+    maxima = db.Column(db.Float, comment='Maior pontuação')
+    histograma = db.Column(db.Text, comment='Quantidade por faixa de 10% (JSON)')
+    primeira_conclusao = db.Column(db.DateTime, comment='Conclusão mais antiga')
+    ultima_conclusao = db.Column(db.DateTime, comment='Conclusão mais recente')
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('grupo', 'tipo_assessment_id', 'dominio_id', name='uq_estatisticas_grupos_publicos'),
+        db.Index('ix_estatisticas_grupos_publicos_tipo', 'tipo_assessment_id', 'dominio_id'),
+    )
+
+    def __repr__(self):
+        return f'<EstatisticaGrupoPublico {self.grupo or "-"}/{self.tipo_assessment_id}/{self.dominio_id}: {self.quantidade}>'
+
+    def get_histograma(self):
+        """Retorna o histograma como lista de FAIXAS_HISTOGRAMA inteiros"""
+        try:
+            histograma = json.loads(self.histograma) if self.histograma else None
+        except (ValueError, TypeError):
+            histograma = None
+        if not isinstance(histograma, list) or len(histograma) != FAIXAS_HISTOGRAMA:
+            histograma = [0] * FAIXAS_HISTOGRAMA
+        return histograma
+
+    def acumular(self, pontuacao, data_conclusao=None, assessment_id=0):
+        """Adiciona a pontuação de um assessment aos agregados"""
+        self.soma = (self.soma or 0) + pontuacao
+        self.quantidade = (self.quantidade or 0) + 1
+        self.soma_ids = (self.soma_ids or 0) + assessment_id
+        self.minima = pontuacao if self.minima is None else min(self.minima, pontuacao)
+        self.maxima = pontuacao if self.maxima is None else max(self.maxima, pontuacao)
+
+        histograma = self.get_histograma()
+        histograma[_faixa(pontuacao)] += 1
+        self.histograma = json.dumps(histograma)
+
+        if data_conclusao:
+            if not self.primeira_conclusao or data_conclusao < self.primeira_conclusao:
+                self.primeira_conclusao = data_conclusao
+            if not self.ultima_conclusao or data_conclusao > self.ultima_conclusao:
+                self.ultima_conclusao = data_conclusao
+
+    @classmethod
+    def registrar_assessment(cls, assessment_publico):
+        """Soma um assessment recém-concluído aos agregados do seu grupo"""
+        pontuacoes = _pontuacoes_assessments(
+            cls._filtro_assessments(assessment_publico.tipo_assessment_id)
+            .filter(_assessment_publico().id == assessment_publico.id)
+        )
+        if not pontuacoes:
+            return
+
+        grupo = assessment_publico.grupo or ''
+        for tentativa in range(2):
+            try:
+                for dados in pontuacoes:
+                    cls._acumular_assessment(grupo, assessment_publico.tipo_assessment_id, dados)
+                db.session.commit()
+                return
+            except IntegrityError:
+                # Outro assessment do mesmo grupo criou a linha ao mesmo tempo
+                db.session.rollback()
+                if tentativa:
+                    raise
+
+    @classmethod
+    def atualizar_conclusao(cls, assessment_publico):
+        """Estende o período do grupo quando a data de conclusão de um assessment é regravada"""
+        data_conclusao = assessment_publico.data_conclusao
+        if not data_conclusao:
+            return
+        cls.query.filter(
+            cls.grupo == (assessment_publico.grupo or ''),
+            cls.tipo_assessment_id == assessment_publico.tipo_assessment_id,
+            db.or_(cls.ultima_conclusao.is_(None), cls.ultima_conclusao < data_conclusao)
+        ).update({cls.ultima_conclusao: data_conclusao}, synchronize_session=False)
+        db.session.commit()
+
+    @classmethod
+    def _acumular_assessment(cls, grupo, tipo_assessment_id, dados):
+        for dominio_id, pontuacao in dados['pontuacoes'].items():
+            registro = cls.query.filter_by(
+                grupo=grupo,
+                tipo_assessment_id=tipo_assessment_id,
+                dominio_id=dominio_id
+            ).with_for_update().first()
+
+            if not registro:
+                registro = cls(
+                    grupo=grupo,
+                    tipo_assessment_id=tipo_assessment_id,
+                    dominio_id=dominio_id,
+                    soma=0,
+                    quantidade=0,
+                    soma_ids=0
+                )
+                db.session.add(registro)
+                db.session.flush()
+
+            registro.acumular(pontuacao, dados['data_conclusao'], dados['id'])
+
+    @classmethod
+    def reconstruir(cls, grupo, tipo_assessment_id, commit=True):
+        """Recalcula os agregados de um grupo a partir das respostas gravadas"""
+        AssessmentPublico = _assessment_publico()
+        query = cls._filtro_assessments(tipo_assessment_id)
+        if grupo:
+            query = query.filter(AssessmentPublico.grupo == grupo)
+        else:
+            query = query.filter(func.coalesce(AssessmentPublico.grupo, '') == '')
+
+        cls.query.filter_by(grupo=grupo or '', tipo_assessment_id=tipo_assessment_id).delete(synchronize_session=False)
+
+        registros = {}
+        for dados in _pontuacoes_assessments(query):
+            for dominio_id, pontuacao in dados['pontuacoes'].items():
+                if dominio_id not in registros:
+                    registros[dominio_id] = cls(
+                        grupo=grupo or '',
+                        tipo_assessment_id=tipo_assessment_id,
+                        dominio_id=dominio_id,
+                        soma=0,
+                        quantidade=0,
+                        soma_ids=0
+                    )
+                registros[dominio_id].acumular(pontuacao, dados['data_conclusao'], dados['id'])
+
+        db.session.add_all(registros.values())
+        if commit:
+            db.session.commit()
+
+        logging.info(f"Estatísticas do grupo '{grupo or '-'}' (tipo {tipo_assessment_id}) reconstruídas")
+
+    @classmethod
+    def _filtro_assessments(cls, tipo_assessment_id):
+        AssessmentPublico = _assessment_publico()
+        return db.session.query(AssessmentPublico.id).filter(
+            AssessmentPublico.tipo_assessment_id == tipo_assessment_id,
+            AssessmentPublico.data_conclusao.isnot(None)
+        )
+
+    @classmethod
+    def sincronizar(cls, grupo_nome, tipo_assessment_id):
+        """
+        Reconstrói os grupos cujos agregados não batem com os assessments
+        concluídos (ex.: assessments excluídos ou dados anteriores à criação
+        dos agregados). Compara, por grupo, a quantidade e a soma dos ids:
+        excluir um assessment e concluir outro muda a soma mesmo que a
+        quantidade continue igual. Uma consulta agrupada por grupo.
+
+        Executada pelo script de manutenção, não nas leituras.
+
+        Returns:
+            Lista dos grupos reconstruídos
+        """
+        AssessmentPublico = _assessment_publico()
+        grupo_coluna = func.coalesce(AssessmentPublico.grupo, '')
+
+        reais = db.session.query(
+            grupo_coluna, func.count(AssessmentPublico.id), func.coalesce(func.sum(AssessmentPublico.id), 0)
+        ).filter(
+            AssessmentPublico.tipo_assessment_id == tipo_assessment_id,
+            AssessmentPublico.data_conclusao.isnot(None)
+        )
+        agregados = db.session.query(cls.grupo, cls.quantidade, cls.soma_ids).filter(
+            cls.tipo_assessment_id == tipo_assessment_id,
+            cls.dominio_id == DOMINIO_GERAL
+        )
+        if grupo_nome is not None:
+            reais = reais.filter(grupo_coluna == grupo_nome)
+            agregados = agregados.filter(cls.grupo == grupo_nome)
+
+        reais = {grupo: (quantidade, soma_ids) for grupo, quantidade, soma_ids in reais.group_by(grupo_coluna)}
+        agregados = {grupo: (quantidade, soma_ids or 0) for grupo, quantidade, soma_ids in agregados}
+
+        divergentes = [grupo for grupo in set(reais) | set(agregados) if reais.get(grupo, (0, 0)) != agregados.get(grupo, (0, 0))]
+        for grupo in divergentes:
+            cls.reconstruir(grupo, tipo_assessment_id, commit=False)
+        if divergentes:
+            db.session.commit()
+        return divergentes
+
+    @classmethod
+    def obter(cls, grupo_nome, tipo_assessment_id):
+        """
+        Estatísticas de um grupo (ou do grupo geral, se grupo_nome for None)
+        lidas dos agregados, no formato usado pelas páginas de grupos
+        """
+        from models.assessment_version import AssessmentDominio
+
+        query = cls.query.filter_by(tipo_assessment_id=tipo_assessment_id)
+        if grupo_nome is not None:
+            query = query.filter_by(grupo=grupo_nome)
+
+        # Combinar os grupos (grupo geral) por domínio
+        combinados = {}
+        for registro in query.all():
+            if not registro.quantidade:
+                continue
+            item = combinados.setdefault(registro.dominio_id, {
+                'soma': 0, 'quantidade': 0, 'minima': None, 'maxima': None,
+                'histograma': [0] * FAIXAS_HISTOGRAMA,
+                'primeira_conclusao': None, 'ultima_conclusao': None
+            })
+            item['soma'] += registro.soma
+            item['quantidade'] += registro.quantidade
+            item['minima'] = registro.minima if item['minima'] is None else min(item['minima'], registro.minima)
+            item['maxima'] = registro.maxima if item['maxima'] is None else max(item['maxima'], registro.maxima)
+            item['histograma'] = [a + b for a, b in zip(item['histograma'], registro.get_histograma())]
+            for campo, escolher in (('primeira_conclusao', min), ('ultima_conclusao', max)):
+                valor = getattr(registro, campo)
+                if valor:
+                    item[campo] = valor if item[campo] is None else escolher(item[campo], valor)
+
+        geral = combinados.pop(DOMINIO_GERAL, None)
+        if not geral:
+            return None
+
+        dominios = {}
+        if combinados:
+            dominios = {d.id: d for d in AssessmentDominio.query.filter(AssessmentDominio.id.in_(list(combinados)))}
+
+        dominios_estatisticas = []
+        for dominio_id, item in combinados.items():
+            if dominio_id not in dominios:
+                continue
+            dominios_estatisticas.append({
+                'dominio': dominios[dominio_id],
+                'media': round(item['soma'] / item['quantidade'], 1),
+                'minima': round(item['minima'], 1),
+                'maxima': round(item['maxima'], 1),
+                'total_respostas': item['quantidade'],
+                'histograma': item['histograma']
+            })
+
+        # Ordenar por média decrescente
+        dominios_estatisticas.sort(key=lambda x: x['media'], reverse=True)
+
+        estatisticas = {
+            'total_assessments': geral['quantidade'],
+            'pontuacao_media_geral': round(geral['soma'] / geral['quantidade'], 1),
+            'pontuacao_minima': round(geral['minima'], 1),
+            'pontuacao_maxima': round(geral['maxima'], 1),
+            'primeira_resposta': geral['primeira_conclusao'],
+            'ultima_resposta': geral['ultima_conclusao'],
+            'histograma': geral['histograma']
+        }
+
+        return {
+            'estatisticas': estatisticas,
+            'dominios_estatisticas': dominios_estatisticas
+        }
+
+
+def _assessment_publico():
+    from models.assessment_publico import AssessmentPublico
+    return AssessmentPublico
+
+
+def _faixa(pontuacao):
+    """Faixa do histograma de uma pontuação de 0 a 100"""
+    return max(0, min(int(pontuacao // (100 / FAIXAS_HISTOGRAMA)), FAIXAS_HISTOGRAMA - 1))
+
+
+def _pontuacoes_assessments(ids_query):
+    """
+    Pontuação geral e por domínio (0-100, uma casa decimal, como em
+    AssessmentPublico.calcular_pontuacao_*) dos assessments selecionados,
+    com uma única consulta agrupada por (assessment, domínio)
+
+    Returns:
+        Lista de {'id', 'data_conclusao', 'pontuacoes': {dominio_id: pontuacao}}
+    """
+    from models.assessment_publico import AssessmentPublico, RespostaPublica
+    from models.pergunta import Pergunta
+
+    ids = ids_query.subquery()
+    linhas = db.session.query(
+        AssessmentPublico.id,
+        AssessmentPublico.data_conclusao,
+        Pergunta.dominio_versao_id,
+        func.sum(RespostaPublica.valor),
+        func.count(RespostaPublica.id)
+    ).outerjoin(
+        RespostaPublica, RespostaPublica.assessment_publico_id == AssessmentPublico.id
+    ).outerjoin(
+        Pergunta, Pergunta.id == RespostaPublica.pergunta_id
+    ).filter(
+        AssessmentPublico.id.in_(db.select(ids.c.id))
+    ).group_by(
+        AssessmentPublico.id,
+        AssessmentPublico.data_conclusao,
+        Pergunta.dominio_versao_id
+    ).all()
+
+    por_assessment = {}
+    for assessment_id, data_conclusao, dominio_id, soma, quantidade in linhas:
+        dados = por_assessment.setdefault(assessment_id, {
+            'data_conclusao': data_conclusao, 'soma': 0, 'quantidade': 0, 'pontuacoes': {}
+        })
+        dados['soma'] += soma or 0
+        dados['quantidade'] += quantidade
+        if dominio_id is not None and quantidade:
+            dados['pontuacoes'][dominio_id] = round(((soma or 0) / (quantidade * 5)) * 100, 1)
+
+    resultado = []
+    for assessment_id, dados in por_assessment.items():
+        # Assessment concluído sem respostas conta com pontuação geral 0
+        if dados['quantidade']:
+            dados['pontuacoes'][DOMINIO_GERAL] = round((dados['soma'] / (dados['quantidade'] * 5)) * 100, 1)
+        else:
+            dados['pontuacoes'][DOMINIO_GERAL] = 0
+        resultado.append({'id': assessment_id, 'data_conclusao': dados['data_conclusao'], 'pontuacoes': dados['pontuacoes']})
+    return resultado
@@ -1,5 +1,34 @@
+import logging
 from datetime import datetime
+from sqlalchemy import case, or_, text
 from app import db
+from models.auditoria import codificar_cursor, decodificar_cursor
+
+# Faixas de pontuação dos contadores do dashboard (limite inferior inclusivo)
+FAIXAS_PONTUACAO = (('baixa', None, 40), ('media', 40, 70), ('alta', 70, None))
+
+# Índice de texto no SQLite: tabela FTS5 externa sobre leads, com tokenizador
+# trigram (busca por trecho, como o ILIKE '%termo%'), mantida por triggers.
+# No PostgreSQL o mesmo papel é dos índices GIN pg_trgm da migração
+# add_leads_indices_busca.sql, usados diretamente pelo ILIKE.
+DDL_BUSCA_SQLITE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS leads_busca USING fts5("
+    "nome, email, empresa, content='leads', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS leads_busca_ai AFTER INSERT ON leads BEGIN "
+    "INSERT INTO leads_busca(rowid, nome, email, empresa) VALUES (new.id, new.nome, new.email, new.empresa); END",
+    "CREATE TRIGGER IF NOT EXISTS leads_busca_ad AFTER DELETE ON leads BEGIN "
+    "INSERT INTO leads_busca(leads_busca, rowid, nome, email, empresa) "
+    "VALUES ('delete', old.id, old.nome, old.email, old.empresa); END",
+    "CREATE TRIGGER IF NOT EXISTS leads_busca_au AFTER UPDATE OF nome, email, empresa ON leads BEGIN "
+    "INSERT INTO leads_busca(leads_busca, rowid, nome, email, empresa) "
+    "VALUES ('delete', old.id, old.nome, old.email, old.empresa); "
+    "INSERT INTO leads_busca(rowid, nome, email, empresa) VALUES (new.id, new.nome, new.email, new.empresa); END",
+)
+
+# O tokenizador trigram só encontra termos com 3 caracteres ou mais
+TAMANHO_MINIMO_BUSCA_FTS = 3
+
+_busca_fts = None
 
 class Lead(db.Model):
     """Modelo para gerenciar leads gerados por assessments públicos"""
@@ -42,6 +71,13 @@ class Lead(db.Model):
     # Histórico de interações
     historico = db.relationship('LeadHistorico', backref='lead', lazy=True, cascade='all, delete-orphan', order_by='LeadHistorico.data_registro.desc()')
     
+    # Índices da paginação por chave (data_criacao, id), com e sem filtros
+    __table_args__ = (
+        db.Index('ix_leads_data_criacao_id', 'data_criacao', 'id'),
+        db.Index('ix_leads_status_data_criacao', 'status', 'data_criacao', 'id'),
+        db.Index('ix_leads_prioridade_data_criacao', 'prioridade', 'data_criacao', 'id'),
+    )
+    
     def __repr__(self):
         nome_display = self.nome or self.email
         empresa_display = f' ({self.empresa})' if self.empresa else ''
@@ -90,6 +126,103 @@ class Lead(db.Model):
         
         return lead
     
+    @classmethod
+    def _condicoes(cls, status=None, prioridade=None, busca=None):
+        """Condições SQL dos filtros do dashboard"""
+        condicoes = []
+        if status:
+            condicoes.append(cls.status == status)
+        if prioridade:
+            condicoes.append(cls.prioridade == prioridade)
+        busca = (busca or '').strip()
+        if busca:
+            condicoes.append(cls._condicao_busca(busca))
+        return condicoes
+    
+    @classmethod
+    def _condicao_busca(cls, termo):
+        """
+        Busca por trecho em nome, email ou empresa
+        
+        No SQLite usa a tabela FTS5 leads_busca quando disponível; nos demais
+        casos (e para termos curtos demais para trigramas) usa ILIKE, que no
+        PostgreSQL é atendido pelos índices GIN pg_trgm.
+        """
+        if len(termo) >= TAMANHO_MINIMO_BUSCA_FTS and busca_fts_disponivel():
+            consulta = '"' + termo.replace('"', '""') + '"'
+            return cls.id.in_(
+                text('SELECT rowid FROM leads_busca WHERE leads_busca MATCH :consulta_busca')
+                .bindparams(consulta_busca=consulta)
+                .columns(db.column('rowid'))
+            )
+        
+        padrao = f'%{termo}%'
+        return or_(
+            cls.nome.ilike(padrao),
+            cls.email.ilike(padrao),
+            cls.empresa.ilike(padrao)
+        )
+    
+    @classmethod
+    def paginar(cls, cursor=None, limite=50, **filtros):
+        """
+        Página de leads do mais recente para o mais antigo, por chave (data_criacao, id)
+        
+        Args:
+            cursor: Valor de `proximo_cursor` da página anterior (None para a primeira)
+            limite: Leads por página
+            **filtros: status, prioridade, busca
+            
+        Returns:
+            (leads, proximo_cursor) - proximo_cursor é None na última página
+            
+        Raises:
+            ValueError: cursor inválido
+        """
+        consulta = cls.query.filter(*cls._condicoes(**filtros))
+        if cursor:
+            consulta = consulta.filter(db.tuple_(cls.data_criacao, cls.id) < decodificar_cursor(cursor))
+        
+        # Um lead a mais indica se existe próxima página
+        leads = consulta.order_by(cls.data_criacao.desc(), cls.id.desc()).limit(limite + 1).all()
+        proximo_cursor = None
+        if len(leads) > limite:
+            leads = leads[:limite]
+            proximo_cursor = codificar_cursor(leads[-1].data_criacao, leads[-1].id)
+        return leads, proximo_cursor
+    
+    @classmethod
+    def contadores(cls):
+        """
+        Totais do dashboard em uma única consulta agrupada por status
+        
+        Returns:
+            Dict com total, por_status ({status: quantidade}) e pontuacao
+            ({'baixa', 'media', 'alta'}: quantidade)
+        """
+        faixas = []
+        for _, minimo, maximo in FAIXAS_PONTUACAO:
+            condicoes = []
+            if minimo is not None:
+                condicoes.append(cls.pontuacao_geral >= minimo)
+            if maximo is not None:
+                condicoes.append(cls.pontuacao_geral < maximo)
+            faixas.append(db.func.count(case((db.and_(*condicoes), 1))))
+        
+        linhas = db.session.query(cls.status, db.func.count(cls.id), *faixas).group_by(cls.status).all()
+        
+        resultado = {
+            'total': 0,
+            'por_status': {},
+            'pontuacao': {nome: 0 for nome, _, _ in FAIXAS_PONTUACAO}
+        }
+        for status, quantidade, *por_faixa in linhas:
+            resultado['total'] += quantidade
+            resultado['por_status'][status] = quantidade
+            for (nome, _, _), valor in zip(FAIXAS_PONTUACAO, por_faixa):
+                resultado['pontuacao'][nome] += valor
+        return resultado
+    
     def adicionar_historico(self, acao, usuario_id=None, detalhes=None):
         """Adiciona uma entrada ao histórico do lead"""
         historico_entry = LeadHistorico(
@@ -146,6 +279,43 @@ class Lead(db.Model):
         }
 
 
+def busca_fts_disponivel():
+    """Se a tabela FTS5 leads_busca existe (apenas SQLite), verificado uma vez por processo"""
+    global _busca_fts
+    if _busca_fts is None:
+        _busca_fts = db.engine.dialect.name == 'sqlite' and db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_busca'")
+        ).first() is not None
+    return _busca_fts
+
+
+def preparar_busca_leads():
+    """
+    Cria o índice de texto dos leads no SQLite (idempotente; chamado na inicialização)
+    
+    Se o SQLite não tiver FTS5 com o tokenizador trigram, a busca continua por ILIKE.
+    No PostgreSQL não faz nada: os índices pg_trgm vêm da migração.
+    """
+    global _busca_fts
+    if db.engine.dialect.name != 'sqlite':
+        return
+    
+    try:
+        with db.engine.begin() as conn:
+            existia = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leads_busca'")
+            ).first() is not None
+            for comando in DDL_BUSCA_SQLITE:
+                conn.exec_driver_sql(comando)
+            if not existia:
+                # Indexar os leads gravados antes da tabela de busca existir
+                conn.exec_driver_sql("INSERT INTO leads_busca(leads_busca) VALUES ('rebuild')")
+        _busca_fts = True
+    except Exception as e:
+        logging.warning(f'Busca de leads sem FTS5, usando ILIKE: {e}')
+        _busca_fts = False
+
+
 class LeadHistorico(db.Model):
     """Modelo para armazenar histórico de interações com leads"""
     
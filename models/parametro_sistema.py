@@ -8,6 +8,12 @@ import json
 from cryptography.fernet import Fernet
 import os
 import base64
+from models.cache_versao import CacheProcesso
+
+# Instância Fernet (chave, objeto) e textos já descriptografados por (chave, texto cifrado)
+_fernet = None
+_valores_descriptografados = {}
+_FALHA_DESCRIPTOGRAFIA = object()
 
 class ParametroSistema(db.Model):
     __tablename__ = 'parametros_sistema'
@@ -34,39 +40,85 @@ class ParametroSistema(db.Model):
         chave_fixa = "ZmDfcTF7_60GrrY167zsiPd67pEvs0aGOv2oasOM1Pg="
         return chave_fixa.encode()
     
+    @staticmethod
+    def get_fernet():
+        """Retorna a instância Fernet, recriando apenas se a chave mudar"""
+        global _fernet
+        chave = ParametroSistema.get_chave_criptografia()
+        if _fernet is None or _fernet[0] != chave:
+            _fernet = (chave, Fernet(chave))
+        return _fernet[1]
+    
+    @staticmethod
+    def _descriptografar(chave, valor_criptografado):
+        """Descriptografa um valor, reaproveitando o resultado enquanto o texto cifrado não mudar"""
+        import logging
+        
+        memo_key = (chave, valor_criptografado)
+        if memo_key in _valores_descriptografados:
+            return _valores_descriptografados[memo_key]
+        
+        try:
+            resultado = ParametroSistema.get_fernet().decrypt(valor_criptografado.encode()).decode()
+            
+            # Log detalhado para debugging OpenAI
+            if chave == 'openai_api_key':
+                logging.debug(f"OpenAI API key descriptografada com sucesso. Tamanho: {len(resultado)}")
+                logging.debug(f"OpenAI API key format check: starts_with_sk={resultado.startswith('sk-')}")
+        except Exception as e:
+            logging.error(f"Erro ao descriptografar parâmetro '{chave}': {e}")
+            resultado = _FALHA_DESCRIPTOGRAFIA
+        
+        _valores_descriptografados[memo_key] = resultado
+        return resultado
+    
+    @staticmethod
+    def _carregar_todos():
+        """Carrega todos os parâmetros em uma única consulta, já descriptografados"""
+        linhas = db.session.query(
+            ParametroSistema.chave,
+            ParametroSistema.valor,
+            ParametroSistema.valor_criptografado,
+            ParametroSistema.tipo
+        ).all()
+        
+        parametros = {}
+        cifrados_atuais = set()
+        for chave, valor, valor_criptografado, tipo in linhas:
+            if tipo == 'encrypted' and valor_criptografado:
+                cifrados_atuais.add((chave, valor_criptografado))
+                valor = ParametroSistema._descriptografar(chave, valor_criptografado)
+            parametros[chave] = (tipo, valor)
+        
+        # Descartar textos cifrados que não existem mais
+        for memo_key in list(_valores_descriptografados):
+            if memo_key not in cifrados_atuais:
+                del _valores_descriptografados[memo_key]
+        
+        return parametros
+    
     @staticmethod
     def get_valor(chave, valor_padrao=None):
-        """Recupera um valor do sistema"""
+        """Recupera um valor do sistema (via cache do processo)"""
         import logging
         
-        parametro = ParametroSistema.query.filter_by(chave=chave).first()
-        if not parametro:
+        parametros = _cache_parametros.obter()
+        if chave not in parametros:
             logging.debug(f"Parâmetro '{chave}' não encontrado no banco")
             return valor_padrao
         
-        if parametro.tipo == 'encrypted' and parametro.valor_criptografado:
-            try:
-                fernet = Fernet(ParametroSistema.get_chave_criptografia())
-                valor_descriptografado = fernet.decrypt(parametro.valor_criptografado.encode())
-                resultado = valor_descriptografado.decode()
-                
-                # Log detalhado para debugging OpenAI
-                if chave == 'openai_api_key':
-                    logging.debug(f"OpenAI API key descriptografada com sucesso. Tamanho: {len(resultado)}")
-                    logging.debug(f"OpenAI API key format check: starts_with_sk={resultado.startswith('sk-')}")
-                
-                return resultado
-            except Exception as e:
-                logging.error(f"Erro ao descriptografar parâmetro '{chave}': {e}")
-                return valor_padrao
-        elif parametro.tipo == 'json' and parametro.valor:
+        tipo, valor = parametros[chave]
+        
+        if valor is _FALHA_DESCRIPTOGRAFIA:
+            return valor_padrao
+        elif tipo == 'json' and valor:
             try:
-                return json.loads(parametro.valor)
+                return json.loads(valor)
             except Exception as e:
                 logging.error(f"Erro ao parsing JSON do parâmetro '{chave}': {e}")
                 return valor_padrao
         else:
-            return parametro.valor or valor_padrao
+            return valor or valor_padrao
     
     @staticmethod
     def set_valor(chave, valor, tipo='string', descricao=None, categoria=None):
@@ -82,7 +134,7 @@ class ParametroSistema(db.Model):
         parametro.data_atualizacao = datetime.utcnow()
         
         if tipo == 'encrypted':
-            fernet = Fernet(ParametroSistema.get_chave_criptografia())
+            fernet = ParametroSistema.get_fernet()
             valor_criptografado = fernet.encrypt(valor.encode())
             parametro.valor_criptografado = valor_criptografado.decode()
             parametro.valor = None
@@ -93,7 +145,9 @@ class ParametroSistema(db.Model):
             parametro.valor = valor
             parametro.valor_criptografado = None
         
+        _cache_parametros.registrar_alteracao()
         db.session.commit()
+        _cache_parametros.limpar()
         return parametro
     
     @staticmethod
@@ -201,4 +255,7 @@ class ParametroSistema(db.Model):
             except:
                 return self.valor[:100] + '...' if len(self.valor) > 100 else self.valor
         else:
-            return self.valor[:100] + '...' if self.valor and len(self.valor) > 100 else self.valor
\ No newline at end of file
+            return self.valor[:100] + '...' if self.valor and len(self.valor) > 100 else self.valor
+
+
+_cache_parametros = CacheProcesso('parametros_sistema', ParametroSistema._carregar_todos)
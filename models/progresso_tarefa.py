@@ -0,0 +1,18 @@
+from app import db
+from datetime import datetime
+
+
+class ProgressoTarefa(db.Model):
+    """Estado de progresso de tarefas em background, compartilhado entre workers"""
+
+    __tablename__ = 'progresso_tarefas'
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(64), unique=True, nullable=False, comment='Identificador da sessão de progresso')
+    versao = db.Column(db.Integer, nullable=False, default=0, comment='Incrementada a cada publicação')
+    dados = db.Column(db.Text, comment='Último estado publicado (JSON)')
+    data_atualizacao = db.Column(db.DateTime, default=datetime.utcnow, comment='Data da última publicação')
+    expira_em = db.Column(db.DateTime, index=True, comment='Após esta data o registro pode ser removido')
+
+    def __repr__(self):
+        return f'<ProgressoTarefa {self.session_id} v{self.versao}>'
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from sqlalchemy import func, select
 from sqlalchemy.orm import relationship
 
 class Projeto(db.Model):
@@ -20,6 +21,9 @@ class Projeto(db.Model):
     nome_avaliador = db.Column(db.String(255))  # Nome do avaliador responsável
     email_avaliador = db.Column(db.String(255))  # Email do avaliador responsável
     liberado_cliente = db.Column(db.Boolean, default=False)  # Se foi liberado para o cliente
+    # Contadores de progresso desnormalizados (None = recalcular na próxima gravação)
+    total_perguntas = db.Column(db.Integer)  # Perguntas ativas das versões do projeto
+    perguntas_respondidas = db.Column(db.Integer)  # Perguntas respondidas (colaborativo)
     
     # Relacionamentos
     cliente = relationship('Cliente', backref='projetos')
@@ -30,47 +34,99 @@ class Projeto(db.Model):
     def __repr__(self):
         return f'<Projeto {self.nome}>'
     
-    def get_progresso_geral(self):
-        """Calcula o progresso geral do projeto (colaborativo)"""
+    def _versoes_ids(self):
+        """IDs das versões de assessment associadas ao projeto"""
+        return [pa.versao_assessment_id for pa in self.assessments if pa.versao_assessment_id]
+    
+    def _contar_perguntas(self, versoes_ids):
+        """Total de perguntas ativas das versões informadas"""
+        from models.pergunta import Pergunta
+        from models.assessment_version import AssessmentDominio
+        
+        if not versoes_ids:
+            return 0
+        
+        return db.session.query(func.count(Pergunta.id)).join(
+            AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id
+        ).filter(
+            AssessmentDominio.versao_id.in_(versoes_ids),
+            AssessmentDominio.ativo == True,
+            Pergunta.ativo == True
+        ).scalar() or 0
+    
+    def _contar_respondidas(self, versoes_ids):
+        """Perguntas ativas únicas respondidas no projeto (qualquer respondente)"""
         from models.resposta import Resposta
         from models.pergunta import Pergunta
-        from models.dominio import Dominio
+        from models.assessment_version import AssessmentDominio
+        
+        if not versoes_ids:
+            return 0
+        
+        return db.session.query(func.count(func.distinct(Pergunta.id))).join(
+            Resposta, Pergunta.id == Resposta.pergunta_id
+        ).join(AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id).filter(
+            Resposta.projeto_id == self.id,
+            AssessmentDominio.versao_id.in_(versoes_ids),
+            AssessmentDominio.ativo == True,
+            Pergunta.ativo == True
+        ).scalar() or 0
+    
+    def _contar_respondidas_por_respondente(self, versoes_ids):
+        """Respostas de cada respondente no projeto ({respondente_id: quantidade})"""
+        from models.resposta import Resposta
+        from models.pergunta import Pergunta
+        from models.assessment_version import AssessmentDominio
+        
+        if not versoes_ids:
+            return {}
+        
+        linhas = db.session.query(Resposta.respondente_id, func.count(Resposta.id)).join(
+            Pergunta, Pergunta.id == Resposta.pergunta_id
+        ).join(AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id).filter(
+            Resposta.projeto_id == self.id,
+            Resposta.respondente_id.isnot(None),
+            AssessmentDominio.versao_id.in_(versoes_ids)
+        ).group_by(Resposta.respondente_id).all()
+        
+        return {respondente_id: quantidade for respondente_id, quantidade in linhas}
+    
+    def progresso_calculado(self):
+        """Indica se os contadores de progresso do projeto e dos respondentes estão calculados"""
+        return (self.total_perguntas is not None and self.perguntas_respondidas is not None
+                and all(pr.perguntas_respondidas is not None for pr in self.respondentes))
+    
+    def recalcular_progresso(self, commit=True):
+        """
+        Recalcula os contadores de progresso do projeto e de cada respondente
         
-        total_perguntas = 0
-        total_respostas_unicas = 0
+        Usado nas gravações (respostas, finalização) e no script de manutenção;
+        as leituras apenas calculam, sem gravar, enquanto os contadores são None.
+        """
+        versoes_ids = self._versoes_ids()
+        self.total_perguntas = self._contar_perguntas(versoes_ids)
+        self.perguntas_respondidas = self._contar_respondidas(versoes_ids)
         
-        for projeto_assessment in self.assessments:
-            # Usar sistema novo de versionamento
-            if projeto_assessment.versao_assessment_id:
-                versao = projeto_assessment.versao_assessment
-                
-                # Contar total de perguntas desta versão
-                from models.assessment_version import AssessmentDominio
-                perguntas_count = db.session.query(Pergunta).join(
-                    AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id
-                ).filter(
-                    AssessmentDominio.versao_id == versao.id,
-                    AssessmentDominio.ativo == True,
-                    Pergunta.ativo == True
-                ).count()
-                total_perguntas += perguntas_count
-                
-                # Contar perguntas únicas respondidas (colaborativo)
-                perguntas_respondidas = db.session.query(Pergunta.id).join(
-                    Resposta, Pergunta.id == Resposta.pergunta_id
-                ).join(AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id).filter(
-                    Resposta.projeto_id == self.id,
-                    AssessmentDominio.versao_id == versao.id,
-                    AssessmentDominio.ativo == True,
-                    Pergunta.ativo == True
-                ).distinct().count()
-                
-                total_respostas_unicas += perguntas_respondidas
+        por_respondente = self._contar_respondidas_por_respondente(versoes_ids)
+        for projeto_respondente in self.respondentes:
+            projeto_respondente.perguntas_respondidas = por_respondente.get(projeto_respondente.respondente_id, 0)
         
-        if total_perguntas == 0:
+        if commit:
+            db.session.commit()
+    
+    def get_progresso_geral(self):
+        """Calcula o progresso geral do projeto (colaborativo)"""
+        total, respondidas = self.total_perguntas, self.perguntas_respondidas
+        if total is None or respondidas is None:
+            # Contadores ainda não calculados: contar sem gravar (leitura)
+            versoes_ids = self._versoes_ids()
+            total = self._contar_perguntas(versoes_ids)
+            respondidas = self._contar_respondidas(versoes_ids)
+        
+        if not total:
             return 0
         
-        return round((total_respostas_unicas / total_perguntas) * 100, 1)
+        return round((respondidas / total) * 100, 1)
     
     def is_concluido(self):
         """Verifica se o projeto está concluído"""
@@ -111,40 +167,115 @@ class Projeto(db.Model):
     
     def get_progresso_respondente(self, respondente_id):
         """Calcula o progresso individual de um respondente neste projeto"""
-        from models.resposta import Resposta
-        from models.pergunta import Pergunta
-        from models.dominio import Dominio
+        projeto_respondente = next(
+            (pr for pr in self.respondentes if pr.respondente_id == respondente_id), None
+        )
         
-        total_perguntas = 0
-        total_respostas = 0
+        # Contadores ainda não calculados (ou respondente sem associação ao
+        # projeto): contar sem gravar, pois esta é uma leitura
+        versoes_ids = None
+        total = self.total_perguntas
+        if total is None:
+            versoes_ids = self._versoes_ids()
+            total = self._contar_perguntas(versoes_ids)
         
-        for projeto_assessment in self.assessments:
-            # Usar sistema novo de versionamento
-            if projeto_assessment.versao_assessment_id:
-                versao = projeto_assessment.versao_assessment
-                
-                # Contar total de perguntas desta versão
-                from models.assessment_version import AssessmentDominio
-                perguntas = db.session.query(Pergunta).join(
-                    AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id
-                ).filter(
-                    AssessmentDominio.versao_id == versao.id,
-                    AssessmentDominio.ativo == True,
-                    Pergunta.ativo == True
-                ).count()
-                
-                # Contar apenas as respostas DESTE respondente específico
-                respostas = Resposta.query.filter_by(
-                    projeto_id=self.id,
-                    respondente_id=respondente_id
-                ).join(Pergunta).join(AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id).filter(
-                    AssessmentDominio.versao_id == versao.id
-                ).count()
-                
-                total_perguntas += perguntas
-                total_respostas += respostas
+        if projeto_respondente is not None and projeto_respondente.perguntas_respondidas is not None:
+            respondidas = projeto_respondente.perguntas_respondidas
+        else:
+            if versoes_ids is None:
+                versoes_ids = self._versoes_ids()
+            respondidas = self._contar_respondidas_por_respondente(versoes_ids).get(respondente_id, 0)
         
-        return round((total_respostas / total_perguntas * 100) if total_perguntas > 0 else 0, 1)
+        return round((respondidas / total * 100) if total else 0, 1)
+
+
+def atualizar_contadores_resposta(projeto_id, respondente_id, pergunta, delta):
+    """
+    Atualiza os contadores de progresso quando uma resposta é criada (delta=1)
+    ou removida (delta=-1). Usa UPDATE atômico para suportar respondentes
+    simultâneos; contadores ainda não calculados (None) são ignorados.
+    """
+    atualizar_contadores_respostas(projeto_id, [(respondente_id, pergunta, delta)])
+
+
+def atualizar_contadores_respostas(projeto_id, alteracoes):
+    """
+    Versão em lote de atualizar_contadores_resposta
+    
+    `alteracoes` é uma lista de (respondente_id, pergunta, delta). Os deltas
+    são somados antes: no máximo um UPDATE no projeto e um por respondente.
+    """
+    from models.assessment_version import AssessmentDominio
+    
+    dominios_ids = {pergunta.dominio_versao_id for _, pergunta, _ in alteracoes if pergunta.dominio_versao_id}
+    if not dominios_ids:
+        return
+    
+    # Contadores não calculados (invalidados): recalcular tudo nesta gravação;
+    # a consulta faz o autoflush, então as respostas novas já entram na contagem
+    projeto = Projeto.query.get(projeto_id)
+    if projeto and not projeto.progresso_calculado():
+        projeto.recalcular_progresso(commit=False)
+        return
+    
+    dominios = {dominio.id: dominio for dominio in AssessmentDominio.query.filter(AssessmentDominio.id.in_(dominios_ids))}
+    versoes_projeto = {versao_id for (versao_id,) in db.session.query(
+        ProjetoAssessment.versao_assessment_id
+    ).filter_by(projeto_id=projeto_id)}
+    
+    delta_projeto = 0
+    delta_respondentes = {}
+    for respondente_id, pergunta, delta in alteracoes:
+        dominio = dominios.get(pergunta.dominio_versao_id)
+        if not dominio or dominio.versao_id not in versoes_projeto:
+            continue
+        if pergunta.ativo and dominio.ativo:
+            delta_projeto += delta
+        if respondente_id:
+            delta_respondentes[respondente_id] = delta_respondentes.get(respondente_id, 0) + delta
+    
+    if delta_projeto:
+        Projeto.query.filter(
+            Projeto.id == projeto_id,
+            Projeto.perguntas_respondidas.isnot(None)
+        ).update(
+            {Projeto.perguntas_respondidas: Projeto.perguntas_respondidas + delta_projeto},
+            synchronize_session=False
+        )
+    
+    for respondente_id, delta in delta_respondentes.items():
+        if not delta:
+            continue
+        ProjetoRespondente.query.filter(
+            ProjetoRespondente.projeto_id == projeto_id,
+            ProjetoRespondente.respondente_id == respondente_id,
+            ProjetoRespondente.perguntas_respondidas.isnot(None)
+        ).update(
+            {ProjetoRespondente.perguntas_respondidas: ProjetoRespondente.perguntas_respondidas + delta},
+            synchronize_session=False
+        )
+
+
+def invalidar_progresso_projetos(versao_id=None, projeto_id=None):
+    """
+    Marca os contadores de progresso para recálculo: dos projetos que usam a
+    versão (perguntas publicadas/alteradas) ou de um projeto específico
+    """
+    if versao_id is not None:
+        projetos_ids = select(ProjetoAssessment.projeto_id).where(
+            ProjetoAssessment.versao_assessment_id == versao_id
+        )
+    else:
+        projetos_ids = [projeto_id]
+    
+    Projeto.query.filter(Projeto.id.in_(projetos_ids)).update(
+        {Projeto.total_perguntas: None, Projeto.perguntas_respondidas: None},
+        synchronize_session=False
+    )
+    ProjetoRespondente.query.filter(ProjetoRespondente.projeto_id.in_(projetos_ids)).update(
+        {ProjetoRespondente.perguntas_respondidas: None},
+        synchronize_session=False
+    )
 
 
 class ProjetoRespondente(db.Model):
@@ -156,6 +287,7 @@ class ProjetoRespondente(db.Model):
     respondente_id = db.Column(db.Integer, db.ForeignKey('respondentes.id'), nullable=False)
     data_associacao = db.Column(db.DateTime, default=datetime.utcnow)
     ativo = db.Column(db.Boolean, default=True)
+    perguntas_respondidas = db.Column(db.Integer)  # Contador desnormalizado (None = recalcular)
     
     # Relacionamentos
     respondente = relationship('Respondente', backref='projetos')
@@ -190,6 +322,8 @@ class ProjetoAssessment(db.Model):
         """Finaliza o assessment"""
         self.finalizado = True
         self.data_finalizacao = datetime.utcnow()
+        if not self.projeto.progresso_calculado():
+            self.projeto.recalcular_progresso(commit=False)
         db.session.commit()
     
     def get_progresso_percentual(self):
@@ -0,0 +1,156 @@
+"""
+Questionário compilado de uma versão de assessment, em cache por processo
+
+Uma versão publicada não muda, então a árvore de domínios e perguntas ativos
+é montada uma vez (duas consultas) e reaproveitada pela tela do respondente,
+pelo assessment público, pelas estatísticas e pelos PDFs. Os objetos são
+somente leitura e não pertencem à sessão do SQLAlchemy.
+
+Alterações na estrutura de uma versão (publicação, edição, reordenação,
+importação) devem chamar registrar_alteracao_questionario() antes do commit e
+limpar_questionario() depois dele, como nos caches de configurações.
+"""
+
+import threading
+from app import db
+from models.cache_versao import CacheProcesso
+
+
+class PerguntaCompilada:
+    """Pergunta ativa de um questionário compilado"""
+
+    __slots__ = ('id', 'dominio_id', 'dominio_versao_id', 'texto', 'descricao', 'referencia',
+                 'recomendacao', 'light', 'ordem', 'ativo')
+
+    def __init__(self, id, dominio_id, dominio_versao_id, texto, descricao, referencia,
+                 recomendacao, light, ordem):
+        self.id = id
+        self.dominio_id = dominio_id
+        self.dominio_versao_id = dominio_versao_id
+        self.texto = texto
+        self.descricao = descricao
+        self.referencia = referencia
+        self.recomendacao = recomendacao
+        self.light = bool(light)
+        self.ordem = ordem
+        self.ativo = True
+
+    def __repr__(self):
+        return f'<PerguntaCompilada {self.id}>'
+
+
+class DominioCompilado:
+    """Domínio ativo com suas perguntas ativas, em ordem"""
+
+    __slots__ = ('id', 'versao_id', 'nome', 'descricao', 'ordem', 'ativo', 'perguntas', 'perguntas_light')
+
+    def __init__(self, id, versao_id, nome, descricao, ordem, perguntas):
+        self.id = id
+        self.versao_id = versao_id
+        self.nome = nome
+        self.descricao = descricao
+        self.ordem = ordem
+        self.ativo = True
+        self.perguntas = tuple(perguntas)
+        self.perguntas_light = tuple(p for p in self.perguntas if p.light)
+
+    def __repr__(self):
+        return f'<DominioCompilado {self.nome}>'
+
+    def __len__(self):
+        return len(self.perguntas)
+
+    @property
+    def total_perguntas(self):
+        return len(self.perguntas)
+
+    def get_perguntas_ativas(self):
+        """Compatível com AssessmentDominio.get_perguntas_ativas(), sem consulta"""
+        return self.perguntas
+
+
+class QuestionarioCompilado:
+    """Domínios e perguntas ativos de uma versão, com índices e totais"""
+
+    def __init__(self, versao_id, dominios):
+        self.versao_id = versao_id
+        self.dominios = tuple(dominios)
+        self.dominios_light = tuple(d for d in self.dominios if d.perguntas_light)
+        self._dominios_por_id = {d.id: d for d in self.dominios}
+        self.perguntas = {p.id: p for d in self.dominios for p in d.perguntas}
+        self.total_dominios = len(self.dominios)
+        self.total_perguntas = len(self.perguntas)
+        self.total_perguntas_light = sum(len(d.perguntas_light) for d in self.dominios)
+
+    def __repr__(self):
+        return f'<QuestionarioCompilado versão {self.versao_id} ({self.total_perguntas} perguntas)>'
+
+    def __len__(self):
+        return self.total_perguntas
+
+    def dominio(self, dominio_id):
+        """Domínio ativo pelo id (None se não pertencer ao questionário)"""
+        return self._dominios_por_id.get(dominio_id)
+
+    @staticmethod
+    def compilar(versao_id):
+        """Carrega domínios e perguntas ativos da versão em duas consultas"""
+        from models.assessment_version import AssessmentDominio
+        from models.pergunta import Pergunta
+
+        dominios = db.session.query(
+            AssessmentDominio.id, AssessmentDominio.nome, AssessmentDominio.descricao, AssessmentDominio.ordem
+        ).filter(
+            AssessmentDominio.versao_id == versao_id,
+            AssessmentDominio.ativo == True
+        ).order_by(AssessmentDominio.ordem, AssessmentDominio.id).all()
+
+        perguntas_por_dominio = {dominio.id: [] for dominio in dominios}
+        if perguntas_por_dominio:
+            for linha in db.session.query(
+                Pergunta.id, Pergunta.dominio_id, Pergunta.dominio_versao_id, Pergunta.texto, Pergunta.descricao,
+                Pergunta.referencia, Pergunta.recomendacao, Pergunta.light, Pergunta.ordem
+            ).filter(
+                Pergunta.dominio_versao_id.in_(list(perguntas_por_dominio)),
+                Pergunta.ativo == True
+            ).order_by(Pergunta.ordem, Pergunta.id):
+                perguntas_por_dominio[linha.dominio_versao_id].append(PerguntaCompilada(*linha))
+
+        return QuestionarioCompilado(versao_id, [
+            DominioCompilado(dominio.id, versao_id, dominio.nome, dominio.descricao, dominio.ordem,
+                             perguntas_por_dominio[dominio.id])
+            for dominio in dominios
+        ])
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _cache(versao_id):
+    cache = _caches.get(versao_id)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(versao_id)
+            if cache is None:
+                cache = _caches[versao_id] = CacheProcesso(
+                    f'questionario:{versao_id}', lambda: QuestionarioCompilado.compilar(versao_id)
+                )
+    return cache
+
+
+def obter_questionario(versao_id):
+    """Questionário compilado da versão (via cache do processo)"""
+    return _cache(versao_id).obter()
+
+
+def registrar_alteracao_questionario(versao_id):
+    """Invalida o questionário em todos os workers; chamar antes do commit"""
+    _cache(versao_id).registrar_alteracao()
+
+
+def limpar_questionario(versao_id):
+    """Descarta o questionário deste worker; chamar depois do commit"""
+    cache = _caches.get(versao_id)
+    if cache:
+        cache.limpar()
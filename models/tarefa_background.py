@@ -0,0 +1,84 @@
+from app import db
+from datetime import datetime
+import json
+
+
+class TarefaBackground(db.Model):
+    """Fila durável de tarefas executadas pelo worker (python -m jobs.worker)"""
+
+    __tablename__ = 'tarefas_background'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False, comment='Tipo da tarefa (ex: analise_dominios, introducao_ia)')
+    projeto_id = db.Column(db.Integer, db.ForeignKey('projetos.id', ondelete='CASCADE'), nullable=True, comment='Projeto relacionado')
+    chave_deduplicacao = db.Column(db.String(200), nullable=False, comment='Tarefas ativas com a mesma chave não são duplicadas')
+    parametros = db.Column(db.Text, comment='Parâmetros da tarefa (JSON)')
+    session_id = db.Column(db.String(64), nullable=False, comment='Sessão de progresso lida pelo endpoint SSE')
+
+    # Estado: pendente, executando, concluida, erro
+    status = db.Column(db.String(20), nullable=False, default='pendente', index=True)
+    tentativas = db.Column(db.Integer, nullable=False, default=0)
+    max_tentativas = db.Column(db.Integer, nullable=False, default=3)
+    disponivel_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, comment='Não executar antes desta data (backoff)')
+    lease_ate = db.Column(db.DateTime, comment='Worker que reservou a tarefa a mantém até esta data')
+    worker_id = db.Column(db.String(100), comment='Worker que está executando a tarefa')
+
+    resultado = db.Column(db.Text, comment='Resumo do resultado (JSON)')
+    erro = db.Column(db.Text, comment='Última mensagem de erro')
+
+    solicitado_por = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+    data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
+    data_inicio = db.Column(db.DateTime)
+    data_conclusao = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_tarefas_background_fila', 'status', 'disponivel_em'),
+        # Garante no banco que só existe uma tarefa ativa por chave
+        db.Index('uq_tarefas_background_ativa', 'chave_deduplicacao', unique=True,
+                 postgresql_where=db.text("status IN ('pendente', 'executando')"),
+                 sqlite_where=db.text("status IN ('pendente', 'executando')")),
+    )
+
+    STATUS_ATIVOS = ('pendente', 'executando')
+
+    def __repr__(self):
+        return f'<TarefaBackground {self.id} {self.tipo} ({self.status})>'
+
+    @property
+    def parametros_json(self):
+        """Retorna os parâmetros como dicionário"""
+        if self.parametros:
+            try:
+                return json.loads(self.parametros)
+            except (ValueError, TypeError):
+                return {}
+        return {}
+
+    def is_ativa(self):
+        """Verifica se a tarefa ainda está na fila ou em execução"""
+        return self.status in self.STATUS_ATIVOS
+
+    @staticmethod
+    def ativas_do_projeto(projeto_id):
+        """Retorna as tarefas ativas de um projeto indexadas por tipo"""
+        tarefas = TarefaBackground.query.filter(
+            TarefaBackground.projeto_id == projeto_id,
+            TarefaBackground.status.in_(TarefaBackground.STATUS_ATIVOS)
+        ).order_by(TarefaBackground.data_criacao).all()
+        return {tarefa.tipo: tarefa for tarefa in tarefas}
+
+    def to_dict(self):
+        """Converte a tarefa para dicionário"""
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'projeto_id': self.projeto_id,
+            'status': self.status,
+            'session_id': self.session_id,
+            'tentativas': self.tentativas,
+            'max_tentativas': self.max_tentativas,
+            'erro': self.erro,
+            'data_criacao': self.data_criacao.isoformat() if self.data_criacao else None,
+            'data_inicio': self.data_inicio.isoformat() if self.data_inicio else None,
+            'data_conclusao': self.data_conclusao.isoformat() if self.data_conclusao else None
+        }
@@ -17,6 +17,7 @@ from forms.admin_forms import DominioForm, PerguntaForm, LogoForm
 from forms.cliente_forms import ClienteForm, ResponenteForm, TipoAssessmentForm, ImportacaoCSVForm
 from forms.configuracao_forms import ConfiguracaoForm
 from utils.auth_utils import admin_required
+from utils.parametros_utils import inteiro_parametro
 from utils.two_factor_utils import reset_user_2fa, get_user_2fa_config
 from utils.upload_utils import allowed_file, save_uploaded_file
 from utils.csv_utils import processar_csv_importacao, gerar_template_csv
@@ -313,6 +314,135 @@ def dashboard():
                              agora_local=datetime.now(),
                              fuso_horario="UTC")
 
+# Registros por página do explorador de auditoria
+AUDITORIA_POR_PAGINA = 50
+AUDITORIA_MAX_POR_PAGINA = 500
+
+def _filtros_auditoria():
+    """
+    Filtros do explorador de auditoria a partir da query string
+    
+    Datas (AAAA-MM-DD) são dias no fuso configurado; `ate` inclui o dia todo.
+    Levanta ValueError se algum valor for inválido.
+    """
+    from datetime import datetime, timedelta
+    import pytz
+    
+    tz = pytz.timezone(Configuracao.get_fuso_horario() or 'America/Sao_Paulo')
+    
+    def inicio_do_dia_utc(campo, texto):
+        try:
+            dia = datetime.strptime(texto, '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f'{campo} deve ser uma data no formato AAAA-MM-DD')
+        return tz.localize(dia).astimezone(pytz.UTC).replace(tzinfo=None)
+    
+    filtros = {
+        'usuario_tipo': request.args.get('usuario_tipo') or None,
+        'entidade': request.args.get('entidade') or None,
+        'acao': request.args.get('acao') or None
+    }
+    for campo in ('usuario_id', 'entidade_id'):
+        filtros[campo] = inteiro_parametro(campo)
+    
+    desde, ate = request.args.get('desde'), request.args.get('ate')
+    filtros['desde'] = inicio_do_dia_utc('desde', desde) if desde else None
+    filtros['ate'] = inicio_do_dia_utc('ate', ate) + timedelta(days=1) if ate else None
+    
+    return filtros
+
+@admin_bp.route('/auditoria')
+@login_required
+@admin_required
+def auditoria():
+    """Explorador do histórico de auditoria com filtros e paginação por cursor"""
+    from models.auditoria import Auditoria, AuditoriaResumoDiario
+    
+    registros, proximo_cursor = [], None
+    try:
+        filtros = _filtros_auditoria()
+        registros, proximo_cursor = Auditoria.paginar(
+            cursor=request.args.get('cursor'), limite=AUDITORIA_POR_PAGINA, **filtros
+        )
+    except ValueError:
+        flash('Filtros de auditoria inválidos.', 'warning')
+    
+    # Opções dos filtros a partir dos contadores diários (tabela pequena)
+    acoes = [linha[0] for linha in db.session.query(AuditoriaResumoDiario.acao).distinct().order_by(AuditoriaResumoDiario.acao)]
+    entidades = [linha[0] for linha in db.session.query(AuditoriaResumoDiario.entidade).distinct().order_by(AuditoriaResumoDiario.entidade)]
+    
+    # Parâmetros atuais, sem o cursor, para montar os links de paginação e exportação
+    parametros = {chave: valor for chave, valor in request.args.items() if valor and chave != 'cursor'}
+    
+    return render_template('admin/auditoria.html',
+                         registros=registros,
+                         proximo_cursor=proximo_cursor,
+                         primeira_pagina=not request.args.get('cursor'),
+                         parametros=parametros,
+                         acoes=acoes,
+                         entidades=entidades)
+
+@admin_bp.route('/auditoria/api')
+@login_required
+@admin_required
+def auditoria_api():
+    """Registros de auditoria em JSON (mesmos filtros e cursor da página HTML)"""
+    from models.auditoria import Auditoria
+    
+    try:
+        filtros = _filtros_auditoria()
+        limite = min(inteiro_parametro('limite', AUDITORIA_POR_PAGINA, minimo=1), AUDITORIA_MAX_POR_PAGINA)
+        registros, proximo_cursor = Auditoria.paginar(cursor=request.args.get('cursor'), limite=limite, **filtros)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'registros': [registro.to_dict() for registro in registros],
+        'proximo_cursor': proximo_cursor
+    })
+
+@admin_bp.route('/auditoria/exportar')
+@login_required
+@admin_required
+def exportar_auditoria():
+    """Exporta em CSV todos os registros filtrados, gerando o arquivo à medida que é enviado"""
+    import csv
+    import io
+    from datetime import datetime
+    from flask import Response, stream_with_context
+    from models.auditoria import Auditoria, COLUNAS_EXPORTACAO
+    
+    try:
+        filtros = _filtros_auditoria()
+    except ValueError:
+        flash('Filtros de auditoria inválidos.', 'warning')
+        return redirect(url_for('admin.auditoria'))
+    
+    def gerar():
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        # BOM para o Excel reconhecer UTF-8
+        buffer.write('\ufeff')
+        escritor.writerow(COLUNAS_EXPORTACAO)
+        
+        for numero, linha in enumerate(Auditoria.iterar_linhas(**filtros), 1):
+            escritor.writerow(linha)
+            if numero % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    nome_arquivo = f"auditoria_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    return Response(
+        stream_with_context(gerar()),
+        mimetype='text/csv',
+        headers={
+            'Content-Disposition': f'attachment; filename={nome_arquivo}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @admin_bp.route('/clientes')
 @login_required
 @admin_required
@@ -706,86 +836,16 @@ def calcular_estatisticas_grupo(grupo_nome, tipo_assessment_id):
     
     MUDANÇA CONCEITUAL: Agora filtra por (grupo + tipo_assessment_id)
     
+    Lê os agregados por (grupo, tipo, domínio) mantidos a cada assessment
+    concluído, em vez de recalcular a pontuação de todos os assessments.
+    
     Args:
         grupo_nome: Nome do grupo/tag. Se None, calcula para TODAS as respostas do tipo (grupo geral)
         tipo_assessment_id: ID do tipo de assessment
     """
-    from models.assessment_publico import AssessmentPublico
-    from models.assessment_version import AssessmentDominio
-    from sqlalchemy import func
-    
-    # Buscar todos os assessments concluídos
-    query = AssessmentPublico.query.filter_by(
-        tipo_assessment_id=tipo_assessment_id
-    ).filter(
-        AssessmentPublico.data_conclusao.isnot(None)
-    )
-    
-    # Se grupo_nome for especificado, filtrar por ele
-    # Se for None, retorna TODAS as respostas do tipo (grupo geral)
-    if grupo_nome is not None:
-        query = query.filter_by(grupo=grupo_nome)
-    
-    assessments = query.all()
-    
-    if not assessments:
-        return None
+    from models.estatistica_grupo import EstatisticaGrupoPublico
     
-    # Calcular estatísticas gerais
-    pontuacoes_gerais = [a.calcular_pontuacao_geral() for a in assessments]
-    pontuacao_media_geral = sum(pontuacoes_gerais) / len(pontuacoes_gerais) if pontuacoes_gerais else 0
-    
-    # Identificar todos os domínios únicos respondidos
-    dominios_dict = {}
-    
-    for assessment in assessments:
-        try:
-            for dominio in assessment.get_dominios_respondidos():
-                if dominio.id not in dominios_dict:
-                    dominios_dict[dominio.id] = {
-                        'dominio': dominio,
-                        'pontuacoes': []
-                    }
-                
-                pontuacao_dominio = assessment.calcular_pontuacao_dominio(dominio.id)
-                dominios_dict[dominio.id]['pontuacoes'].append(pontuacao_dominio)
-        except Exception as e:
-            logging.error(f"Erro ao processar domínios do assessment {assessment.id}: {e}")
-            continue
-    
-    # Calcular médias por domínio
-    dominios_estatisticas = []
-    for dominio_data in dominios_dict.values():
-        pontuacoes = dominio_data['pontuacoes']
-        media = sum(pontuacoes) / len(pontuacoes) if pontuacoes else 0
-        minima = min(pontuacoes) if pontuacoes else 0
-        maxima = max(pontuacoes) if pontuacoes else 0
-        
-        dominios_estatisticas.append({
-            'dominio': dominio_data['dominio'],
-            'media': round(media, 1),
-            'minima': round(minima, 1),
-            'maxima': round(maxima, 1),
-            'total_respostas': len(pontuacoes)
-        })
-    
-    # Ordenar por média decrescente
-    dominios_estatisticas.sort(key=lambda x: x['media'], reverse=True)
-    
-    # Estatísticas adicionais
-    estatisticas = {
-        'total_assessments': len(assessments),
-        'pontuacao_media_geral': round(pontuacao_media_geral, 1),
-        'pontuacao_minima': round(min(pontuacoes_gerais), 1) if pontuacoes_gerais else 0,
-        'pontuacao_maxima': round(max(pontuacoes_gerais), 1) if pontuacoes_gerais else 0,
-        'primeira_resposta': min(a.data_conclusao for a in assessments if a.data_conclusao),
-        'ultima_resposta': max(a.data_conclusao for a in assessments if a.data_conclusao)
-    }
-    
-    return {
-        'estatisticas': estatisticas,
-        'dominios_estatisticas': dominios_estatisticas
-    }
+    return EstatisticaGrupoPublico.obter(grupo_nome, tipo_assessment_id)
 
 @admin_bp.route('/grupos/geral/<int:tipo_id>')
 @login_required
@@ -881,7 +941,8 @@ def estatisticas_grupo_geral_api(tipo_id):
                 'media': item['media'],
                 'minima': item['minima'],
                 'maxima': item['maxima'],
-                'total_respostas': item['total_respostas']
+                'total_respostas': item['total_respostas'],
+                'histograma': item['histograma']
             })
         
         # Converter datas para string
@@ -921,7 +982,8 @@ def estatisticas_grupo_api(grupo_nome, tipo_id):
                 'media': item['media'],
                 'minima': item['minima'],
                 'maxima': item['maxima'],
-                'total_respostas': item['total_respostas']
+                'total_respostas': item['total_respostas'],
+                'histograma': item['histograma']
             })
         
         # Converter datas para string
@@ -947,6 +1009,7 @@ def excluir_grupo(grupo_nome, tipo_id):
     """Excluir todos os assessments públicos de um grupo específico (TAG + TIPO)"""
     from models.assessment_publico import AssessmentPublico, RespostaPublica
     from models.lead import Lead
+    from models.estatistica_grupo import EstatisticaGrupoPublico
     
     try:
         # Buscar todos os assessments deste grupo + tipo
@@ -965,6 +1028,12 @@ def excluir_grupo(grupo_nome, tipo_id):
         for assessment in assessments:
             db.session.delete(assessment)
         
+        # Remover as estatísticas agregadas do grupo
+        EstatisticaGrupoPublico.query.filter_by(
+            grupo=grupo_nome,
+            tipo_assessment_id=tipo_id
+        ).delete(synchronize_session=False)
+        
         db.session.commit()
         
         flash(f'Grupo "{grupo_nome}" excluído com sucesso! {total_excluidos} assessment(s) removido(s).', 'success')
@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from app import db
 from models.assessment_version import AssessmentTipo, AssessmentVersao, AssessmentDominio
 from models.pergunta import Pergunta
+from models.questionario import registrar_alteracao_questionario, limpar_questionario
 from models.usuario import Usuario
 from utils.auth_utils import admin_required
 from datetime import datetime
@@ -121,6 +122,7 @@ def nova_versao(versao_id):
     versao_base = AssessmentVersao.query.get_or_404(versao_id)
     nova_versao_num = request.form.get('versao')
     notas = request.form.get('notas_versao', '')
+    copiar_conteudo = request.form.get('copiar_conteudo') == '1'
     
     if not nova_versao_num:
         flash('Número da versão é obrigatório', 'error')
@@ -147,11 +149,18 @@ def nova_versao(versao_id):
     db.session.add(nova_versao)
     db.session.flush()
     
-    # Nova versão é criada vazia (sem domínios e perguntas)
-    # O usuário pode adicionar conteúdo manualmente ou via CSV
+    # Sem cópia, a nova versão é criada vazia (conteúdo manual ou via CSV)
+    if copiar_conteudo:
+        from utils.versao_utils import copiar_estrutura_versao
+        mapa_dominios, mapa_perguntas = copiar_estrutura_versao(versao_base.id, nova_versao.id)
     
     db.session.commit()
-    flash(f'Nova versão {nova_versao_num} criada com sucesso!', 'success')
+    
+    if copiar_conteudo:
+        flash(f'Nova versão {nova_versao_num} criada com {len(mapa_dominios)} domínios e '
+              f'{len(mapa_perguntas)} perguntas da versão {versao_base.versao}!', 'success')
+    else:
+        flash(f'Nova versão {nova_versao_num} criada com sucesso!', 'success')
     return redirect(url_for('assessment_admin.editar_versao', versao_id=nova_versao.id))
 
 @assessment_admin_bp.route('/tipos-assessment/dominio/<int:versao_id>/novo', methods=['POST'])
@@ -184,7 +193,9 @@ def novo_dominio(versao_id):
         ordem=ultima_ordem + 1
     )
     db.session.add(dominio)
+    registrar_alteracao_questionario(versao_id)
     db.session.commit()
+    limpar_questionario(versao_id)
     
     flash(f'Domínio "{nome}" adicionado com sucesso!', 'success')
     return redirect(url_for('assessment_admin.editar_versao', versao_id=versao_id))
@@ -225,7 +236,9 @@ def nova_pergunta(dominio_id):
         ordem=ultima_ordem + 1
     )
     db.session.add(pergunta)
+    registrar_alteracao_questionario(dominio.versao_id)
     db.session.commit()
+    limpar_questionario(dominio.versao_id)
     
     flash('Pergunta adicionada com sucesso!', 'success')
     return redirect(url_for('assessment_admin.editar_versao', versao_id=dominio.versao_id))
@@ -266,7 +279,9 @@ def editar_pergunta(pergunta_id):
     pergunta.light = light
     pergunta.ordem = ordem_int
     
+    registrar_alteracao_questionario(dominio.versao_id)
     db.session.commit()
+    limpar_questionario(dominio.versao_id)
     
     flash('Pergunta atualizada com sucesso!', 'success')
     return redirect(url_for('assessment_admin.editar_versao', versao_id=dominio.versao_id))
@@ -300,7 +315,9 @@ def reordenar_perguntas():
             if pergunta:
                 pergunta.ordem = nova_ordem
         
+        registrar_alteracao_questionario(dominio.versao_id)
         db.session.commit()
+        limpar_questionario(dominio.versao_id)
         
         return {'success': True, 'message': 'Ordem atualizada com sucesso'}
         
@@ -398,6 +415,12 @@ def clonar_tipo(tipo_id):
         flash('Já existe um tipo com este nome', 'error')
         return redirect(url_for('assessment_admin.ver_tipo', tipo_id=tipo_id))
     
+    # Pegar versão ativa do tipo original
+    versao_original = tipo_original.get_versao_ativa()
+    if not versao_original:
+        flash('Tipo original não tem versão ativa para clonar', 'error')
+        return redirect(url_for('assessment_admin.ver_tipo', tipo_id=tipo_id))
+    
     # Criar novo tipo
     novo_tipo = AssessmentTipo(
         nome=novo_nome,
@@ -406,12 +429,6 @@ def clonar_tipo(tipo_id):
     db.session.add(novo_tipo)
     db.session.flush()
     
-    # Pegar versão ativa do tipo original
-    versao_original = tipo_original.get_versao_ativa()
-    if not versao_original:
-        flash('Tipo original não tem versão ativa para clonar', 'error')
-        return redirect(url_for('assessment_admin.ver_tipo', tipo_id=tipo_id))
-    
     # Criar versão 1.0 para o novo tipo
     nova_versao = AssessmentVersao(
         tipo_id=novo_tipo.id,
@@ -423,29 +440,9 @@ def clonar_tipo(tipo_id):
     db.session.add(nova_versao)
     db.session.flush()
     
-    # Copiar domínios e perguntas
-    for dominio_original in versao_original.get_dominios_ativos():
-        novo_dominio = AssessmentDominio(
-            versao_id=nova_versao.id,
-            nome=dominio_original.nome,
-            descricao=dominio_original.descricao,
-            ordem=dominio_original.ordem
-        )
-        db.session.add(novo_dominio)
-        db.session.flush()
-        
-        # Copiar perguntas
-        for pergunta_original in dominio_original.get_perguntas_ativas():
-            nova_pergunta = Pergunta(
-                dominio_versao_id=novo_dominio.id,
-                texto=pergunta_original.texto,
-                descricao=pergunta_original.descricao,
-                referencia=pergunta_original.referencia,
-                recomendacao=pergunta_original.recomendacao,
-                light=pergunta_original.light,
-                ordem=pergunta_original.ordem
-            )
-            db.session.add(nova_pergunta)
+    # Copiar domínios e perguntas (INSERT em lote, na mesma transação)
+    from utils.versao_utils import copiar_estrutura_versao
+    copiar_estrutura_versao(versao_original.id, nova_versao.id)
     
     db.session.commit()
     flash(f'Tipo "{novo_nome}" clonado com sucesso!', 'success')
@@ -484,7 +481,9 @@ def excluir_versao(versao_id):
     
     # Excluir a versão
     db.session.delete(versao)
+    registrar_alteracao_questionario(versao_id)
     db.session.commit()
+    limpar_questionario(versao_id)
     
     flash(f'Versão {versao_num} do tipo "{tipo_nome}" excluída com sucesso!', 'success')
     return redirect(url_for('assessment_admin.ver_tipo', tipo_id=tipo_id))
@@ -493,113 +492,62 @@ def excluir_versao(versao_id):
 @login_required
 @admin_required
 def importar_csv_versao(versao_id):
-    """Importa CSV para uma versão específica"""
+    """Importa CSV para uma versão específica (simular=1 devolve apenas a prévia em JSON)"""
+    from utils.importacao_questionario import ImportacaoQuestionario
     versao = AssessmentVersao.query.get_or_404(versao_id)
+    simular = request.form.get('simular') == '1'
     
-    # Verificar se a versão pode receber importação
-    if versao.status != 'draft':
-        flash('Apenas versões em draft podem receber importação CSV', 'error')
+    def erro(mensagem):
+        if simular:
+            return jsonify({'success': False, 'message': mensagem}), 400
+        flash(mensagem, 'error')
         return redirect(url_for('assessment_admin.editar_versao', versao_id=versao_id))
     
-    # Verificar se a versão está vazia
-    if versao.get_total_perguntas() > 0:
-        flash('A versão deve estar vazia para receber importação CSV', 'error')
-        return redirect(url_for('assessment_admin.editar_versao', versao_id=versao_id))
+    # Verificar se a versão pode receber importação
+    if versao.status != 'draft':
+        return erro('Apenas versões em draft podem receber importação CSV')
     
     arquivo = request.files.get('arquivo_csv')
     if not arquivo or arquivo.filename == '':
-        flash('Nenhum arquivo selecionado', 'error')
-        return redirect(url_for('assessment_admin.editar_versao', versao_id=versao_id))
+        return erro('Nenhum arquivo selecionado')
     
     if not arquivo.filename.lower().endswith('.csv'):
-        flash('Arquivo deve ser um CSV', 'error')
-        return redirect(url_for('assessment_admin.editar_versao', versao_id=versao_id))
+        return erro('Arquivo deve ser um CSV')
     
     try:
-        # Processar CSV
-        import csv
-        import io
-        
-        # Ler arquivo CSV com separador ponto e vírgula
-        stream = io.StringIO(arquivo.stream.read().decode("UTF8"), newline=None)
-        csv_input = csv.DictReader(stream, delimiter=';')
-        
-        dominios_criados = {}
-        perguntas_criadas = 0
-        
-        for row in csv_input:
-            dominio_nome = row.get('Dominio', '').strip()
-            dominio_descricao = row.get('DescriçãoDominio', '').strip()
-            dominio_ordem = row.get('OrdemDominio', '').strip()
-            pergunta_texto = row.get('Pergunta', '').strip()
-            pergunta_descricao = row.get('DescriçãoPergunta', '').strip()
-            pergunta_referencia = row.get('Referência', '').strip()
-            pergunta_recomendacao = row.get('Recomendação', '').strip()
-            pergunta_light = row.get('Light', '').strip().lower() in ['1', 'sim', 'true', 's']
-            pergunta_ordem = row.get('OrdemPergunta', '').strip()
-            
-            if not dominio_nome or not pergunta_texto:
-                continue
-                
-            # Criar ou encontrar domínio
-            if dominio_nome not in dominios_criados:
-                try:
-                    ordem_dom = int(dominio_ordem) if dominio_ordem else len(dominios_criados) + 1
-                except ValueError:
-                    ordem_dom = len(dominios_criados) + 1
-                    
-                dominio = AssessmentDominio(
-                    versao_id=versao_id,
-                    nome=dominio_nome,
-                    descricao=dominio_descricao,
-                    ordem=ordem_dom
-                )
-                db.session.add(dominio)
-                db.session.flush()
-                dominios_criados[dominio_nome] = dominio
-            else:
-                dominio = dominios_criados[dominio_nome]
-            
-            # Criar pergunta
-            try:
-                ordem_perg = int(pergunta_ordem) if pergunta_ordem else len(dominio.get_perguntas_ativas()) + 1
-            except ValueError:
-                ordem_perg = len(dominio.get_perguntas_ativas()) + 1
-                
-            pergunta = Pergunta(
-                dominio_versao_id=dominio.id,
-                texto=pergunta_texto,
-                descricao=pergunta_descricao,
-                referencia=pergunta_referencia if pergunta_referencia else None,
-                recomendacao=pergunta_recomendacao if pergunta_recomendacao else None,
-                light=pergunta_light,
-                ordem=ordem_perg
-            )
-            db.session.add(pergunta)
-            perguntas_criadas += 1
-        
+        # Comparar o CSV (lido em stream) com os domínios e perguntas da versão
+        importacao = ImportacaoQuestionario(versao_id).analisar(arquivo.stream)
+    except ValueError as e:
+        return erro(f'Erro ao processar CSV: {str(e)}')
+    
+    if simular:
+        return jsonify({'success': True, **importacao.resumo()})
+    
+    try:
+        totais = importacao.aplicar()
+        registrar_alteracao_questionario(versao_id)
         db.session.commit()
-        
-        # Registrar importação CSV na auditoria
-        from models.auditoria import Auditoria
-        Auditoria.registrar(
-            acao='import_csv',
-            entidade='assessment_versao',
-            entidade_id=versao_id,
-            entidade_nome=f'{versao.tipo.nome} v{versao.versao}',
-            descricao=f'Importou CSV para "{versao.tipo.nome}" v{versao.versao}',
-            detalhes={
-                'dominios_criados': len(dominios_criados),
-                'perguntas_criadas': perguntas_criadas,
-                'arquivo_nome': arquivo.filename
-            }
-        )
-        
-        flash(f'Importação concluída! {len(dominios_criados)} domínios e {perguntas_criadas} perguntas criadas.', 'success')
-        
+        limpar_questionario(versao_id)
     except Exception as e:
         db.session.rollback()
-        flash(f'Erro ao processar CSV: {str(e)}', 'error')
+        return erro(f'Erro ao processar CSV: {str(e)}')
+    
+    # Registrar importação CSV na auditoria
+    from models.auditoria import Auditoria
+    Auditoria.registrar(
+        acao='import_csv',
+        entidade='assessment_versao',
+        entidade_id=versao_id,
+        entidade_nome=f'{versao.tipo.nome} v{versao.versao}',
+        descricao=f'Importou CSV para "{versao.tipo.nome}" v{versao.versao}',
+        detalhes=dict(totais, arquivo_nome=arquivo.filename)
+    )
+    
+    flash(f'Importação concluída! Domínios: {totais["dominios_criados"]} criados e '
+          f'{totais["dominios_atualizados"]} atualizados. Perguntas: {totais["perguntas_criadas"]} criadas, '
+          f'{totais["perguntas_atualizadas"]} atualizadas e {totais["perguntas_inalteradas"]} sem alteração.', 'success')
+    for aviso in importacao.avisos[:5]:
+        flash(aviso, 'warning')
     
     return redirect(url_for('assessment_admin.editar_versao', versao_id=versao_id))
 
@@ -608,11 +556,7 @@ def importar_csv_versao(versao_id):
 @admin_required
 def processar_importacao_csv():
     """Processa importação CSV criando nova versão draft"""
-    from werkzeug.utils import secure_filename
-    import csv
-    import io
-    import os
-    from decimal import Decimal
+    from utils.importacao_questionario import ImportacaoQuestionario
     
     tipo_id = request.form.get('tipo_assessment_id')
     nova_versao_num = request.form.get('nova_versao')
@@ -635,10 +579,6 @@ def processar_importacao_csv():
         return redirect(url_for('assessment_admin.importar_csv'))
     
     try:
-        # Ler arquivo CSV com separador ponto e vírgula
-        stream = io.StringIO(arquivo.stream.read().decode("UTF8"), newline=None)
-        csv_input = csv.DictReader(stream, delimiter=';')
-        
         # Criar nova versão
         nova_versao = AssessmentVersao(
             tipo_id=tipo_id,
@@ -650,59 +590,9 @@ def processar_importacao_csv():
         db.session.add(nova_versao)
         db.session.flush()
         
-        dominios_criados = {}
-        perguntas_criadas = 0
-        
-        # Processar cada linha do CSV
-        for row in csv_input:
-            dominio_nome = row.get('Dominio', '').strip()
-            dominio_descricao = row.get('DescriçãoDominio', '').strip()
-            dominio_ordem = row.get('OrdemDominio', '').strip()
-            pergunta_texto = row.get('Pergunta', '').strip()
-            pergunta_descricao = row.get('DescriçãoPergunta', '').strip()
-            pergunta_referencia = row.get('Referência', '').strip()
-            pergunta_recomendacao = row.get('Recomendação', '').strip()
-            pergunta_light = row.get('Light', '').strip().lower() in ['1', 'sim', 'true', 's']
-            pergunta_ordem = row.get('OrdemPergunta', '').strip()
-            
-            if not dominio_nome or not pergunta_texto:
-                continue
-            
-            # Criar domínio se não existir
-            if dominio_nome not in dominios_criados:
-                try:
-                    ordem_dom = int(dominio_ordem) if dominio_ordem else len(dominios_criados) + 1
-                except ValueError:
-                    ordem_dom = len(dominios_criados) + 1
-                    
-                dominio = AssessmentDominio(
-                    versao_id=nova_versao.id,
-                    nome=dominio_nome,
-                    descricao=dominio_descricao,
-                    ordem=ordem_dom
-                )
-                db.session.add(dominio)
-                db.session.flush()
-                dominios_criados[dominio_nome] = dominio
-            
-            # Criar pergunta
-            dominio = dominios_criados[dominio_nome]
-            try:
-                ordem_perg = int(pergunta_ordem) if pergunta_ordem else 1
-            except ValueError:
-                ordem_perg = 1
-            
-            pergunta = Pergunta(
-                dominio_versao_id=dominio.id,
-                texto=pergunta_texto,
-                descricao=pergunta_descricao,
-                referencia=pergunta_referencia if pergunta_referencia else None,
-                recomendacao=pergunta_recomendacao if pergunta_recomendacao else None,
-                light=pergunta_light,
-                ordem=ordem_perg
-            )
-            db.session.add(pergunta)
-            perguntas_criadas += 1
+        # CSV lido em stream e gravado com INSERT em lote
+        importacao = ImportacaoQuestionario(nova_versao.id).analisar(arquivo.stream)
+        totais = importacao.aplicar()
         
         db.session.commit()
         
@@ -717,13 +607,15 @@ def processar_importacao_csv():
             detalhes={
                 'tipo_id': tipo.id,
                 'versao': nova_versao_num,
-                'dominios_criados': len(dominios_criados),
-                'perguntas_criadas': perguntas_criadas,
+                'dominios_criados': totais['dominios_criados'],
+                'perguntas_criadas': totais['perguntas_criadas'],
                 'arquivo_nome': arquivo.filename
             }
         )
         
-        flash(f'Importação concluída! Criados {len(dominios_criados)} domínios e {perguntas_criadas} perguntas na versão {nova_versao_num}', 'success')
+        flash(f'Importação concluída! Criados {totais["dominios_criados"]} domínios e {totais["perguntas_criadas"]} perguntas na versão {nova_versao_num}', 'success')
+        for aviso in importacao.avisos[:5]:
+            flash(aviso, 'warning')
         return redirect(url_for('assessment_admin.editar_versao', versao_id=nova_versao.id))
         
     except Exception as e:
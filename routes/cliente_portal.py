@@ -3,6 +3,7 @@ Portal do cliente para visualização de estatísticas dos projetos liberados
 """
 
 from flask import Blueprint, render_template, redirect, url_for, flash, request
+from werkzeug.exceptions import HTTPException
 from flask_login import login_required, current_user
 from app import db
 from models.projeto import Projeto
@@ -16,6 +17,42 @@ import pytz
 
 cliente_portal_bp = Blueprint('cliente_portal', __name__, url_prefix='/cliente')
 
+def _montar_estatisticas_cliente(projeto):
+    """Monta os dados da página de estatísticas do cliente a partir das estatísticas do projeto"""
+    from utils.estatisticas_utils import calcular_estatisticas_projeto
+    estatisticas = calcular_estatisticas_projeto(projeto)
+    respondentes = projeto.get_respondentes_ativos()
+    
+    estatisticas_gerais = {
+        'total_assessments': len(estatisticas['assessments']),
+        'total_respondentes': len(respondentes),
+        'total_respostas': estatisticas['total_respostas']
+    }
+    
+    scores_por_assessment = {}
+    detalhamento_dominio = {}
+    memorial_respostas = {}
+    
+    for assessment in estatisticas['assessments']:
+        tipo_nome = assessment['tipo'].nome
+        scores_por_assessment[tipo_nome] = assessment['score_geral']
+        detalhamento_dominio[tipo_nome] = [{
+            'nome': dominio_stats['dominio'].nome,
+            'descricao': dominio_stats['dominio'].descricao,
+            'score_medio': dominio_stats['score'],
+            'total_perguntas': dominio_stats['total_perguntas'],
+            'total_respostas': dominio_stats['total_respostas']
+        } for dominio_stats in assessment['dominios']]
+        memorial_respostas[tipo_nome] = [{
+            'dominio': dominio_stats['dominio'],
+            'respostas': [p for p in dominio_stats['perguntas'] if p['resposta_final']]
+        } for dominio_stats in assessment['dominios']]
+    
+    respondentes_stats = [{'respondente': respondente} for respondente in respondentes]
+    
+    return (estatisticas['score_medio_projeto'], estatisticas_gerais, scores_por_assessment,
+            detalhamento_dominio, respondentes_stats, memorial_respostas)
+
 @cliente_portal_bp.route('/projetos/<int:projeto_id>/estatisticas')
 @login_required
 def estatisticas_cliente(projeto_id):
@@ -29,9 +66,10 @@ def estatisticas_cliente(projeto_id):
     
     # Carregar dados das estatísticas
     try:
-        from routes.projeto import calcular_estatisticas_projeto
+        from utils.relatorio_artefatos import status_relatorio
+        
         (score_medio_projeto, estatisticas_gerais, scores_por_assessment,
-         detalhamento_dominio, respondentes_stats, memorial_respostas) = calcular_estatisticas_projeto(projeto)
+         detalhamento_dominio, respondentes_stats, memorial_respostas) = _montar_estatisticas_cliente(projeto)
         
         # Timezone para data/hora
         timezone = pytz.timezone('America/Sao_Paulo')
@@ -45,7 +83,8 @@ def estatisticas_cliente(projeto_id):
                              detalhamento_dominio=detalhamento_dominio,
                              respondentes_stats=respondentes_stats,
                              memorial_respostas=memorial_respostas,
-                             data_visualizacao=data_atual.strftime('%d/%m/%Y às %H:%M'))
+                             data_visualizacao=data_atual.strftime('%d/%m/%Y às %H:%M'),
+                             relatorio_pdf=status_relatorio(projeto))
                              
     except Exception as e:
         flash(f'Erro ao carregar estatísticas: {str(e)}', 'error')
@@ -63,17 +102,36 @@ def gerar_relatorio_cliente(projeto_id):
         return redirect(url_for('auth.login'))
     
     try:
-        from utils.pdf_relatorio import gerar_relatorio_completo_pdf
-        
-        pdf_buffer = gerar_relatorio_completo_pdf(projeto)
+        from utils.relatorio_artefatos import responder_relatorio_pdf, solicitar_relatorio
         
-        from flask import make_response
-        response = make_response(pdf_buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename="Relatorio_Assessment_{projeto.nome}_{projeto.cliente.nome}.pdf"'
+        resposta = responder_relatorio_pdf(
+            projeto,
+            download_name=f"Relatorio_Assessment_{projeto.nome}_{projeto.cliente.nome}.pdf"
+        )
+        if resposta:
+            return resposta
         
-        return response
+        solicitar_relatorio(projeto)
+        flash('O relatório está sendo gerado. O download ficará disponível nesta página assim que estiver pronto.', 'info')
         
+    except HTTPException:
+        # Respostas HTTP de erro (ex.: 416 para Range inválido) seguem ao cliente
+        raise
     except Exception as e:
+        db.session.rollback()
         flash(f'Erro ao gerar relatório: {str(e)}', 'error')
-        return redirect(url_for('cliente_portal.estatisticas_cliente', projeto_id=projeto_id))
\ No newline at end of file
+    
+    return redirect(url_for('cliente_portal.estatisticas_cliente', projeto_id=projeto_id))
+
+@cliente_portal_bp.route('/projetos/<int:projeto_id>/relatorio-pdf/status')
+@login_required
+def status_relatorio_pdf(projeto_id):
+    """Situação da geração do relatório PDF (consultada pela página de estatísticas)"""
+    from flask import jsonify
+    from utils.relatorio_artefatos import status_relatorio
+    
+    projeto = Projeto.query.get_or_404(projeto_id)
+    if not projeto.liberado_cliente:
+        return jsonify({'error': 'Projeto não liberado'}), 403
+    
+    return jsonify(status_relatorio(projeto))
\ No newline at end of file
@@ -5,74 +5,75 @@ from models.usuario import Usuario
 from forms.lead_forms import LeadUpdateForm, LeadComentarioForm, LeadFiltroForm
 from app import db
 from utils.auth_utils import admin_required
-from sqlalchemy import or_, desc
+from utils.parametros_utils import inteiro_parametro
+from sqlalchemy import desc
 from datetime import datetime
 import logging
 
 leads_bp = Blueprint('leads', __name__, url_prefix='/admin/leads')
 
+LEADS_POR_PAGINA = 50
+LEADS_MAX_POR_PAGINA = 500
+
+def _filtros_leads(form):
+    """Filtros do dashboard a partir do formulário (mesmos da página HTML e da API)"""
+    return {
+        'status': form.status.data or None,
+        'prioridade': form.prioridade.data or None,
+        'busca': form.busca.data or None
+    }
+
 @leads_bp.route('/')
 @login_required
 @admin_required
 def dashboard():
-    """Dashboard de leads com filtros e estatísticas"""
+    """Dashboard de leads com filtros e estatísticas (primeira página; as demais via API)"""
     form = LeadFiltroForm(request.args, meta={'csrf': False})
     
-    # Query base
-    query = Lead.query
-    
-    # Aplicar filtros
-    if form.status.data:
-        query = query.filter(Lead.status == form.status.data)
-    
-    if form.prioridade.data:
-        query = query.filter(Lead.prioridade == form.prioridade.data)
-    
-    if form.busca.data:
-        busca_term = f"%{form.busca.data}%"
-        query = query.filter(
-            or_(
-                Lead.nome.ilike(busca_term),
-                Lead.email.ilike(busca_term),
-                Lead.empresa.ilike(busca_term)
-            )
-        )
-    
-    # Ordenar por data de criação (mais recentes primeiro)
-    leads = query.order_by(desc(Lead.data_criacao)).all()
-    
-    # Calcular estatísticas
-    total_leads = Lead.query.count()
-    leads_novos = Lead.query.filter_by(status='novo').count()
-    leads_qualificados = Lead.query.filter_by(status='qualificado').count()
-    leads_ganhos = Lead.query.filter_by(status='ganho').count()
+    leads, proximo_cursor = Lead.paginar(limite=LEADS_POR_PAGINA, **_filtros_leads(form))
     
-    # Estatísticas de pontuação
-    leads_baixa = Lead.query.filter(Lead.pontuacao_geral < 40).count()
-    leads_media = Lead.query.filter(Lead.pontuacao_geral >= 40, Lead.pontuacao_geral < 70).count()
-    leads_alta = Lead.query.filter(Lead.pontuacao_geral >= 70).count()
+    # Cards e distribuições em uma única consulta agrupada
+    contadores = Lead.contadores()
+    status_dict = contadores['por_status']
     
-    # Distribuição por status
-    status_distribuicao = db.session.query(
-        Lead.status, 
-        db.func.count(Lead.id)
-    ).group_by(Lead.status).all()
-    
-    status_dict = {status: count for status, count in status_distribuicao}
+    # Parâmetros atuais dos filtros, para a API de rolagem infinita
+    parametros = {chave: valor for chave, valor in request.args.items() if valor and chave != 'cursor'}
     
     return render_template('admin/leads/dashboard.html',
                          leads=leads,
+                         proximo_cursor=proximo_cursor,
+                         parametros=parametros,
                          form=form,
-                         total_leads=total_leads,
-                         leads_novos=leads_novos,
-                         leads_qualificados=leads_qualificados,
-                         leads_ganhos=leads_ganhos,
-                         leads_baixa=leads_baixa,
-                         leads_media=leads_media,
-                         leads_alta=leads_alta,
+                         total_leads=contadores['total'],
+                         leads_novos=status_dict.get('novo', 0),
+                         leads_qualificados=status_dict.get('qualificado', 0),
+                         leads_ganhos=status_dict.get('ganho', 0),
+                         leads_baixa=contadores['pontuacao']['baixa'],
+                         leads_media=contadores['pontuacao']['media'],
+                         leads_alta=contadores['pontuacao']['alta'],
                          status_dict=status_dict)
 
 
+@leads_bp.route('/api')
+@login_required
+@admin_required
+def api():
+    """Leads em JSON, página a página por cursor (rolagem infinita do dashboard)"""
+    form = LeadFiltroForm(request.args, meta={'csrf': False})
+    
+    try:
+        limite = min(inteiro_parametro('limite', LEADS_POR_PAGINA, minimo=1), LEADS_MAX_POR_PAGINA)
+        leads, proximo_cursor = Lead.paginar(cursor=request.args.get('cursor'), limite=limite, **_filtros_leads(form))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'leads': [lead.to_dict() for lead in leads],
+        'html': render_template('admin/leads/linhas_tabela.html', leads=leads),
+        'proximo_cursor': proximo_cursor
+    })
+
+
 @leads_bp.route('/<int:lead_id>')
 @login_required
 @admin_required
@@ -234,18 +235,8 @@ def excluir(lead_id):
 def estatisticas():
     """API endpoint para estatísticas de leads (para gráficos)"""
     
-    # Distribuição por status
-    status_data = db.session.query(
-        Lead.status,
-        db.func.count(Lead.id)
-    ).group_by(Lead.status).all()
-    
-    # Distribuição por pontuação
-    pontuacao_data = {
-        'baixa': Lead.query.filter(Lead.pontuacao_geral < 40).count(),
-        'media': Lead.query.filter(Lead.pontuacao_geral >= 40, Lead.pontuacao_geral < 70).count(),
-        'alta': Lead.query.filter(Lead.pontuacao_geral >= 70).count()
-    }
+    # Distribuição por status e por pontuação (uma consulta)
+    contadores = Lead.contadores()
     
     # Leads por mês (últimos 6 meses)
     from datetime import datetime, timedelta
@@ -257,7 +248,7 @@ def estatisticas():
     ).filter(Lead.data_criacao >= seis_meses_atras).group_by('mes').all()
     
     return jsonify({
-        'status': dict(status_data),
-        'pontuacao': pontuacao_data,
+        'status': contadores['por_status'],
+        'pontuacao': contadores['pontuacao'],
         'por_mes': [{'mes': str(mes), 'count': count} for mes, count in leads_por_mes]
     })
@@ -15,6 +15,7 @@ from models.dominio import Dominio
 from models.pergunta import Pergunta
 from models.resposta import Resposta
 from werkzeug.security import generate_password_hash
+from werkzeug.exceptions import HTTPException
 from sqlalchemy import func, case, and_
 import logging
 import json
@@ -55,7 +56,10 @@ def listar_working():
                              projetos=projetos_data,
                              projetos_data=projetos_data,
                              ordem_atual='data_criacao',
-                             direcao_atual='desc')
+                             direcao_atual='desc',
+                             clientes=Cliente.query.filter_by(ativo=True).order_by(Cliente.nome).all(),
+                             lote_relatorios=_ultimo_lote_relatorios(),
+                             exportacao=_opcoes_exportacao())
         
     except Exception as e:
         return f"<h1>Erro ao carregar projetos: {str(e)}</h1>"
@@ -111,7 +115,10 @@ def listar():
                                  cliente=cliente,
                                  filtro_cliente=True,
                                  ordem_atual='data_criacao',
-                                 direcao_atual='desc')
+                                 direcao_atual='desc',
+                                 clientes=Cliente.query.filter_by(ativo=True).order_by(Cliente.nome).all(),
+                                 lote_relatorios=_ultimo_lote_relatorios(),
+                                 exportacao=_opcoes_exportacao())
         except Exception as e:
             logging.error(f"Erro ao filtrar projetos: {str(e)}")
             flash(f'Erro ao filtrar projetos: {str(e)}', 'danger')
@@ -373,242 +380,73 @@ def estatisticas(projeto_id):
             if not estatisticas_gerais['data_finalizacao'] or pa.data_finalizacao > estatisticas_gerais['data_finalizacao']:
                 estatisticas_gerais['data_finalizacao'] = pa.data_finalizacao
     
-    # Estatísticas por assessment
+    # Estatísticas por assessment (domínios, perguntas e respostas carregados de uma vez)
+    from utils.estatisticas_utils import calcular_estatisticas_projeto
+    estatisticas = calcular_estatisticas_projeto(projeto)
+    
     estatisticas_assessments = []
-    scores_gerais = []
     dados_grafico_radar = {}
+    memorial_respostas = {}
     
-    for projeto_assessment in projeto.assessments:
-        if not projeto_assessment.finalizado:
-            continue
-            
-        # Determinar tipo e versão do assessment
-        tipo = None
-        versao_info = "Sistema Antigo"
-        
-        if projeto_assessment.versao_assessment_id:
-            versao = projeto_assessment.versao_assessment
-            tipo = versao.tipo
-            versao_info = f"Versão {versao.versao}"
-            dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-        elif projeto_assessment.tipo_assessment_id:
-            tipo = projeto_assessment.tipo_assessment
-            versao_info = "Sistema Antigo"
-            dominios_query = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True)
-        
-        if not tipo:
-            continue
-        
-        # Calcular score geral do assessment
-        if projeto_assessment.versao_assessment_id:
-            # Novo sistema de versionamento
-            score_query = db.session.query(
-                func.avg(Resposta.nota).label('score_medio'),
-                func.count(Resposta.id).label('total_respostas')
-            ).join(
-                Pergunta, Resposta.pergunta_id == Pergunta.id
-            ).join(
-                AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id
-            ).filter(
-                Resposta.projeto_id == projeto.id,
-                AssessmentDominio.versao_id == versao.id,
-                AssessmentDominio.ativo == True,
-                Pergunta.ativo == True
-            ).first()
-        else:
-            # Sistema antigo
-            score_query = db.session.query(
-                func.avg(Resposta.nota).label('score_medio'),
-                func.count(Resposta.id).label('total_respostas')
-            ).join(
-                Pergunta, Resposta.pergunta_id == Pergunta.id
-            ).join(
-                Dominio, Pergunta.dominio_id == Dominio.id
-            ).filter(
-                Resposta.projeto_id == projeto.id,
-                Dominio.tipo_assessment_id == tipo.id,
-                Dominio.ativo == True,
-                Pergunta.ativo == True
-            ).first()
-        
-        score_geral = round(float(score_query.score_medio or 0), 2)
-        total_respostas = score_query.total_respostas or 0
-        
-        # Calcular scores por domínio
-        scores_dominios = []
-        dominios_radar = []
-        scores_radar = []
+    for assessment in estatisticas['assessments']:
+        tipo = assessment['tipo']
         
-        for dominio in dominios_query.order_by('ordem'):
-            if projeto_assessment.versao_assessment_id:
-                # Novo sistema
-                dominio_score_query = db.session.query(
-                    func.avg(Resposta.nota).label('score_medio'),
-                    func.count(Resposta.id).label('total_respostas'),
-                    func.count(Pergunta.id.distinct()).label('total_perguntas')
-                ).join(
-                    Pergunta, Resposta.pergunta_id == Pergunta.id
-                ).filter(
-                    Resposta.projeto_id == projeto.id,
-                    Pergunta.dominio_versao_id == dominio.id,
-                    Pergunta.ativo == True
-                ).first()
-                
-                total_perguntas_dominio = db.session.query(
-                    func.count(Pergunta.id)
-                ).filter(
-                    Pergunta.dominio_versao_id == dominio.id,
-                    Pergunta.ativo == True
-                ).scalar()
-            else:
-                # Sistema antigo
-                dominio_score_query = db.session.query(
-                    func.avg(Resposta.nota).label('score_medio'),
-                    func.count(Resposta.id).label('total_respostas'),
-                    func.count(Pergunta.id.distinct()).label('total_perguntas')
-                ).join(
-                    Pergunta, Resposta.pergunta_id == Pergunta.id
-                ).filter(
-                    Resposta.projeto_id == projeto.id,
-                    Pergunta.dominio_id == dominio.id,
-                    Pergunta.ativo == True
-                ).first()
-                
-                total_perguntas_dominio = db.session.query(
-                    func.count(Pergunta.id)
-                ).filter(
-                    Pergunta.dominio_id == dominio.id,
-                    Pergunta.ativo == True
-                ).scalar()
-            
-            dominio_score = round(float(dominio_score_query.score_medio or 0), 2)
-            respostas_dominio = dominio_score_query.total_respostas or 0
-            
-            # Calcular nível de maturidade
-            if dominio_score >= 4.5:
-                nivel_maturidade = "Otimizado"
-                classe_css = "success"
-            elif dominio_score >= 3.5:
-                nivel_maturidade = "Avançado"
-                classe_css = "info"
-            elif dominio_score >= 2.5:
-                nivel_maturidade = "Intermediário"
-                classe_css = "warning"
-            elif dominio_score >= 1.5:
-                nivel_maturidade = "Básico"
-                classe_css = "secondary"
-            elif dominio_score >= 0.5:
-                nivel_maturidade = "Inicial"
-                classe_css = "danger"
-            else:
-                nivel_maturidade = "Inexistente"
-                classe_css = "dark"
-            
-            scores_dominios.append({
-                'dominio': dominio,
-                'score': dominio_score,
-                'total_respostas': respostas_dominio,
-                'total_perguntas': total_perguntas_dominio,
-                'nivel_maturidade': nivel_maturidade,
-                'classe_css': classe_css,
-                'percentual_completude': round((respostas_dominio / total_perguntas_dominio * 100) if total_perguntas_dominio > 0 else 0, 1)
-            })
-            
-            # Dados para gráfico radar
-            dominios_radar.append(dominio.nome)
-            scores_radar.append(dominio_score)
+        scores_dominios = [{
+            'dominio': dominio_stats['dominio'],
+            'score': dominio_stats['score'],
+            'total_respostas': dominio_stats['total_respostas'],
+            'total_perguntas': dominio_stats['total_perguntas'],
+            'nivel_maturidade': dominio_stats['nivel_maturidade'],
+            'classe_css': dominio_stats['classe_css'],
+            'percentual_completude': dominio_stats['percentual_completude']
+        } for dominio_stats in assessment['dominios']]
         
         # Dados do assessment
-        assessment_data = {
+        estatisticas_assessments.append({
             'tipo': tipo,
-            'versao_info': versao_info,
-            'score_geral': score_geral,
-            'total_respostas': total_respostas,
+            'versao_info': assessment['versao_info'],
+            'score_geral': assessment['score_geral'],
+            'total_respostas': assessment['total_respostas'],
             'scores_dominios': scores_dominios,
-            'data_finalizacao': projeto_assessment.data_finalizacao
-        }
-        
-        estatisticas_assessments.append(assessment_data)
-        scores_gerais.append(score_geral)
+            'data_finalizacao': assessment['data_finalizacao']
+        })
         
         # Dados para gráfico radar
         dados_grafico_radar[tipo.nome] = {
-            'dominios': dominios_radar,
-            'scores': scores_radar
+            'dominios': [d['dominio'].nome for d in scores_dominios],
+            'scores': [d['score'] for d in scores_dominios]
         }
-    
-    # Score médio geral do projeto
-    score_medio_projeto = round(sum(scores_gerais) / len(scores_gerais) if scores_gerais else 0, 2)
-    
-    # Coletar memorial de respostas por domínio
-    memorial_respostas = {}
-    
-    for projeto_assessment in projeto.assessments:
-        if not projeto_assessment.finalizado:
-            continue
-            
-        # Determinar tipo e versão do assessment
-        tipo = None
-        if projeto_assessment.versao_assessment_id:
-            versao = projeto_assessment.versao_assessment
-            tipo = versao.tipo
-            dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-        elif projeto_assessment.tipo_assessment_id:
-            tipo = projeto_assessment.tipo_assessment
-            dominios_query = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True)
         
-        if not tipo:
-            continue
-            
+        # Memorial de respostas por domínio (resposta mais recente + histórico)
         memorial_respostas[tipo.nome] = []
-        
-        for dominio in dominios_query.order_by('ordem'):
-            # Coletar perguntas e respostas do domínio
-            if projeto_assessment.versao_assessment_id:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_versao_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            else:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            
+        for dominio_stats in assessment['dominios']:
             respostas_dominio = []
-            for pergunta in perguntas_dominio:
-                # Buscar respostas desta pergunta no projeto
-                respostas_pergunta = Resposta.query.filter_by(
-                    projeto_id=projeto.id,
-                    pergunta_id=pergunta.id
-                ).order_by(Resposta.data_resposta.desc()).all()
+            for pergunta_stats in dominio_stats['perguntas']:
+                if not pergunta_stats['resposta_final']:
+                    continue
                 
-                if respostas_pergunta:
-                    # Pegar a resposta mais recente (colaborativa)
-                    resposta_final = respostas_pergunta[0]
-                    
-                    # Coletar histórico de respostas para mostrar evolução
-                    historico_respostas = []
-                    for resp in respostas_pergunta:
-                        historico_respostas.append({
-                            'nota': resp.nota,
-                            'comentario': resp.comentario,
-                            'respondente': resp.respondente.nome if resp.respondente else 'Sistema',
-                            'data': resp.data_resposta
-                        })
-                    
-                    respostas_dominio.append({
-                        'pergunta': pergunta,
-                        'resposta_final': resposta_final,
-                        'historico': historico_respostas
-                    })
+                historico_respostas = [{
+                    'nota': resp.nota,
+                    'comentario': resp.comentario,
+                    'respondente': resp.respondente.nome if resp.respondente else 'Sistema',
+                    'data': resp.data_resposta
+                } for resp in pergunta_stats['respostas']]
+                
+                respostas_dominio.append({
+                    'pergunta': pergunta_stats['pergunta'],
+                    'resposta_final': pergunta_stats['resposta_final'],
+                    'historico': historico_respostas
+                })
             
             if respostas_dominio:
                 memorial_respostas[tipo.nome].append({
-                    'dominio': dominio,
+                    'dominio': dominio_stats['dominio'],
                     'respostas': respostas_dominio
                 })
     
+    # Score médio geral do projeto
+    score_medio_projeto = estatisticas['score_medio_projeto']
+    
     # Preparar dados para gráficos
     dados_graficos = {
         'radar': dados_grafico_radar,
@@ -632,6 +470,14 @@ def estatisticas(projeto_id):
     # Remover referência a relatórios IA
     relatorio_ia = None
     
+    # Gerações de IA ainda na fila ou em execução
+    from models.tarefa_background import TarefaBackground
+    tarefas_ia = TarefaBackground.ativas_do_projeto(projeto.id)
+    tarefas_ia.pop('relatorio_pdf', None)
+    
+    from utils.relatorio_artefatos import status_relatorio
+    relatorio_pdf = status_relatorio(projeto)
+    
     return render_template('admin/projetos/estatisticas.html',
                          projeto=projeto,
                          estatisticas_gerais=estatisticas_gerais,
@@ -642,14 +488,17 @@ def estatisticas(projeto_id):
                          memorial_respostas=memorial_respostas,
                          relatorio_ia=relatorio_ia,
                          consideracoes_finais_dados=consideracoes_finais_dados,
-                         consideracoes_finais_texto=consideracoes_finais_texto)
+                         consideracoes_finais_texto=consideracoes_finais_texto,
+                         tarefas_ia=tarefas_ia,
+                         relatorio_pdf=relatorio_pdf)
 
 @projeto_bp.route('/<int:projeto_id>/relatorio-pdf')
 @login_required
 @admin_required
 def gerar_relatorio_pdf(projeto_id):
-    """Gera relatório PDF completo e formal do projeto"""
-    from utils.pdf_relatorio import gerar_relatorio_pdf_completo
+    """Baixa o relatório PDF completo e formal do projeto (enfileira a geração se ainda não existir)"""
+    from flask_login import current_user
+    from utils.relatorio_artefatos import responder_relatorio_pdf, solicitar_relatorio
     
     projeto = Projeto.query.get_or_404(projeto_id)
     
@@ -659,19 +508,164 @@ def gerar_relatorio_pdf(projeto_id):
         return redirect(url_for('projeto.estatisticas', projeto_id=projeto.id))
     
     try:
-        # Gerar o PDF completo
-        filename = gerar_relatorio_pdf_completo(projeto)
-        
-        from flask import send_file
-        return send_file(
-            filename,
-            as_attachment=True,
-            download_name=f"relatorio_assessment_{projeto.nome.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-            mimetype='application/pdf'
+        # Servir o PDF já gerado, se nada mudou desde a última geração
+        resposta = responder_relatorio_pdf(
+            projeto,
+            download_name=f"relatorio_assessment_{projeto.nome.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         )
+        if resposta:
+            return resposta
+        
+        solicitar_relatorio(projeto, solicitado_por=current_user.id)
+        flash('O relatório está sendo gerado. O download ficará disponível nesta página assim que estiver pronto.', 'info')
+    except HTTPException:
+        # Respostas HTTP de erro (ex.: 416 para Range inválido) seguem ao cliente
+        raise
     except Exception as e:
+        logging.error(f"Erro ao gerar relatório PDF do projeto {projeto.id}: {e}")
+        db.session.rollback()
         flash(f'Erro ao gerar o relatório PDF: {str(e)}', 'danger')
-        return redirect(url_for('projeto.estatisticas', projeto_id=projeto.id))
+    
+    return redirect(url_for('projeto.estatisticas', projeto_id=projeto.id))
+
+@projeto_bp.route('/<int:projeto_id>/relatorio-pdf/status')
+@login_required
+@admin_required
+def status_relatorio_pdf(projeto_id):
+    """Situação da geração do relatório PDF (consultada pela página de estatísticas)"""
+    from utils.relatorio_artefatos import status_relatorio
+    
+    projeto = Projeto.query.get_or_404(projeto_id)
+    return jsonify(status_relatorio(projeto))
+
+def _ultimo_lote_relatorios():
+    """Última geração de relatórios em lote (exibida na lista de projetos)"""
+    from models.tarefa_background import TarefaBackground
+    
+    tarefa = TarefaBackground.query.filter_by(tipo='relatorios_lote').order_by(TarefaBackground.id.desc()).first()
+    if not tarefa:
+        return None
+    
+    lote = tarefa.to_dict()
+    lote['parametros'] = tarefa.parametros_json
+    lote['resumo'] = json.loads(tarefa.resultado) if tarefa.status == 'concluida' and tarefa.resultado else None
+    return lote
+
+@projeto_bp.route('/relatorios-lote', methods=['POST'])
+@login_required
+@admin_required
+def relatorios_lote():
+    """Enfileira a geração dos relatórios PDF dos projetos filtrados em um único ZIP"""
+    import hashlib
+    from flask_login import current_user
+    from jobs.fila import enfileirar
+    from utils.relatorios_lote import STATUS_LOTE
+    
+    parametros = {
+        'cliente_id': request.form.get('cliente_id', type=int),
+        'status': request.form.get('status', 'finalizados'),
+        'data_inicio': request.form.get('data_inicio') or None,
+        'data_fim': request.form.get('data_fim') or None
+    }
+    
+    try:
+        if parametros['status'] not in STATUS_LOTE:
+            raise ValueError('situação inválida')
+        for campo in ('data_inicio', 'data_fim'):
+            if parametros[campo]:
+                datetime.strptime(parametros[campo], '%Y-%m-%d')
+    except ValueError:
+        flash('Filtros inválidos para a geração em lote.', 'danger')
+        return redirect(url_for('projeto.listar'))
+    
+    # Lotes com os mesmos filtros não são enfileirados em duplicidade
+    chave = 'relatorios_lote:' + hashlib.sha1(json.dumps(parametros, sort_keys=True).encode()).hexdigest()[:16]
+    try:
+        tarefa, criada = enfileirar('relatorios_lote', parametros=parametros, solicitado_por=current_user.id, chave=chave)
+        if criada:
+            flash('Geração dos relatórios em lote enfileirada. O ZIP ficará disponível nesta página.', 'info')
+        else:
+            flash('Já existe uma geração em lote com estes filtros em processamento.', 'info')
+    except Exception as e:
+        logging.error(f"Erro ao enfileirar relatórios em lote: {e}")
+        db.session.rollback()
+        flash('Erro ao enfileirar a geração em lote. Tente novamente.', 'danger')
+    
+    return redirect(url_for('projeto.listar'))
+
+@projeto_bp.route('/relatorios-lote/<int:tarefa_id>/download')
+@login_required
+@admin_required
+def baixar_relatorios_lote(tarefa_id):
+    """Baixa o ZIP gerado por uma geração de relatórios em lote"""
+    import os
+    from flask import send_file
+    from models.tarefa_background import TarefaBackground
+    from utils.relatorios_lote import caminho_lote
+    
+    tarefa = TarefaBackground.query.filter_by(id=tarefa_id, tipo='relatorios_lote').first_or_404()
+    caminho = caminho_lote(tarefa.id)
+    if tarefa.status != 'concluida' or not os.path.exists(caminho):
+        flash('O arquivo deste lote não está mais disponível. Gere os relatórios novamente.', 'warning')
+        return redirect(url_for('projeto.listar'))
+    
+    return send_file(
+        caminho,
+        as_attachment=True,
+        download_name=f"relatorios_{tarefa.data_criacao.strftime('%Y%m%d_%H%M%S')}.zip",
+        mimetype='application/zip',
+        conditional=True
+    )
+
+def _opcoes_exportacao():
+    """Tipos (com versões) e formatos oferecidos em "Exportar respostas" na lista de projetos"""
+    from sqlalchemy.orm import selectinload
+    from models.assessment_version import AssessmentTipo
+    from utils.exportacao_respostas import FORMATOS_EXPORTACAO, SITUACOES_EXPORTACAO, parquet_disponivel
+    
+    formatos = {chave: formato['nome'] for chave, formato in FORMATOS_EXPORTACAO.items()
+                if chave != 'parquet' or parquet_disponivel()}
+    return {
+        'tipos': AssessmentTipo.query.options(selectinload(AssessmentTipo.versoes)).order_by(AssessmentTipo.nome).all(),
+        'formatos': formatos,
+        'situacoes': SITUACOES_EXPORTACAO
+    }
+
+@projeto_bp.route('/exportar-respostas')
+@login_required
+@admin_required
+def exportar_respostas():
+    """Exporta as respostas filtradas (CSV, JSON Lines ou Parquet), gerando o arquivo à medida que é enviado"""
+    from flask import Response, stream_with_context
+    from utils.exportacao_respostas import ExportacaoRespostas
+    
+    try:
+        datas = {}
+        for campo in ('data_inicio', 'data_fim'):
+            valor = request.args.get(campo)
+            datas[campo] = datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+        
+        exportacao = ExportacaoRespostas(
+            request.args.get('formato', 'csv'),
+            tipo_id=request.args.get('tipo_id', type=int),
+            versao_id=request.args.get('versao_id', type=int),
+            cliente_id=request.args.get('cliente_id', type=int),
+            situacao=request.args.get('situacao', 'finalizados'),
+            **datas
+        )
+    except ValueError as e:
+        flash(f'Filtros inválidos para a exportação: {e}', 'danger')
+        return redirect(url_for('projeto.listar'))
+    
+    logging.info(f"Exportação de respostas ({exportacao.formato}) solicitada: {dict(request.args)}")
+    return Response(
+        stream_with_context(exportacao.blocos()),
+        mimetype=exportacao.mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename={exportacao.nome_arquivo()}',
+            'X-Accel-Buffering': 'no'
+        }
+    )
 
 @projeto_bp.route('/<int:projeto_id>/editar-avaliador', methods=['GET', 'POST'])
 @login_required
@@ -981,6 +975,10 @@ def editar(projeto_id):
                 )
                 db.session.add(projeto_assessment)
             
+            # Perguntas do projeto mudaram: recalcular progresso na próxima gravação
+            from models.projeto import invalidar_progresso_projetos
+            invalidar_progresso_projetos(projeto_id=projeto.id)
+            
             db.session.commit()
             flash(f'Projeto "{projeto.nome}" atualizado com sucesso!', 'success')
             return redirect(url_for('projeto.detalhar', projeto_id=projeto.id))
@@ -1043,6 +1041,10 @@ def excluir(projeto_id):
         db.session.delete(projeto)
         db.session.commit()
         
+        # Remover os relatórios PDF armazenados
+        from utils.relatorio_artefatos import remover_relatorios
+        remover_relatorios(projeto_id)
+        
         flash(f'Projeto "{nome_projeto}" excluído permanentemente!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -1051,11 +1053,27 @@ def excluir(projeto_id):
     
     return redirect(url_for('projeto.listar'))
 
+def _enfileirar_tarefa_ia(projeto, tipo, descricao):
+    """Enfileira uma geração de IA para o worker e informa o usuário"""
+    from flask_login import current_user
+    from jobs.fila import enfileirar
+    
+    try:
+        tarefa, criada = enfileirar(tipo, projeto_id=projeto.id, solicitado_por=current_user.id)
+        if criada:
+            flash(f'{descricao} enfileirada. O texto aparecerá nesta página assim que for gerado.', 'info')
+        else:
+            flash(f'{descricao} já está em processamento para este projeto.', 'info')
+    except Exception as e:
+        logging.error(f"Erro ao enfileirar tarefa {tipo} do projeto {projeto.id}: {e}")
+        db.session.rollback()
+        flash(f'Erro ao enfileirar {descricao.lower()}. Tente novamente.', 'danger')
+
 @projeto_bp.route('/<int:projeto_id>/gerar-introducao-ia', methods=['POST'])
 @login_required
 @admin_required
 def gerar_introducao_ia(projeto_id):
-    """Gera introdução do relatório usando ChatGPT"""
+    """Enfileira a geração da introdução do relatório usando ChatGPT"""
     projeto = Projeto.query.get_or_404(projeto_id)
     
     # Verificar se projeto está totalmente finalizado
@@ -1063,23 +1081,7 @@ def gerar_introducao_ia(projeto_id):
         flash('A introdução IA só pode ser gerada quando todos os assessments estão finalizados.', 'warning')
         return redirect(url_for('projeto.estatisticas', projeto_id=projeto_id))
     
-    try:
-        from utils.openai_utils import gerar_introducao_ia
-        
-        # Gerar introdução
-        resultado = gerar_introducao_ia(projeto)
-        
-        if resultado.get('erro'):
-            flash(f'Erro ao gerar introdução: {resultado["erro"]}', 'danger')
-        else:
-            # Salvar no banco
-            projeto.introducao_ia = resultado['introducao']
-            db.session.commit()
-            flash('Introdução inteligente gerada com sucesso!', 'success')
-        
-    except Exception as e:
-        logging.error(f"Erro ao gerar introdução IA: {e}")
-        flash(f'Erro ao gerar introdução: {str(e)}', 'danger')
+    _enfileirar_tarefa_ia(projeto, 'introducao_ia', 'Geração da introdução')
     
     return redirect(url_for('projeto.estatisticas', projeto_id=projeto_id))
 
@@ -1087,10 +1089,7 @@ def gerar_introducao_ia(projeto_id):
 @login_required
 @admin_required
 def gerar_analise_dominios_ia(projeto_id):
-    """Gera análise dos domínios do projeto usando IA"""
-    from utils.ia_batch_processor import gerar_analise_incremental
-    import json
-    
+    """Enfileira a análise dos domínios do projeto usando IA"""
     projeto = Projeto.query.get_or_404(projeto_id)
     
     logging.info(f"Requisição para gerar análise IA do projeto {projeto_id}")
@@ -1101,25 +1100,7 @@ def gerar_analise_dominios_ia(projeto_id):
         flash('A análise dos domínios só pode ser gerada quando todos os assessments estão finalizados.', 'warning')
         return redirect(url_for('projeto.estatisticas', projeto_id=projeto_id))
     
-    try:
-        # Gerar análise dos domínios com processamento incremental
-        logging.info(f"Iniciando análise incremental IA para projeto {projeto_id}")
-        resultado = gerar_analise_incremental(projeto)
-        
-        if resultado.get('erro'):
-            logging.error(f"Erro na análise IA: {resultado['erro']}")
-            flash(f'{resultado["erro"]}', 'warning')
-        else:
-            # As análises já foram salvas incrementalmente durante o processamento
-            logging.info(f"Análise concluída: {resultado['dominios_processados']} domínios processados")
-            if resultado['dominios_processados'] == resultado['total_dominios']:
-                flash(f'Análise completa de {resultado["dominios_processados"]} domínios gerada com sucesso!', 'success')
-            else:
-                flash(f'Análise parcial: {resultado["dominios_processados"]} de {resultado["total_dominios"]} domínios processados. Alguns domínios podem ter falhado por problemas de conectividade.', 'info')
-        
-    except Exception as e:
-        logging.error(f"Erro crítico ao gerar análise dos domínios IA: {e}", exc_info=True)
-        flash('Erro de conectividade ou timeout. Tente novamente em alguns segundos.', 'warning')
+    _enfileirar_tarefa_ia(projeto, 'analise_dominios', 'Análise dos domínios')
     
     return redirect(url_for('projeto.estatisticas', projeto_id=projeto_id))
 
@@ -1127,10 +1108,7 @@ def gerar_analise_dominios_ia(projeto_id):
 @login_required
 @admin_required  
 def gerar_consideracoes_finais(projeto_id):
-    """Gera considerações finais do projeto usando IA"""
-    from utils.openai_utils import gerar_consideracoes_finais_projeto
-    import json
-    
+    """Enfileira a geração das considerações finais do projeto usando IA"""
     projeto = Projeto.query.get_or_404(projeto_id)
     
     logging.info(f"Requisição para gerar considerações finais do projeto {projeto_id}")
@@ -1141,46 +1119,7 @@ def gerar_consideracoes_finais(projeto_id):
         flash('As considerações finais só podem ser geradas quando todos os assessments estão finalizados.', 'warning')
         return redirect(url_for('projeto.estatisticas', projeto_id=projeto_id))
     
-    try:
-        # Gerar considerações finais
-        logging.info(f"Iniciando geração de considerações finais para projeto {projeto_id}")
-        resultado = gerar_consideracoes_finais_projeto(projeto)
-        
-        if resultado.get('erro'):
-            logging.error(f"Erro nas considerações finais: {resultado['erro']}")
-            flash(f'{resultado["erro"]}', 'warning')
-        else:
-            # Salvar considerações no projeto como JSON
-            logging.info("Salvando considerações finais no projeto")
-            logging.debug(f"Resultado recebido: {type(resultado)}, keys: {resultado.keys() if isinstance(resultado, dict) else 'N/A'}")
-            
-            consideracoes_data = {
-                'consideracoes': resultado['consideracoes'],
-                'assistant_name': resultado['assistant_name'],
-                'gerado_em': resultado['gerado_em'],
-                'dados_utilizados': resultado['dados_utilizados']
-            }
-            
-            logging.debug(f"Dados a serem salvos: {consideracoes_data}")
-            logging.debug(f"Projeto ID: {projeto.id}, campo antes: {projeto.consideracoes_finais_ia}")
-            
-            projeto.consideracoes_finais_ia = json.dumps(consideracoes_data, ensure_ascii=False)
-            
-            logging.debug(f"Campo após atribuição: {projeto.consideracoes_finais_ia}")
-            
-            try:
-                db.session.commit()
-                logging.info("Commit realizado com sucesso")
-                logging.debug(f"Verificação após commit: {projeto.consideracoes_finais_ia}")
-                flash('Considerações finais geradas com sucesso!', 'success')
-            except Exception as commit_error:
-                logging.error(f"Erro no commit: {commit_error}")
-                db.session.rollback()
-                flash('Erro ao salvar considerações finais.', 'error')
-        
-    except Exception as e:
-        logging.error(f"Erro crítico ao gerar considerações finais: {e}", exc_info=True)
-        flash('Erro interno ao processar considerações finais. Tente novamente em alguns minutos.', 'error')
+    _enfileirar_tarefa_ia(projeto, 'consideracoes_finais', 'Geração das considerações finais')
     
     return redirect(url_for('projeto.estatisticas', projeto_id=projeto_id))
 
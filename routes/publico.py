@@ -1,8 +1,9 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, abort
 from models.assessment_version import AssessmentTipo
 from models.dominio import Dominio
 from models.pergunta import Pergunta
 from models.assessment_publico import AssessmentPublico, RespostaPublica
+from models.questionario import obter_questionario
 from forms.publico_forms import RespostaPublicaForm, DadosRespondentePubForm
 from app import db
 from datetime import datetime
@@ -10,6 +11,16 @@ import logging
 
 publico_bp = Blueprint('publico', __name__, url_prefix='/public')
 
+def _respostas_publicas(assessment_publico_id, perguntas):
+    """Respostas já gravadas para as perguntas do domínio, por pergunta_id (uma consulta)"""
+    return {
+        resposta.pergunta_id: resposta
+        for resposta in RespostaPublica.query.filter(
+            RespostaPublica.assessment_publico_id == assessment_publico_id,
+            RespostaPublica.pergunta_id.in_([pergunta.id for pergunta in perguntas])
+        )
+    }
+
 @publico_bp.route('/<int:assessment_id>')
 def iniciar_assessment(assessment_id):
     """Página inicial do assessment público"""
@@ -27,19 +38,8 @@ def iniciar_assessment(assessment_id):
         flash('Este assessment não possui versão publicada.', 'warning')
         return redirect(url_for('auth.login'))
     
-    # Obter domínios ativos da versão publicada
-    from models.assessment_version import AssessmentDominio
-    dominios = AssessmentDominio.query.filter_by(
-        versao_id=versao_publicada.id,
-        ativo=True
-    ).order_by(AssessmentDominio.ordem).all()
-    
-    # Filtrar apenas domínios que têm perguntas light
-    dominios_com_light = []
-    for dominio in dominios:
-        perguntas_light = [p for p in dominio.perguntas if p.ativo and p.light]
-        if perguntas_light:
-            dominios_com_light.append(dominio)
+    # Domínios ativos da versão publicada que têm perguntas light (questionário em cache)
+    dominios_com_light = versao_publicada.get_questionario().dominios_light
     
     if not dominios_com_light:
         flash('Este assessment não possui perguntas disponíveis.', 'warning')
@@ -65,6 +65,7 @@ def iniciar_assessment(assessment_id):
         session[session_key] = {
             'assessment_publico_id': assessment_publico.id,
             'dominio_atual': 0,
+            'versao_id': versao_publicada.id,
             'dominios_ids': [d.id for d in dominios_com_light]
         }
     
@@ -96,10 +97,14 @@ def responder_dominio(assessment_id, dominio_index):
         assessment_publico_id = session_data['assessment_publico_id']
         assessment_publico = AssessmentPublico.query.get_or_404(assessment_publico_id)
         
-        # Marcar data de conclusão
+        # Marcar data de conclusão e iniciar a geração das recomendações em background
         if not assessment_publico.data_conclusao:
             assessment_publico.data_conclusao = datetime.utcnow()
             db.session.commit()
+            
+            from utils.publico_utils import agendar_recomendacoes, registrar_estatisticas_grupo
+            registrar_estatisticas_grupo(assessment_publico)
+            agendar_recomendacoes(assessment_publico)
         
         # Redirecionar para página de loading com geração de IA
         return redirect(url_for('publico.aguardando_resultado', 
@@ -107,15 +112,19 @@ def responder_dominio(assessment_id, dominio_index):
                               token=assessment_publico.token))
     
     dominio_id = dominios_ids[dominio_index]
-    from models.assessment_version import AssessmentDominio
-    dominio = AssessmentDominio.query.get_or_404(dominio_id)
+    versao_id = session_data.get('versao_id')
+    if not versao_id:
+        # Sessões iniciadas antes de a versão ser guardada na sessão
+        from models.assessment_version import AssessmentDominio
+        versao_id = db.session.query(AssessmentDominio.versao_id).filter_by(id=dominio_id).scalar()
+        if not versao_id:
+            abort(404)
+        session[session_key]['versao_id'] = versao_id
+        session.modified = True
     
-    # Obter perguntas light do domínio (usando dominio_versao_id)
-    perguntas = Pergunta.query.filter_by(
-        dominio_versao_id=dominio_id,
-        ativo=True,
-        light=True
-    ).order_by(Pergunta.ordem).all()
+    # Domínio e perguntas light do questionário compilado da versão (cache)
+    dominio = obter_questionario(versao_id).dominio(dominio_id)
+    perguntas = dominio.perguntas_light if dominio else ()
     
     if not perguntas:
         # Se não há perguntas, pular para o próximo domínio
@@ -128,6 +137,7 @@ def responder_dominio(assessment_id, dominio_index):
     if form.validate_on_submit():
         # Salvar respostas
         assessment_publico_id = session_data['assessment_publico_id']
+        respostas_anteriores = _respostas_publicas(assessment_publico_id, perguntas)
         
         for pergunta in perguntas:
             campo_nome = f'pergunta_{pergunta.id}'
@@ -138,10 +148,7 @@ def responder_dominio(assessment_id, dominio_index):
                 valor_int = int(valor)
                 
                 # Verificar se já existe resposta
-                resposta_existente = RespostaPublica.query.filter_by(
-                    assessment_publico_id=assessment_publico_id,
-                    pergunta_id=pergunta.id
-                ).first()
+                resposta_existente = respostas_anteriores.get(pergunta.id)
                 
                 if resposta_existente:
                     resposta_existente.valor = valor_int
@@ -166,15 +173,10 @@ def responder_dominio(assessment_id, dominio_index):
     
     # Obter respostas existentes se houver
     assessment_publico_id = session_data['assessment_publico_id']
-    respostas_existentes = {}
-    
-    for pergunta in perguntas:
-        resposta = RespostaPublica.query.filter_by(
-            assessment_publico_id=assessment_publico_id,
-            pergunta_id=pergunta.id
-        ).first()
-        if resposta:
-            respostas_existentes[pergunta.id] = resposta.valor
+    respostas_existentes = {
+        pergunta_id: resposta.valor
+        for pergunta_id, resposta in _respostas_publicas(assessment_publico_id, perguntas).items()
+    }
     
     # Calcular progresso
     total_dominios = len(dominios_ids)
@@ -219,12 +221,18 @@ def dados_respondente(assessment_id):
         assessment_publico.telefone_respondente = form.telefone.data
         assessment_publico.cargo_respondente = form.cargo.data
         assessment_publico.empresa_respondente = form.empresa.data
+        nova_conclusao = assessment_publico.data_conclusao is None
         assessment_publico.data_conclusao = datetime.utcnow()
         
         db.session.commit()
         
         logging.info(f"Dados do respondente salvos para assessment público {assessment_publico.id}")
         
+        # Atualizar as estatísticas do grupo e iniciar a geração das recomendações em background
+        from utils.publico_utils import agendar_recomendacoes, registrar_estatisticas_grupo
+        registrar_estatisticas_grupo(assessment_publico, nova_conclusao)
+        agendar_recomendacoes(assessment_publico)
+        
         # Criar lead automaticamente a partir do assessment público
         from models.lead import Lead
         
@@ -303,6 +311,19 @@ def aguardando_resultado(assessment_id, token):
                          token=token,
                          tipo_assessment=tipo_assessment)
 
+@publico_bp.route('/<int:assessment_id>/status-resultado/<token>')
+def status_resultado(assessment_id, token):
+    """Informa se as recomendações do resultado já foram geradas (consultado pela página de loading)"""
+    assessment_publico = AssessmentPublico.query.filter_by(
+        tipo_assessment_id=assessment_id,
+        token=token
+    ).first_or_404()
+    
+    return jsonify({
+        'pronto': assessment_publico.recomendacoes_prontas(),
+        'status': assessment_publico.status_recomendacoes
+    })
+
 @publico_bp.route('/<int:assessment_id>/resultado/<token>')
 def resultado(assessment_id, token):
     """Exibir resultado do assessment com recomendações IA"""
@@ -317,39 +338,18 @@ def resultado(assessment_id, token):
     pontuacao_geral = assessment_publico.calcular_pontuacao_geral()
     
     # Obter domínios respondidos com pontuações
-    dominios_dados = []
-    for dominio in assessment_publico.get_dominios_respondidos():
-        pontuacao_dominio = assessment_publico.calcular_pontuacao_dominio(dominio.id)
-        
-        dominios_dados.append({
-            'dominio': dominio,
-            'pontuacao': pontuacao_dominio,
-            'recomendacao': None  # Será preenchido pela IA
-        })
-    
-    # Gerar recomendações com OpenAI
-    from utils.publico_utils import gerar_recomendacoes_ia
+    from utils.publico_utils import montar_dominios_dados, preencher_recomendacoes, recomendacao_padrao
+    dominios_dados = montar_dominios_dados(assessment_publico)
     
+    # Recomendações armazenadas (geradas em background após a conclusão)
     try:
-        logging.info(f"Gerando recomendações IA para assessment público {assessment_publico.id}")
-        recomendacoes = gerar_recomendacoes_ia(assessment_publico, dominios_dados)
-        
-        # Atualizar recomendações nos dados dos domínios
-        for i, dominio_data in enumerate(dominios_dados):
-            if i < len(recomendacoes):
-                dominio_data['recomendacao'] = recomendacoes[i]
-                logging.info(f"Recomendação atribuída ao domínio {dominio_data['dominio'].nome}")
+        preencher_recomendacoes(assessment_publico, dominios_dados)
     except Exception as e:
-        logging.error(f"Erro ao gerar recomendações IA: {e}", exc_info=True)
+        logging.error(f"Erro ao obter recomendações IA: {e}", exc_info=True)
+        db.session.rollback()
         # Se falhar, adicionar recomendações padrão
         for dominio_data in dominios_dados:
-            pontuacao = dominio_data['pontuacao']
-            dominio_nome = dominio_data['dominio'].nome
-            dominio_data['recomendacao'] = (
-                f"Com base na pontuação de {pontuacao:.0f}%, recomenda-se revisar e fortalecer "
-                f"as práticas relacionadas a {dominio_nome}, priorizando a implementação "
-                f"de processos formais e a melhoria contínua dos controles existentes."
-            )
+            dominio_data['recomendacao'] = recomendacao_padrao(dominio_data['dominio'].nome, dominio_data['pontuacao'])
     
     # Limpar sessão
     session_key = f'assessment_publico_{assessment_id}'
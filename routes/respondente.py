@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash
+from werkzeug.exceptions import HTTPException
 from datetime import datetime
+import logging
 from models.respondente import Respondente
 from models.cliente import Cliente
 from models.tipo_assessment import TipoAssessment
@@ -155,100 +157,34 @@ def visualizar_estatisticas(projeto_id):
         flash('As estatísticas deste projeto ainda não foram liberadas.', 'warning')
         return redirect(url_for('respondente.dashboard'))
     
-    # Importar modelos necessários
-    from models.resposta import Resposta
-    from models.pergunta import Pergunta
-    from models.dominio import Dominio
-    from models.assessment_version import AssessmentDominio, AssessmentVersao, AssessmentTipo
-    from models.tipo_assessment import TipoAssessment
-    from datetime import datetime
-    import pytz
-    from utils.timezone_utils import format_datetime_local
-    
-    # Dados do projeto já foram carregados
-    # Agora vamos buscar todos os dados estatísticos como na página admin
-    
     # Buscar respondentes do projeto
     respondentes_projeto = [pr.respondente for pr in projeto.respondentes if pr.ativo]
     
-    # Calcular estatísticas por assessment
-    estatisticas_assessments = {}
+    # Calcular estatísticas por assessment (resposta mais recente de cada pergunta)
+    from utils.estatisticas_utils import calcular_estatisticas_projeto
+    estatisticas = calcular_estatisticas_projeto(projeto)
     
-    for projeto_assessment in projeto.assessments:
-        if not projeto_assessment.finalizado:
-            continue
-            
-        # Determinar tipo e versão
-        tipo = None
-        versao = None
-        
-        if projeto_assessment.versao_assessment_id:
-            versao = projeto_assessment.versao_assessment
-            tipo = versao.tipo
-            dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-        elif projeto_assessment.tipo_assessment_id:
-            tipo = projeto_assessment.tipo_assessment
-            dominios_query = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True)
-        
-        if not tipo:
-            continue
-        
-        # Estatísticas por domínio
-        dominios_stats = []
-        todas_respostas = []
-        
-        for dominio in dominios_query.order_by('ordem'):
-            # Buscar perguntas do domínio
-            if versao:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_versao_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            else:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            
-            # Buscar respostas do domínio para este projeto
-            respostas_dominio = []
-            for pergunta in perguntas_dominio:
-                resposta = Resposta.query.filter_by(
-                    projeto_id=projeto.id,
-                    pergunta_id=pergunta.id
-                ).order_by(Resposta.data_resposta.desc()).first()
-                
-                if resposta:
-                    respostas_dominio.append(resposta.nota)
-                    todas_respostas.append(resposta.nota)
-            
-            # Calcular média do domínio
-            if respostas_dominio:
-                media_dominio = sum(respostas_dominio) / len(respostas_dominio)
-            else:
-                media_dominio = 0
-            
-            dominios_stats.append({
-                'dominio': dominio,
-                'media': media_dominio,
-                'total_perguntas': len(perguntas_dominio),
-                'respostas_dadas': len(respostas_dominio),
-                'respostas': respostas_dominio
-            })
-        
-        # Score geral do assessment
-        score_geral = sum(todas_respostas) / len(todas_respostas) if todas_respostas else 0
+    estatisticas_assessments = {}
+    for assessment in estatisticas['assessments']:
+        dominios_stats = [{
+            'dominio': dominio_stats['dominio'],
+            'media': dominio_stats['media'],
+            'total_perguntas': dominio_stats['total_perguntas'],
+            'respostas_dadas': dominio_stats['respostas_dadas'],
+            'respostas': dominio_stats['notas']
+        } for dominio_stats in assessment['dominios']]
         
-        estatisticas_assessments[tipo.id] = {
-            'tipo': tipo,
-            'versao': versao,
+        estatisticas_assessments[assessment['tipo'].id] = {
+            'tipo': assessment['tipo'],
+            'versao': assessment['versao'],
             'dominios': dominios_stats,
-            'score_geral': score_geral,
-            'total_respostas': len(todas_respostas)
+            'score_geral': assessment['media_final'],
+            'total_respostas': assessment['respostas_finais']
         }
     
     # Processar considerações finais se existirem
     import json
+    from utils.relatorio_artefatos import status_relatorio
     consideracoes_finais_dados = None
     consideracoes_finais_texto = None
     
@@ -267,7 +203,8 @@ def visualizar_estatisticas(projeto_id):
                          respondentes_projeto=respondentes_projeto,
                          estatisticas_assessments=estatisticas_assessments,
                          consideracoes_finais_dados=consideracoes_finais_dados,
-                         consideracoes_finais_texto=consideracoes_finais_texto)
+                         consideracoes_finais_texto=consideracoes_finais_texto,
+                         relatorio_pdf=status_relatorio(projeto))
 
 @respondente_bp.route('/projeto/<int:projeto_id>/relatorio-pdf')
 @login_required
@@ -297,22 +234,47 @@ def gerar_relatorio_pdf(projeto_id):
         return redirect(url_for('respondente.dashboard'))
     
     try:
-        from utils.pdf_relatorio import gerar_relatorio_pdf_completo
+        from utils.relatorio_artefatos import responder_relatorio_pdf, solicitar_relatorio
         from datetime import datetime
         
-        # Gerar o PDF completo
-        filename = gerar_relatorio_pdf_completo(projeto)
-        
-        from flask import send_file
-        return send_file(
-            filename,
-            as_attachment=True,
-            download_name=f"relatorio_assessment_{projeto.nome.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-            mimetype='application/pdf'
+        # Servir o PDF já gerado, se nada mudou desde a última geração
+        resposta = responder_relatorio_pdf(
+            projeto,
+            download_name=f"relatorio_assessment_{projeto.nome.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         )
+        if resposta:
+            return resposta
+        
+        solicitar_relatorio(projeto)
+        flash('O relatório está sendo gerado. O download ficará disponível nesta página assim que estiver pronto.', 'info')
+    except HTTPException:
+        # Respostas HTTP de erro (ex.: 416 para Range inválido) seguem ao cliente
+        raise
     except Exception as e:
+        db.session.rollback()
         flash(f'Erro ao gerar o relatório PDF: {str(e)}', 'danger')
-        return redirect(url_for('respondente.visualizar_estatisticas', projeto_id=projeto.id))
+    
+    return redirect(url_for('respondente.visualizar_estatisticas', projeto_id=projeto.id))
+
+@respondente_bp.route('/projeto/<int:projeto_id>/relatorio-pdf/status')
+@login_required
+@respondente_required
+def status_relatorio_pdf(projeto_id):
+    """Situação da geração do relatório PDF (consultada pela página de estatísticas)"""
+    from models.projeto import ProjetoRespondente, Projeto
+    from utils.relatorio_artefatos import status_relatorio
+    
+    projeto_respondente = ProjetoRespondente.query.filter_by(
+        projeto_id=projeto_id,
+        respondente_id=current_user.id,
+        ativo=True
+    ).first()
+    projeto = Projeto.query.get_or_404(projeto_id)
+    
+    if not projeto_respondente or not projeto.liberado_cliente:
+        return jsonify({'error': 'Acesso negado'}), 403
+    
+    return jsonify(status_relatorio(projeto))
 
 @respondente_bp.route('/assessment/<int:projeto_id>/<int:tipo_assessment_id>')
 @login_required
@@ -372,8 +334,8 @@ def assessment(projeto_id, tipo_assessment_id):
     
     # Obter domínios baseado no sistema usado
     if projeto_assessment.versao_assessment_id:
-        # Novo sistema de versionamento - domínios da versão
-        dominios = projeto_assessment.versao_assessment.get_dominios_ativos()
+        # Novo sistema de versionamento - questionário compilado da versão (cache)
+        dominios = projeto_assessment.versao_assessment.get_questionario().dominios
     else:
         # Sistema antigo - domínios do tipo
         dominios = tipo_assessment.get_dominios_ativos()
@@ -477,70 +439,121 @@ def finalizar_assessment(projeto_id, tipo_assessment_id):
     except Exception as e:
         return jsonify({'success': False, 'message': 'Erro ao finalizar assessment'}), 500
 
-@respondente_bp.route('/assessment/salvar', methods=['POST'])
-@login_required
-def salvar_resposta():
-    """Salva uma resposta via AJAX"""
-    if not isinstance(current_user, Respondente):
-        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+# Máximo de alterações aceitas por chamada de /assessment/salvar-lote
+RESPOSTAS_LOTE_MAX = 500
+
+def _salvar_respostas(projeto_id, itens):
+    """
+    Aplica as alterações de resposta do respondente atual em uma única transação
     
-    try:
-        data = request.get_json()
-        pergunta_id = data.get('pergunta_id')
-        projeto_id = data.get('projeto_id')
-        nota = data.get('nota')
-        comentario = data.get('comentario', '')
-        
-        # Validar pergunta
-        pergunta = Pergunta.query.get(pergunta_id)
-        if not pergunta:
-            return jsonify({'success': False, 'message': 'Pergunta não encontrada'}), 404
-        
-        # Verificar acesso ao projeto
-        from models.projeto import ProjetoRespondente, ProjetoAssessment
-        projeto_respondente = ProjetoRespondente.query.filter_by(
-            projeto_id=projeto_id,
-            respondente_id=current_user.id,
-            ativo=True
-        ).first()
+    O acesso ao projeto é verificado uma vez e perguntas, domínios, assessments
+    do projeto e respostas existentes são carregados em uma consulta cada.
+    Alterações repetidas para a mesma pergunta são reduzidas à última.
+    
+    Args:
+        projeto_id: ID do projeto
+        itens: Lista de dicts {'pergunta_id', 'nota', 'comentario'}; nota None remove a resposta
         
-        if not projeto_respondente:
-            return jsonify({'success': False, 'message': 'Acesso negado ao projeto'}), 403
+    Returns:
+        (resultados, erro) - um resultado por pergunta ({'pergunta_id', 'success',
+        'message', 'action', 'status'}) ou erro (mensagem, status HTTP) se o acesso for negado
+    """
+    from models.projeto import ProjetoRespondente, ProjetoAssessment, atualizar_contadores_respostas
+    from models.assessment_version import AssessmentDominio
+    from models.auditoria import registrar_resposta
+    
+    projeto_respondente = ProjetoRespondente.query.filter_by(
+        projeto_id=projeto_id,
+        respondente_id=current_user.id,
+        ativo=True
+    ).first()
+    
+    if not projeto_respondente:
+        return None, ('Acesso negado ao projeto', 403)
+    
+    # Última alteração de cada pergunta, na ordem em que chegaram
+    alteracoes = {}
+    resultados = []
+    for item in itens:
+        try:
+            pergunta_id = int(item.get('pergunta_id'))
+        except (TypeError, ValueError):
+            resultados.append({'pergunta_id': item.get('pergunta_id'), 'success': False,
+                               'message': 'Pergunta inválida', 'status': 400})
+            continue
+        alteracoes.pop(pergunta_id, None)
+        alteracoes[pergunta_id] = item
+    
+    perguntas = {pergunta.id: pergunta for pergunta in Pergunta.query.filter(Pergunta.id.in_(alteracoes))}
+    dominios_ids = {pergunta.dominio_versao_id for pergunta in perguntas.values() if pergunta.dominio_versao_id}
+    versao_por_dominio = dict(db.session.query(AssessmentDominio.id, AssessmentDominio.versao_id).filter(
+        AssessmentDominio.id.in_(dominios_ids)
+    )) if dominios_ids else {}
+    assessments_projeto = ProjetoAssessment.query.filter_by(projeto_id=projeto_id).order_by(ProjetoAssessment.id).all()
+    assessment_por_versao = {pa.versao_assessment_id: pa for pa in assessments_projeto}
+    
+    # Resposta existente para a pergunta (qualquer respondente do projeto)
+    respostas = {}
+    for resposta in Resposta.query.filter(
+        Resposta.projeto_id == projeto_id,
+        Resposta.pergunta_id.in_(alteracoes)
+    ).order_by(Resposta.id):
+        respostas.setdefault(resposta.pergunta_id, resposta)
+    
+    admin_user = None
+    contadores = []
+    auditar = []
+    for pergunta_id, item in alteracoes.items():
+        nota = item.get('nota')
+        comentario = item.get('comentario', '')
         
-        # Verificar se o assessment ainda pode ser editado
-        projeto_assessment = ProjetoAssessment.query.filter_by(
-            projeto_id=projeto_id
-        ).first()
+        pergunta = perguntas.get(pergunta_id)
+        versao_id = versao_por_dominio.get(pergunta.dominio_versao_id) if pergunta else None
+        if not pergunta or (versao_id is not None and versao_id not in assessment_por_versao):
+            resultados.append({'pergunta_id': pergunta_id, 'success': False,
+                               'message': 'Pergunta não encontrada', 'status': 404})
+            continue
         
+        # Verificar se o assessment da pergunta ainda pode ser editado
+        projeto_assessment = assessment_por_versao.get(versao_id) or (assessments_projeto[0] if assessments_projeto else None)
         if projeto_assessment and not projeto_assessment.pode_editar():
-            return jsonify({'success': False, 'message': 'Este assessment foi finalizado e não pode ser editado'}), 403
+            resultados.append({'pergunta_id': pergunta_id, 'success': False, 'status': 403,
+                               'message': 'Este assessment foi finalizado e não pode ser editado'})
+            continue
         
-        # Buscar resposta existente para a pergunta (qualquer respondente do projeto)
-        resposta = Resposta.query.filter_by(
-            pergunta_id=pergunta_id,
-            projeto_id=projeto_id  # Qualquer resposta do projeto para esta pergunta
-        ).first()
+        if nota is not None and (isinstance(nota, bool) or not isinstance(nota, int) or not 0 <= nota <= 5):
+            resultados.append({'pergunta_id': pergunta_id, 'success': False,
+                               'message': 'Nota deve ser entre 0 e 5', 'status': 400})
+            continue
+        
+        resposta = respostas.get(pergunta_id)
         
         # Se nota for None, remover resposta (funcionalidade de "desresponder")
         if nota is None:
             if resposta:
+                contadores.append((resposta.respondente_id, pergunta, -1))
                 db.session.delete(resposta)
-                db.session.commit()
-                return jsonify({'success': True, 'message': 'Resposta removida', 'action': 'removed'})
+                resultados.append({'pergunta_id': pergunta_id, 'success': True,
+                                   'message': 'Resposta removida', 'action': 'removed', 'status': 200})
             else:
-                return jsonify({'success': True, 'message': 'Nenhuma resposta para remover'})
+                resultados.append({'pergunta_id': pergunta_id, 'success': True,
+                                   'message': 'Nenhuma resposta para remover', 'status': 200})
+            continue
         
         # Atualizar ou criar resposta
+        valor_anterior = resposta.nota if resposta else None
         if resposta:
             resposta.nota = nota
             resposta.comentario = comentario
             resposta.data_atualizacao = datetime.utcnow()
         else:
             # Buscar um usuário admin padrão para compatibilidade
-            from models.usuario import Usuario
-            admin_user = Usuario.query.first()
-            if not admin_user:
-                return jsonify({'success': False, 'message': 'Nenhum usuário admin encontrado'}), 500
+            if admin_user is None:
+                from models.usuario import Usuario
+                admin_user = Usuario.query.first()
+                if not admin_user:
+                    db.session.rollback()
+                    return None, ('Nenhum usuário admin encontrado', 500)
             
             resposta = Resposta(
                 usuario_id=admin_user.id,  # Para compatibilidade com o banco
@@ -551,36 +564,97 @@ def salvar_resposta():
                 comentario=comentario
             )
             db.session.add(resposta)
+            respostas[pergunta_id] = resposta
+            contadores.append((current_user.id, pergunta, 1))
         
-        db.session.commit()
-        
-        # Registrar resposta na auditoria
-        from models.auditoria import registrar_resposta
+        auditar.append((pergunta.id, pergunta.texto, valor_anterior, nota))
+        resultados.append({'pergunta_id': pergunta_id, 'success': True,
+                           'message': 'Resposta salva com sucesso', 'action': 'saved', 'status': 200})
+    
+    # Lido antes do commit, que expira os objetos da sessão
+    projeto_nome = projeto_respondente.projeto.nome
+    
+    atualizar_contadores_respostas(projeto_id, contadores)
+    db.session.commit()
+    
+    # Registrar respostas na auditoria (enfileiradas e gravadas em lote, sem novo commit na requisição)
+    for pergunta_id, pergunta_texto, valor_anterior, nota in auditar:
         try:
-            projeto = projeto_respondente.projeto
-            valor_anterior = None
-            if hasattr(resposta, 'nota'):
-                valor_anterior = getattr(resposta, 'nota', None)
-            
             registrar_resposta(
                 projeto_id=projeto_id,
-                projeto_nome=projeto.nome,
+                projeto_nome=projeto_nome,
                 pergunta_id=pergunta_id,
-                pergunta_texto=pergunta.texto,
+                pergunta_texto=pergunta_texto,
                 valor_anterior=valor_anterior,
                 valor_novo=nota
             )
         except Exception as audit_error:
             # Se houver erro na auditoria, logar mas não falhar a operação principal
-            print(f"Erro ao registrar auditoria: {audit_error}")
+            logging.warning(f"Erro ao registrar auditoria: {audit_error}")
+    
+    return resultados, None
+
+@respondente_bp.route('/assessment/salvar', methods=['POST'])
+@login_required
+def salvar_resposta():
+    """Salva uma resposta via AJAX"""
+    if not isinstance(current_user, Respondente):
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    
+    try:
+        data = request.get_json()
+        resultados, erro = _salvar_respostas(data.get('projeto_id'), [data])
+        if erro:
+            mensagem, status = erro
+            return jsonify({'success': False, 'message': mensagem}), status
         
-        return jsonify({'success': True, 'message': 'Resposta salva com sucesso', 'action': 'saved'})
+        resultado = resultados[0]
+        resposta = {chave: valor for chave, valor in resultado.items() if chave in ('success', 'message', 'action')}
+        return jsonify(resposta), resultado['status']
         
     except Exception as e:
         db.session.rollback()
         print(f"DEBUG: Erro ao salvar resposta: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@respondente_bp.route('/assessment/salvar-lote', methods=['POST'])
+@login_required
+def salvar_respostas_lote():
+    """
+    Salva várias respostas via AJAX em uma única transação (autosave)
+    
+    Corpo: {"projeto_id": 1, "respostas": [{"pergunta_id": 10, "nota": 3, "comentario": "..."}, ...]}
+    Retorna o resultado de cada pergunta; erros em uma pergunta não impedem as demais.
+    """
+    if not isinstance(current_user, Respondente):
+        return jsonify({'success': False, 'message': 'Acesso negado'}), 403
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        itens = data.get('respostas')
+        if not isinstance(itens, list) or not all(isinstance(item, dict) for item in itens):
+            return jsonify({'success': False, 'message': 'Lista de respostas inválida'}), 400
+        if len(itens) > RESPOSTAS_LOTE_MAX:
+            return jsonify({'success': False, 'message': f'Máximo de {RESPOSTAS_LOTE_MAX} respostas por envio'}), 400
+        
+        resultados, erro = _salvar_respostas(data.get('projeto_id'), itens)
+        if erro:
+            mensagem, status = erro
+            return jsonify({'success': False, 'message': mensagem}), status
+        
+        return jsonify({
+            'success': all(resultado['success'] for resultado in resultados),
+            'resultados': [
+                {chave: valor for chave, valor in resultado.items() if chave != 'status'}
+                for resultado in resultados
+            ]
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Erro ao salvar respostas em lote: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @respondente_bp.route('/logout')
 @login_required
 def logout():
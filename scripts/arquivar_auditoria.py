@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script de retenção da auditoria.
+
+Uso: python3 scripts/arquivar_auditoria.py [--dias N] [--expurgar-dias M] [--reconstruir-resumo]
+
+Move para a tabela auditoria_arquivo os registros com mais de N dias
+(padrão: AUDITORIA_RETENCAO_DIAS ou 180), mantendo a tabela auditoria
+pequena. Com --expurgar-dias, exclui definitivamente do arquivo os registros
+com mais de M dias. Os contadores diários do dashboard não são afetados;
+--reconstruir-resumo os recalcula a partir da auditoria e do arquivo (em uma
+transação que bloqueia as gravações de auditoria até o fim; no PostgreSQL e
+no SQLite pode ser executado com a aplicação no ar).
+
+Recomendado agendar diariamente (cron).
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app
+from models.auditoria import Auditoria, AuditoriaResumoDiario
+
+RETENCAO_DIAS = int(os.environ.get('AUDITORIA_RETENCAO_DIAS', '180'))
+
+
+def arquivar_auditoria(dias=RETENCAO_DIAS, expurgar_dias=None, reconstruir_resumo=False):
+    """Executa a retenção e retorna (arquivados, expurgados)"""
+    with app.app_context():
+        corte = datetime.utcnow() - timedelta(days=dias)
+        print(f"Arquivando registros anteriores a {corte.strftime('%d/%m/%Y %H:%M')} (UTC)...")
+        arquivados = Auditoria.arquivar(corte)
+        print(f"Registros arquivados: {arquivados}")
+
+        expurgados = 0
+        if expurgar_dias is not None:
+            corte_expurgo = datetime.utcnow() - timedelta(days=expurgar_dias)
+            print(f"\nExcluindo do arquivo registros anteriores a {corte_expurgo.strftime('%d/%m/%Y %H:%M')} (UTC)...")
+            expurgados = Auditoria.expurgar_arquivo(corte_expurgo)
+            print(f"Registros excluídos do arquivo: {expurgados}")
+
+        if reconstruir_resumo:
+            print("\nRecalculando contadores diários...")
+            total = AuditoriaResumoDiario.reconstruir()
+            print(f"Eventos contabilizados: {total}")
+
+        return arquivados, expurgados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arquiva e expurga registros antigos da auditoria')
+    parser.add_argument('--dias', type=int, default=RETENCAO_DIAS,
+                        help=f'Manter na tabela auditoria os últimos N dias (padrão: {RETENCAO_DIAS})')
+    parser.add_argument('--expurgar-dias', type=int,
+                        help='Excluir do arquivo os registros com mais de M dias')
+    parser.add_argument('--reconstruir-resumo', action='store_true',
+                        help='Recalcular os contadores diários do dashboard')
+    args = parser.parse_args()
+
+    if args.expurgar_dias is not None and args.expurgar_dias < args.dias:
+        parser.error('--expurgar-dias deve ser maior ou igual a --dias')
+
+    print(f"\n{'='*60}")
+    print("RETENÇÃO DA AUDITORIA")
+    print(f"{'='*60}")
+    print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    print(f"{'='*60}\n")
+
+    arquivar_auditoria(args.dias, args.expurgar_dias, args.reconstruir_resumo)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,35 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Script para exportar respostas de projetos liberados para CSV.
+Script para exportar respostas de projetos para CSV, JSON Lines ou Parquet.
 
-Uso: python3 scripts/exportar_respostas.py "Nome do Tipo de Assessment"
+Uso: python3 scripts/exportar_respostas.py ["Nome do Tipo de Assessment"]
+                                           [--versao ID] [--cliente ID]
+                                           [--desde AAAA-MM-DD] [--ate AAAA-MM-DD]
+                                           [--situacao finalizados|em_andamento|todos]
+                                           [--formato csv|jsonl|parquet] [--saida ARQUIVO]
 
-Gera um arquivo CSV no formato: nome_argumento_timestamp.csv
-Contém apenas respostas de projetos com status "Liberado" (finalizado=True)
+Gera um arquivo no formato: nome_argumento_timestamp.<extensão>
+Por padrão contém apenas respostas de projetos com status "Liberado"
+(assessment finalizado). O período considera a data da resposta.
+As respostas são lidas e gravadas em lotes, sem carregar tudo em memória.
 """
 
 import sys
 import os
-import csv
-from datetime import datetime
+import argparse
+from datetime import datetime, date
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import create_app, db
-from models.assessment_version import AssessmentTipo, AssessmentVersao, AssessmentDominio
-from models.projeto import Projeto, ProjetoAssessment
-from models.cliente import Cliente
-from models.respondente import Respondente
-from models.resposta import Resposta
-from models.pergunta import Pergunta
+# Apenas leitura: não criar tabelas nem dados padrão ao importar a aplicação
+os.environ.setdefault('INICIALIZAR_BANCO', '0')
+
+from app import app
+from models.assessment_version import AssessmentTipo
+from utils.exportacao_respostas import (
+    ExportacaoRespostas, FORMATOS_EXPORTACAO, SITUACOES_EXPORTACAO, TAMANHO_LOTE_EXPORTACAO
+)
 
 
 def sanitize_filename(name):
@@ -36,142 +43,85 @@ def sanitize_filename(name):
     return name.strip('_').lower()
 
 
-def exportar_respostas(nome_tipo_assessment):
-    """Exporta respostas de projetos liberados para CSV"""
-    
-    app = create_app()
-    
+def exportar_respostas(nome_tipo_assessment=None, versao_id=None, cliente_id=None, data_inicio=None,
+                       data_fim=None, situacao='finalizados', formato='csv', saida=None,
+                       lote=TAMANHO_LOTE_EXPORTACAO):
+    """Exporta as respostas filtradas para um arquivo"""
+
     with app.app_context():
-        tipo = AssessmentTipo.query.filter(
-            AssessmentTipo.nome.ilike(f'%{nome_tipo_assessment}%')
-        ).first()
-        
-        if not tipo:
-            print(f"Erro: Tipo de assessment '{nome_tipo_assessment}' não encontrado.")
-            print("\nTipos disponíveis:")
-            tipos = AssessmentTipo.query.filter_by(ativo=True).all()
-            for t in tipos:
-                print(f"  - {t.nome}")
-            return False
-        
-        print(f"Tipo de assessment encontrado: {tipo.nome} (ID: {tipo.id})")
-        
-        versoes_ids = [v.id for v in tipo.versoes]
-        
-        if not versoes_ids:
-            print(f"Nenhuma versão encontrada para o tipo '{tipo.nome}'.")
-            return False
-        
-        print(f"Versões encontradas: {len(versoes_ids)}")
-        
-        projetos_assessment = ProjetoAssessment.query.filter(
-            ProjetoAssessment.versao_assessment_id.in_(versoes_ids),
-            ProjetoAssessment.ativo == True,
-            ProjetoAssessment.finalizado == True
-        ).all()
-        
-        projeto_ids = [pa.projeto_id for pa in projetos_assessment]
-        
-        if not projeto_ids:
-            print(f"Nenhum projeto liberado encontrado para o tipo '{tipo.nome}'.")
+        tipo = None
+        if nome_tipo_assessment:
+            tipo = AssessmentTipo.query.filter(
+                AssessmentTipo.nome.ilike(f'%{nome_tipo_assessment}%')
+            ).first()
+
+            if not tipo:
+                print(f"Erro: Tipo de assessment '{nome_tipo_assessment}' não encontrado.")
+                print("\nTipos disponíveis:")
+                tipos = AssessmentTipo.query.filter_by(ativo=True).all()
+                for t in tipos:
+                    print(f"  - {t.nome}")
+                return False
+
+            print(f"Tipo de assessment encontrado: {tipo.nome} (ID: {tipo.id})")
+
+        try:
+            exportacao = ExportacaoRespostas(
+                formato, lote=lote,
+                tipo_id=tipo.id if tipo else None,
+                versao_id=versao_id,
+                cliente_id=cliente_id,
+                data_inicio=data_inicio,
+                data_fim=data_fim,
+                situacao=situacao
+            )
+        except ValueError as e:
+            print(f"Erro: {e}")
             return False
-        
-        projetos = Projeto.query.filter(
-            Projeto.id.in_(projeto_ids),
-            Projeto.ativo == True
-        ).all()
-        
-        print(f"Projetos liberados encontrados: {len(projetos)}")
-        
-        respostas = db.session.query(
-            Cliente.nome.label('cliente_nome'),
-            Respondente.email.label('respondente_email'),
-            AssessmentTipo.nome.label('tipo_nome'),
-            AssessmentDominio.nome.label('dominio_nome'),
-            Pergunta.texto.label('pergunta_texto'),
-            Resposta.nota.label('valor_resposta'),
-            Resposta.comentario.label('comentario')
-        ).join(
-            Projeto, Resposta.projeto_id == Projeto.id
-        ).join(
-            Cliente, Projeto.cliente_id == Cliente.id
-        ).join(
-            Respondente, Resposta.respondente_id == Respondente.id
-        ).join(
-            Pergunta, Resposta.pergunta_id == Pergunta.id
-        ).join(
-            AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id
-        ).join(
-            AssessmentVersao, AssessmentDominio.versao_id == AssessmentVersao.id
-        ).join(
-            AssessmentTipo, AssessmentVersao.tipo_id == AssessmentTipo.id
-        ).filter(
-            Resposta.projeto_id.in_(projeto_ids),
-            AssessmentTipo.id == tipo.id
-        ).order_by(
-            Cliente.nome,
-            Respondente.email,
-            AssessmentDominio.ordem,
-            Pergunta.ordem
-        ).all()
-        
-        if not respostas:
-            print(f"Nenhuma resposta encontrada para os projetos liberados.")
+
+        prefixo = sanitize_filename(nome_tipo_assessment) if nome_tipo_assessment else 'respostas'
+        nome_arquivo = saida or exportacao.nome_arquivo(prefixo)
+
+        print(f"Exportando ({FORMATOS_EXPORTACAO[formato]['nome']}, lotes de {lote} linhas)...")
+        total = exportacao.salvar(nome_arquivo)
+
+        if not total:
+            os.remove(nome_arquivo)
+            print("Nenhuma resposta encontrada com os filtros informados.")
             return False
-        
-        print(f"Total de respostas a exportar: {len(respostas)}")
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        nome_arquivo = f"{sanitize_filename(nome_tipo_assessment)}_{timestamp}.csv"
-        
-        with open(nome_arquivo, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            writer = csv.writer(csvfile, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-            
-            writer.writerow([
-                'Nome Cliente',
-                'E-mail Respondente',
-                'Tipo Assessment',
-                'Domínio',
-                'Pergunta',
-                'Pontuação',
-                'Comentário'
-            ])
-            
-            for resp in respostas:
-                writer.writerow([
-                    resp.cliente_nome or '',
-                    resp.respondente_email or '',
-                    resp.tipo_nome or '',
-                    resp.dominio_nome or '',
-                    resp.pergunta_texto or '',
-                    resp.valor_resposta if resp.valor_resposta is not None else '',
-                    resp.comentario or ''
-                ])
-        
+
         print(f"\nArquivo exportado com sucesso: {nome_arquivo}")
-        print(f"Total de registros: {len(respostas)}")
+        print(f"Total de registros: {total}")
         return True
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Uso: python3 scripts/exportar_respostas.py \"Nome do Tipo de Assessment\"")
-        print("\nExemplo:")
-        print('  python3 scripts/exportar_respostas.py "Cybersecurity"')
-        print('  python3 scripts/exportar_respostas.py "NIST CSF"')
-        sys.exit(1)
-    
-    nome_tipo = sys.argv[1]
-    
+    parser = argparse.ArgumentParser(description='Exporta respostas de projetos para CSV, JSON Lines ou Parquet')
+    parser.add_argument('tipo', nargs='?', help='Nome (ou parte do nome) do tipo de assessment')
+    parser.add_argument('--versao', type=int, help='Apenas respostas desta versão (ID)')
+    parser.add_argument('--cliente', type=int, help='Apenas projetos deste cliente (ID)')
+    parser.add_argument('--desde', type=date.fromisoformat, help='Data inicial das respostas (AAAA-MM-DD)')
+    parser.add_argument('--ate', type=date.fromisoformat, help='Data final das respostas (AAAA-MM-DD)')
+    parser.add_argument('--situacao', choices=list(SITUACOES_EXPORTACAO), default='finalizados',
+                        help='Situação dos assessments (padrão: finalizados)')
+    parser.add_argument('--formato', choices=list(FORMATOS_EXPORTACAO), default='csv',
+                        help='Formato do arquivo (padrão: csv; parquet requer pyarrow)')
+    parser.add_argument('--saida', help='Arquivo de saída (padrão: <tipo>_<data>.<extensão>)')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE_EXPORTACAO,
+                        help=f'Linhas lidas do banco por vez (padrão: {TAMANHO_LOTE_EXPORTACAO})')
+    args = parser.parse_args()
+
     print(f"\n{'='*60}")
-    print(f"EXPORTADOR DE RESPOSTAS - PROJETOS LIBERADOS")
+    print(f"EXPORTADOR DE RESPOSTAS")
     print(f"{'='*60}")
-    print(f"Tipo de Assessment: {nome_tipo}")
+    print(f"Tipo de Assessment: {args.tipo or 'Todos'}")
+    print(f"Situação: {SITUACOES_EXPORTACAO[args.situacao]}")
     print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
     print(f"{'='*60}\n")
-    
-    sucesso = exportar_respostas(nome_tipo)
-    
+
+    sucesso = exportar_respostas(args.tipo, args.versao, args.cliente, args.desde, args.ate,
+                                 args.situacao, args.formato, args.saida, args.lote)
+
     if sucesso:
         print(f"\n{'='*60}")
         print("Exportação concluída com sucesso!")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para gerar os relatórios PDF de vários projetos em um arquivo ZIP.
+
+Uso: python3 scripts/gerar_relatorios_lote.py [--cliente ID] [--status finalizados|em_andamento|todos]
+                                              [--desde AAAA-MM-DD] [--ate AAAA-MM-DD]
+                                              [--processos N] [--saida ARQUIVO.zip]
+
+O período considera a data de finalização do projeto (ou a de criação, se
+ainda não foi finalizado). Projetos com erro são listados ao final e no
+RESUMO.txt do ZIP, sem interromper os demais.
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime, date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# O banco já deve estar inicializado: não criar tabelas nem dados padrão ao importar a aplicação
+os.environ.setdefault('INICIALIZAR_BANCO', '0')
+
+from app import app
+from utils.relatorios_lote import STATUS_LOTE, PROCESSOS_LOTE, selecionar_projetos, gerar_relatorios_lote
+
+
+def gerar_lote(cliente_id=None, status='finalizados', data_inicio=None, data_fim=None, processos=None, saida=None):
+    """Gera o ZIP e retorna o resumo do lote (ou None se nenhum projeto foi encontrado)"""
+    with app.app_context():
+        projetos = selecionar_projetos(cliente_id, status, data_inicio, data_fim)
+        if not projetos:
+            print("Nenhum projeto encontrado com os filtros informados.")
+            return None
+
+        saida = saida or f"relatorios_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        print(f"Gerando {len(projetos)} relatórios com {processos or PROCESSOS_LOTE} processo(s)...\n")
+
+        def progresso(processados, total, projeto):
+            print(f"  [{processados}/{total}] Projeto {projeto.id} ({projeto.nome})")
+
+        resumo = gerar_relatorios_lote(projetos, saida, processos=processos, progresso=progresso)
+
+        print(f"\nRelatórios gerados: {resumo['gerados']}/{resumo['total']}")
+        if resumo['erros']:
+            print(f"Erros: {len(resumo['erros'])}")
+            for erro in resumo['erros']:
+                print(f"  - Projeto {erro['projeto_id']} ({erro['cliente']} / {erro['projeto']}): {erro['erro']}")
+        print(f"Arquivo: {os.path.abspath(resumo['arquivo'])}")
+        return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Gera os relatórios PDF de vários projetos em um arquivo ZIP')
+    parser.add_argument('--cliente', type=int, help='Apenas projetos deste cliente')
+    parser.add_argument('--status', choices=list(STATUS_LOTE), default='finalizados',
+                        help='Situação dos projetos (padrão: finalizados)')
+    parser.add_argument('--desde', type=date.fromisoformat, help='Data inicial (AAAA-MM-DD)')
+    parser.add_argument('--ate', type=date.fromisoformat, help='Data final (AAAA-MM-DD)')
+    parser.add_argument('--processos', type=int, help=f'Processos em paralelo (padrão: {PROCESSOS_LOTE})')
+    parser.add_argument('--saida', help='Arquivo ZIP de saída (padrão: relatorios_<data>.zip)')
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print("GERAÇÃO DE RELATÓRIOS EM LOTE")
+    print(f"{'='*60}")
+    print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    print(f"{'='*60}\n")
+
+    resumo = gerar_lote(args.cliente, args.status, args.desde, args.ate, args.processos, args.saida)
+    if resumo is None or resumo['erros']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
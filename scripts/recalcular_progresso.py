@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para recalcular os contadores de progresso dos projetos.
+
+Uso: python3 scripts/recalcular_progresso.py [--projeto ID] [--inativos]
+
+Os contadores (projetos.total_perguntas, projetos.perguntas_respondidas e
+projeto_respondentes.perguntas_respondidas) são mantidos a cada resposta
+salva; este script os reconcilia com as respostas gravadas no banco.
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from models.projeto import Projeto
+
+
+def recalcular_progresso(projeto_id=None, incluir_inativos=False):
+    """Recalcula os contadores e retorna a quantidade de projetos corrigidos"""
+    with app.app_context():
+        query = Projeto.query
+        if projeto_id:
+            query = query.filter_by(id=projeto_id)
+        elif not incluir_inativos:
+            query = query.filter_by(ativo=True)
+
+        corrigidos = 0
+        total = 0
+        for projeto in query.order_by(Projeto.id).all():
+            total += 1
+            antes = (
+                projeto.total_perguntas,
+                projeto.perguntas_respondidas,
+                [pr.perguntas_respondidas for pr in projeto.respondentes]
+            )
+
+            projeto.recalcular_progresso()
+
+            depois = (
+                projeto.total_perguntas,
+                projeto.perguntas_respondidas,
+                [pr.perguntas_respondidas for pr in projeto.respondentes]
+            )
+            if antes != depois:
+                corrigidos += 1
+                print(f"  Projeto {projeto.id} ({projeto.nome}): "
+                      f"{antes[1]}/{antes[0]} -> {depois[1]}/{depois[0]} perguntas respondidas")
+
+        print(f"\nProjetos verificados: {total}")
+        print(f"Projetos corrigidos: {corrigidos}")
+        return corrigidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recalcula os contadores de progresso dos projetos')
+    parser.add_argument('--projeto', type=int, help='Recalcular apenas este projeto')
+    parser.add_argument('--inativos', action='store_true', help='Incluir projetos inativos')
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print("RECÁLCULO DOS CONTADORES DE PROGRESSO")
+    print(f"{'='*60}")
+    print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    print(f"{'='*60}\n")
+
+    recalcular_progresso(args.projeto, args.inativos)
+
+
+if __name__ == '__main__':
+    main()
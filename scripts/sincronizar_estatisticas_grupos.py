@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script para sincronizar as estatísticas agregadas dos grupos públicos.
+
+Uso: python3 scripts/sincronizar_estatisticas_grupos.py [--tipo ID]
+
+Os agregados (tabela estatisticas_grupos_publicos) são mantidos a cada
+assessment público concluído e lidos pelas páginas de grupos. Este script
+reconstrói os grupos que divergem dos assessments gravados: execute após
+criar a tabela (assessments concluídos antes dela) e após excluir
+assessments públicos fora da exclusão de grupo. Recomendado agendar
+diariamente (cron).
+"""
+
+import sys
+import os
+import argparse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, db
+from models.assessment_publico import AssessmentPublico
+from models.estatistica_grupo import EstatisticaGrupoPublico
+
+
+def sincronizar_estatisticas(tipo_assessment_id=None):
+    """Reconstrói os grupos divergentes e retorna a quantidade de grupos corrigidos"""
+    with app.app_context():
+        if tipo_assessment_id:
+            tipos = [tipo_assessment_id]
+        else:
+            tipos = sorted(
+                {tipo for (tipo,) in db.session.query(AssessmentPublico.tipo_assessment_id).distinct()}
+                | {tipo for (tipo,) in db.session.query(EstatisticaGrupoPublico.tipo_assessment_id).distinct()}
+            )
+
+        corrigidos = 0
+        for tipo in tipos:
+            for grupo in EstatisticaGrupoPublico.sincronizar(None, tipo):
+                corrigidos += 1
+                print(f"  Tipo {tipo}, grupo '{grupo or '-'}': reconstruído")
+
+        print(f"\nTipos verificados: {len(tipos)}")
+        print(f"Grupos reconstruídos: {corrigidos}")
+        return corrigidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sincroniza as estatísticas agregadas dos grupos públicos')
+    parser.add_argument('--tipo', type=int, help='Sincronizar apenas este tipo de assessment')
+    args = parser.parse_args()
+
+    print(f"\n{'='*60}")
+    print("SINCRONIZAÇÃO DAS ESTATÍSTICAS DE GRUPOS")
+    print(f"{'='*60}")
+    print(f"Data/Hora: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
+    print(f"{'='*60}\n")
+
+    sincronizar_estatisticas(args.tipo)
+
+
+if __name__ == '__main__':
+    main()
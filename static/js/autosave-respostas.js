@@ -0,0 +1,165 @@
+/**
+ * Sistema de Assessment de Cibersegurança
+ * Salvamento automático das respostas do respondente em lote
+ *
+ * As alterações são acumuladas por pergunta (a mais recente substitui as
+ * anteriores) e enviadas juntas para /respondente/assessment/salvar-lote
+ * depois de um intervalo sem novas alterações. Só um envio fica em andamento
+ * por vez; o que mudar durante o envio segue no próximo.
+ */
+
+class AutosaveRespostas {
+    /**
+     * @param {number} projetoId - Projeto das respostas
+     * @param {Object} opcoes - atraso (ms), onResultado(resultado, item), onErro(mensagem, lote)
+     */
+    constructor(projetoId, opcoes = {}) {
+        this.projetoId = projetoId;
+        this.url = opcoes.url || '/respondente/assessment/salvar-lote';
+        this.atraso = opcoes.atraso || 800;
+        this.atrasoNovaTentativa = opcoes.atrasoNovaTentativa || 5000;
+        this.onResultado = opcoes.onResultado || function() {};
+        this.onErro = opcoes.onErro || function() {};
+
+        this.pendentes = new Map();
+        this.timer = null;
+        this.envio = null;
+        this.erro = null;
+
+        // Enviar o que estiver pendente ao sair da página
+        window.addEventListener('pagehide', () => this.enviarAoSair());
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                this.enviarAoSair();
+            }
+        });
+    }
+
+    /**
+     * Registra a alteração de uma pergunta (nota null remove a resposta)
+     */
+    alterar(perguntaId, nota, comentario) {
+        this.pendentes.set(String(perguntaId), {
+            pergunta_id: parseInt(perguntaId),
+            nota: nota,
+            comentario: comentario
+        });
+        this.agendar(this.atraso);
+    }
+
+    /**
+     * Indica se há alterações ainda não confirmadas pelo servidor
+     */
+    temPendentes() {
+        return this.pendentes.size > 0 || this.envio !== null;
+    }
+
+    /**
+     * Envia o que estiver pendente e confirma que tudo foi salvo (usar antes de finalizar)
+     * @returns {Promise} rejeitada se algum envio ou resposta falhou ou se restaram alterações
+     */
+    salvarTudo() {
+        this.erro = null;
+        return this.enviar().then(() => {
+            if (this.erro || this.temPendentes()) {
+                throw new Error(this.erro || 'Existem respostas que ainda não foram salvas');
+            }
+        });
+    }
+
+    agendar(atraso) {
+        clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.enviar(), atraso);
+    }
+
+    /**
+     * Envia imediatamente as alterações pendentes
+     * @returns {Promise} resolvida quando tudo o que estava pendente foi enviado
+     */
+    enviar() {
+        clearTimeout(this.timer);
+
+        if (this.envio) {
+            return this.envio.then(() => this.enviar());
+        }
+        if (this.pendentes.size === 0) {
+            return Promise.resolve();
+        }
+
+        const lote = Array.from(this.pendentes.values());
+        this.pendentes.clear();
+        let novaTentativa = false;
+
+        this.envio = fetch(this.url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                projeto_id: this.projetoId,
+                respostas: lote
+            })
+        })
+        .then(response => response.json().catch(() => ({})).then(data => {
+            if (response.status >= 500) {
+                throw new Error(data.message || 'Erro no servidor');
+            }
+            if (!data.resultados) {
+                // Erro definitivo (acesso negado, dados inválidos): não adianta reenviar
+                this.erro = data.message || 'Erro ao salvar respostas';
+                this.onErro(this.erro, lote);
+                return;
+            }
+            const itens = new Map(lote.map(item => [item.pergunta_id, item]));
+            data.resultados.forEach(resultado => {
+                if (!resultado.success) {
+                    this.erro = resultado.message || 'Erro ao salvar respostas';
+                }
+                this.onResultado(resultado, itens.get(resultado.pergunta_id));
+            });
+        }))
+        .catch(error => {
+            // Falha de conexão ou do servidor: devolver à fila o que não foi alterado depois
+            lote.forEach(item => {
+                const chave = String(item.pergunta_id);
+                if (!this.pendentes.has(chave)) {
+                    this.pendentes.set(chave, item);
+                }
+            });
+            novaTentativa = true;
+            this.erro = error.message;
+            this.onErro(error.message, lote);
+        })
+        .finally(() => {
+            this.envio = null;
+            if (this.pendentes.size > 0) {
+                this.agendar(novaTentativa ? this.atrasoNovaTentativa : this.atraso);
+            }
+        });
+
+        return this.envio;
+    }
+
+    /**
+     * Envio que sobrevive ao fechamento da página (keepalive)
+     */
+    enviarAoSair() {
+        if (this.pendentes.size === 0) {
+            return;
+        }
+        clearTimeout(this.timer);
+        const lote = Array.from(this.pendentes.values());
+        this.pendentes.clear();
+        fetch(this.url, {
+            method: 'POST',
+            keepalive: true,
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                projeto_id: this.projetoId,
+                respostas: lote
+            })
+        }).catch(() => {});
+    }
+}
@@ -0,0 +1,223 @@
+"""
+Gravação assíncrona e em lote dos registros de auditoria
+
+Auditoria.registrar apenas monta o evento e o entrega ao escritor do
+processo; uma thread grava os eventos acumulados em um único INSERT
+(executemany) em conexão própria, sem participar da transação da requisição,
+e atualiza na mesma transação os contadores diários usados pelo dashboard.
+Assim salvar uma resposta custa um único commit e o volume de auditoria não
+aumenta a latência das requisições.
+
+Contrapressão: a fila em memória tem capacidade AUDITORIA_FILA_MAX. Com a
+fila cheia a requisição espera no máximo AUDITORIA_ESPERA_MAX_SEGUNDOS e,
+se ainda não houver espaço, o evento vai para o arquivo de contingência.
+
+Arquivo de contingência: eventos que não puderam ser gravados (fila cheia,
+banco indisponível ou encerramento do processo) são escritos em arquivos
+JSON Lines em AUDITORIA_SPILL_DIR (gravação atômica, um arquivo por lote) e
+reenviados ao banco pela thread assim que possível, por qualquer processo.
+
+AUDITORIA_ASSINCRONA=0 grava cada evento na hora (scripts e testes), ainda
+em conexão própria.
+"""
+
+import os
+import glob
+import json
+import time
+import queue
+import atexit
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from sqlalchemy import insert
+from app import db
+
+ASSINCRONA = os.environ.get('AUDITORIA_ASSINCRONA', '1').lower() in ('1', 'true', 'sim')
+
+# Eventos por INSERT e espera máxima antes de gravar um lote incompleto
+TAMANHO_LOTE = int(os.environ.get('AUDITORIA_LOTE', '200'))
+INTERVALO_SEGUNDOS = float(os.environ.get('AUDITORIA_INTERVALO_SEGUNDOS', '1'))
+
+# Contrapressão
+CAPACIDADE_FILA = int(os.environ.get('AUDITORIA_FILA_MAX', '10000'))
+ESPERA_MAXIMA = float(os.environ.get('AUDITORIA_ESPERA_MAX_SEGUNDOS', '0.05'))
+
+SPILL_DIR = os.environ.get(
+    'AUDITORIA_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'assessment_auditoria')
+)
+
+# Intervalo entre tentativas de reenviar os arquivos de contingência
+INTERVALO_REPROCESSAMENTO = 30
+
+# Arquivo em reprocessamento por um processo que morreu volta a ficar disponível após este tempo
+PROCESSAMENTO_EXPIRADO_SEGUNDOS = 600
+
+
+class EscritorAuditoria:
+    """Fila de eventos de auditoria de um processo e a thread que os grava"""
+
+    def __init__(self, app):
+        self.app = app
+        self.pid = os.getpid()
+        self.fila = queue.Queue(maxsize=CAPACIDADE_FILA)
+        self._sequencia = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        if ASSINCRONA:
+            self._thread = threading.Thread(target=self._executar, name='auditoria-escritor', daemon=True)
+            self._thread.start()
+
+    def registrar(self, evento):
+        """Enfileira um evento (dict com as colunas da tabela auditoria)"""
+        if not ASSINCRONA:
+            self._gravar_ou_derramar([evento])
+            return
+
+        try:
+            self.fila.put(evento, timeout=ESPERA_MAXIMA)
+        except queue.Full:
+            logging.warning("Fila de auditoria cheia; evento gravado no arquivo de contingência")
+            self._derramar([evento])
+
+    def descarregar(self):
+        """Grava tudo o que está na fila (encerramento do processo e testes)"""
+        while True:
+            lote = self._retirar_lote(bloquear=False)
+            if not lote:
+                return
+            self._gravar_ou_derramar(lote)
+
+    def _retirar_lote(self, bloquear=True):
+        lote = []
+        try:
+            lote.append(self.fila.get(timeout=INTERVALO_SEGUNDOS) if bloquear else self.fila.get_nowait())
+            while len(lote) < TAMANHO_LOTE:
+                lote.append(self.fila.get_nowait())
+        except queue.Empty:
+            pass
+        return lote
+
+    def _executar(self):
+        ultimo_reprocessamento = 0.0
+        with self.app.app_context():
+            while True:
+                try:
+                    lote = self._retirar_lote()
+                    if lote:
+                        self._gravar_ou_derramar(lote)
+                    if time.monotonic() - ultimo_reprocessamento > INTERVALO_REPROCESSAMENTO:
+                        ultimo_reprocessamento = time.monotonic()
+                        self.reprocessar_derramados()
+                except Exception as e:
+                    # A thread nunca deve morrer: os eventos seguintes continuariam presos na fila
+                    logging.error(f"Erro no escritor de auditoria: {e}")
+
+    def _gravar(self, eventos):
+        from models.auditoria import Auditoria, AuditoriaResumoDiario
+
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                conn.execute(insert(Auditoria.__table__), eventos)
+                # Contadores diários do dashboard na mesma transação dos eventos
+                AuditoriaResumoDiario.acumular(conn, eventos)
+
+    def _gravar_ou_derramar(self, eventos):
+        try:
+            self._gravar(eventos)
+        except Exception as e:
+            logging.error(f"Erro ao gravar {len(eventos)} eventos de auditoria, usando arquivo de contingência: {e}")
+            self._derramar(eventos)
+
+    def _derramar(self, eventos):
+        """Grava os eventos em um novo arquivo de contingência (escrita atômica)"""
+        with self._lock:
+            self._sequencia += 1
+            sequencia = self._sequencia
+        nome = f'auditoria_{time.time_ns()}_{self.pid}_{sequencia}'
+        try:
+            os.makedirs(SPILL_DIR, exist_ok=True)
+            parcial = os.path.join(SPILL_DIR, f'{nome}.tmp')
+            with open(parcial, 'w', encoding='utf-8') as arquivo:
+                for evento in eventos:
+                    arquivo.write(json.dumps(evento, ensure_ascii=False, default=_serializar) + '\n')
+                arquivo.flush()
+                os.fsync(arquivo.fileno())
+            os.replace(parcial, os.path.join(SPILL_DIR, f'{nome}.jsonl'))
+        except OSError as e:
+            logging.error(f"Erro ao gravar arquivo de contingência da auditoria ({len(eventos)} eventos perdidos): {e}")
+
+    def reprocessar_derramados(self):
+        """
+        Reenvia ao banco os arquivos de contingência (de qualquer processo)
+
+        Retorna a quantidade de eventos gravados.
+        """
+        agora = time.time()
+        arquivos = glob.glob(os.path.join(SPILL_DIR, '*.jsonl'))
+        arquivos += [
+            caminho for caminho in glob.glob(os.path.join(SPILL_DIR, '*.processando'))
+            if agora - os.path.getmtime(caminho) > PROCESSAMENTO_EXPIRADO_SEGUNDOS
+        ]
+
+        gravados = 0
+        for caminho in sorted(arquivos):
+            # Renomear reserva o arquivo: só um processo consegue
+            base = os.path.basename(caminho).split('.')[0]
+            reservado = os.path.join(SPILL_DIR, f'{base}.{os.getpid()}.processando')
+            try:
+                os.replace(caminho, reservado)
+                os.utime(reservado)
+                with open(reservado, encoding='utf-8') as arquivo:
+                    eventos = [_desserializar(json.loads(linha)) for linha in arquivo if linha.strip()]
+            except OSError:
+                continue
+            except ValueError as e:
+                logging.error(f"Arquivo de contingência da auditoria inválido ({reservado}): {e}")
+                os.replace(reservado, os.path.join(SPILL_DIR, f'{base}.invalido'))
+                continue
+
+            try:
+                # Uma única transação: o arquivo só é descartado se todos os eventos forem gravados
+                self._gravar(eventos)
+            except Exception as e:
+                logging.error(f"Erro ao reprocessar {reservado}: {e}")
+                os.replace(reservado, os.path.join(SPILL_DIR, f'{base}.jsonl'))
+                # Banco provavelmente indisponível: tentar os demais depois
+                break
+
+            os.unlink(reservado)
+            gravados += len(eventos)
+
+        if gravados:
+            logging.info(f"{gravados} eventos de auditoria recuperados do arquivo de contingência")
+        return gravados
+
+
+def _serializar(valor):
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _desserializar(evento):
+    if evento.get('data_hora'):
+        evento['data_hora'] = datetime.fromisoformat(evento['data_hora'])
+    return evento
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def get_escritor_auditoria():
+    """Retorna o escritor de auditoria do processo (recriado após fork)"""
+    global _escritor
+    if _escritor is None or _escritor.pid != os.getpid():
+        with _escritor_lock:
+            if _escritor is None or _escritor.pid != os.getpid():
+                from flask import current_app
+                _escritor = EscritorAuditoria(current_app._get_current_object())
+                atexit.register(_escritor.descarregar)
+    return _escritor
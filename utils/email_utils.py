@@ -385,38 +385,19 @@ def enviar_resultado_assessment(assessment_publico, email_destino, tipo_assessme
         logger.info(f"Pontuação geral calculada: {pontuacao_geral}%")
         
         # Obter domínios respondidos com pontuações
-        dominios_dados = []
-        for dominio in assessment_publico.get_dominios_respondidos():
-            pontuacao_dominio = assessment_publico.calcular_pontuacao_dominio(dominio.id)
-            
-            dominios_dados.append({
-                'dominio': dominio,
-                'pontuacao': pontuacao_dominio,
-                'recomendacao': None
-            })
+        from utils.publico_utils import montar_dominios_dados, preencher_recomendacoes, recomendacao_padrao
+        dominios_dados = montar_dominios_dados(assessment_publico)
         
         logger.info(f"Total de domínios processados: {len(dominios_dados)}")
         
-        # Gerar recomendações com OpenAI
-        from utils.publico_utils import gerar_recomendacoes_ia
-        
+        # Usar as recomendações já armazenadas no assessment (as mesmas da página de resultado)
         try:
-            logger.info(f"Gerando recomendações IA para email do assessment público {assessment_publico.id}")
-            recomendacoes = gerar_recomendacoes_ia(assessment_publico, dominios_dados)
-            
-            for i, dominio_data in enumerate(dominios_dados):
-                if i < len(recomendacoes):
-                    dominio_data['recomendacao'] = recomendacoes[i]
+            preencher_recomendacoes(assessment_publico, dominios_dados)
         except Exception as e:
-            logger.error(f"Erro ao gerar recomendações IA para email: {e}")
+            logger.error(f"Erro ao obter recomendações IA para email: {e}")
             # Usar recomendações padrão
             for dominio_data in dominios_dados:
-                pontuacao = dominio_data['pontuacao']
-                dominio_nome = dominio_data['dominio'].nome
-                dominio_data['recomendacao'] = (
-                    f"Com base na pontuação de {pontuacao:.0f}%, recomenda-se revisar e fortalecer "
-                    f"as práticas relacionadas a {dominio_nome}."
-                )
+                dominio_data['recomendacao'] = recomendacao_padrao(dominio_data['dominio'].nome, dominio_data['pontuacao'])
         
         # Montar corpo do e-mail
         from flask import render_template, current_app
@@ -0,0 +1,201 @@
+"""
+Cálculo das estatísticas de um projeto (assessments, domínios e perguntas)
+
+Usado pelas páginas de estatísticas (admin, respondente e portal do cliente) e
+pelos geradores de PDF e Markdown, inclusive nos memoriais de respostas.
+Domínios e perguntas das versões vêm do questionário compilado (cache por
+processo); os do sistema antigo e as respostas do projeto são carregados com
+uma consulta cada e os agregados são calculados em uma única passada, de modo
+que o número de consultas não cresce com a quantidade de domínios e perguntas.
+"""
+
+from collections import defaultdict
+from sqlalchemy.orm import joinedload
+from models.dominio import Dominio
+from models.pergunta import Pergunta
+from models.questionario import obter_questionario
+from models.resposta import Resposta
+
+
+def classificar_maturidade(score):
+    """Retorna (nivel_maturidade, classe_css) para um score de 0 a 5"""
+    if score >= 4.5:
+        return "Otimizado", "success"
+    elif score >= 3.5:
+        return "Avançado", "info"
+    elif score >= 2.5:
+        return "Intermediário", "warning"
+    elif score >= 1.5:
+        return "Básico", "secondary"
+    elif score >= 0.5:
+        return "Inicial", "danger"
+    return "Inexistente", "dark"
+
+
+def _media(valores):
+    return sum(valores) / len(valores) if valores else 0
+
+
+def calcular_estatisticas_projeto(projeto, somente_finalizados=True):
+    """
+    Calcula as estatísticas de todos os assessments do projeto
+
+    Cada assessment traz dois tipos de média:
+      - score / score_geral: média de todas as respostas gravadas
+      - media / media_final: média da resposta mais recente de cada pergunta
+
+    Returns:
+        Dicionário com 'assessments' (lista na ordem do projeto),
+        'score_medio_projeto' e 'total_respostas'
+    """
+    # Assessments considerados
+    projeto_assessments = []
+    for projeto_assessment in projeto.assessments:
+        if somente_finalizados and not projeto_assessment.finalizado:
+            continue
+
+        if projeto_assessment.versao_assessment_id:
+            versao = projeto_assessment.versao_assessment
+            projeto_assessments.append((projeto_assessment, versao.tipo, versao))
+        elif projeto_assessment.tipo_assessment_id:
+            projeto_assessments.append((projeto_assessment, projeto_assessment.tipo_assessment, None))
+
+    versoes_ids = [versao.id for _, _, versao in projeto_assessments if versao]
+    tipos_antigos_ids = [tipo.id for _, tipo, versao in projeto_assessments if not versao]
+
+    # Domínios ativos (questionários compilados das versões; uma consulta no sistema antigo)
+    dominios_por_versao = {versao_id: obter_questionario(versao_id).dominios for versao_id in versoes_ids}
+    dominios_por_tipo = defaultdict(list)
+    if tipos_antigos_ids:
+        for dominio in Dominio.query.filter(
+            Dominio.tipo_assessment_id.in_(tipos_antigos_ids),
+            Dominio.ativo == True
+        ).order_by(Dominio.ordem, Dominio.id):
+            dominios_por_tipo[dominio.tipo_assessment_id].append(dominio)
+
+    # Perguntas ativas desses domínios (já compiladas nas versões; uma consulta no sistema antigo)
+    perguntas_por_dominio_versao = {d.id: d.perguntas for dominios in dominios_por_versao.values() for d in dominios}
+    perguntas_por_dominio_antigo = defaultdict(list)
+    dominios_antigos_ids = [d.id for dominios in dominios_por_tipo.values() for d in dominios]
+    if dominios_antigos_ids:
+        for pergunta in Pergunta.query.filter(
+            Pergunta.dominio_id.in_(dominios_antigos_ids),
+            Pergunta.ativo == True
+        ).order_by(Pergunta.ordem, Pergunta.id):
+            perguntas_por_dominio_antigo[pergunta.dominio_id].append(pergunta)
+
+    # Respostas do projeto (uma consulta, mais recentes primeiro)
+    respostas_por_pergunta = defaultdict(list)
+    perguntas_ids = [p.id for perguntas in perguntas_por_dominio_versao.values() for p in perguntas]
+    perguntas_ids += [p.id for perguntas in perguntas_por_dominio_antigo.values() for p in perguntas]
+    if perguntas_ids:
+        for resposta in Resposta.query.options(joinedload(Resposta.respondente)).filter(
+            Resposta.projeto_id == projeto.id,
+            Resposta.pergunta_id.in_(perguntas_ids)
+        ).order_by(Resposta.data_resposta.desc(), Resposta.id.desc()):
+            respostas_por_pergunta[resposta.pergunta_id].append(resposta)
+
+    # Agregação em uma única passada
+    assessments = []
+    for projeto_assessment, tipo, versao in projeto_assessments:
+        if versao:
+            dominios = dominios_por_versao[versao.id]
+            perguntas_por_dominio = perguntas_por_dominio_versao
+        else:
+            dominios = dominios_por_tipo[tipo.id]
+            perguntas_por_dominio = perguntas_por_dominio_antigo
+
+        notas_assessment = []
+        notas_finais_assessment = []
+        total_perguntas_assessment = 0
+        dominios_stats = []
+
+        for dominio in dominios:
+            perguntas = perguntas_por_dominio[dominio.id]
+            notas_dominio = []
+            notas_finais = []
+            perguntas_stats = []
+
+            for pergunta in perguntas:
+                respostas = respostas_por_pergunta.get(pergunta.id, [])
+                notas_dominio.extend(r.nota for r in respostas)
+                if respostas:
+                    notas_finais.append(respostas[0].nota)
+                perguntas_stats.append({
+                    'pergunta': pergunta,
+                    'resposta_final': respostas[0] if respostas else None,
+                    'respostas': respostas
+                })
+
+            score = round(float(_media(notas_dominio)), 2)
+            nivel_maturidade, classe_css = classificar_maturidade(score)
+            total_perguntas = len(perguntas)
+
+            dominios_stats.append({
+                'dominio': dominio,
+                'score': score,
+                'total_respostas': len(notas_dominio),
+                'total_perguntas': total_perguntas,
+                'nivel_maturidade': nivel_maturidade,
+                'classe_css': classe_css,
+                'percentual_completude': round((len(notas_dominio) / total_perguntas * 100) if total_perguntas > 0 else 0, 1),
+                'media': _media(notas_finais),
+                'respostas_dadas': len(notas_finais),
+                'notas': notas_finais,
+                'perguntas': perguntas_stats
+            })
+
+            notas_assessment.extend(notas_dominio)
+            notas_finais_assessment.extend(notas_finais)
+            total_perguntas_assessment += total_perguntas
+
+        assessments.append({
+            'projeto_assessment': projeto_assessment,
+            'tipo': tipo,
+            'versao': versao,
+            'versao_info': f"Versão {versao.versao}" if versao else "Sistema Antigo",
+            'finalizado': projeto_assessment.finalizado,
+            'data_finalizacao': projeto_assessment.data_finalizacao,
+            'score_geral': round(float(_media(notas_assessment)), 2),
+            'total_respostas': len(notas_assessment),
+            'media_final': _media(notas_finais_assessment),
+            'respostas_finais': len(notas_finais_assessment),
+            'total_dominios': len(dominios),
+            'total_perguntas': total_perguntas_assessment,
+            'dominios': dominios_stats
+        })
+
+    scores_gerais = [a['score_geral'] for a in assessments if a['finalizado']]
+
+    return {
+        'assessments': assessments,
+        'score_medio_projeto': round(sum(scores_gerais) / len(scores_gerais) if scores_gerais else 0, 2),
+        'total_respostas': sum(a['total_respostas'] for a in assessments)
+    }
+
+
+def montar_memorial_respostas(estatisticas):
+    """
+    Perguntas respondidas de cada domínio, com a resposta mais recente, a
+    partir do resultado de calcular_estatisticas_projeto (sem novas consultas)
+
+    Returns:
+        Lista de {'dominio', 'tipo', 'respostas': [{'pergunta', 'resposta_final'}]}
+        apenas com os domínios que têm respostas, na ordem do questionário
+    """
+    memorial = []
+    for assessment in estatisticas['assessments']:
+        if not assessment['finalizado']:
+            continue
+        for dominio_stats in assessment['dominios']:
+            respostas = [{
+                'pergunta': pergunta_stats['pergunta'],
+                'resposta_final': pergunta_stats['resposta_final']
+            } for pergunta_stats in dominio_stats['perguntas'] if pergunta_stats['resposta_final']]
+            if respostas:
+                memorial.append({
+                    'dominio': dominio_stats['dominio'],
+                    'tipo': assessment['tipo'],
+                    'respostas': respostas
+                })
+    return memorial
@@ -0,0 +1,301 @@
+"""
+Exportação das respostas dos projetos em CSV, JSON Lines ou Parquet
+
+As respostas são lidas com cursor no servidor (yield_per) e convertidas em
+blocos de bytes à medida que chegam do banco, então a memória usada não
+depende do volume exportado. Os mesmos blocos são gravados em arquivo pelo
+script scripts/exportar_respostas.py e enviados em streaming pelo download
+"Exportar respostas" da lista de projetos.
+
+Parquet depende do pacote opcional pyarrow; cada lote lido vira um row group.
+"""
+
+import io
+import os
+import csv
+import json
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import select, and_
+from app import db
+
+# Linhas lidas do banco (e escritas) por vez
+TAMANHO_LOTE_EXPORTACAO = int(os.environ.get('EXPORTACAO_LOTE', '2000'))
+
+FORMATOS_EXPORTACAO = {
+    'csv': {'extensao': 'csv', 'mimetype': 'text/csv', 'nome': 'CSV'},
+    'jsonl': {'extensao': 'jsonl', 'mimetype': 'application/x-ndjson', 'nome': 'JSON Lines'},
+    'parquet': {'extensao': 'parquet', 'mimetype': 'application/vnd.apache.parquet', 'nome': 'Parquet'}
+}
+
+SITUACOES_EXPORTACAO = {
+    'finalizados': 'Assessments finalizados',
+    'em_andamento': 'Assessments em andamento',
+    'todos': 'Todos'
+}
+
+# (chave, título no CSV) - as sete primeiras são as colunas históricas do CSV
+COLUNAS_EXPORTACAO = (
+    ('cliente_nome', 'Nome Cliente'),
+    ('respondente_email', 'E-mail Respondente'),
+    ('tipo_nome', 'Tipo Assessment'),
+    ('dominio_nome', 'Domínio'),
+    ('pergunta_texto', 'Pergunta'),
+    ('valor_resposta', 'Pontuação'),
+    ('comentario', 'Comentário'),
+    ('projeto_id', 'ID Projeto'),
+    ('projeto_nome', 'Projeto'),
+    ('versao', 'Versão'),
+    ('data_resposta', 'Data Resposta'),
+    ('finalizado', 'Finalizado')
+)
+
+
+def consulta_respostas(tipo_id=None, versao_id=None, cliente_id=None, data_inicio=None,
+                       data_fim=None, situacao='finalizados'):
+    """
+    SELECT das respostas de projetos ativos, ordenado por cliente, respondente,
+    domínio e pergunta
+
+    Args:
+        tipo_id: Tipo de assessment
+        versao_id: Versão específica do tipo
+        cliente_id: Restringe a um cliente
+        data_inicio, data_fim: Período (datas, inclusive) da data da resposta
+        situacao: 'finalizados', 'em_andamento' ou 'todos' (finalização do
+            assessment no projeto)
+    """
+    from models.assessment_version import AssessmentTipo, AssessmentVersao, AssessmentDominio
+    from models.projeto import Projeto, ProjetoAssessment
+    from models.cliente import Cliente
+    from models.respondente import Respondente
+    from models.resposta import Resposta
+    from models.pergunta import Pergunta
+
+    if situacao not in SITUACOES_EXPORTACAO:
+        raise ValueError(f'Situação inválida: {situacao}')
+
+    consulta = select(
+        Cliente.nome.label('cliente_nome'),
+        Respondente.email.label('respondente_email'),
+        AssessmentTipo.nome.label('tipo_nome'),
+        AssessmentDominio.nome.label('dominio_nome'),
+        Pergunta.texto.label('pergunta_texto'),
+        Resposta.nota.label('valor_resposta'),
+        Resposta.comentario.label('comentario'),
+        Projeto.id.label('projeto_id'),
+        Projeto.nome.label('projeto_nome'),
+        AssessmentVersao.versao.label('versao'),
+        Resposta.data_resposta.label('data_resposta'),
+        ProjetoAssessment.finalizado.label('finalizado')
+    ).select_from(Resposta).join(
+        Projeto, Resposta.projeto_id == Projeto.id
+    ).join(
+        Cliente, Projeto.cliente_id == Cliente.id
+    ).join(
+        Respondente, Resposta.respondente_id == Respondente.id
+    ).join(
+        Pergunta, Resposta.pergunta_id == Pergunta.id
+    ).join(
+        AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id
+    ).join(
+        AssessmentVersao, AssessmentDominio.versao_id == AssessmentVersao.id
+    ).join(
+        AssessmentTipo, AssessmentVersao.tipo_id == AssessmentTipo.id
+    ).join(
+        ProjetoAssessment, and_(
+            ProjetoAssessment.projeto_id == Projeto.id,
+            ProjetoAssessment.versao_assessment_id == AssessmentVersao.id
+        )
+    ).where(
+        Projeto.ativo == True,
+        ProjetoAssessment.ativo == True
+    )
+
+    if tipo_id:
+        consulta = consulta.where(AssessmentTipo.id == tipo_id)
+    if versao_id:
+        consulta = consulta.where(AssessmentVersao.id == versao_id)
+    if cliente_id:
+        consulta = consulta.where(Projeto.cliente_id == cliente_id)
+    if data_inicio:
+        consulta = consulta.where(Resposta.data_resposta >= datetime.combine(data_inicio, time.min))
+    if data_fim:
+        consulta = consulta.where(Resposta.data_resposta < datetime.combine(data_fim + timedelta(days=1), time.min))
+    if situacao == 'finalizados':
+        consulta = consulta.where(ProjetoAssessment.finalizado == True)
+    elif situacao == 'em_andamento':
+        consulta = consulta.where(db.or_(ProjetoAssessment.finalizado == False, ProjetoAssessment.finalizado.is_(None)))
+
+    return consulta.order_by(
+        Cliente.nome,
+        Respondente.email,
+        AssessmentDominio.ordem,
+        Pergunta.ordem,
+        Resposta.id
+    )
+
+
+class ExportacaoRespostas:
+    """
+    Exportação de respostas em um formato
+
+    Uso:
+        exportacao = ExportacaoRespostas('csv', tipo_id=1)
+        for bloco in exportacao.blocos():  # bytes
+            ...
+        exportacao.total  # linhas exportadas, ao final
+    """
+
+    def __init__(self, formato='csv', lote=TAMANHO_LOTE_EXPORTACAO, **filtros):
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValueError(f'Formato inválido: {formato}')
+        if formato == 'parquet' and not parquet_disponivel():
+            raise ValueError('Exportação Parquet indisponível: instale o pacote pyarrow')
+
+        self.formato = formato
+        self.lote = lote
+        self.consulta = consulta_respostas(**filtros)
+        self.total = 0
+
+    @property
+    def mimetype(self):
+        return FORMATOS_EXPORTACAO[self.formato]['mimetype']
+
+    def nome_arquivo(self, prefixo='respostas'):
+        """Nome do arquivo com data/hora e extensão do formato"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return f"{prefixo}_{timestamp}.{FORMATOS_EXPORTACAO[self.formato]['extensao']}"
+
+    def lotes(self):
+        """Listas de linhas (dicts) lidas com cursor no servidor"""
+        resultado = db.session.execute(self.consulta.execution_options(yield_per=self.lote))
+        try:
+            for particao in resultado.mappings().partitions():
+                self.total += len(particao)
+                yield particao
+        finally:
+            resultado.close()
+
+    def blocos(self):
+        """Conteúdo do arquivo em blocos de bytes, um por lote lido"""
+        self.total = 0
+        return getattr(self, f'_blocos_{self.formato}')()
+
+    def salvar(self, caminho):
+        """Grava o arquivo e retorna a quantidade de linhas exportadas"""
+        with open(caminho, 'wb') as arquivo:
+            for bloco in self.blocos():
+                arquivo.write(bloco)
+        return self.total
+
+    def _blocos_csv(self):
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer, delimiter=';', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+
+        # BOM (utf-8-sig) para o Excel reconhecer a codificação
+        buffer.write('\ufeff')
+        escritor.writerow([titulo for _, titulo in COLUNAS_EXPORTACAO])
+
+        for linhas in self.lotes():
+            for linha in linhas:
+                escritor.writerow([_valor_csv(linha[chave]) for chave, _ in COLUNAS_EXPORTACAO])
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode('utf-8')
+
+    def _blocos_jsonl(self):
+        for linhas in self.lotes():
+            yield ''.join(
+                json.dumps({chave: linha[chave] for chave, _ in COLUNAS_EXPORTACAO},
+                           ensure_ascii=False, default=_valor_json) + '\n'
+                for linha in linhas
+            ).encode('utf-8')
+
+    def _blocos_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        esquema = pa.schema([
+            ('cliente_nome', pa.string()),
+            ('respondente_email', pa.string()),
+            ('tipo_nome', pa.string()),
+            ('dominio_nome', pa.string()),
+            ('pergunta_texto', pa.string()),
+            ('valor_resposta', pa.int32()),
+            ('comentario', pa.string()),
+            ('projeto_id', pa.int32()),
+            ('projeto_nome', pa.string()),
+            ('versao', pa.string()),
+            ('data_resposta', pa.timestamp('us')),
+            ('finalizado', pa.bool_())
+        ])
+
+        saida = _SaidaContinua()
+        escritor = pq.ParquetWriter(saida, esquema)
+        try:
+            for linhas in self.lotes():
+                escritor.write_table(pa.Table.from_pylist([dict(linha) for linha in linhas], schema=esquema))
+                yield saida.drenar()
+        finally:
+            # Rodapé do arquivo (metadados dos row groups)
+            escritor.close()
+        yield saida.drenar()
+
+
+class _SaidaContinua(io.RawIOBase):
+    """
+    Destino de escrita que entrega os bytes à medida que são escritos
+
+    O escritor Parquet usa tell() para calcular os offsets do rodapé, então
+    a posição continua contando o que já foi entregue.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._blocos = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        dados = bytes(dados)
+        self._blocos.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def drenar(self):
+        dados = b''.join(self._blocos)
+        self._blocos = []
+        return dados
+
+
+def parquet_disponivel():
+    """Indica se o pacote opcional pyarrow está instalado"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _valor_csv(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sim' if valor else 'Não'
+    if isinstance(valor, datetime):
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    return valor
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return str(valor)
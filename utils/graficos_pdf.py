@@ -0,0 +1,180 @@
+"""
+Gráficos vetoriais para os relatórios PDF
+
+Os gráficos são montados com as primitivas de desenho do ReportLab
+(reportlab.graphics.shapes) e retornados como Drawing, que pode ser
+adicionado diretamente à story de um documento. Não há imagens
+intermediárias nem arquivos temporários.
+"""
+
+import math
+import textwrap
+from reportlab.lib.colors import HexColor
+from reportlab.lib.units import inch
+from reportlab.graphics.shapes import Drawing, Polygon, PolyLine, Line, Circle, Rect, String
+
+COR_GRADE = HexColor('#d0d0d0')
+COR_TEXTO = HexColor('#2c3e50')
+COR_TEXTO_SECUNDARIO = HexColor('#6c757d')
+
+# Cores das classes CSS de utils.estatisticas_utils.classificar_maturidade
+CORES_MATURIDADE = {
+    'success': '#198754',
+    'info': '#0dcaf0',
+    'warning': '#ffc107',
+    'secondary': '#6c757d',
+    'danger': '#dc3545',
+    'dark': '#212529'
+}
+
+
+def _quebrar_rotulo(texto, largura=18, linhas=2):
+    """Divide um rótulo em até `linhas` linhas de `largura` caracteres"""
+    partes = textwrap.wrap(texto or '', largura) or ['']
+    if len(partes) > linhas:
+        partes = partes[:linhas]
+        partes[-1] = partes[-1][:largura - 3].rstrip() + '...'
+    return partes
+
+
+def grafico_radar(rotulos, valores, titulo=None, valor_maximo=5, tamanho=4.5 * inch, cor='#6f42c1'):
+    """
+    Gráfico radar (teia) com um eixo por rótulo
+
+    Args:
+        rotulos: Nomes dos eixos (ex: domínios)
+        valores: Valor de cada eixo, de 0 a valor_maximo
+        titulo: Título exibido acima do gráfico
+        valor_maximo: Valor do anel externo; os anéis são desenhados a cada unidade
+        tamanho: Largura e altura do desenho em pontos
+        cor: Cor da área e da linha dos valores
+
+    Returns:
+        Drawing ou None se não houver eixos
+    """
+    total = len(rotulos)
+    if total == 0:
+        return None
+
+    altura_titulo = 24 if titulo else 0
+    desenho = Drawing(tamanho, tamanho + altura_titulo)
+    cor = HexColor(cor)
+
+    # Margem para os rótulos ao redor da teia
+    margem = 1.1 * inch
+    raio = tamanho / 2 - margem
+    centro_x = tamanho / 2
+    centro_y = tamanho / 2
+
+    # Eixo a partir do topo, no sentido horário
+    def ponto(indice, valor):
+        angulo = math.pi / 2 - 2 * math.pi * indice / total
+        distancia = raio * max(0, min(valor, valor_maximo)) / valor_maximo
+        return centro_x + distancia * math.cos(angulo), centro_y + distancia * math.sin(angulo)
+
+    # Anéis da grade e escala
+    for nivel in range(1, int(valor_maximo) + 1):
+        pontos = []
+        for indice in range(total):
+            pontos.extend(ponto(indice, nivel))
+        if total >= 3:
+            desenho.add(Polygon(pontos, strokeColor=COR_GRADE, strokeWidth=0.5, fillColor=None))
+        else:
+            desenho.add(Circle(centro_x, centro_y, raio * nivel / valor_maximo,
+                               strokeColor=COR_GRADE, strokeWidth=0.5, fillColor=None))
+        desenho.add(String(centro_x + 2, centro_y + raio * nivel / valor_maximo + 1, str(nivel),
+                           fontName='Helvetica', fontSize=6, fillColor=COR_TEXTO_SECUNDARIO))
+
+    # Eixos e rótulos
+    for indice, rotulo in enumerate(rotulos):
+        x, y = ponto(indice, valor_maximo)
+        desenho.add(Line(centro_x, centro_y, x, y, strokeColor=COR_GRADE, strokeWidth=0.5))
+
+        cosseno = (x - centro_x) / raio
+        seno = (y - centro_y) / raio
+        if cosseno > 0.1:
+            ancora = 'start'
+        elif cosseno < -0.1:
+            ancora = 'end'
+        else:
+            ancora = 'middle'
+
+        # Linha de base da primeira linha do rótulo, afastada da ponta do eixo
+        linhas = _quebrar_rotulo(rotulo)
+        rotulo_x = x + 6 * cosseno
+        if seno > 0.1:
+            rotulo_y = y + 6 * seno + 4 + 9 * (len(linhas) - 1)
+        elif seno < -0.1:
+            rotulo_y = y + 6 * seno - 9
+        else:
+            rotulo_y = y - 3 + 4.5 * (len(linhas) - 1)
+        for numero, linha in enumerate(linhas):
+            desenho.add(String(rotulo_x, rotulo_y - 9 * numero, linha, fontName='Helvetica',
+                               fontSize=8, fillColor=COR_TEXTO, textAnchor=ancora))
+
+    # Área dos valores
+    pontos = []
+    for indice, valor in enumerate(valores):
+        pontos.extend(ponto(indice, valor))
+    if total >= 3:
+        desenho.add(Polygon(pontos, strokeColor=cor, strokeWidth=2, fillColor=cor, fillOpacity=0.25))
+    else:
+        desenho.add(PolyLine(pontos, strokeColor=cor, strokeWidth=2))
+    for indice in range(total):
+        x, y = pontos[2 * indice], pontos[2 * indice + 1]
+        desenho.add(Circle(x, y, 2.5, strokeColor=cor, fillColor=cor))
+
+    if titulo:
+        desenho.add(String(tamanho / 2, tamanho + altura_titulo - 14, titulo, fontName='Helvetica-Bold',
+                           fontSize=12, fillColor=COR_TEXTO, textAnchor='middle'))
+
+    return desenho
+
+
+def grafico_barras(rotulos, valores, valor_maximo=5, largura=6 * inch, cores=None, cor='#0d6efd'):
+    """
+    Gráfico de barras horizontais, uma barra por rótulo
+
+    Args:
+        rotulos: Nome de cada barra
+        valores: Valor de cada barra, de 0 a valor_maximo
+        valor_maximo: Valor correspondente à barra cheia
+        largura: Largura do desenho em pontos
+        cores: Cor (hex) de cada barra; se omitido, usa `cor` para todas
+
+    Returns:
+        Drawing ou None se não houver barras
+    """
+    total = len(rotulos)
+    if total == 0:
+        return None
+
+    altura_barra = 12
+    espacamento = 6
+    largura_rotulo = 2.2 * inch
+    largura_valor = 0.5 * inch
+    largura_barras = largura - largura_rotulo - largura_valor
+    altura = total * (altura_barra + espacamento) + espacamento + 12
+
+    desenho = Drawing(largura, altura)
+
+    # Linhas de referência a cada unidade
+    for nivel in range(int(valor_maximo) + 1):
+        x = largura_rotulo + largura_barras * nivel / valor_maximo
+        desenho.add(Line(x, 12, x, altura, strokeColor=COR_GRADE, strokeWidth=0.5))
+        desenho.add(String(x, 2, str(nivel), fontName='Helvetica', fontSize=7,
+                           fillColor=COR_TEXTO_SECUNDARIO, textAnchor='middle'))
+
+    for indice, (rotulo, valor) in enumerate(zip(rotulos, valores)):
+        y = altura - (indice + 1) * (altura_barra + espacamento)
+        cor_barra = HexColor(cores[indice] if cores else cor)
+        comprimento = largura_barras * max(0, min(valor, valor_maximo)) / valor_maximo
+
+        desenho.add(String(largura_rotulo - 6, y + 3, _quebrar_rotulo(rotulo, 38, 1)[0],
+                           fontName='Helvetica', fontSize=8, fillColor=COR_TEXTO, textAnchor='end'))
+        desenho.add(Rect(largura_rotulo, y, comprimento, altura_barra,
+                         strokeColor=None, fillColor=cor_barra))
+        desenho.add(String(largura_rotulo + largura_barras + 6, y + 3, f'{valor:.1f}',
+                           fontName='Helvetica-Bold', fontSize=8, fillColor=COR_TEXTO))
+
+    return desenho
@@ -1,45 +1,149 @@
 """
 Processador em lote para análises IA
 Permite processamento incremental com salvamento de progresso
+
+As chamadas à OpenAI de cada domínio são feitas em paralelo (até
+IA_CONCORRENCIA ao mesmo tempo). A coleta de dados e o salvamento continuam
+na thread que chamou, que é a única a usar a sessão do banco.
 """
 
+import os
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from flask import current_app
 from utils.openai_utils import OpenAIAssistant, coletar_dados_dominio_para_ia
 from app import db
 
-def processar_dominio_individual(projeto, dominio, assistant, tipo_nome):
-    """Processa um domínio individual e retorna resultado"""
-    try:
-        logging.info(f"Processando domínio: {dominio.nome}")
+# Número máximo de chamadas simultâneas à OpenAI
+IA_CONCORRENCIA = int(os.environ.get('IA_CONCORRENCIA', '4'))
+
+# Timeout (segundos) de cada chamada de análise de domínio
+IA_TIMEOUT_DOMINIO = float(os.environ.get('IA_TIMEOUT_DOMINIO_SEGUNDOS', '15'))
+
+def listar_dominios_projeto(projeto):
+    """Retorna [(dominio, tipo_nome)] dos assessments finalizados, na ordem do relatório"""
+    dominios_para_processar = []
+    
+    for projeto_assessment in projeto.assessments:
+        if not projeto_assessment.finalizado:
+            continue
+        
+        # Identificar domínios do assessment
+        dominios_query = None
+        if projeto_assessment.versao_assessment_id:
+            # Sistema novo
+            from models.assessment_version import AssessmentDominio
+            dominios_query = AssessmentDominio.query.filter_by(
+                versao_id=projeto_assessment.versao_assessment.id,
+                ativo=True
+            ).order_by(AssessmentDominio.ordem)
+        elif projeto_assessment.tipo_assessment_id:
+            # Sistema antigo
+            from models.dominio import Dominio
+            dominios_query = Dominio.query.filter_by(
+                tipo_assessment_id=projeto_assessment.tipo_assessment_id,
+                ativo=True
+            ).order_by(Dominio.ordem)
+        
+        if not dominios_query:
+            continue
+        
+        tipo_nome = (projeto_assessment.versao_assessment.tipo.nome
+                    if projeto_assessment.versao_assessment_id
+                    else projeto_assessment.tipo_assessment.nome)
         
-        # Coletar dados do domínio
+        # Adicionar domínios à lista
+        for dominio in dominios_query:
+            dominios_para_processar.append((dominio, tipo_nome))
+    
+    return dominios_para_processar
+
+def analisar_dominios_concorrente(projeto, assistant, dominios_para_processar, ao_concluir_dominio=None,
+                                  concorrencia=None, timeout=None):
+    """
+    Gera a análise de vários domínios com chamadas paralelas à OpenAI.
+    
+    ao_concluir_dominio(analises, processados, concluidos, total, dominio_nome) é
+    chamado na thread atual sempre que um domínio termina (com ou sem sucesso);
+    analises já vem organizado por tipo e na ordem original dos domínios.
+    
+    Retorna (analises, dominios_processados).
+    """
+    concorrencia = max(1, concorrencia or IA_CONCORRENCIA)
+    timeout = timeout or IA_TIMEOUT_DOMINIO
+    total = len(dominios_para_processar)
+    
+    # Coleta de dados no banco (sequencial, na thread atual)
+    itens = []
+    for dominio, tipo_nome in dominios_para_processar:
         dados_dominio = coletar_dados_dominio_para_ia(projeto, dominio)
         if not dados_dominio:
             logging.warning(f"Não foi possível coletar dados para domínio: {dominio.nome}")
-            return None
-        
-        # Gerar análise
-        analise = assistant.gerar_analise_dominio(dados_dominio)
-        if not analise:
-            logging.warning(f"Análise vazia para domínio: {dominio.nome}")
-            return None
-        
-        return {
-            'dominio_nome': dominio.nome,
-            'tipo_nome': tipo_nome,
-            'analise': analise,
-            'estatisticas': dados_dominio['estatisticas'],
-            'gerado_em': datetime.now().isoformat()
+        itens.append((dominio.nome, tipo_nome, dados_dominio))
+    
+    resultados = [None] * total
+    
+    def montar_analises():
+        # Sempre na ordem original, para que o JSON salvo mantenha a ordem dos domínios
+        analises = {}
+        for (dominio_nome, tipo_nome, _), resultado in zip(itens, resultados):
+            if resultado:
+                analises.setdefault(tipo_nome, {})[dominio_nome] = resultado
+        return analises
+    
+    logging.info(f"Analisando {total} domínios com até {concorrencia} chamadas simultâneas")
+    
+    # As threads precisam do contexto da aplicação (o cache de respostas usa o banco)
+    app = current_app._get_current_object()
+    
+    def gerar_analise(dados):
+        with app.app_context():
+            return assistant.gerar_analise_dominio(dados, timeout)
+    
+    processados = 0
+    with ThreadPoolExecutor(max_workers=concorrencia, thread_name_prefix='analise-ia') as executor:
+        futuros = {
+            executor.submit(gerar_analise, dados): indice
+            for indice, (_, _, dados) in enumerate(itens) if dados
         }
+        concluidos = total - len(futuros)
         
-    except Exception as e:
-        logging.error(f"Erro ao processar domínio {dominio.nome}: {e}")
-        return None
+        for futuro in as_completed(futuros):
+            indice = futuros[futuro]
+            dominio_nome, tipo_nome, dados_dominio = itens[indice]
+            concluidos += 1
+            
+            try:
+                analise = futuro.result()
+            except Exception as e:
+                logging.error(f"Erro ao processar domínio {dominio_nome}: {e}")
+                analise = None
+            
+            if analise:
+                resultados[indice] = {
+                    'analise': analise,
+                    'estatisticas': dados_dominio['estatisticas'],
+                    'gerado_em': datetime.now().isoformat()
+                }
+                processados += 1
+            else:
+                logging.warning(f"Análise vazia para domínio: {dominio_nome}")
+            
+            logging.info(f"Progresso: {concluidos}/{total} ({processados} com sucesso)")
+            if ao_concluir_dominio:
+                ao_concluir_dominio(montar_analises(), processados, concluidos, total, dominio_nome)
+    
+    return montar_analises(), processados
+
+def gerar_analise_incremental(projeto, publicar_progresso=None):
+    """
+    Gera análise incremental dos domínios
 
-def gerar_analise_incremental(projeto):
-    """Gera análise incremental dos domínios"""
+    publicar_progresso, se informado, recebe um dict com o andamento
+    (processed, total, percentage, current_domain) a cada domínio concluído.
+    """
     try:
         logging.info(f"Iniciando análise incremental para projeto {projeto.id}")
         
@@ -56,77 +160,46 @@ def gerar_analise_incremental(projeto):
                 'erro': 'Integração com ChatGPT não configurada.'
             }
         
-        # Estrutura para armazenar resultados
-        dominios_analises = {}
-        total_dominios = 0
-        dominios_processados = 0
-        
         # Coletar lista de domínios
-        dominios_para_processar = []
-        
-        for projeto_assessment in projeto.assessments:
-            if not projeto_assessment.finalizado:
-                continue
-                
-            # Identificar domínios do assessment
-            dominios_query = None
-            if projeto_assessment.versao_assessment_id:
-                # Sistema novo
-                from models.assessment_version import AssessmentDominio
-                dominios_query = AssessmentDominio.query.filter_by(
-                    versao_id=projeto_assessment.versao_assessment.id,
-                    ativo=True
-                ).order_by(AssessmentDominio.ordem)
-            elif projeto_assessment.tipo_assessment_id:
-                # Sistema antigo
-                from models.dominio import Dominio
-                dominios_query = Dominio.query.filter_by(
-                    tipo_assessment_id=projeto_assessment.tipo_assessment_id,
-                    ativo=True
-                ).order_by(Dominio.ordem)
-            
-            if not dominios_query:
-                continue
-                
-            tipo_nome = (projeto_assessment.versao_assessment.tipo.nome 
-                        if projeto_assessment.versao_assessment_id 
-                        else projeto_assessment.tipo_assessment.nome)
-            
-            # Adicionar domínios à lista
-            for dominio in dominios_query:
-                dominios_para_processar.append((dominio, tipo_nome))
-                total_dominios += 1
+        dominios_para_processar = listar_dominios_projeto(projeto)
+        total_dominios = len(dominios_para_processar)
         
         if not dominios_para_processar:
             return {'erro': 'Nenhum domínio encontrado para análise.'}
         
         logging.info(f"Encontrados {total_dominios} domínios para processar")
         
-        # Processar domínios um por um
-        for dominio, tipo_nome in dominios_para_processar:
-            resultado_dominio = processar_dominio_individual(projeto, dominio, assistant, tipo_nome)
+        if publicar_progresso:
+            publicar_progresso({
+                'status': 'processing',
+                'current_domain': f'Analisando {total_dominios} domínios...',
+                'processed': 0,
+                'total': total_dominios,
+                'percentage': 0
+            })
+        
+        def ao_concluir_dominio(analises, processados, concluidos, total, dominio_nome):
+            # Salvamento incremental a cada domínio processado
+            try:
+                projeto.analise_dominios_ia = json.dumps(analises, ensure_ascii=False)
+                db.session.commit()
+                logging.info(f"Progresso salvo: {processados} domínios")
+            except Exception as e:
+                logging.error(f"Erro ao salvar progresso: {e}")
+                db.session.rollback()
             
-            if resultado_dominio:
-                # Organizar por tipo
-                if tipo_nome not in dominios_analises:
-                    dominios_analises[tipo_nome] = {}
-                
-                dominios_analises[tipo_nome][resultado_dominio['dominio_nome']] = {
-                    'analise': resultado_dominio['analise'],
-                    'estatisticas': resultado_dominio['estatisticas'],
-                    'gerado_em': resultado_dominio['gerado_em']
-                }
-                
-                dominios_processados += 1
-                logging.info(f"Progresso: {dominios_processados}/{total_dominios}")
-                
-                # Salvamento incremental a cada domínio processado
-                try:
-                    projeto.analise_dominios_ia = json.dumps(dominios_analises, ensure_ascii=False)
-                    db.session.commit()
-                    logging.info(f"Progresso salvo: {dominios_processados} domínios")
-                except Exception as e:
-                    logging.error(f"Erro ao salvar progresso: {e}")
+            if publicar_progresso:
+                publicar_progresso({
+                    'status': 'processing',
+                    'current_domain': f'Concluído: {dominio_nome}',
+                    'processed': concluidos,
+                    'total': total,
+                    'percentage': int((concluidos / total) * 100)
+                })
+            
+        dominios_analises, dominios_processados = analisar_dominios_concorrente(
+            projeto, assistant, dominios_para_processar, ao_concluir_dominio=ao_concluir_dominio
+        )
         
         return {
             'analises': dominios_analises,
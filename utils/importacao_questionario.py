@@ -0,0 +1,306 @@
+"""
+Importação de domínios e perguntas de uma versão de assessment via CSV
+
+O arquivo é lido como stream (linha a linha, sem decodificar o upload inteiro
+em memória). Os domínios e perguntas já existentes na versão são carregados
+com uma consulta cada e comparados em memória com o CSV - domínios pelo nome,
+perguntas pelo texto dentro do domínio - resultando em uma lista de
+alterações (criar, atualizar, inalterado). A simulação (dry-run) apenas
+devolve essa lista; a aplicação grava tudo com INSERT/UPDATE em lote na
+transação da sessão, e quem chama faz o commit.
+
+Formato (separador ponto e vírgula):
+Dominio;DescriçãoDominio;OrdemDominio;Pergunta;DescriçãoPergunta;Referência;Recomendação;Light;OrdemPergunta
+
+Apenas Dominio e Pergunta são obrigatórias. Nas atualizações, uma coluna
+ausente do arquivo (ou uma ordem em branco) mantém o valor atual.
+"""
+
+import io
+import csv
+from sqlalchemy import select, update
+from app import db
+from models.assessment_version import AssessmentDominio
+from models.pergunta import Pergunta
+
+COLUNAS_OBRIGATORIAS = ('Dominio', 'Pergunta')
+
+VALORES_LIGHT = ('1', 'sim', 'true', 's')
+
+# Chave de cada total em totais(), por (entidade, ação)
+CHAVES_TOTAIS = {
+    ('dominio', 'criar'): 'dominios_criados',
+    ('dominio', 'atualizar'): 'dominios_atualizados',
+    ('dominio', 'inalterado'): 'dominios_inalterados',
+    ('pergunta', 'criar'): 'perguntas_criadas',
+    ('pergunta', 'atualizar'): 'perguntas_atualizadas',
+    ('pergunta', 'inalterado'): 'perguntas_inalteradas'
+}
+
+# Itens de alteração devolvidos na simulação (o resumo sempre traz todos os totais)
+LIMITE_ITENS_PREVIA = 500
+
+
+class ImportacaoQuestionario:
+    """
+    Comparação de um CSV com a estrutura de uma versão e aplicação em lote
+
+    Uso:
+        importacao = ImportacaoQuestionario(versao_id)
+        importacao.analisar(arquivo.stream)
+        importacao.resumo()   # simulação
+        importacao.aplicar()  # grava na sessão (commit a cargo de quem chama)
+    """
+
+    def __init__(self, versao_id=None):
+        # Sem versão (nova versão ainda não criada) todos os itens são criações
+        self.versao_id = versao_id
+        self.dominios = {}
+        self.avisos = []
+        self.linhas = 0
+        self.alteracoes = []
+
+    def analisar(self, stream):
+        """Lê o CSV e calcula as alterações em relação à versão"""
+        self._ler(stream)
+        self._comparar()
+        return self
+
+    def _ler(self, stream):
+        texto = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        try:
+            leitor = csv.DictReader(texto, delimiter=';')
+            colunas = [coluna.strip() for coluna in (leitor.fieldnames or [])]
+            faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in colunas]
+            if faltando:
+                raise ValueError(f'CSV deve conter as colunas: {", ".join(faltando)}')
+            leitor.fieldnames = colunas
+
+            for numero, linha in enumerate(leitor, start=2):
+                self.linhas += 1
+                self._ler_linha(numero, linha)
+        except UnicodeDecodeError:
+            raise ValueError('O arquivo deve estar codificado em UTF-8')
+        finally:
+            # Não fechar o stream do upload junto com o wrapper
+            texto.detach()
+
+    def _ler_linha(self, numero, linha):
+        nome = (linha.get('Dominio') or '').strip()[:200]
+        texto = (linha.get('Pergunta') or '').strip()
+        if not nome or not texto:
+            self.avisos.append(f'Linha {numero}: sem domínio ou pergunta, ignorada')
+            return
+
+        dominio = self.dominios.get(nome)
+        if dominio is None:
+            dominio = self.dominios[nome] = {
+                'nome': nome,
+                'descricao': _texto_opcional(linha.get('DescriçãoDominio')),
+                'ordem': self._ordem(numero, linha.get('OrdemDominio'), 'OrdemDominio'),
+                'perguntas': {}
+            }
+
+        if texto in dominio['perguntas']:
+            self.avisos.append(f'Linha {numero}: pergunta repetida no domínio "{nome}", vale a última ocorrência')
+
+        light = linha.get('Light')
+        dominio['perguntas'][texto] = {
+            'texto': texto,
+            'descricao': _texto_opcional(linha.get('DescriçãoPergunta')),
+            'referencia': _texto_opcional(linha.get('Referência')),
+            'recomendacao': _texto_opcional(linha.get('Recomendação')),
+            'light': None if light is None else light.strip().lower() in VALORES_LIGHT,
+            'ordem': self._ordem(numero, linha.get('OrdemPergunta'), 'OrdemPergunta')
+        }
+
+    def _ordem(self, numero, valor, coluna):
+        valor = (valor or '').strip()
+        if not valor:
+            return None
+        try:
+            return int(valor)
+        except ValueError:
+            self.avisos.append(f'Linha {numero}: {coluna} inválida ("{valor}"), ignorada')
+            return None
+
+    def _existentes(self):
+        """Domínios (por nome) e perguntas (por domínio e texto) da versão, uma consulta cada"""
+        if not self.versao_id:
+            return {}, {}
+
+        dominios = {
+            dominio.nome: dominio
+            for dominio in db.session.execute(
+                select(AssessmentDominio.id, AssessmentDominio.nome, AssessmentDominio.descricao,
+                       AssessmentDominio.ordem, AssessmentDominio.ativo)
+                .where(AssessmentDominio.versao_id == self.versao_id)
+                .order_by(AssessmentDominio.id)
+            )
+        }
+
+        perguntas = {}
+        if dominios:
+            for pergunta in db.session.execute(
+                select(Pergunta.id, Pergunta.dominio_versao_id, Pergunta.texto, Pergunta.descricao,
+                       Pergunta.referencia, Pergunta.recomendacao, Pergunta.light, Pergunta.ordem, Pergunta.ativo)
+                .where(Pergunta.dominio_versao_id.in_([dominio.id for dominio in dominios.values()]))
+                .order_by(Pergunta.id)
+            ):
+                perguntas[(pergunta.dominio_versao_id, pergunta.texto)] = pergunta
+
+        return dominios, perguntas
+
+    def _comparar(self):
+        dominios_existentes, perguntas_existentes = self._existentes()
+        self.alteracoes = []
+
+        proxima_ordem_dominio = max((d.ordem or 0 for d in dominios_existentes.values()), default=0) + 1
+        ordens_perguntas = {}
+        for pergunta in perguntas_existentes.values():
+            atual = ordens_perguntas.get(pergunta.dominio_versao_id, 0)
+            ordens_perguntas[pergunta.dominio_versao_id] = max(atual, pergunta.ordem or 0)
+
+        for nome, dominio in self.dominios.items():
+            existente = dominios_existentes.get(nome)
+            if existente is None:
+                valores = {'nome': nome, 'descricao': _normalizar(dominio['descricao']), 'ordem': dominio['ordem']}
+                if valores['ordem'] is None:
+                    valores['ordem'] = proxima_ordem_dominio
+                proxima_ordem_dominio = max(proxima_ordem_dominio, valores['ordem']) + 1
+                self._registrar('dominio', 'criar', nome, valores=valores)
+                proxima_ordem_pergunta = 1
+            else:
+                valores = _diferencas(existente, {
+                    'descricao': dominio['descricao'],
+                    'ordem': dominio['ordem'],
+                    'ativo': True
+                })
+                self._registrar('dominio', 'atualizar' if valores else 'inalterado', nome,
+                                id=existente.id, valores=valores)
+                proxima_ordem_pergunta = ordens_perguntas.get(existente.id, 0) + 1
+
+            for texto, pergunta in dominio['perguntas'].items():
+                pergunta_existente = perguntas_existentes.get((existente.id, texto)) if existente else None
+                if pergunta_existente is None:
+                    valores = {campo: _normalizar(valor) for campo, valor in pergunta.items()}
+                    valores['light'] = bool(valores['light'])
+                    if valores['ordem'] is None:
+                        valores['ordem'] = proxima_ordem_pergunta
+                    proxima_ordem_pergunta = max(proxima_ordem_pergunta, valores['ordem']) + 1
+                    self._registrar('pergunta', 'criar', nome, texto, valores=valores)
+                else:
+                    valores = _diferencas(pergunta_existente, {
+                        'descricao': pergunta['descricao'],
+                        'referencia': pergunta['referencia'],
+                        'recomendacao': pergunta['recomendacao'],
+                        'light': pergunta['light'],
+                        'ordem': pergunta['ordem'],
+                        'ativo': True
+                    })
+                    self._registrar('pergunta', 'atualizar' if valores else 'inalterado', nome, texto,
+                                    id=pergunta_existente.id, valores=valores)
+
+    def _registrar(self, entidade, acao, dominio, texto=None, id=None, valores=None):
+        self.alteracoes.append({
+            'entidade': entidade,
+            'acao': acao,
+            'dominio': dominio,
+            'texto': texto,
+            'id': id,
+            'valores': valores or {}
+        })
+
+    def totais(self):
+        """Quantidade de alterações por entidade e ação"""
+        totais = dict.fromkeys(CHAVES_TOTAIS.values(), 0)
+        for alteracao in self.alteracoes:
+            totais[CHAVES_TOTAIS[(alteracao['entidade'], alteracao['acao'])]] += 1
+        return totais
+
+    def resumo(self, limite=LIMITE_ITENS_PREVIA):
+        """Resultado da simulação: totais, avisos e as alterações que gravam algo"""
+        itens = [
+            {
+                'entidade': alteracao['entidade'],
+                'acao': alteracao['acao'],
+                'dominio': alteracao['dominio'],
+                'texto': alteracao['texto'],
+                'campos': sorted(alteracao['valores']) if alteracao['acao'] == 'atualizar' else []
+            }
+            for alteracao in self.alteracoes if alteracao['acao'] != 'inalterado'
+        ]
+        return {
+            'linhas': self.linhas,
+            'totais': self.totais(),
+            'avisos': self.avisos,
+            'alteracoes': itens[:limite],
+            'alteracoes_omitidas': max(len(itens) - limite, 0)
+        }
+
+    def aplicar(self):
+        """
+        Grava as alterações em lote na sessão atual (sem commit)
+
+        Returns:
+            Totais por entidade e ação (ver totais())
+        """
+        from utils.versao_utils import inserir_dominios, inserir_perguntas
+
+        if not self.versao_id:
+            raise ValueError('Versão de destino não informada')
+
+        por_tipo = {}
+        for alteracao in self.alteracoes:
+            por_tipo.setdefault((alteracao['entidade'], alteracao['acao']), []).append(alteracao)
+
+        # Domínios novos primeiro, para obter os ids usados pelas perguntas
+        novos_dominios = por_tipo.get(('dominio', 'criar'), [])
+        ids_dominios = {
+            alteracao['dominio']: alteracao['id']
+            for alteracao in self.alteracoes if alteracao['entidade'] == 'dominio'
+        }
+        ids_dominios.update(zip(
+            (alteracao['dominio'] for alteracao in novos_dominios),
+            inserir_dominios(self.versao_id, [alteracao['valores'] for alteracao in novos_dominios])
+        ))
+
+        _atualizar(AssessmentDominio, por_tipo.get(('dominio', 'atualizar'), []))
+
+        inserir_perguntas([
+            dict(alteracao['valores'], dominio_versao_id=ids_dominios[alteracao['dominio']])
+            for alteracao in por_tipo.get(('pergunta', 'criar'), [])
+        ])
+
+        _atualizar(Pergunta, por_tipo.get(('pergunta', 'atualizar'), []))
+
+        return self.totais()
+
+
+def _atualizar(modelo, alteracoes):
+    """UPDATE em lote pela chave primária (agrupado pelos campos alterados)"""
+    if alteracoes:
+        db.session.execute(update(modelo), [
+            dict(alteracao['valores'], id=alteracao['id']) for alteracao in alteracoes
+        ])
+
+
+def _texto_opcional(valor):
+    """None se a coluna não existe no arquivo, '' se está vazia"""
+    return None if valor is None else valor.strip()
+
+
+def _normalizar(valor):
+    """Textos em branco são gravados (e comparados) como NULL"""
+    if isinstance(valor, str):
+        return valor or None
+    return valor
+
+
+def _diferencas(existente, novos):
+    """Campos cujo valor novo difere do atual (None mantém o atual)"""
+    return {
+        campo: _normalizar(valor)
+        for campo, valor in novos.items()
+        if valor is not None and _normalizar(valor) != _normalizar(getattr(existente, campo))
+    }
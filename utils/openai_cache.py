@@ -0,0 +1,156 @@
+"""
+Cache persistente de respostas da OpenAI (tabela cache_openai)
+
+A chave é o SHA-256 de (operação, modelo, prompt de sistema, prompt do
+usuário, temperatura, max_tokens): requisições idênticas devolvem a resposta
+gravada sem custo de tokens. Entradas sem acesso há OPENAI_CACHE_MAX_DIAS
+são removidas e, acima de OPENAI_CACHE_MAX_MB, as menos usadas recentemente.
+
+OPENAI_CACHE_DESATIVADO=1 desliga o cache; cada chamada também pode
+ignorá-lo com usar_cache=False.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, insert, delete, func
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+MAX_DIAS = int(os.environ.get('OPENAI_CACHE_MAX_DIAS', '30'))
+MAX_BYTES = int(float(os.environ.get('OPENAI_CACHE_MAX_MB', '50')) * 1024 * 1024)
+
+# Intervalo mínimo entre duas limpezas no mesmo processo
+INTERVALO_LIMPEZA = 3600
+
+_ultima_limpeza = 0.0
+_limpeza_lock = threading.Lock()
+
+
+def cache_ativo():
+    """Verifica se o cache não foi desligado por variável de ambiente"""
+    return os.environ.get('OPENAI_CACHE_DESATIVADO', '').lower() not in ('1', 'true', 'sim')
+
+
+def calcular_chave(operacao, modelo, system_prompt, user_prompt, temperatura, max_tokens=None):
+    """Calcula a chave (SHA-256) de uma requisição"""
+    conteudo = json.dumps(
+        [operacao, modelo, system_prompt, user_prompt, temperatura, max_tokens],
+        ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def _tabela():
+    from models.cache_openai import CacheOpenAI
+    return CacheOpenAI.__table__
+
+
+def obter(chave):
+    """Retorna a resposta gravada para a chave, ou None"""
+    tabela = _tabela()
+    try:
+        # Conexão própria para não interferir na transação da sessão de quem chama
+        with db.engine.begin() as conn:
+            resposta = conn.execute(
+                select(tabela.c.resposta).where(tabela.c.chave == chave)
+            ).scalar()
+            if resposta is not None:
+                conn.execute(
+                    update(tabela)
+                    .where(tabela.c.chave == chave)
+                    .values(acessos=tabela.c.acessos + 1, ultimo_acesso=datetime.utcnow())
+                )
+        return resposta
+    except Exception as e:
+        logging.error(f"Erro ao consultar cache OpenAI: {e}")
+        return None
+
+
+def salvar(chave, operacao, modelo, resposta, tokens_prompt=None, tokens_resposta=None):
+    """Grava uma resposta no cache"""
+    tabela = _tabela()
+    agora = datetime.utcnow()
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(insert(tabela).values(
+                chave=chave,
+                operacao=operacao,
+                modelo=modelo,
+                resposta=resposta,
+                tamanho=len(resposta.encode('utf-8')),
+                tokens_prompt=tokens_prompt,
+                tokens_resposta=tokens_resposta,
+                acessos=0,
+                data_criacao=agora,
+                ultimo_acesso=agora
+            ))
+    except IntegrityError:
+        # Outra thread/worker gravou a mesma resposta ao mesmo tempo
+        pass
+    except Exception as e:
+        logging.error(f"Erro ao gravar cache OpenAI: {e}")
+        return
+
+    global _ultima_limpeza
+    if time.monotonic() - _ultima_limpeza > INTERVALO_LIMPEZA:
+        with _limpeza_lock:
+            if time.monotonic() - _ultima_limpeza > INTERVALO_LIMPEZA:
+                _ultima_limpeza = time.monotonic()
+                limpar()
+
+
+def remover(chave):
+    """Remove uma resposta do cache (ex.: resposta que não pôde ser interpretada)"""
+    tabela = _tabela()
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(delete(tabela).where(tabela.c.chave == chave))
+    except Exception as e:
+        logging.error(f"Erro ao remover resposta do cache OpenAI: {e}")
+
+
+def limpar(max_dias=None, max_bytes=None):
+    """
+    Remove entradas antigas e, se o cache passar do limite de tamanho,
+    as menos acessadas recentemente. Retorna a quantidade removida.
+    """
+    max_dias = MAX_DIAS if max_dias is None else max_dias
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    tabela = _tabela()
+    removidas = 0
+
+    try:
+        with db.engine.begin() as conn:
+            resultado = conn.execute(
+                delete(tabela).where(tabela.c.ultimo_acesso < datetime.utcnow() - timedelta(days=max_dias))
+            )
+            removidas += resultado.rowcount or 0
+
+            total = conn.execute(select(func.coalesce(func.sum(tabela.c.tamanho), 0))).scalar()
+            if total > max_bytes:
+                acumulado = 0
+                excedentes = []
+                linhas = conn.execute(
+                    select(tabela.c.id, tabela.c.tamanho)
+                    .order_by(tabela.c.ultimo_acesso.desc(), tabela.c.id.desc())
+                )
+                for linha in linhas:
+                    acumulado += linha.tamanho
+                    if acumulado > max_bytes:
+                        excedentes.append(linha.id)
+
+                for inicio in range(0, len(excedentes), 500):
+                    conn.execute(delete(tabela).where(tabela.c.id.in_(excedentes[inicio:inicio + 500])))
+                removidas += len(excedentes)
+
+        if removidas:
+            logging.info(f"Cache OpenAI: {removidas} entradas removidas")
+    except Exception as e:
+        logging.error(f"Erro ao limpar cache OpenAI: {e}")
+
+    return removidas
@@ -86,8 +86,17 @@ class OpenAIPayloadMonitor:
         return analysis
     
     def log_request(self, operation: str, payload_analysis: Dict, response_time: float, 
-                   success: bool, error: Optional[str] = None):
-        """Registra métricas de uma requisição"""
+                   success: bool, error: Optional[str] = None,
+                   tokens_prompt: Optional[int] = None, tokens_resposta: Optional[int] = None,
+                   extra: Optional[Dict[str, Any]] = None):
+        """
+        Registra métricas de uma requisição
+        
+        tokens_prompt/tokens_resposta são os valores reais informados pela API
+        (response.usage); sem eles é usada a estimativa do payload.
+        """
+        
+        tokens_entrada = tokens_prompt if tokens_prompt is not None else payload_analysis['payload_size']['estimated_tokens']
         
         request_log = {
             'timestamp': datetime.now().isoformat(),
@@ -97,12 +106,17 @@ class OpenAIPayloadMonitor:
             'response_time_seconds': response_time,
             'success': success,
             'error': error,
+            'tokens_prompt': tokens_prompt,
+            'tokens_resposta': tokens_resposta,
             'warnings': payload_analysis.get('warnings', [])
         }
+        if extra:
+            request_log.update(extra)
         
         # Atualizar métricas globais
         self.metrics['total_requests'] += 1
-        self.metrics['total_tokens_input'] += payload_analysis['payload_size']['estimated_tokens']
+        self.metrics['total_tokens_input'] += tokens_entrada
+        self.metrics['total_tokens_output'] += tokens_resposta or 0
         
         # Calcular média de tempo de resposta
         if self.metrics['avg_response_time'] == 0:
@@ -126,7 +140,8 @@ class OpenAIPayloadMonitor:
         level = logging.WARNING if not success or payload_analysis.get('warnings') else logging.INFO
         logging.log(level, 
                    f"OpenAI {operation}: "
-                   f"{payload_analysis['payload_size']['estimated_tokens']:,} tokens, "
+                   f"{tokens_entrada:,} tokens"
+                   f"{f' (+{tokens_resposta:,} na resposta)' if tokens_resposta else ''}, "
                    f"{response_time:.2f}s, "
                    f"Success: {success}"
                    f"{f', Error: {error}' if error else ''}")
@@ -145,6 +160,7 @@ class OpenAIPayloadMonitor:
         return {
             'total_requests': self.metrics['total_requests'],
             'total_tokens_input': self.metrics['total_tokens_input'],
+            'total_tokens_output': self.metrics['total_tokens_output'],
             'avg_response_time': round(self.metrics['avg_response_time'], 2),
             'large_payload_warnings': self.metrics['large_payload_warnings'],
             'recent_requests': self.metrics['request_history'][-5:],  # Últimos 5
@@ -15,9 +15,10 @@ from utils.openai_monitor import payload_monitor, monitor_openai_request
 class OpenAIAssistant:
     """Classe para gerenciar a integração com OpenAI Assistant"""
     
-    def __init__(self):
+    def __init__(self, usar_cache=True):
         self.client = None
         self.assistant_name = None
+        self.usar_cache = usar_cache
         self._initialize_client()
     
     def _initialize_client(self):
@@ -55,6 +56,64 @@ class OpenAIAssistant:
         """Verifica se o cliente está configurado"""
         return self.client is not None
     
+    def completar(self, operacao, modelo, system_prompt, user_prompt, max_tokens, temperature, timeout=None,
+                  usar_cache=None, formato_json=False, uso=None):
+        """
+        Executa uma chat completion, reaproveitando a resposta do cache quando a
+        mesma requisição (operação, modelo, prompts, temperatura) já foi feita.
+        
+        usar_cache=False (ou OpenAIAssistant(usar_cache=False)) força uma nova geração.
+        formato_json=True pede à API uma resposta em JSON válido.
+        uso, se informado (dict), recebe tokens_prompt, tokens_resposta, cache e chave.
+        """
+        from utils import openai_cache
+        
+        if usar_cache is None:
+            usar_cache = self.usar_cache
+        usar_cache = usar_cache and openai_cache.cache_ativo()
+        
+        chave = openai_cache.calcular_chave(operacao, modelo, system_prompt, user_prompt, temperature, max_tokens)
+        if usar_cache:
+            resposta = openai_cache.obter(chave)
+            if resposta is not None:
+                logging.info(f"Resposta de '{operacao}' obtida do cache ({chave[:12]})")
+                if uso is not None:
+                    uso.update({'tokens_prompt': None, 'tokens_resposta': None, 'cache': True, 'chave': chave})
+                return resposta
+        
+        parametros = {
+            'model': modelo,
+            'messages': [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            'max_tokens': max_tokens,
+            'temperature': temperature
+        }
+        if timeout is not None:
+            parametros['timeout'] = timeout
+        if formato_json:
+            parametros['response_format'] = {'type': 'json_object'}
+        
+        response = self.client.chat.completions.create(**parametros)
+        resposta = (response.choices[0].message.content or '').strip()
+        
+        usage = getattr(response, 'usage', None)
+        tokens_prompt = getattr(usage, 'prompt_tokens', None)
+        tokens_resposta = getattr(usage, 'completion_tokens', None)
+        if uso is not None:
+            uso.update({'tokens_prompt': tokens_prompt, 'tokens_resposta': tokens_resposta, 'cache': False, 'chave': chave})
+        
+        # Respostas vazias não são gravadas para que a próxima chamada tente de novo
+        if resposta:
+            openai_cache.salvar(
+                chave, operacao, modelo, resposta,
+                tokens_prompt=tokens_prompt,
+                tokens_resposta=tokens_resposta
+            )
+        
+        return resposta
+    
     def gerar_introducao_projeto(self, projeto_data):
         """Gera texto de introdução do projeto usando as instruções do assistente"""
         if not self.is_configured():
@@ -95,12 +154,11 @@ class OpenAIAssistant:
             Use linguagem técnica e profissional.
             """
             
-            response = self.client.chat.completions.create(
-                model="gpt-4o",  # newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-                messages=[
-                    {"role": "system", "content": f"Você é o {self.assistant_name}. Gere textos técnicos para relatórios de assessment de maturidade organizacional seguindo exatamente as instruções fornecidas."},
-                    {"role": "user", "content": prompt}
-                ],
+            introducao = self.completar(
+                'gerar_introducao',
+                modelo="gpt-4o",  # newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
+                system_prompt=f"Você é o {self.assistant_name}. Gere textos técnicos para relatórios de assessment de maturidade organizacional seguindo exatamente as instruções fornecidas.",
+                user_prompt=prompt,
                 max_tokens=1500,
                 temperature=0.7
             )
@@ -119,7 +177,7 @@ class OpenAIAssistant:
                         f"{analysis['payload_size']['estimated_tokens']:,} tokens enviados, "
                         f"{response_time:.2f}s de resposta")
             
-            return response.choices[0].message.content.strip()
+            return introducao
             
         except Exception as e:
             # Log erro com análise do payload
@@ -135,8 +193,8 @@ class OpenAIAssistant:
             logging.error(f"Erro ao gerar introdução do projeto: {e}")
             return None
     
-    def gerar_analise_dominio(self, dominio_data):
-        """Gera análise de um domínio específico usando IA"""
+    def gerar_analise_dominio(self, dominio_data, timeout=15):
+        """Gera análise de um domínio específico usando IA (timeout em segundos por chamada)"""
         if not self.is_configured():
             logging.error("Assistente OpenAI não configurado para gerar análise")
             return None
@@ -184,18 +242,15 @@ class OpenAIAssistant:
                 
                 logging.debug(f"Enviando prompt para OpenAI (tamanho: {len(prompt)} caracteres)")
                 
-                response = self.client.chat.completions.create(
-                    model="gpt-4o",  # newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
-                    messages=[
-                        {"role": "system", "content": f"Você é o {self.assistant_name}. Analise domínios de assessments de maturidade organizacional com expertise técnica e visão analítica profunda."},
-                        {"role": "user", "content": prompt}
-                    ],
+                analise = self.completar(
+                    'gerar_analise_dominio',
+                    modelo="gpt-4o",  # newest OpenAI model is "gpt-4o" which was released May 13, 2024. do not change this unless explicitly requested by the user
+                    system_prompt=f"Você é o {self.assistant_name}. Analise domínios de assessments de maturidade organizacional com expertise técnica e visão analítica profunda.",
+                    user_prompt=prompt,
                     max_tokens=1000,
                     temperature=0.7,
-                    timeout=15  # Timeout mais curto ainda
+                    timeout=timeout
                 )
-                
-                analise = response.choices[0].message.content.strip()
                 logging.info(f"Análise gerada com sucesso (tamanho: {len(analise)} caracteres)")
                 return analise
                 
@@ -307,19 +362,16 @@ class OpenAIAssistant:
                 
                 logging.debug(f"Enviando prompt para OpenAI (tamanho: {len(prompt)} caracteres)")
                 
-                response = self.client.chat.completions.create(
-                    model="gpt-4o-mini",  # Usar modelo mais rápido para evitar timeout
-                    messages=[
-                        {"role": "system", "content": f"Você é o {self.assistant_name}. Elabore considerações finais técnicas e estratégicas para relatórios de assessment de maturidade organizacional."},
-                        {"role": "user", "content": prompt}
-                    ],
+                consideracoes = self.completar(
+                    'gerar_consideracoes_finais',
+                    modelo="gpt-4o-mini",  # Usar modelo mais rápido para evitar timeout
+                    system_prompt=f"Você é o {self.assistant_name}. Elabore considerações finais técnicas e estratégicas para relatórios de assessment de maturidade organizacional.",
+                    user_prompt=prompt,
                     max_tokens=2500,  # Aumentar limite para texto completo (aproximadamente 1500-2000 palavras)
                     temperature=0.7,
                     timeout=45  # Timeout mais longo para respostas longas
                 )
                 
-                consideracoes = response.choices[0].message.content.strip()
-                
                 # Verificar se o texto está completo (termina com ponto)
                 termina_completo = consideracoes.endswith('.') or consideracoes.endswith('!') or consideracoes.endswith('?')
                 
@@ -596,76 +648,21 @@ def gerar_analise_dominios_ia(projeto):
                 'erro': 'Integração com ChatGPT não configurada. Configure a API Key e o nome do Assistant em Parâmetros do Sistema.'
             }
         
-        # Coletar todos os domínios do projeto
-        dominios_analises = {}
-        total_dominios = 0
-        dominios_processados = 0
+        # Coletar todos os domínios do projeto e analisá-los em paralelo
+        from utils.ia_batch_processor import listar_dominios_projeto, analisar_dominios_concorrente
         
-        for projeto_assessment in projeto.assessments:
-            if not projeto_assessment.finalizado:
-                continue
-                
-            # Identificar domínios do assessment
-            dominios_query = None
-            if projeto_assessment.versao_assessment_id:
-                # Sistema novo
-                from models.assessment_version import AssessmentDominio
-                dominios_query = AssessmentDominio.query.filter_by(
-                    versao_id=projeto_assessment.versao_assessment.id,
-                    ativo=True
-                ).order_by(AssessmentDominio.ordem)
-            elif projeto_assessment.tipo_assessment_id:
-                # Sistema antigo
-                from models.dominio import Dominio
-                dominios_query = Dominio.query.filter_by(
-                    tipo_assessment_id=projeto_assessment.tipo_assessment_id,
-                    ativo=True
-                ).order_by(Dominio.ordem)
-            
-            if not dominios_query:
-                continue
-                
-            tipo_nome = (projeto_assessment.versao_assessment.tipo.nome 
-                        if projeto_assessment.versao_assessment_id 
-                        else projeto_assessment.tipo_assessment.nome)
-            
-            if tipo_nome not in dominios_analises:
-                dominios_analises[tipo_nome] = {}
-            
-            for dominio in dominios_query:
-                total_dominios += 1
-                
-                # Coletar dados do domínio
-                logging.info(f"Coletando dados para domínio: {dominio.nome}")
-                dados_dominio = coletar_dados_dominio_para_ia(projeto, dominio)
-                if not dados_dominio:
-                    logging.warning(f"Não foi possível coletar dados para domínio: {dominio.nome}")
-                    continue
-                
-                # Gerar análise do domínio
-                logging.info(f"Gerando análise IA para domínio: {dominio.nome}")
-                try:
-                    analise = assistant.gerar_analise_dominio(dados_dominio)
-                    if analise:
-                        dominios_analises[tipo_nome][dominio.nome] = {
-                            'analise': analise,
-                            'estatisticas': dados_dominio['estatisticas'],
-                            'gerado_em': datetime.now().isoformat()
-                        }
-                        dominios_processados += 1
-                        logging.info(f"Análise gerada com sucesso para domínio: {dominio.nome}")
-                    else:
-                        logging.warning(f"Análise vazia para domínio: {dominio.nome}")
-                except Exception as e:
-                    logging.error(f"Erro ao gerar análise para domínio {dominio.nome}: {e}")
-                    # Em caso de erro SSL/timeout, continuar com os próximos domínios
-                    continue
+        dominios_para_processar = listar_dominios_projeto(projeto)
+        total_dominios = len(dominios_para_processar)
         
-        if not dominios_analises:
+        if not dominios_para_processar:
             return {
                 'erro': 'Nenhum domínio encontrado para análise.'
             }
         
+        dominios_analises, dominios_processados = analisar_dominios_concorrente(
+            projeto, assistant, dominios_para_processar
+        )
+        
         resultado_final = {
             'analises': dominios_analises,
             'assistant_name': assistant.assistant_name,
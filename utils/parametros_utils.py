@@ -0,0 +1,24 @@
+"""
+Leitura e validação de parâmetros da query string para as APIs JSON
+"""
+
+from flask import request
+
+
+def inteiro_parametro(nome, padrao=None, minimo=None):
+    """
+    Valor inteiro do parâmetro `nome` da query string (padrao se ausente)
+
+    Raises:
+        ValueError: com mensagem legível para devolver ao cliente
+    """
+    valor = request.args.get(nome)
+    if not valor:
+        return padrao
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise ValueError(f'{nome} deve ser um número inteiro')
+    if minimo is not None and numero < minimo:
+        raise ValueError(f'{nome} deve ser maior ou igual a {minimo}')
+    return numero
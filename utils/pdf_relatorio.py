@@ -5,7 +5,6 @@ Utilitário para geração de relatórios PDF completos e formais
 import os
 import json
 import tempfile
-from datetime import datetime
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.colors import HexColor, black, white
@@ -19,19 +18,21 @@ from reportlab.platypus.frames import Frame
 from reportlab.platypus import Image
 from reportlab.graphics.shapes import Drawing, Line
 from reportlab.graphics import renderPDF
-from models.assessment_version import AssessmentDominio
-from models.dominio import Dominio
-from models.pergunta import Pergunta
 from models.resposta import Resposta
 from models.respondente import Respondente
 from app import db
 from utils.timezone_utils import format_datetime_local, format_date_local
 from sqlalchemy import func
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-import numpy as np
+from utils.graficos_pdf import grafico_radar
 from io import BytesIO
 
+# Tamanho máximo (bytes) do relatório mantido em memória antes de ir para disco
+RELATORIO_BUFFER_MEMORIA = int(os.environ.get('RELATORIO_BUFFER_MEMORIA', 8 * 1024 * 1024))
+
+# Versão do layout do relatório; incrementar ao alterar o conteúdo ou o visual
+# gerado para invalidar os relatórios armazenados (utils/relatorio_artefatos.py)
+VERSAO_TEMPLATE_RELATORIO = 3
+
 class RelatorioPDF:
     """Classe para geração de relatórios PDF completos e formais"""
     
@@ -43,8 +44,56 @@ class RelatorioPDF:
         self.styles = getSampleStyleSheet()
         self.page_number = 0
         self.total_pages = 0
+        self._estatisticas = None
+        self._logo_sistema = None
+        self._data_referencia = None
         self._setup_styles()
     
+    def _get_estatisticas(self):
+        """Estatísticas de todos os assessments do projeto (calculadas uma única vez)"""
+        if self._estatisticas is None:
+            from utils.estatisticas_utils import calcular_estatisticas_projeto
+            self._estatisticas = calcular_estatisticas_projeto(self.projeto, somente_finalizados=False)
+        return self._estatisticas
+    
+    def _get_data_referencia(self):
+        """
+        Data de referência do relatório (UTC): a finalização ou resposta mais recente
+        
+        Vem dos mesmos dados da impressão digital do relatório armazenado, então
+        um PDF reaproveitado continua com a data correta, ao contrário da data
+        em que foi renderizado.
+        """
+        if self._data_referencia is None:
+            datas = [self.projeto.data_finalizacao]
+            datas += [pa.data_finalizacao for pa in self.projeto.assessments]
+            datas.append(db.session.query(func.max(Resposta.data_resposta)).filter(
+                Resposta.projeto_id == self.projeto.id
+            ).scalar())
+            datas = [data for data in datas if data]
+            self._data_referencia = max(datas) if datas else self.projeto.data_criacao
+        return self._data_referencia
+    
+    def _get_logo_sistema(self):
+        """Caminho do logo ativo do sistema (buscado uma única vez, não a cada página)"""
+        if self._logo_sistema is None:
+            # Importar modelo Logo aqui para evitar dependências circulares
+            from models.logo import Logo
+            
+            self._logo_sistema = ''
+            logo_sistema = Logo.query.filter_by(ativo=True).first()
+            if logo_sistema and logo_sistema.caminho_arquivo:
+                logo_path = logo_sistema.caminho_arquivo
+                # O caminho no banco é 'logos/filename.png', mas o real é 'static/uploads/logos/filename.png'
+                if logo_path.startswith('logos/'):
+                    logo_path = os.path.join('static', 'uploads', logo_path)
+                elif not logo_path.startswith('static/'):
+                    logo_path = os.path.join('static', 'uploads', logo_path.lstrip('/'))
+                
+                if os.path.exists(logo_path):
+                    self._logo_sistema = logo_path
+        return self._logo_sistema or None
+    
     def _setup_styles(self):
         """Configurar estilos personalizados para o relatório"""
         # Estilo para títulos principais
@@ -161,18 +210,28 @@ class RelatorioPDF:
             alignment=TA_LEFT
         ))
     
-    def gerar_relatorio_completo(self):
-        """Gera o relatório PDF completo"""
+    def gerar_relatorio_completo(self, destino=None):
+        """
+        Gera o relatório PDF completo
+        
+        Args:
+            destino: Caminho ou arquivo binário onde gravar o PDF. Se omitido,
+                o PDF é gerado em um buffer (SpooledTemporaryFile), que só vai
+                para disco se passar de RELATORIO_BUFFER_MEMORIA
+        
+        Returns:
+            O destino informado, ou o buffer posicionado no início
+        """
         # Inicializar contador de perguntas
         self._numero_pergunta = 0
-        # Criar arquivo temporário
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-        temp_filename = temp_file.name
-        temp_file.close()
+        
+        buffer = None
+        if destino is None:
+            buffer = destino = tempfile.SpooledTemporaryFile(max_size=RELATORIO_BUFFER_MEMORIA)
         
         # Criar documento
         doc = SimpleDocTemplate(
-            temp_filename,
+            destino,
             pagesize=A4,
             rightMargin=20*mm,
             leftMargin=20*mm,
@@ -197,16 +256,9 @@ class RelatorioPDF:
         # Gerar PDF com callback para cabeçalho/rodapé
         doc.build(self.story, onFirstPage=self._primeira_pagina, onLaterPages=self._demais_paginas)
         
-        # Limpar arquivos temporários dos gráficos
-        if hasattr(self, '_temp_files'):
-            for temp_file in self._temp_files:
-                try:
-                    if os.path.exists(temp_file):
-                        os.unlink(temp_file)
-                except:
-                    pass
-        
-        return temp_filename
+        if buffer is not None:
+            buffer.seek(0)
+        return destino
     
     def _primeira_pagina(self, canvas, doc):
         """Callback para primeira página (capa) - sem cabeçalho/rodapé"""
@@ -219,24 +271,12 @@ class RelatorioPDF:
         # CABEÇALHO
         # Logo do sistema à esquerda
         try:
-            # Importar modelo Logo aqui para evitar dependências circulares
-            from models.logo import Logo
-            
-            # Buscar logo ativo do sistema
-            logo_sistema = Logo.query.filter_by(ativo=True).first()
+            logo_path = self._get_logo_sistema()
             
             logo_encontrado = False
-            if logo_sistema and logo_sistema.caminho_arquivo:
-                logo_path = logo_sistema.caminho_arquivo
-                # O caminho no banco é 'logos/filename.png', mas o real é 'static/uploads/logos/filename.png'
-                if logo_path.startswith('logos/'):
-                    logo_path = os.path.join('static', 'uploads', logo_path)
-                elif not logo_path.startswith('static/'):
-                    logo_path = os.path.join('static', 'uploads', logo_path.lstrip('/'))
-                
-                if os.path.exists(logo_path):
-                    canvas.drawImage(logo_path, 1*inch, A4[1] - 0.9*inch, width=0.8*inch, height=0.4*inch, preserveAspectRatio=True)
-                    logo_encontrado = True
+            if logo_path:
+                canvas.drawImage(logo_path, 1*inch, A4[1] - 0.9*inch, width=0.8*inch, height=0.4*inch, preserveAspectRatio=True)
+                logo_encontrado = True
             
             # Se não encontrou logo do sistema, usar fallback
             if not logo_encontrado:
@@ -296,7 +336,7 @@ class RelatorioPDF:
         dados_cliente = f"""
         Cliente: {self.projeto.cliente.nome}<br/>
         Projeto: {self.projeto.nome}<br/>
-        Data de Geração: {format_datetime_local(datetime.utcnow(), '%d/%m/%Y %H:%M')}
+        Data de Referência: {format_datetime_local(self._get_data_referencia(), '%d/%m/%Y %H:%M')}
         """
         self.story.append(Paragraph(dados_cliente, self.styles['Normal']))
         
@@ -380,19 +420,22 @@ class RelatorioPDF:
         """Adiciona seção com dados dos respondentes"""
         self.story.append(Paragraph("2. DADOS DOS RESPONDENTES", self.styles['TituloCapitulo']))
         
+        # Total de respostas de todos os respondentes em uma única consulta
+        totais_respostas = dict(db.session.query(
+            Resposta.respondente_id, func.count(Resposta.id)
+        ).filter(
+            Resposta.projeto_id == self.projeto.id
+        ).group_by(Resposta.respondente_id).all())
+        
         respondentes = []
         for projeto_resp in self.projeto.respondentes:
             respondente = projeto_resp.respondente
-            total_respostas = Resposta.query.filter_by(
-                projeto_id=self.projeto.id,
-                respondente_id=respondente.id
-            ).count()
             
             respondentes.append([
                 respondente.nome,
                 respondente.email,
                 respondente.login,
-                str(total_respostas)
+                str(totais_respostas.get(respondente.id, 0))
             ])
         
         if respondentes:
@@ -450,28 +493,11 @@ class RelatorioPDF:
         """Adiciona seção com dados dos assessments"""
         self.story.append(Paragraph("4. DADOS DOS ASSESSMENTS", self.styles['TituloCapitulo']))
         
-        for projeto_assessment in self.projeto.assessments:
-            # Determinar tipo e versão
-            tipo = None
-            versao = None
-            dominios_count = 0
-            perguntas_count = 0
-            
-            if projeto_assessment.versao_assessment_id:
-                versao = projeto_assessment.versao_assessment
-                tipo = versao.tipo
-                dominios_count = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True).count()
-                
-                # Contar perguntas
-                for dominio in AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True):
-                    perguntas_count += Pergunta.query.filter_by(dominio_versao_id=dominio.id, ativo=True).count()
-            
-            elif projeto_assessment.tipo_assessment_id:
-                tipo = projeto_assessment.tipo_assessment
-                dominios_count = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True).count()
-                perguntas_count = db.session.query(func.count(Pergunta.id)).join(
-                    Dominio, Pergunta.dominio_id == Dominio.id
-                ).filter(Dominio.tipo_assessment_id == tipo.id, Pergunta.ativo == True).scalar()
+        for assessment in self._get_estatisticas()['assessments']:
+            projeto_assessment = assessment['projeto_assessment']
+            tipo = assessment['tipo']
+            dominios_count = assessment['total_dominios']
+            perguntas_count = assessment['total_perguntas']
             
             if tipo:
                 self.story.append(Paragraph(tipo.nome, self.styles['Subtitulo']))
@@ -552,67 +578,26 @@ class RelatorioPDF:
         self.story.append(Paragraph("6. SCORES E RESULTADOS", self.styles['TituloCapitulo']))
         
         # Calcular e exibir scores por assessment
-        for projeto_assessment in self.projeto.assessments:
-            if not projeto_assessment.finalizado:
-                continue
-            
-            # Determinar tipo e versão
-            tipo = None
-            versao = None
-            
-            if projeto_assessment.versao_assessment_id:
-                versao = projeto_assessment.versao_assessment
-                tipo = versao.tipo
-                dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-            elif projeto_assessment.tipo_assessment_id:
-                tipo = projeto_assessment.tipo_assessment
-                dominios_query = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True)
-            
-            if not tipo:
+        for assessment in self._get_estatisticas()['assessments']:
+            if not assessment['finalizado']:
                 continue
             
+            tipo = assessment['tipo']
             self.story.append(Paragraph(tipo.nome, self.styles['Subtitulo']))
             
-            # Calcular score geral
-            todas_respostas = []
-            dados_dominios = []
-            
-            for dominio in dominios_query.order_by('ordem'):
-                # Buscar perguntas do domínio
-                if versao:
-                    perguntas_dominio = Pergunta.query.filter_by(
-                        dominio_versao_id=dominio.id,
-                        ativo=True
-                    ).order_by(Pergunta.ordem).all()
-                else:
-                    perguntas_dominio = Pergunta.query.filter_by(
-                        dominio_id=dominio.id,
-                        ativo=True
-                    ).order_by(Pergunta.ordem).all()
-                
-                respostas_dominio = []
-                for pergunta in perguntas_dominio:
-                    resposta = Resposta.query.filter_by(
-                        projeto_id=self.projeto.id,
-                        pergunta_id=pergunta.id
-                    ).order_by(Resposta.data_resposta.desc()).first()
-                    
-                    if resposta:
-                        respostas_dominio.append(resposta.nota)
-                        todas_respostas.append(resposta.nota)
-                
-                # Calcular média do domínio
-                if respostas_dominio:
-                    media_dominio = sum(respostas_dominio) / len(respostas_dominio)
-                    dados_dominios.append([
-                        dominio.nome,
-                        f"{media_dominio:.1f}",
-                        f"{len(respostas_dominio)}/{len(perguntas_dominio)}"
-                    ])
+            # Scores por domínio (resposta mais recente de cada pergunta)
+            dados_dominios = [
+                [
+                    dominio_stats['dominio'].nome,
+                    f"{dominio_stats['media']:.1f}",
+                    f"{dominio_stats['respostas_dadas']}/{dominio_stats['total_perguntas']}"
+                ]
+                for dominio_stats in assessment['dominios'] if dominio_stats['respostas_dadas']
+            ]
             
             # Score geral
-            if todas_respostas:
-                score_geral = sum(todas_respostas) / len(todas_respostas)
+            if assessment['respostas_finais']:
+                score_geral = assessment['media_final']
                 self.story.append(Paragraph(
                     f"Score Geral: {score_geral:.1f}/5.0",
                     self.styles['TextoJustificado']
@@ -644,22 +629,16 @@ class RelatorioPDF:
                 
                 # Gerar e adicionar gráfico radar
                 try:
-                    grafico_path = self._gerar_grafico_radar(tipo, dados_dominios)
-                    if grafico_path and os.path.exists(grafico_path):
+                    grafico = self._gerar_grafico_radar(tipo, dados_dominios)
+                    if grafico:
                         self.story.append(Paragraph("Análise Visual por Domínio", self.styles['Subtitulo']))
                         self.story.append(Spacer(1, 10))
                         
-                        # Adicionar imagem do gráfico radar
-                        img = Image(grafico_path, width=4.5*inch, height=4.5*inch)
-                        img.hAlign = 'CENTER'
-                        self.story.append(img)
+                        # Gráfico vetorial, desenhado diretamente no PDF
+                        grafico.hAlign = 'CENTER'
+                        self.story.append(grafico)
                         self.story.append(Spacer(1, 20))
                         
-                        # Armazenar path para limpeza posterior
-                        if not hasattr(self, '_temp_files'):
-                            self._temp_files = []
-                        self._temp_files.append(grafico_path)
-                        
                 except Exception as e:
                     # Se houver erro na geração do gráfico, continuar sem ele
                     print(f"Erro ao gerar gráfico radar: {e}")
@@ -671,29 +650,15 @@ class RelatorioPDF:
         """Adiciona memorial completo de respostas"""
         self.story.append(Paragraph("7. MEMORIAL DE RESPOSTAS", self.styles['TituloCapitulo']))
         
-        for projeto_assessment in self.projeto.assessments:
-            if not projeto_assessment.finalizado:
+        # Domínios, perguntas e respostas já carregados em lote pelas estatísticas
+        for assessment in self._get_estatisticas()['assessments']:
+            if not assessment['finalizado']:
                 continue
             
-            # Determinar tipo e versão
-            tipo = None
-            versao = None
-            
-            if projeto_assessment.versao_assessment_id:
-                versao = projeto_assessment.versao_assessment
-                tipo = versao.tipo
-                dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-            elif projeto_assessment.tipo_assessment_id:
-                tipo = projeto_assessment.tipo_assessment
-                dominios_query = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True)
-            
-            if not tipo:
-                continue
-            
-            self.story.append(Paragraph(tipo.nome, self.styles['Subtitulo']))
+            self.story.append(Paragraph(assessment['tipo'].nome, self.styles['Subtitulo']))
             
-            for dominio in dominios_query.order_by('ordem'):
-                self.story.append(Paragraph(dominio.nome, ParagraphStyle(
+            for dominio_stats in assessment['dominios']:
+                self.story.append(Paragraph(dominio_stats['dominio'].nome, ParagraphStyle(
                     name='DominioMemorial',
                     parent=self.styles['Normal'],
                     fontSize=12,
@@ -703,23 +668,9 @@ class RelatorioPDF:
                     fontName='Helvetica-Bold'
                 )))
                 
-                # Buscar perguntas do domínio
-                if versao:
-                    perguntas_dominio = Pergunta.query.filter_by(
-                        dominio_versao_id=dominio.id,
-                        ativo=True
-                    ).order_by(Pergunta.ordem).all()
-                else:
-                    perguntas_dominio = Pergunta.query.filter_by(
-                        dominio_id=dominio.id,
-                        ativo=True
-                    ).order_by(Pergunta.ordem).all()
-                
-                for pergunta in perguntas_dominio:
-                    resposta = Resposta.query.filter_by(
-                        projeto_id=self.projeto.id,
-                        pergunta_id=pergunta.id
-                    ).order_by(Resposta.data_resposta.desc()).first()
+                for pergunta_stats in dominio_stats['perguntas']:
+                    pergunta = pergunta_stats['pergunta']
+                    resposta = pergunta_stats['resposta_final']
                     
                     if resposta:
                         # Pergunta numerada sem "Pergunta:"
@@ -811,7 +762,7 @@ class RelatorioPDF:
     def _adicionar_assinatura(self):
         """Adiciona seção de assinatura sem título separado"""
         # Data e local à direita
-        data_atual = datetime.now().strftime("%d de %B de %Y")
+        data_atual = format_date_local(self._get_data_referencia(), "%d de %B de %Y")
         meses = {
             'January': 'janeiro', 'February': 'fevereiro', 'March': 'março',
             'April': 'abril', 'May': 'maio', 'June': 'junho',
@@ -866,71 +817,16 @@ class RelatorioPDF:
                                                 fontName='Helvetica')))
 
     def _gerar_grafico_radar(self, tipo_assessment, dados_dominios):
-        """Gera gráfico radar para os domínios de um assessment"""
+        """Gera gráfico radar (vetorial) para os domínios de um assessment"""
         if not dados_dominios:
             return None
         
-        try:
-            # Configurar matplotlib para usar backend não-interativo
-            plt.switch_backend('Agg')
-            
-            # Extrair dados
-            labels = [dado[0] for dado in dados_dominios]
-            values = [float(dado[1]) for dado in dados_dominios]
-            
-            # Configurar o gráfico radar
-            N = len(labels)
-            if N == 0:
-                return None
-                
-            # Calcular ângulos para cada eixo
-            angles = [n / float(N) * 2 * np.pi for n in range(N)]
-            angles += angles[:1]  # Fechar o círculo
-            
-            # Adicionar o primeiro valor no final para fechar o gráfico
-            values += values[:1]
-            
-            # Criar figura
-            fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(projection='polar'))
-            
-            # Plotar a área
-            ax.plot(angles, values, 'o-', linewidth=2, label=tipo_assessment.nome, color='#6f42c1')
-            ax.fill(angles, values, alpha=0.25, color='#6f42c1')
-            
-            # Configurar labels
-            ax.set_xticks(angles[:-1])
-            ax.set_xticklabels(labels, fontsize=10)
-            
-            # Configurar escala radial
-            ax.set_ylim(0, 5)
-            ax.set_yticks([0, 1, 2, 3, 4, 5])
-            ax.set_yticklabels(['0', '1', '2', '3', '4', '5'], fontsize=8)
-            ax.grid(True)
-            
-            # Adicionar título
-            plt.title(f'Assessment: {tipo_assessment.nome}', size=14, fontweight='bold', pad=20)
-            
-            # Configurar layout
-            plt.tight_layout()
-            
-            # Salvar em arquivo temporário
-            # Usar diretório temporário do sistema
-            temp_dir = tempfile.gettempdir()
-            temp_filename = f"radar_chart_{os.getpid()}_{int(datetime.now().timestamp())}.png"
-            temp_path = os.path.join(temp_dir, temp_filename)
-            
-            plt.savefig(temp_path, format='png', dpi=150, bbox_inches='tight', 
-                       facecolor='white', edgecolor='none')
-            plt.close()
-            return temp_path
-                
-        except Exception as e:
-            print(f"Erro na geração do gráfico radar: {e}")
-            plt.close('all')
-            return None
-
+        labels = [dado[0] for dado in dados_dominios]
+        values = [float(dado[1]) for dado in dados_dominios]
+        
+        return grafico_radar(labels, values, titulo=f'Assessment: {tipo_assessment.nome}')
 
-def gerar_relatorio_pdf_completo(projeto):
-    """Função principal para gerar relatório PDF completo"""
+def gerar_relatorio_pdf_completo(projeto, destino=None):
+    """Função principal para gerar relatório PDF completo (ver RelatorioPDF.gerar_relatorio_completo)"""
     relatorio = RelatorioPDF(projeto)
-    return relatorio.gerar_relatorio_completo()
\ No newline at end of file
+    return relatorio.gerar_relatorio_completo(destino)
\ No newline at end of file
@@ -16,13 +16,11 @@ from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 from reportlab.graphics.shapes import Drawing, Rect, String
 from reportlab.graphics import renderPDF
-from models.assessment_version import AssessmentDominio
-from models.dominio import Dominio
-from models.pergunta import Pergunta
 from models.resposta import Resposta
 from app import db
 from sqlalchemy import func
 from flask import current_app
+from utils.graficos_pdf import grafico_barras, CORES_MATURIDADE
 
 def gerar_relatorio_markdown(projeto):
     """
@@ -32,62 +30,9 @@ def gerar_relatorio_markdown(projeto):
     temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.md', mode='w', encoding='utf-8')
     temp_filename = temp_file.name
     
-    # Buscar dados das estatísticas (replicando a lógica da view)
-    estatisticas_data = []
-    
-    for projeto_assessment in projeto.assessments:
-        if not projeto_assessment.finalizado:
-            continue
-            
-        # Determinar tipo e versão do assessment
-        tipo = None
-        versao = None
-        
-        if projeto_assessment.versao_assessment_id:
-            versao = projeto_assessment.versao_assessment
-            tipo = versao.tipo
-            dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-        elif projeto_assessment.tipo_assessment_id:
-            tipo = projeto_assessment.tipo_assessment
-            dominios_query = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True)
-        
-        if not tipo:
-            continue
-        
-        # Processar domínios
-        for dominio in dominios_query.order_by('ordem'):
-            # Buscar perguntas do domínio
-            if versao:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_versao_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            else:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            
-            respostas_dominio = []
-            for pergunta in perguntas_dominio:
-                # Buscar resposta mais recente desta pergunta no projeto
-                resposta = Resposta.query.filter_by(
-                    projeto_id=projeto.id,
-                    pergunta_id=pergunta.id
-                ).order_by(Resposta.data_resposta.desc()).first()
-                
-                if resposta:
-                    respostas_dominio.append({
-                        'pergunta': pergunta,
-                        'resposta_final': resposta
-                    })
-            
-            if respostas_dominio:
-                estatisticas_data.append({
-                    'dominio': dominio,
-                    'tipo': tipo,
-                    'respostas': respostas_dominio
-                })
+    # Buscar dados das estatísticas (domínios, perguntas e respostas carregados em lote)
+    from utils.estatisticas_utils import calcular_estatisticas_projeto, montar_memorial_respostas
+    estatisticas_data = montar_memorial_respostas(calcular_estatisticas_projeto(projeto))
     
     # Gerar conteúdo Markdown
     markdown_content = f"""# 📊 RELATÓRIO DE ESTATÍSTICAS
@@ -391,62 +336,9 @@ def gerar_relatorio_estatisticas_visual(projeto):
     story.append(Paragraph(f"<b>Data de Geração:</b> {datetime.now().strftime('%d/%m/%Y às %H:%M')}", info_style))
     story.append(Spacer(1, 30))
     
-    # Buscar dados das estatísticas (replicando a lógica da view)
-    estatisticas_data = []
-    
-    for projeto_assessment in projeto.assessments:
-        if not projeto_assessment.finalizado:
-            continue
-            
-        # Determinar tipo e versão do assessment
-        tipo = None
-        versao = None
-        
-        if projeto_assessment.versao_assessment_id:
-            versao = projeto_assessment.versao_assessment
-            tipo = versao.tipo
-            dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-        elif projeto_assessment.tipo_assessment_id:
-            tipo = projeto_assessment.tipo_assessment
-            dominios_query = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True)
-        
-        if not tipo:
-            continue
-        
-        # Processar domínios
-        for dominio in dominios_query.order_by('ordem'):
-            # Buscar perguntas do domínio
-            if versao:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_versao_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            else:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            
-            respostas_dominio = []
-            for pergunta in perguntas_dominio:
-                # Buscar resposta mais recente desta pergunta no projeto
-                resposta = Resposta.query.filter_by(
-                    projeto_id=projeto.id,
-                    pergunta_id=pergunta.id
-                ).order_by(Resposta.data_resposta.desc()).first()
-                
-                if resposta:
-                    respostas_dominio.append({
-                        'pergunta': pergunta,
-                        'resposta_final': resposta
-                    })
-            
-            if respostas_dominio:
-                estatisticas_data.append({
-                    'dominio': dominio,
-                    'tipo': tipo,
-                    'respostas': respostas_dominio
-                })
+    # Buscar dados das estatísticas (domínios, perguntas e respostas carregados em lote)
+    from utils.estatisticas_utils import calcular_estatisticas_projeto, montar_memorial_respostas
+    estatisticas_data = montar_memorial_respostas(calcular_estatisticas_projeto(projeto))
     
     # Gerar memorial de respostas com estrutura visual idêntica
     story.append(Paragraph("MEMORIAL DE RESPOSTAS E COMENTÁRIOS", title_style))
@@ -617,72 +509,11 @@ def gerar_relatorio_estatisticas(projeto):
     # Estatísticas gerais
     story.append(Paragraph("RESUMO EXECUTIVO", heading_style))
     
-    # Calcular score médio geral
-    scores_gerais = []
-    estatisticas_assessments = []
-    
-    for projeto_assessment in projeto.assessments:
-        if not projeto_assessment.finalizado:
-            continue
-            
-        # Determinar tipo e versão do assessment
-        tipo = None
-        versao_info = "Sistema Antigo"
-        
-        if projeto_assessment.versao_assessment_id:
-            versao = projeto_assessment.versao_assessment
-            tipo = versao.tipo
-            versao_info = f"Versão {versao.versao}"
-        elif projeto_assessment.tipo_assessment_id:
-            tipo = projeto_assessment.tipo_assessment
-            versao_info = "Sistema Antigo"
-        
-        if not tipo:
-            continue
-        
-        # Calcular score geral do assessment
-        if projeto_assessment.versao_assessment_id:
-            score_query = db.session.query(
-                func.avg(Resposta.nota).label('score_medio'),
-                func.count(Resposta.id).label('total_respostas')
-            ).join(
-                Pergunta, Resposta.pergunta_id == Pergunta.id
-            ).join(
-                AssessmentDominio, Pergunta.dominio_versao_id == AssessmentDominio.id
-            ).filter(
-                Resposta.projeto_id == projeto.id,
-                AssessmentDominio.versao_id == versao.id,
-                AssessmentDominio.ativo == True,
-                Pergunta.ativo == True
-            ).first()
-        else:
-            score_query = db.session.query(
-                func.avg(Resposta.nota).label('score_medio'),
-                func.count(Resposta.id).label('total_respostas')
-            ).join(
-                Pergunta, Resposta.pergunta_id == Pergunta.id
-            ).join(
-                Dominio, Pergunta.dominio_id == Dominio.id
-            ).filter(
-                Resposta.projeto_id == projeto.id,
-                Dominio.tipo_assessment_id == tipo.id,
-                Dominio.ativo == True,
-                Pergunta.ativo == True
-            ).first()
-        
-        score_geral = round(float(score_query.score_medio or 0), 2)
-        total_respostas = score_query.total_respostas or 0
-        
-        scores_gerais.append(score_geral)
-        estatisticas_assessments.append({
-            'tipo': tipo,
-            'versao_info': versao_info,
-            'score_geral': score_geral,
-            'total_respostas': total_respostas,
-            'data_finalizacao': projeto_assessment.data_finalizacao
-        })
-    
-    score_medio_projeto = round(sum(scores_gerais) / len(scores_gerais) if scores_gerais else 0, 2)
+    # Calcular estatísticas dos assessments finalizados
+    from utils.estatisticas_utils import calcular_estatisticas_projeto, classificar_maturidade
+    estatisticas = calcular_estatisticas_projeto(projeto)
+    estatisticas_assessments = estatisticas['assessments']
+    score_medio_projeto = estatisticas['score_medio_projeto']
     
     # Tabela de resumo
     resumo_data = [
@@ -723,55 +554,14 @@ def gerar_relatorio_estatisticas(projeto):
         story.append(Paragraph(f"ASSESSMENT: {assessment['tipo'].nome}", heading_style))
         story.append(Paragraph(f"{assessment['versao_info']} - Score: {assessment['score_geral']}/5.0", subheading_style))
         
-        # Buscar domínios e suas estatísticas
-        if projeto.assessments[0].versao_assessment_id:
-            versao = projeto.assessments[0].versao_assessment
-            dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-        else:
-            dominios_query = Dominio.query.filter_by(tipo_assessment_id=assessment['tipo'].id, ativo=True)
-        
         dominios_data = [['Domínio', 'Score', 'Nível de Maturidade']]
         
-        for dominio in dominios_query.order_by('ordem'):
-            if projeto.assessments[0].versao_assessment_id:
-                dominio_score_query = db.session.query(
-                    func.avg(Resposta.nota).label('score_medio')
-                ).join(
-                    Pergunta, Resposta.pergunta_id == Pergunta.id
-                ).filter(
-                    Resposta.projeto_id == projeto.id,
-                    Pergunta.dominio_versao_id == dominio.id,
-                    Pergunta.ativo == True
-                ).first()
-            else:
-                dominio_score_query = db.session.query(
-                    func.avg(Resposta.nota).label('score_medio')
-                ).join(
-                    Pergunta, Resposta.pergunta_id == Pergunta.id
-                ).filter(
-                    Resposta.projeto_id == projeto.id,
-                    Pergunta.dominio_id == dominio.id,
-                    Pergunta.ativo == True
-                ).first()
-            
-            dominio_score = round(float(dominio_score_query.score_medio or 0), 2)
-            
-            # Determinar nível de maturidade
-            if dominio_score >= 4.5:
-                nivel_maturidade = "Otimizado"
-            elif dominio_score >= 3.5:
-                nivel_maturidade = "Avançado"
-            elif dominio_score >= 2.5:
-                nivel_maturidade = "Intermediário"
-            elif dominio_score >= 1.5:
-                nivel_maturidade = "Básico"
-            elif dominio_score >= 0.5:
-                nivel_maturidade = "Inicial"
-            else:
-                nivel_maturidade = "Inexistente"
+        for dominio_stats in assessment['dominios']:
+            dominio_score = dominio_stats['score']
+            nivel_maturidade, _ = classificar_maturidade(dominio_score)
             
             dominios_data.append([
-                dominio.nome,
+                dominio_stats['dominio'].nome,
                 f'{dominio_score}/5.0',
                 nivel_maturidade
             ])
@@ -789,53 +579,34 @@ def gerar_relatorio_estatisticas(projeto):
         ]))
         
         story.append(dominios_table)
+        story.append(Spacer(1, 10))
+        
+        # Gráfico de barras dos scores por domínio
+        grafico = grafico_barras(
+            [dominio_stats['dominio'].nome for dominio_stats in assessment['dominios']],
+            [dominio_stats['score'] for dominio_stats in assessment['dominios']],
+            largura=5.5*inch,
+            cores=[CORES_MATURIDADE[classificar_maturidade(dominio_stats['score'])[1]] for dominio_stats in assessment['dominios']]
+        )
+        if grafico:
+            grafico.hAlign = 'LEFT'
+            story.append(grafico)
         story.append(Spacer(1, 20))
     
     # Memorial de respostas
     story.append(PageBreak())
     story.append(Paragraph("MEMORIAL DE RESPOSTAS E COMENTÁRIOS", heading_style))
     
-    # Coletar memorial de respostas
-    for projeto_assessment in projeto.assessments:
-        if not projeto_assessment.finalizado:
-            continue
-            
-        # Determinar tipo e versão do assessment
-        tipo = None
-        if projeto_assessment.versao_assessment_id:
-            versao = projeto_assessment.versao_assessment
-            tipo = versao.tipo
-            dominios_query = AssessmentDominio.query.filter_by(versao_id=versao.id, ativo=True)
-        elif projeto_assessment.tipo_assessment_id:
-            tipo = projeto_assessment.tipo_assessment
-            dominios_query = Dominio.query.filter_by(tipo_assessment_id=tipo.id, ativo=True)
-        
-        if not tipo:
-            continue
-        
-        story.append(Paragraph(f"Assessment: {tipo.nome}", subheading_style))
+    # Coletar memorial de respostas (a partir das estatísticas já carregadas)
+    for assessment in estatisticas_assessments:
+        story.append(Paragraph(f"Assessment: {assessment['tipo'].nome}", subheading_style))
         
-        for dominio in dominios_query.order_by('ordem'):
-            story.append(Paragraph(f"Domínio: {dominio.nome}", subheading_style))
-            
-            # Coletar perguntas e respostas do domínio
-            if projeto_assessment.versao_assessment_id:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_versao_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
-            else:
-                perguntas_dominio = Pergunta.query.filter_by(
-                    dominio_id=dominio.id,
-                    ativo=True
-                ).order_by(Pergunta.ordem).all()
+        for dominio_stats in assessment['dominios']:
+            story.append(Paragraph(f"Domínio: {dominio_stats['dominio'].nome}", subheading_style))
             
-            for pergunta in perguntas_dominio:
-                # Buscar resposta mais recente desta pergunta no projeto
-                resposta = Resposta.query.filter_by(
-                    projeto_id=projeto.id,
-                    pergunta_id=pergunta.id
-                ).order_by(Resposta.data_resposta.desc()).first()
+            for pergunta_stats in dominio_stats['perguntas']:
+                pergunta = pergunta_stats['pergunta']
+                resposta = pergunta_stats['resposta_final']
                 
                 if resposta:
                     story.append(Paragraph(f"<b>Pergunta:</b> {pergunta.texto}", normal_style))
@@ -0,0 +1,334 @@
+"""
+Armazenamento de progresso de tarefas em background, compartilhado entre workers
+
+O backend é escolhido pela variável de ambiente PROGRESS_BACKEND:
+- 'banco' (padrão): tabela progresso_tarefas; no PostgreSQL usa LISTEN/NOTIFY
+  para acordar os streams SSE de qualquer worker assim que algo é publicado
+- 'arquivo': um JSON por sessão em PROGRESS_DIR (apenas para um único host)
+"""
+
+import os
+import re
+import json
+import time
+import select
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import select as sa_select, update, insert, delete
+from app import db
+
+# Status que encerram uma sessão de progresso
+STATUS_FINAIS = ('completed', 'error')
+
+# Tempo de vida dos registros (sessões ativas e sessões encerradas)
+TTL_ATIVO = int(os.environ.get('PROGRESS_TTL_SEGUNDOS', '3600'))
+TTL_FINAL = int(os.environ.get('PROGRESS_TTL_FINAL_SEGUNDOS', '300'))
+
+# Intervalo máximo entre verificações quando a notificação vem de outro processo
+INTERVALO_VERIFICACAO = float(os.environ.get('PROGRESS_INTERVALO_SEGUNDOS', '2'))
+
+# Intervalo entre comentários de keepalive no stream SSE
+INTERVALO_KEEPALIVE = 15
+
+CANAL_NOTIFICACAO = 'progresso_tarefas'
+
+_SESSION_ID_VALIDO = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class _NotificadorLocal:
+    """Acorda assinantes do mesmo processo quando algo é publicado"""
+
+    def __init__(self):
+        self._condicao = threading.Condition()
+        self._contador = 0
+
+    def marca(self):
+        with self._condicao:
+            return self._contador
+
+    def notificar(self):
+        with self._condicao:
+            self._contador += 1
+            self._condicao.notify_all()
+
+    def aguardar(self, marca, timeout):
+        """Aguarda uma publicação posterior à marca; retorna False em caso de timeout"""
+        with self._condicao:
+            return self._condicao.wait_for(lambda: self._contador != marca, timeout)
+
+
+_notificador_local = _NotificadorLocal()
+
+
+class ProgressStore(ABC):
+    """Interface comum dos backends de progresso"""
+
+    @abstractmethod
+    def publicar(self, session_id, dados):
+        """Grava o novo estado da sessão e notifica os assinantes"""
+
+    @abstractmethod
+    def obter(self, session_id):
+        """Retorna (versao, dados) da sessão, ou (0, None) se não existir"""
+
+    @abstractmethod
+    def expirar(self, session_id):
+        """Remove a sessão imediatamente"""
+
+    @abstractmethod
+    def limpar_expirados(self):
+        """Remove sessões cujo prazo de expiração já passou"""
+
+    @contextmanager
+    def _canal_notificacao(self):
+        """Fornece uma função aguardar(timeout) que bloqueia até uma nova publicação"""
+        marca = [_notificador_local.marca()]
+
+        def aguardar(timeout):
+            notificado = _notificador_local.aguardar(marca[0], min(timeout, INTERVALO_VERIFICACAO))
+            marca[0] = _notificador_local.marca()
+            return notificado
+
+        yield aguardar
+
+    def assinar(self, session_id, duracao_maxima=None):
+        """
+        Gera os estados da sessão à medida que mudam.
+
+        Produz um dict a cada nova versão publicada e None quando é hora de
+        enviar um keepalive. Termina após um status final ou ao atingir
+        duracao_maxima segundos (o EventSource do navegador reconecta sozinho).
+        """
+        inicio = time.monotonic()
+        ultimo_envio = inicio
+        versao_enviada = 0
+
+        with self._canal_notificacao() as aguardar:
+            while True:
+                versao, dados = self.obter(session_id)
+                if dados is not None and versao != versao_enviada:
+                    versao_enviada = versao
+                    ultimo_envio = time.monotonic()
+                    yield dados
+                    if dados.get('status') in STATUS_FINAIS:
+                        return
+
+                agora = time.monotonic()
+                if duracao_maxima and agora - inicio >= duracao_maxima:
+                    return
+
+                if agora - ultimo_envio >= INTERVALO_KEEPALIVE:
+                    ultimo_envio = agora
+                    yield None
+
+                aguardar(INTERVALO_KEEPALIVE)
+
+    @staticmethod
+    def _calcular_expiracao(dados):
+        ttl = TTL_FINAL if dados.get('status') in STATUS_FINAIS else TTL_ATIVO
+        return datetime.utcnow() + timedelta(seconds=ttl)
+
+
+class ProgressStoreBanco(ProgressStore):
+    """Backend em banco de dados (tabela progresso_tarefas)"""
+
+    def __init__(self):
+        self._ultima_limpeza = 0.0
+
+    @property
+    def _tabela(self):
+        from models.progresso_tarefa import ProgressoTarefa
+        return ProgressoTarefa.__table__
+
+    def _is_postgres(self):
+        return db.engine.dialect.name == 'postgresql'
+
+    def publicar(self, session_id, dados):
+        tabela = self._tabela
+        agora = datetime.utcnow()
+        valores = {
+            'dados': json.dumps(dados, ensure_ascii=False),
+            'data_atualizacao': agora,
+            'expira_em': self._calcular_expiracao(dados)
+        }
+
+        # Conexão própria: o progresso é gravado mesmo que a sessão ORM de quem
+        # publica esteja no meio de outra transação
+        with db.engine.begin() as conn:
+            resultado = conn.execute(
+                update(tabela)
+                .where(tabela.c.session_id == session_id)
+                .values(versao=tabela.c.versao + 1, **valores)
+            )
+            if resultado.rowcount == 0:
+                conn.execute(insert(tabela).values(session_id=session_id, versao=1, **valores))
+
+            if self._is_postgres():
+                conn.execute(
+                    db.text("SELECT pg_notify(:canal, :session_id)"),
+                    {'canal': CANAL_NOTIFICACAO, 'session_id': session_id}
+                )
+
+        _notificador_local.notificar()
+
+        if time.monotonic() - self._ultima_limpeza > 60:
+            self.limpar_expirados()
+
+    def obter(self, session_id):
+        tabela = self._tabela
+        with db.engine.connect() as conn:
+            linha = conn.execute(
+                sa_select(tabela.c.versao, tabela.c.dados)
+                .where(tabela.c.session_id == session_id)
+            ).first()
+
+        if not linha or not linha.dados:
+            return 0, None
+
+        try:
+            return linha.versao, json.loads(linha.dados)
+        except (ValueError, TypeError):
+            logging.error(f"Progresso inválido para sessão {session_id}")
+            return 0, None
+
+    def expirar(self, session_id):
+        tabela = self._tabela
+        with db.engine.begin() as conn:
+            conn.execute(delete(tabela).where(tabela.c.session_id == session_id))
+
+    def limpar_expirados(self):
+        self._ultima_limpeza = time.monotonic()
+        tabela = self._tabela
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(delete(tabela).where(tabela.c.expira_em < datetime.utcnow()))
+        except Exception as e:
+            logging.error(f"Erro ao limpar progresso expirado: {e}")
+
+    @contextmanager
+    def _canal_notificacao(self):
+        if not self._is_postgres():
+            with super()._canal_notificacao() as aguardar:
+                yield aguardar
+            return
+
+        # PostgreSQL: conexão dedicada em LISTEN durante toda a assinatura, aberta
+        # fora do pool para que streams abertos não esgotem as conexões das requisições
+        dialeto = db.engine.dialect
+        cargs, cparams = dialeto.create_connect_args(db.engine.url)
+        dbapi = dialeto.connect(*cargs, **cparams)
+        try:
+            dbapi.autocommit = True
+            with dbapi.cursor() as cursor:
+                cursor.execute(f"LISTEN {CANAL_NOTIFICACAO}")
+
+            def aguardar(timeout):
+                pronto, _, _ = select.select([dbapi], [], [], timeout)
+                if not pronto:
+                    return False
+                dbapi.poll()
+                notificado = bool(dbapi.notifies)
+                dbapi.notifies.clear()
+                return notificado
+
+            yield aguardar
+        finally:
+            try:
+                dbapi.close()
+            except Exception as e:
+                logging.warning(f"Erro ao encerrar LISTEN de progresso: {e}")
+
+
+class ProgressStoreArquivo(ProgressStore):
+    """Backend em arquivos JSON locais (um arquivo por sessão)"""
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio or os.environ.get(
+            'PROGRESS_DIR', os.path.join(tempfile.gettempdir(), 'assessment_progress')
+        )
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._ultima_limpeza = 0.0
+
+    def _caminho(self, session_id):
+        if not _SESSION_ID_VALIDO.match(session_id):
+            raise ValueError(f"session_id inválido: {session_id!r}")
+        return os.path.join(self.diretorio, f"{session_id}.json")
+
+    def _ler(self, caminho):
+        try:
+            with open(caminho, 'r', encoding='utf-8') as arquivo:
+                return json.load(arquivo)
+        except FileNotFoundError:
+            return None
+        except (ValueError, OSError) as e:
+            logging.error(f"Erro ao ler progresso {caminho}: {e}")
+            return None
+
+    def publicar(self, session_id, dados):
+        caminho = self._caminho(session_id)
+        atual = self._ler(caminho)
+        registro = {
+            'versao': (atual or {}).get('versao', 0) + 1,
+            'dados': dados,
+            'expira_em': self._calcular_expiracao(dados).timestamp()
+        }
+
+        # Escrita atômica: leitores nunca veem um arquivo pela metade
+        fd, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as arquivo:
+            json.dump(registro, arquivo, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+        _notificador_local.notificar()
+
+        if time.monotonic() - self._ultima_limpeza > 60:
+            self.limpar_expirados()
+
+    def obter(self, session_id):
+        registro = self._ler(self._caminho(session_id))
+        if not registro:
+            return 0, None
+        return registro.get('versao', 0), registro.get('dados')
+
+    def expirar(self, session_id):
+        try:
+            os.remove(self._caminho(session_id))
+        except FileNotFoundError:
+            pass
+
+    def limpar_expirados(self):
+        self._ultima_limpeza = time.monotonic()
+        agora = time.time()
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.json'):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            registro = self._ler(caminho)
+            if registro and registro.get('expira_em', 0) < agora:
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_progress_store():
+    """Retorna o backend de progresso configurado (instância única por processo)"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = os.environ.get('PROGRESS_BACKEND', 'banco').lower()
+                if backend == 'arquivo':
+                    _store = ProgressStoreArquivo()
+                else:
+                    _store = ProgressStoreBanco()
+                logging.info(f"Backend de progresso: {type(_store).__name__}")
+    return _store
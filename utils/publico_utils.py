@@ -1,48 +1,57 @@
+import os
+import time
 import logging
+from datetime import datetime
 from utils.openai_utils import OpenAIAssistant
+from utils.openai_monitor import payload_monitor
+from app import db
 import json
 
-def gerar_recomendacoes_ia(assessment_publico, dominios_dados):
-    """
-    Gera recomendações de melhoria para cada domínio usando OpenAI
-    
-    Args:
-        assessment_publico: Objeto AssessmentPublico
-        dominios_dados: Lista de dicionários com domínio e pontuação
-        
-    Returns:
-        Lista de recomendações (strings) para cada domínio
-    """
-    openai_assistant = OpenAIAssistant()
-    
-    if not openai_assistant.is_configured():
-        logging.warning("OpenAI não configurado para gerar recomendações públicas")
-        return []
-    
-    recomendacoes = []
+# Gera as recomendações de todos os domínios em uma única chamada à OpenAI
+# (0 volta ao modo antigo, uma chamada por domínio)
+RECOMENDACOES_EM_LOTE = os.environ.get('PUBLICO_RECOMENDACOES_LOTE', '1') != '0'
+
+SYSTEM_PROMPT_RECOMENDACAO = (
+    "Você é {assistente}. Você gera recomendações CURTAS, práticas e diretas (máximo 2-3 linhas) "
+    "para melhorias em assessments de maturidade organizacional."
+)
+
+
+def _perguntas_respostas_dominio(assessment_publico, dominio):
+    """Perguntas e respostas do domínio (usando dominio_versao_id para assessments versionados)"""
+    return [
+        {
+            'pergunta': resposta.pergunta.texto,
+            'resposta': resposta.get_texto_resposta(),
+            'valor': resposta.valor
+        }
+        for resposta in assessment_publico.respostas
+        if resposta.pergunta.dominio_versao_id == dominio.id
+    ]
+
+
+def _registrar_chamada(operacao, payload, inicio, uso, sucesso=True, erro=None, extra=None):
+    """Registra latência e consumo de tokens da chamada no openai_monitor"""
+    payload_monitor.log_request(
+        operation=operacao,
+        payload_analysis=payload_monitor.analyze_project_payload(payload),
+        response_time=time.time() - inicio,
+        success=sucesso,
+        error=erro,
+        tokens_prompt=uso.get('tokens_prompt'),
+        tokens_resposta=uso.get('tokens_resposta'),
+        extra=dict(extra or {}, cache=uso.get('cache', False))
+    )
+
+
+def _gerar_recomendacao_dominio(openai_assistant, assessment_publico, dominio_data):
+    """Gera a recomendação de um único domínio (uma chamada à OpenAI)"""
+    dominio = dominio_data['dominio']
+    pontuacao = dominio_data['pontuacao']
+    perguntas_respostas = _perguntas_respostas_dominio(assessment_publico, dominio)
     
-    for dominio_data in dominios_dados:
-        try:
-            dominio = dominio_data['dominio']
-            pontuacao = dominio_data['pontuacao']
-            
-            # Obter respostas do domínio (usando dominio_versao_id para assessments versionados)
-            respostas_dominio = [
-                r for r in assessment_publico.respostas 
-                if r.pergunta.dominio_versao_id == dominio.id
-            ]
-            
-            # Preparar dados para análise
-            perguntas_respostas = []
-            for resposta in respostas_dominio:
-                perguntas_respostas.append({
-                    'pergunta': resposta.pergunta.texto,
-                    'resposta': resposta.get_texto_resposta(),
-                    'valor': resposta.valor
-                })
-            
-            # Criar prompt para OpenAI
-            prompt = f"""
+    # Criar prompt para OpenAI
+    prompt = f"""
             Como consultor especializado em assessments de maturidade organizacional, analise as respostas do domínio "{dominio.nome}" e forneça recomendações práticas de melhoria.
 
             **DADOS DO DOMÍNIO:**
@@ -65,40 +74,299 @@ def gerar_recomendacoes_ia(assessment_publico, dominios_dados):
             **FORMATO DE SAÍDA:**
             Retorne apenas o texto da recomendação em um único parágrafo curto, sem título ou formatação markdown.
             """
+    
+    uso = {}
+    inicio = time.time()
+    try:
+        recomendacao = openai_assistant.completar(
+            'gerar_recomendacao_publica',
+            modelo="gpt-4o",
+            system_prompt=SYSTEM_PROMPT_RECOMENDACAO.format(assistente=openai_assistant.assistant_name),
+            user_prompt=prompt,
+            max_tokens=200,
+            temperature=0.7,
+            uso=uso
+        )
+    except Exception as e:
+        _registrar_chamada('gerar_recomendacao_publica', perguntas_respostas, inicio, uso, sucesso=False, erro=str(e))
+        raise
+    
+    _registrar_chamada('gerar_recomendacao_publica', perguntas_respostas, inicio, uso)
+    return recomendacao
+
+
+def _gerar_recomendacoes_lote(openai_assistant, assessment_publico, dominios_dados):
+    """
+    Gera as recomendações de todos os domínios em uma única chamada, pedindo
+    uma resposta JSON com uma recomendação por domínio
+    
+    Returns:
+        Dicionário {dominio_id: recomendacao} com os domínios que vieram
+        válidos na resposta (pode estar incompleto ou vazio)
+    """
+    dominios_payload = []
+    for dominio_data in dominios_dados:
+        dominio = dominio_data['dominio']
+        dominios_payload.append({
+            'dominio_id': dominio.id,
+            'nome': dominio.nome,
+            'descricao': dominio.descricao or 'Não informada',
+            'pontuacao': dominio_data['pontuacao'],
+            'respostas': _perguntas_respostas_dominio(assessment_publico, dominio)
+        })
+    
+    prompt = f"""
+            Como consultor especializado em assessments de maturidade organizacional, analise as respostas de cada domínio abaixo e forneça recomendações práticas de melhoria para cada um deles.
+
+            **DOMÍNIOS (JSON):**
+            {json.dumps(dominios_payload, indent=2, ensure_ascii=False)}
             
-            # Chamar OpenAI
-            response = openai_assistant.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system", 
-                        "content": f"Você é {openai_assistant.assistant_name}. Você gera recomendações CURTAS, práticas e diretas (máximo 2-3 linhas) para melhorias em assessments de maturidade organizacional."
-                    },
-                    {
-                        "role": "user", 
-                        "content": prompt
-                    }
-                ],
-                max_tokens=200,
-                temperature=0.7
-            )
+            **INSTRUÇÕES PARA CADA RECOMENDAÇÃO:**
+            1. Identifique APENAS os 1-2 principais gaps do domínio (respostas "Não" ou "Parcial")
             
-            recomendacao = response.choices[0].message.content.strip()
-            recomendacoes.append(recomendacao)
+            2. Forneça 1-2 ações prioritárias e práticas para melhorar
             
+            3. Use linguagem direta e profissional
+            
+            4. SEJA CONCISO: máximo de 2-3 linhas por domínio, em um único parágrafo curto, sem título ou formatação markdown
+            
+            **FORMATO DE SAÍDA:**
+            Retorne apenas um objeto JSON, com uma entrada para cada domínio recebido:
+            {{"recomendacoes": [{{"dominio_id": <id do domínio>, "recomendacao": "<texto>"}}]}}
+            """
+    
+    uso = {}
+    inicio = time.time()
+    extra = {'dominios': len(dominios_dados)}
+    try:
+        resposta = openai_assistant.completar(
+            'gerar_recomendacoes_publicas_lote',
+            modelo="gpt-4o",
+            system_prompt=SYSTEM_PROMPT_RECOMENDACAO.format(assistente=openai_assistant.assistant_name),
+            user_prompt=prompt,
+            max_tokens=min(200 * len(dominios_dados) + 100, 4000),
+            temperature=0.7,
+            formato_json=True,
+            uso=uso
+        )
+    except Exception as e:
+        _registrar_chamada('gerar_recomendacoes_publicas_lote', dominios_payload, inicio, uso,
+                           sucesso=False, erro=str(e), extra=extra)
+        raise
+    
+    ids_esperados = {dominio_data['dominio'].id for dominio_data in dominios_dados}
+    recomendacoes = {}
+    try:
+        itens = json.loads(resposta).get('recomendacoes') or []
+        if not isinstance(itens, list):
+            raise TypeError('"recomendacoes" não é uma lista')
+    except (ValueError, TypeError, AttributeError) as e:
+        logging.warning(f"Resposta em lote das recomendações públicas inválida: {e}")
+        itens = []
+    
+    # Cada item é validado separadamente: um item inválido não descarta os demais
+    for item in itens:
+        try:
+            dominio_id = int(item.get('dominio_id'))
+            texto = (item.get('recomendacao') or '').strip()
+        except (ValueError, TypeError, AttributeError) as e:
+            logging.warning(f"Item inválido na resposta em lote das recomendações públicas ({item!r}): {e}")
+            continue
+        if dominio_id in ids_esperados and texto:
+            recomendacoes[dominio_id] = texto
+    
+    if not recomendacoes and uso.get('chave'):
+        # Não reaproveitar do cache uma resposta que não pôde ser usada
+        from utils import openai_cache
+        openai_cache.remover(uso['chave'])
+    
+    extra['dominios_validos'] = len(recomendacoes)
+    _registrar_chamada('gerar_recomendacoes_publicas_lote', dominios_payload, inicio, uso,
+                       sucesso=bool(recomendacoes), erro=None if recomendacoes else 'Resposta JSON inválida', extra=extra)
+    return recomendacoes
+
+
+def gerar_recomendacoes_ia(assessment_publico, dominios_dados):
+    """
+    Gera recomendações de melhoria para cada domínio usando OpenAI
+    
+    Por padrão todos os domínios vão em uma única requisição; os domínios que
+    não vierem válidos na resposta são gerados com uma chamada por domínio.
+    
+    Args:
+        assessment_publico: Objeto AssessmentPublico
+        dominios_dados: Lista de dicionários com domínio e pontuação
+        
+    Returns:
+        (recomendacoes, falhas): lista de recomendações (strings) para cada
+        domínio, com a recomendação padrão nos domínios em que a IA falhou,
+        e a quantidade desses domínios
+        
+    Raises:
+        RuntimeError: OpenAI não configurado
+    """
+    openai_assistant = OpenAIAssistant()
+    
+    if not openai_assistant.is_configured():
+        raise RuntimeError("OpenAI não configurado para gerar recomendações públicas")
+    
+    recomendacoes_lote = {}
+    if RECOMENDACOES_EM_LOTE and dominios_dados:
+        try:
+            recomendacoes_lote = _gerar_recomendacoes_lote(openai_assistant, assessment_publico, dominios_dados)
+            logging.info(f"Recomendações em lote: {len(recomendacoes_lote)} de {len(dominios_dados)} domínios")
+        except Exception as e:
+            logging.error(f"Erro ao gerar recomendações em lote, gerando por domínio: {e}")
+    
+    recomendacoes = []
+    falhas = 0
+    
+    for dominio_data in dominios_dados:
+        dominio = dominio_data['dominio']
+        pontuacao = dominio_data['pontuacao']
+        
+        if dominio.id in recomendacoes_lote:
+            recomendacoes.append(recomendacoes_lote[dominio.id])
+            continue
+        
+        try:
+            recomendacoes.append(_gerar_recomendacao_dominio(openai_assistant, assessment_publico, dominio_data))
             logging.info(f"Recomendação gerada para domínio {dominio.nome}")
             
         except Exception as e:
             logging.error(f"Erro ao gerar recomendação para domínio {dominio.nome}: {e}")
+            falhas += 1
             # Adicionar recomendação padrão em caso de erro
-            recomendacoes.append(
-                f"Com base na pontuação de {pontuacao}%, recomenda-se revisar e fortalecer "
-                f"as práticas relacionadas a {dominio.nome}, priorizando a implementação "
-                f"de processos formais e a melhoria contínua dos controles existentes."
-            )
+            recomendacoes.append(recomendacao_padrao(dominio.nome, pontuacao))
     
-    return recomendacoes
+    return recomendacoes, falhas
+
+
+def montar_dominios_dados(assessment_publico):
+    """
+    Monta a lista de domínios respondidos com a pontuação de cada um
+    (estrutura usada pela página de resultado e pelo e-mail)
+    """
+    dominios_dados = []
+    for dominio in assessment_publico.get_dominios_respondidos():
+        dominios_dados.append({
+            'dominio': dominio,
+            'pontuacao': assessment_publico.calcular_pontuacao_dominio(dominio.id),
+            'recomendacao': None
+        })
+    return dominios_dados
+
+
+def recomendacao_padrao(dominio_nome, pontuacao):
+    """Recomendação genérica usada quando a IA não está disponível"""
+    return (
+        f"Com base na pontuação de {pontuacao:.0f}%, recomenda-se revisar e fortalecer "
+        f"as práticas relacionadas a {dominio_nome}, priorizando a implementação "
+        f"de processos formais e a melhoria contínua dos controles existentes."
+    )
+
 
+def gerar_e_salvar_recomendacoes(assessment_publico, dominios_dados=None):
+    """
+    Gera as recomendações de todos os domínios e as armazena no assessment
+    
+    Só grava quando a IA respondeu para todos os domínios: se ela não está
+    configurada ou falhou em algum domínio nada é armazenado e a exceção sobe,
+    para que a tarefa seja repetida (ou a próxima visualização tente de novo).
+    
+    Returns:
+        Dicionário {dominio_id: recomendacao}
+        
+    Raises:
+        RuntimeError: recomendações não geradas pela IA
+    """
+    if dominios_dados is None:
+        dominios_dados = montar_dominios_dados(assessment_publico)
+    
+    logging.info(f"Gerando recomendações IA para assessment público {assessment_publico.id}")
+    recomendacoes, falhas = gerar_recomendacoes_ia(assessment_publico, dominios_dados)
+    if falhas:
+        raise RuntimeError(f"IA não gerou recomendações para {falhas} de {len(dominios_dados)} domínios")
+    
+    recomendacoes_por_dominio = {
+        dominio_data['dominio'].id: recomendacao
+        for dominio_data, recomendacao in zip(dominios_dados, recomendacoes)
+    }
+    
+    assessment_publico.recomendacoes_ia = json.dumps(
+        {str(dominio_id): texto for dominio_id, texto in recomendacoes_por_dominio.items()},
+        ensure_ascii=False
+    )
+    assessment_publico.status_recomendacoes = 'concluido'
+    assessment_publico.data_recomendacoes = datetime.utcnow()
+    db.session.commit()
+    
+    logging.info(f"Recomendações armazenadas para assessment público {assessment_publico.id}")
+    return recomendacoes_por_dominio
+
+
+def preencher_recomendacoes(assessment_publico, dominios_dados):
+    """
+    Preenche a recomendação de cada domínio com a cópia armazenada no
+    assessment; só chama a IA se as recomendações ainda não foram geradas
+    
+    Se a IA não puder gerá-las agora, usa a recomendação padrão sem
+    armazená-la (uma próxima visualização tenta novamente).
+    """
+    recomendacoes = assessment_publico.get_recomendacoes()
+    if recomendacoes is None:
+        try:
+            recomendacoes = gerar_e_salvar_recomendacoes(assessment_publico, dominios_dados)
+        except Exception as e:
+            logging.error(f"Erro ao gerar recomendações IA: {e}", exc_info=True)
+            db.session.rollback()
+            recomendacoes = {}
+    
+    for dominio_data in dominios_dados:
+        dominio_data['recomendacao'] = recomendacoes.get(dominio_data['dominio'].id) or recomendacao_padrao(
+            dominio_data['dominio'].nome, dominio_data['pontuacao']
+        )
+    
+    return dominios_dados
+
+
+def agendar_recomendacoes(assessment_publico):
+    """Enfileira a geração das recomendações assim que o assessment é concluído"""
+    if assessment_publico.get_recomendacoes() is not None:
+        return
+    
+    try:
+        from jobs.fila import enfileirar
+        
+        assessment_publico.status_recomendacoes = 'pendente'
+        db.session.commit()
+        
+        enfileirar(
+            'recomendacoes_publicas',
+            parametros={'assessment_publico_id': assessment_publico.id},
+            chave=f'recomendacoes_publicas:{assessment_publico.id}'
+        )
+    except Exception as e:
+        # Sem a fila, a página de resultado gera as recomendações na hora
+        logging.error(f"Erro ao agendar recomendações do assessment público {assessment_publico.id}: {e}")
+        db.session.rollback()
+        assessment_publico.status_recomendacoes = None
+        db.session.commit()
+
+
+def registrar_estatisticas_grupo(assessment_publico, nova_conclusao=True):
+    """Atualiza as estatísticas agregadas do grupo com um assessment concluído"""
+    from models.estatistica_grupo import EstatisticaGrupoPublico
+    
+    try:
+        if nova_conclusao:
+            EstatisticaGrupoPublico.registrar_assessment(assessment_publico)
+        else:
+            EstatisticaGrupoPublico.atualizar_conclusao(assessment_publico)
+    except Exception as e:
+        # Os agregados divergentes são reconstruídos na próxima leitura
+        logging.error(f"Erro ao atualizar estatísticas do grupo do assessment público {assessment_publico.id}: {e}")
+        db.session.rollback()
 
 def calcular_nivel_maturidade(pontuacao):
     """
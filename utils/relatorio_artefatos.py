@@ -0,0 +1,318 @@
+"""
+Armazenamento dos relatórios PDF gerados por projeto
+
+Cada relatório é gravado em disco com o nome da impressão digital do seu
+conteúdo (dados do projeto, respostas, textos de IA, logos, cores e versão do
+template). Enquanto nada disso mudar, o mesmo arquivo é reaproveitado e a
+impressão digital é usada como ETag, de modo que o navegador recebe 304 sem
+que o relatório seja gerado ou lido novamente.
+
+A geração é feita pelo worker (tarefa 'relatorio_pdf') e grava o PDF
+diretamente no diretório de relatórios; as rotas de download servem o arquivo
+pronto ou enfileiram a geração e exibem o andamento na página do projeto.
+Quando o relatório não precisa ser guardado, gerar_relatorio_pdf_completo sem
+destino gera o PDF em memória e enviar_pdf o envia sem arquivo temporário.
+
+O diretório é definido pela variável de ambiente RELATORIOS_DIR.
+"""
+
+import os
+import glob
+import json
+import hashlib
+import logging
+import tempfile
+from app import db
+
+RELATORIOS_DIR = os.environ.get(
+    'RELATORIOS_DIR', os.path.join(tempfile.gettempdir(), 'assessment_relatorios')
+)
+
+
+def _assinatura_arquivo(caminho):
+    """Identifica a versão de um arquivo (logos) pelo caminho, tamanho e data de modificação"""
+    if not caminho:
+        return None
+    try:
+        estado = os.stat(caminho)
+        return [caminho, estado.st_size, int(estado.st_mtime)]
+    except OSError:
+        return [caminho, None, None]
+
+
+def _caminho_logo_sistema():
+    from models.logo import Logo
+    logo = Logo.query.filter_by(ativo=True).first()
+    if not logo or not logo.caminho_arquivo:
+        return None
+    caminho = logo.caminho_arquivo
+    if caminho.startswith('logos/'):
+        return os.path.join('static', 'uploads', caminho)
+    if not caminho.startswith('static/'):
+        return os.path.join('static', 'uploads', caminho.lstrip('/'))
+    return caminho
+
+
+def calcular_fingerprint(projeto):
+    """
+    Impressão digital (SHA-256) de tudo o que aparece no relatório do projeto
+
+    Usa uma consulta por tabela (domínios, perguntas e respostas), sem montar
+    o relatório.
+    """
+    from models.assessment_version import AssessmentDominio
+    from models.configuracao import Configuracao
+    from models.dominio import Dominio
+    from models.parametro_sistema import ParametroSistema
+    from models.pergunta import Pergunta
+    from models.respondente import Respondente
+    from models.resposta import Resposta
+    from utils.pdf_relatorio import VERSAO_TEMPLATE_RELATORIO
+
+    cliente = projeto.cliente
+    versoes_ids = []
+    tipos_antigos_ids = []
+    assessments = []
+    for projeto_assessment in projeto.assessments:
+        if projeto_assessment.versao_assessment_id:
+            tipo = projeto_assessment.versao_assessment.tipo
+            versoes_ids.append(projeto_assessment.versao_assessment_id)
+        else:
+            tipo = projeto_assessment.tipo_assessment
+            if projeto_assessment.tipo_assessment_id:
+                tipos_antigos_ids.append(projeto_assessment.tipo_assessment_id)
+        assessments.append([
+            projeto_assessment.id, projeto_assessment.versao_assessment_id, projeto_assessment.tipo_assessment_id,
+            projeto_assessment.ativo, projeto_assessment.finalizado, projeto_assessment.data_finalizacao,
+            tipo.nome if tipo else None, tipo.descricao if tipo else None
+        ])
+
+    digest = hashlib.sha256()
+
+    def adicionar(valor):
+        digest.update(json.dumps(valor, default=str, ensure_ascii=False).encode('utf-8'))
+        digest.update(b'\n')
+
+    adicionar({
+        'template': VERSAO_TEMPLATE_RELATORIO,
+        'projeto': [
+            projeto.id, projeto.nome, projeto.descricao, projeto.data_criacao, projeto.data_finalizacao,
+            projeto.nome_avaliador, projeto.email_avaliador, projeto.get_progresso_geral(),
+            projeto.introducao_ia, projeto.analise_dominios_ia, projeto.consideracoes_finais_ia
+        ],
+        'cliente': [
+            cliente.nome, cliente.razao_social, cliente.cnpj, cliente.localidade, cliente.segmento,
+            _assinatura_arquivo(os.path.join('static', 'uploads', cliente.logo_path) if cliente.logo_path else None)
+        ] if cliente else None,
+        'logo_sistema': _assinatura_arquivo(_caminho_logo_sistema()),
+        'cores': Configuracao.get_cores_sistema(),
+        'fuso_horario': ParametroSistema.get_valor('fuso_horario', 'America/Sao_Paulo'),
+        'respondentes': [
+            [pr.respondente_id, pr.ativo, pr.respondente.nome, pr.respondente.email, pr.respondente.login]
+            for pr in projeto.respondentes
+        ],
+        'assessments': assessments
+    })
+
+    # Estrutura dos questionários
+    dominios_versao_ids = []
+    dominios_antigos_ids = []
+    if versoes_ids:
+        for linha in db.session.query(
+            AssessmentDominio.id, AssessmentDominio.versao_id, AssessmentDominio.nome,
+            AssessmentDominio.descricao, AssessmentDominio.ordem, AssessmentDominio.ativo
+        ).filter(AssessmentDominio.versao_id.in_(versoes_ids)).order_by(AssessmentDominio.id):
+            dominios_versao_ids.append(linha.id)
+            adicionar(['dominio_versao'] + list(linha))
+    if tipos_antigos_ids:
+        for linha in db.session.query(
+            Dominio.id, Dominio.tipo_assessment_id, Dominio.nome,
+            Dominio.descricao, Dominio.ordem, Dominio.ativo
+        ).filter(Dominio.tipo_assessment_id.in_(tipos_antigos_ids)).order_by(Dominio.id):
+            dominios_antigos_ids.append(linha.id)
+            adicionar(['dominio'] + list(linha))
+
+    if dominios_versao_ids or dominios_antigos_ids:
+        for linha in db.session.query(
+            Pergunta.id, Pergunta.dominio_id, Pergunta.dominio_versao_id, Pergunta.texto, Pergunta.descricao,
+            Pergunta.referencia, Pergunta.recomendacao, Pergunta.ordem, Pergunta.ativo
+        ).filter(db.or_(
+            Pergunta.dominio_versao_id.in_(dominios_versao_ids),
+            Pergunta.dominio_id.in_(dominios_antigos_ids)
+        )).order_by(Pergunta.id):
+            adicionar(['pergunta'] + list(linha))
+
+    # Respostas do projeto
+    for linha in db.session.query(
+        Resposta.id, Resposta.pergunta_id, Resposta.respondente_id, Resposta.nota,
+        Resposta.comentario, Resposta.data_resposta, Respondente.nome
+    ).outerjoin(
+        Respondente, Respondente.id == Resposta.respondente_id
+    ).filter(Resposta.projeto_id == projeto.id).order_by(Resposta.id):
+        adicionar(['resposta'] + list(linha))
+
+    return digest.hexdigest()
+
+
+def _diretorio_projeto(projeto_id):
+    return os.path.join(RELATORIOS_DIR, f'projeto_{int(projeto_id)}')
+
+
+def obter_relatorio(projeto, fingerprint=None):
+    """
+    Retorna o caminho do relatório PDF do projeto, gerando-o somente se o
+    conteúdo mudou desde a última geração
+    """
+    fingerprint = fingerprint or calcular_fingerprint(projeto)
+    diretorio = _diretorio_projeto(projeto.id)
+    caminho = os.path.join(diretorio, f'{fingerprint}.pdf')
+
+    if os.path.exists(caminho):
+        logging.info(f"Relatório do projeto {projeto.id} reaproveitado ({fingerprint[:12]})")
+        return caminho
+
+    from utils.pdf_relatorio import gerar_relatorio_pdf_completo
+
+    os.makedirs(diretorio, exist_ok=True)
+
+    # Gerar em um arquivo parcial no mesmo diretório e renomear, para que outro processo nunca leia um arquivo incompleto
+    parcial = f'{caminho}.{os.getpid()}.tmp'
+    try:
+        with open(parcial, 'wb') as arquivo:
+            gerar_relatorio_pdf_completo(projeto, arquivo)
+        os.replace(parcial, caminho)
+    except Exception:
+        if os.path.exists(parcial):
+            os.unlink(parcial)
+        raise
+    logging.info(f"Relatório do projeto {projeto.id} gerado e armazenado ({fingerprint[:12]})")
+
+    remover_relatorios(projeto.id, manter=caminho)
+    return caminho
+
+
+def remover_relatorios(projeto_id, manter=None):
+    """Remove os relatórios armazenados de um projeto (exceto o caminho em manter)"""
+    for arquivo in glob.glob(os.path.join(_diretorio_projeto(projeto_id), '*.pdf')):
+        if arquivo == manter:
+            continue
+        try:
+            os.unlink(arquivo)
+        except OSError as e:
+            logging.warning(f"Erro ao remover relatório antigo {arquivo}: {e}")
+
+
+def relatorio_disponivel(projeto, fingerprint=None):
+    """Caminho do relatório atual do projeto, ou None se ainda não foi gerado"""
+    fingerprint = fingerprint or calcular_fingerprint(projeto)
+    caminho = os.path.join(_diretorio_projeto(projeto.id), f'{fingerprint}.pdf')
+    return caminho if os.path.exists(caminho) else None
+
+
+def solicitar_relatorio(projeto, solicitado_por=None):
+    """Enfileira a geração do relatório no worker (reaproveita a tarefa já na fila)"""
+    from jobs.fila import enfileirar
+
+    tarefa_relatorio, _ = enfileirar('relatorio_pdf', projeto_id=projeto.id, solicitado_por=solicitado_por)
+    return tarefa_relatorio
+
+
+def status_relatorio(projeto):
+    """
+    Situação da última geração em background do relatório do projeto
+
+    'pronto' só é informado se o arquivo guardado corresponde aos dados atuais
+    do projeto; se as respostas mudaram depois da geração, a situação é
+    'pendente' (o download enfileira uma nova geração).
+
+    Returns:
+        {'status': None | 'gerando' | 'pronto' | 'pendente' | 'erro', 'mensagem': str}
+    """
+    from models.tarefa_background import TarefaBackground
+
+    tarefa_relatorio = TarefaBackground.query.filter_by(
+        projeto_id=projeto.id, tipo='relatorio_pdf'
+    ).order_by(TarefaBackground.id.desc()).first()
+
+    if not tarefa_relatorio:
+        return {'status': None, 'mensagem': ''}
+    if tarefa_relatorio.is_ativa():
+        if tarefa_relatorio.status == 'pendente':
+            mensagem = 'Aguardando na fila de processamento...'
+        else:
+            mensagem = 'Gerando o relatório...'
+        return {'status': 'gerando', 'mensagem': mensagem}
+    if tarefa_relatorio.status == 'erro':
+        return {'status': 'erro', 'mensagem': f'Erro ao gerar o relatório: {tarefa_relatorio.erro}. Solicite o relatório novamente.'}
+    if not relatorio_disponivel(projeto):
+        return {'status': 'pendente', 'mensagem': 'Os dados do projeto mudaram desde a última geração. Solicite o relatório novamente.'}
+    return {'status': 'pronto', 'mensagem': 'Relatório pronto para download.'}
+
+
+def responder_relatorio_pdf(projeto, download_name):
+    """
+    Resposta HTTP com o relatório do projeto, usando a impressão digital como
+    ETag (If-None-Match igual devolve 304 sem ler o arquivo)
+
+    Retorna None se o relatório atual ainda não foi gerado; nesse caso quem
+    chama deve enfileirar a geração (solicitar_relatorio).
+    """
+    from flask import request, current_app
+
+    fingerprint = calcular_fingerprint(projeto)
+
+    if fingerprint in request.if_none_match:
+        resposta = current_app.response_class(status=304)
+        resposta.set_etag(fingerprint)
+        # O relatório depende de permissão de acesso: o navegador pode guardar, mas deve revalidar
+        resposta.headers['Cache-Control'] = 'private, no-cache'
+        return resposta
+
+    caminho = relatorio_disponivel(projeto, fingerprint)
+    if not caminho:
+        return None
+    return enviar_pdf(caminho, download_name, etag=fingerprint)
+
+
+def enviar_pdf(arquivo, download_name, etag=None):
+    """
+    Envia um PDF em partes (sem carregá-lo inteiro na resposta), com
+    Content-Length e suporte a requisições Range
+
+    Args:
+        arquivo: Caminho do arquivo ou arquivo binário/buffer (ex: retorno de
+            gerar_relatorio_pdf_completo sem destino), que é fechado ao final
+        download_name: Nome sugerido para o download
+        etag: ETag da resposta (usada também em If-Range)
+    """
+    from flask import request, send_file
+    from werkzeug.exceptions import RequestedRangeNotSatisfiable
+
+    if isinstance(arquivo, (str, os.PathLike)):
+        tamanho = os.path.getsize(arquivo)
+    else:
+        arquivo.seek(0, os.SEEK_END)
+        tamanho = arquivo.tell()
+        arquivo.seek(0)
+
+    resposta = send_file(
+        arquivo,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype='application/pdf',
+        etag=etag if etag else False,
+        conditional=False,
+        max_age=0
+    )
+    resposta.content_length = tamanho
+    # Aplica If-None-Match/If-Range/Range com o tamanho conhecido (206 ou 416 quando for o caso)
+    try:
+        resposta = resposta.make_conditional(request, accept_ranges=True, complete_length=tamanho)
+    except RequestedRangeNotSatisfiable:
+        # A resposta não será enviada: fechar o arquivo (ou buffer) aberto
+        resposta.close()
+        raise
+
+    # O relatório depende de permissão de acesso: o navegador pode guardar, mas deve revalidar
+    resposta.headers['Cache-Control'] = 'private, no-cache'
+    return resposta
@@ -0,0 +1,231 @@
+"""
+Geração de relatórios PDF em lote
+
+Seleciona projetos por cliente, situação e período, gera o relatório de cada
+um em um pool de processos e reúne os PDFs em um arquivo ZIP. Cada processo
+do pool tem a sua própria aplicação, app context e sessão do banco. Um
+projeto com erro não interrompe o lote: o erro é registrado no resumo e no
+arquivo RESUMO.txt dentro do ZIP.
+
+Os relatórios gerados ficam guardados em RELATORIOS_DIR (ver
+utils.relatorio_artefatos), então projetos que não mudaram desde a última
+geração são apenas copiados para o ZIP.
+
+Usado pelo script scripts/gerar_relatorios_lote.py e pela tarefa
+'relatorios_lote' (ação "Relatórios em lote" da lista de projetos).
+"""
+
+import os
+import glob
+import logging
+import zipfile
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.utils import secure_filename
+from app import db
+from jobs.processo_lote import inicializar_processo_lote
+
+# Processos usados por padrão na geração em lote
+PROCESSOS_LOTE = int(os.environ.get('RELATORIOS_LOTE_PROCESSOS', min(os.cpu_count() or 1, 4)))
+
+STATUS_LOTE = {
+    'finalizados': 'Finalizados',
+    'em_andamento': 'Em andamento',
+    'todos': 'Todos'
+}
+
+# Quantidade de ZIPs gerados pela ação da lista de projetos mantidos em disco
+LOTES_MANTIDOS = int(os.environ.get('RELATORIOS_LOTE_MANTIDOS', '10'))
+
+def selecionar_projetos(cliente_id=None, status='finalizados', data_inicio=None, data_fim=None):
+    """
+    Projetos ativos que entram no lote, ordenados por cliente e nome
+
+    Args:
+        cliente_id: Restringe a um cliente
+        status: 'finalizados', 'em_andamento' ou 'todos'
+        data_inicio, data_fim: Período (datas, inclusive) da data de referência
+            do projeto: a data de finalização, ou a de criação se o projeto
+            não foi finalizado
+    """
+    from sqlalchemy.orm import selectinload
+    from models.cliente import Cliente
+    from models.projeto import Projeto
+
+    if status not in STATUS_LOTE:
+        raise ValueError(f'Situação inválida: {status}')
+
+    query = Projeto.query.join(Cliente, Cliente.id == Projeto.cliente_id).filter(
+        Projeto.ativo == True
+    ).options(selectinload(Projeto.assessments))
+    if cliente_id:
+        query = query.filter(Projeto.cliente_id == cliente_id)
+
+    projetos = []
+    for projeto in query.order_by(Cliente.nome, Projeto.nome, Projeto.id):
+        finalizado = projeto.is_totalmente_finalizado()
+        if status == 'finalizados' and not finalizado:
+            continue
+        if status == 'em_andamento' and finalizado:
+            continue
+
+        referencia = projeto.data_finalizacao if finalizado else projeto.data_criacao
+        if data_inicio and (not referencia or referencia < datetime.combine(data_inicio, datetime.min.time())):
+            continue
+        if data_fim and (not referencia or referencia >= datetime.combine(data_fim + timedelta(days=1), datetime.min.time())):
+            continue
+
+        projetos.append(projeto)
+    return projetos
+
+
+def _nome_arquivo(projeto):
+    """Nome do PDF do projeto dentro do ZIP"""
+    cliente = secure_filename(projeto.cliente.nome if projeto.cliente else '') or 'cliente'
+    nome = secure_filename(projeto.nome or '') or 'projeto'
+    return f'{cliente}/{projeto.id}_{nome}.pdf'
+
+
+def _gerar_relatorio_projeto(projeto_id):
+    """
+    Gera (ou reaproveita) o relatório de um projeto
+
+    Executada nos processos do pool, ou no próprio processo quando o lote usa
+    um único processo. Nunca lança exceção: o erro volta no resultado.
+    """
+    from flask import has_app_context
+    from models.projeto import Projeto
+    from utils.relatorio_artefatos import obter_relatorio
+
+    def gerar():
+        try:
+            projeto = db.session.get(Projeto, projeto_id)
+            if not projeto:
+                return {'projeto_id': projeto_id, 'caminho': None, 'erro': 'Projeto não encontrado'}
+            return {'projeto_id': projeto_id, 'caminho': obter_relatorio(projeto), 'erro': None}
+        except Exception as e:
+            logging.error(f"Erro ao gerar relatório do projeto {projeto_id} no lote: {e}", exc_info=True)
+            db.session.rollback()
+            return {'projeto_id': projeto_id, 'caminho': None, 'erro': str(e) or e.__class__.__name__}
+
+    if has_app_context():
+        return gerar()
+
+    from app import app
+    with app.app_context():
+        try:
+            return gerar()
+        finally:
+            db.session.remove()
+
+
+def _executar(projetos_ids, processos):
+    """Gera os relatórios e produz os resultados à medida que ficam prontos"""
+    if processos <= 1 or len(projetos_ids) <= 1:
+        for projeto_id in projetos_ids:
+            yield _gerar_relatorio_projeto(projeto_id)
+        return
+
+    # spawn: os processos não herdam conexões abertas nem as threads do processo atual (ex: lease do worker).
+    # Cada processo importa o módulo app (cria a aplicação e o seu pool de conexões, sem inicializar o banco)
+    # antes de receber a primeira tarefa, pois importar utils antes de app causa importação circular.
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(processos, len(projetos_ids)), mp_context=contexto,
+                             initializer=inicializar_processo_lote) as pool:
+        futuros = {pool.submit(_gerar_relatorio_projeto, projeto_id): projeto_id for projeto_id in projetos_ids}
+        for futuro in as_completed(futuros):
+            try:
+                yield futuro.result()
+            except BrokenProcessPool as e:
+                # Um processo morreu (ex: falta de memória); os projetos afetados entram como erro
+                yield {'projeto_id': futuros[futuro], 'caminho': None, 'erro': f'Processo de geração encerrado: {e}'}
+
+
+def gerar_relatorios_lote(projetos, destino, processos=None, progresso=None):
+    """
+    Gera os relatórios dos projetos e grava o ZIP em destino
+
+    Args:
+        projetos: Projetos do lote (ver selecionar_projetos)
+        destino: Caminho do arquivo ZIP
+        processos: Tamanho do pool (padrão: RELATORIOS_LOTE_PROCESSOS)
+        progresso: Função chamada com (processados, total, projeto) após cada projeto
+
+    Returns:
+        Resumo {'arquivo', 'total', 'gerados', 'erros': [{'projeto_id', 'projeto', 'cliente', 'erro'}]}
+    """
+    processos = processos or PROCESSOS_LOTE
+    por_id = {projeto.id: projeto for projeto in projetos}
+    total = len(por_id)
+    gerados = 0
+    erros = []
+
+    # Liberar as conexões antes de abrir o pool; a sessão volta a ser usada ao final
+    db.session.commit()
+
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+    parcial = f'{destino}.{os.getpid()}.tmp'
+    try:
+        # PDFs já são comprimidos; ZIP_STORED evita gastar CPU sem ganho
+        with zipfile.ZipFile(parcial, 'w', compression=zipfile.ZIP_STORED) as arquivo_zip:
+            for processados, resultado in enumerate(_executar(list(por_id), processos), start=1):
+                projeto = por_id[resultado['projeto_id']]
+                if resultado['erro']:
+                    erros.append({
+                        'projeto_id': projeto.id,
+                        'projeto': projeto.nome,
+                        'cliente': projeto.cliente.nome if projeto.cliente else None,
+                        'erro': resultado['erro']
+                    })
+                    logging.warning(f"Relatório do projeto {projeto.id} não gerado no lote: {resultado['erro']}")
+                else:
+                    arquivo_zip.write(resultado['caminho'], _nome_arquivo(projeto))
+                    gerados += 1
+
+                if progresso:
+                    progresso(processados, total, projeto)
+
+            arquivo_zip.writestr('RESUMO.txt', _texto_resumo(total, gerados, erros))
+        os.replace(parcial, destino)
+    except Exception:
+        if os.path.exists(parcial):
+            os.unlink(parcial)
+        raise
+
+    logging.info(f"Lote de relatórios gravado em {destino}: {gerados}/{total} gerados, {len(erros)} erros")
+    return {'arquivo': destino, 'total': total, 'gerados': gerados, 'erros': erros}
+
+
+def _texto_resumo(total, gerados, erros):
+    linhas = [
+        f'Relatórios em lote - {datetime.now().strftime("%d/%m/%Y %H:%M")}',
+        '',
+        f'Projetos: {total}',
+        f'Relatórios gerados: {gerados}',
+        f'Erros: {len(erros)}'
+    ]
+    if erros:
+        linhas.append('')
+        for erro in erros:
+            linhas.append(f"- Projeto {erro['projeto_id']} ({erro['cliente']} / {erro['projeto']}): {erro['erro']}")
+    return '\n'.join(linhas) + '\n'
+
+
+def caminho_lote(tarefa_id):
+    """Caminho do ZIP gerado pela tarefa 'relatorios_lote'"""
+    from utils.relatorio_artefatos import RELATORIOS_DIR
+    return os.path.join(RELATORIOS_DIR, 'lotes', f'lote_{int(tarefa_id)}.zip')
+
+
+def remover_lotes_antigos(manter=LOTES_MANTIDOS):
+    """Mantém em disco apenas os ZIPs mais recentes da ação em lote"""
+    from utils.relatorio_artefatos import RELATORIOS_DIR
+    arquivos = sorted(glob.glob(os.path.join(RELATORIOS_DIR, 'lotes', 'lote_*.zip')),
+                      key=os.path.getmtime, reverse=True)
+    for arquivo in arquivos[manter:]:
+        try:
+            os.unlink(arquivo)
+        except OSError as e:
+            logging.warning(f"Erro ao remover lote antigo {arquivo}: {e}")
@@ -0,0 +1,102 @@
+"""
+Cópia e inserção em lote da estrutura (domínios e perguntas) de versões de assessment
+
+Em vez de adicionar e dar flush em um objeto por domínio e por pergunta, as
+linhas são gravadas com INSERT em lote (executemany com RETURNING, na ordem dos
+parâmetros), de modo que no PostgreSQL copiar uma versão custa quatro comandos
+SQL qualquer que seja o tamanho do questionário (o SQLite, sem garantia de ordem
+no RETURNING em lote, executa uma linha por vez dentro do mesmo comando). Os ids
+gerados são devolvidos em mapas id antigo -> id novo.
+
+Nada é commitado aqui: tudo roda na transação da sessão atual e quem chama faz
+o commit (ou rollback) de uma vez.
+"""
+
+from sqlalchemy import insert, select
+from app import db
+from models.assessment_version import AssessmentDominio
+from models.pergunta import Pergunta
+
+COLUNAS_DOMINIO = ('nome', 'descricao', 'ordem')
+COLUNAS_PERGUNTA = ('texto', 'descricao', 'referencia', 'recomendacao', 'light', 'ordem')
+
+
+def _inserir(tabela, linhas):
+    """INSERT em lote retornando os ids na mesma ordem das linhas"""
+    if not linhas:
+        return []
+    resultado = db.session.execute(
+        insert(tabela).returning(tabela.c.id, sort_by_parameter_order=True),
+        linhas
+    )
+    return list(resultado.scalars())
+
+
+def inserir_dominios(versao_id, dominios):
+    """
+    Insere domínios na versão
+
+    Args:
+        versao_id: Versão de destino
+        dominios: Lista de dicts com nome, descricao e ordem
+
+    Returns:
+        Lista com os ids criados, na ordem de dominios
+    """
+    return _inserir(AssessmentDominio.__table__, [
+        dict({coluna: dominio.get(coluna) for coluna in COLUNAS_DOMINIO}, versao_id=versao_id, ativo=True)
+        for dominio in dominios
+    ])
+
+
+def inserir_perguntas(perguntas):
+    """
+    Insere perguntas em domínios versionados
+
+    Args:
+        perguntas: Lista de dicts com dominio_versao_id, texto, descricao,
+            referencia, recomendacao, light e ordem
+
+    Returns:
+        Lista com os ids criados, na ordem de perguntas
+    """
+    return _inserir(Pergunta.__table__, [
+        dict({coluna: pergunta.get(coluna) for coluna in COLUNAS_PERGUNTA},
+             dominio_versao_id=pergunta['dominio_versao_id'], light=bool(pergunta.get('light')), ativo=True)
+        for pergunta in perguntas
+    ])
+
+
+def copiar_estrutura_versao(origem_id, destino_id):
+    """
+    Copia os domínios e perguntas ativos de uma versão para outra
+
+    Returns:
+        (mapa_dominios, mapa_perguntas): dicts id na origem -> id na cópia
+    """
+    dominios = db.session.execute(
+        select(AssessmentDominio.id, *(getattr(AssessmentDominio, coluna) for coluna in COLUNAS_DOMINIO)).where(
+            AssessmentDominio.versao_id == origem_id,
+            AssessmentDominio.ativo == True
+        ).order_by(AssessmentDominio.ordem, AssessmentDominio.id)
+    ).mappings().all()
+
+    novos_dominios = inserir_dominios(destino_id, dominios)
+    mapa_dominios = dict(zip((dominio['id'] for dominio in dominios), novos_dominios))
+    if not mapa_dominios:
+        return {}, {}
+
+    perguntas = db.session.execute(
+        select(Pergunta.id, Pergunta.dominio_versao_id, *(getattr(Pergunta, coluna) for coluna in COLUNAS_PERGUNTA)).where(
+            Pergunta.dominio_versao_id.in_(list(mapa_dominios)),
+            Pergunta.ativo == True
+        ).order_by(Pergunta.dominio_versao_id, Pergunta.ordem, Pergunta.id)
+    ).mappings().all()
+
+    novas_perguntas = inserir_perguntas([
+        dict(pergunta, dominio_versao_id=mapa_dominios[pergunta['dominio_versao_id']])
+        for pergunta in perguntas
+    ])
+    mapa_perguntas = dict(zip((pergunta['id'] for pergunta in perguntas), novas_perguntas))
+
+    return mapa_dominios, mapa_perguntas